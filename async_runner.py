@@ -0,0 +1,981 @@
+"""
+asyncio 调度与执行路径（SCHEDULER_MODE=asyncio）。
+
+- 调度：AsyncIOScheduler，定时任务同样持久化到 Redis 作业存储并做启动补跑检查
+- 执行：每个用户一个协程，接口请求（httpx）、Cookie / 用户 / VIP 时间的 Redis 读写（redis.asyncio）
+  以及重试间隔都是非阻塞的，大量等待中的账号只占用协程而不是线程
+- 浏览器步骤与登录：启用浏览器进程池时通过 asyncio.to_thread 投递；未启用时直接在事件循环上执行 Playwright
+  异步流程，各用户的浏览器上下文共享本进程的常驻浏览器（见 playwright_handle/browser_pool）；
+  发送记录等低频的读改写沿用 main.py 中带锁的同步实现
+
+阶段顺序、跳过条件（plan_browser_stages / interval_steps / share_skip_lines）与汇总行直接复用 main.py 线程版的函数，
+这里只实现需要 await 的网络请求与 Redis 读写。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import redis.asyncio as aioredis
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.asyncio import AsyncIOExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+import main as runner
+from run_budget import (
+    RunBudget, RunDeferred, login_timeout_kwargs, require_user_time, stage_timeout_kwargs, use_budget,
+)
+from run_state import (
+    STATUS_DEFERRED, STATUS_DONE, TASK_DAILY, TASK_MISSIONS, TASK_SHARE, TASK_VIP,
+    open_run, get_unfinished_runs, get_done_tasks, mark_task_done,
+)
+from deletion_queue import process_due_deletions, schedule_delete
+from mission_engine import claim_mission_rewards_async
+from tracing import span
+from core import (
+    AuthManager, CryptoUtil, NeteaseClient, NeteaseSecurity, logger, parse_user_credentials,
+    COOKIE_TTL_SECONDS, DEFAULT_HEADERS, USER_COOKIE_KEY_TPL, USER_DATA_KEY_TPL, USER_TASK_KEY,
+)
+from config import (
+    REDIS_CONF,
+    LOGIN_METHOD,
+    SEND_TIME, SEND_WINDOW, EXECUTION_INTERVAL_DAYS,
+    WECOM_WEBHOOK_KEY, TASK_QUEUE_MODE,
+    ASYNC_USER_CONCURRENCY, PLAYWRIGHT_USER_CONCURRENCY,
+    SCHEDULER_DAILY_MISFIRE_GRACE, SCHEDULER_INTERVAL_MISFIRE_GRACE,
+    DYNAMIC_DELETE_DELAY_SECONDS, DYNAMIC_DELETE_POLL_SECONDS,
+    RUN_FOLLOWUP_DELAY_SECONDS,
+    PLAYWRIGHT_SUPERVISOR_SECONDS,
+)
+
+_aredis: aioredis.Redis | None = None
+# 以下对象绑定事件循环，在 main_async 中创建
+_browser_slots: asyncio.Semaphore | None = None
+_run_lock: asyncio.Lock | None = None
+_scheduler: AsyncIOScheduler | None = None
+# 已校验过的 Cookie 复用（与线程版 UserSession 的 SESSION_REUSE_SECONDS 一致）
+_cookie_cache: dict[str, tuple[str, float]] = {}
+
+
+def get_async_redis() -> aioredis.Redis | None:
+    global _aredis
+    if _aredis is None and REDIS_CONF:
+        _aredis = aioredis.Redis(**REDIS_CONF)
+    return _aredis
+
+
+def _get_browser_slots() -> asyncio.Semaphore:
+    global _browser_slots
+    if _browser_slots is None:
+        _browser_slots = asyncio.Semaphore(PLAYWRIGHT_USER_CONCURRENCY)
+    return _browser_slots
+
+
+def _get_run_lock() -> asyncio.Lock:
+    global _run_lock
+    if _run_lock is None:
+        _run_lock = asyncio.Lock()
+    return _run_lock
+
+
+# ---------- 异步 API 客户端 ----------
+class AsyncNeteaseClient:
+    """NeteaseClient 的异步版本（httpx），请求加密、重试次数与返回结构保持一致"""
+    BASE_URL = NeteaseClient.BASE_URL
+    RETRY_TIMES = NeteaseClient.RETRY_TIMES
+    RETRY_DELAY = NeteaseClient.RETRY_DELAY
+
+    def __init__(self, cookie_str=None, uid=None):
+        self.uid = uid
+        self.session = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=10, follow_redirects=True)
+        if cookie_str:
+            self._parse_and_set_cookie(cookie_str)
+
+    def _parse_and_set_cookie(self, cookie_str):
+        """将浏览器复制的 key=val; key2=val2 字符串解析进 Session"""
+        count = 0
+        for item in cookie_str.split(';'):
+            item = item.strip()
+            if '=' in item:
+                k, v = item.split('=', 1)
+                self.session.cookies.set(k, v)
+                count += 1
+        if not count:
+            logger.warning("Cookie解析结果为空")
+
+    def get_cookie_str(self):
+        """将当前 Session 的 Cookie 导出为字符串，方便存 Redis"""
+        try:
+            return '; '.join(f"{c.name}={c.value}" for c in self.session.cookies.jar)
+        except Exception as e:
+            logger.error(f"导出Cookie字符串失败: {e}")
+            return ''
+
+    @property
+    def csrf_token(self):
+        csrf = self.session.cookies.get('__csrf')
+        if csrf:
+            return csrf
+        logger.warning("Cookie中未找到__csrf，生成新的csrf_token")
+        return CryptoUtil.generate_csrf_token()
+
+    async def request(self, method, path, data=None, encrypt=True):
+        url = self.BASE_URL + path
+        payload = None
+
+        for retry in range(self.RETRY_TIMES):
+            try:
+                if method.upper() == 'POST' and data:
+                    payload = NeteaseSecurity.encrypt_weapi(data) if encrypt else data
+
+                resp = await self.session.request(method, url, data=payload)
+
+                if resp.status_code != 200:
+                    logger.warning(f"请求返回非200状态码: {resp.status_code}, URL: {url}")
+                    if retry >= self.RETRY_TIMES - 1:
+                        return {'code': resp.status_code, 'msg': f'HTTP错误: {resp.status_code}'}
+                    await asyncio.sleep(self.RETRY_DELAY)
+                    continue
+
+                try:
+                    return resp.json()
+                except json.JSONDecodeError:
+                    logger.error(f"非 JSON 响应 [Code: {resp.status_code}]: {resp.text[:50]}")
+                    if retry >= self.RETRY_TIMES - 1:
+                        return {'code': -1, 'msg': '非 JSON 响应'}
+                    await asyncio.sleep(self.RETRY_DELAY)
+                    continue
+
+            except httpx.HTTPError as e:
+                logger.error(f"网络请求异常 [{path}]: {e}")
+                if retry >= self.RETRY_TIMES - 1:
+                    return {'code': 500, 'msg': str(e)}
+                await asyncio.sleep(self.RETRY_DELAY)
+                continue
+
+        return {'code': 500, 'msg': '请求失败，已达最大重试次数'}
+
+    async def aclose(self):
+        await self.session.aclose()
+
+
+class AsyncTaskManager:
+    """TaskManager 的异步版本（仅包含调度流程用到的接口）"""
+
+    def __init__(self, client: AsyncNeteaseClient):
+        self.client = client
+
+    async def daily_task(self):
+        """网易云音乐签到任务"""
+        return await self.client.request('POST', '/weapi/point/dailyTask', data={"type": 1})
+
+    async def get_musician_cycle_mission(self, actionType="102", platform="200"):
+        """获取音乐人任务列表"""
+        csrf = self.client.csrf_token
+        # checkToken 依赖 execjs（同步执行 JS），放到线程中生成
+        check_token = await asyncio.to_thread(CryptoUtil.generate_check_token)
+        data = {"actionType": actionType, "platform": platform, "csrf_token": csrf}
+        if check_token:
+            data["checkToken"] = check_token
+        else:
+            logger.warning("checkToken 生成失败（缺少 JS 运行时/Node.js 或 execjs 不可用），将不携带 checkToken 请求音乐人接口")
+        return await self.client.request(
+            'POST', f'/weapi/nmusician/workbench/mission/cycle/list?csrf_token={csrf}', data=data
+        )
+
+    async def reward_obtain(self, userMissionId, period):
+        """领取音乐人云豆签到任务"""
+        return await self.client.request(
+            'POST',
+            '/weapi/nmusician/workbench/mission/reward/obtain/new',
+            data={"userMissionId": userMissionId, "period": period},
+        )
+
+    async def get_random_song(self):
+        try:
+            resp = await self.client.session.get(
+                "https://music.163.com/api/v6/playlist/detail?id=3778678&n=100", timeout=5
+            )
+            tracks = resp.json()['playlist']['tracks']
+            return str(random.choice(tracks)['id'])
+        except Exception:
+            return "2123990711"
+
+    async def share_song(self):
+        song_id = await self.get_random_song()
+        msg = f"{time.strftime('%Y年%m月%d日%H:%M:%S')}早上好"
+        check_token = await asyncio.to_thread(CryptoUtil.generate_check_token)
+        csrf = self.client.csrf_token
+        params = {
+            "id": song_id,
+            "type": "song",
+            "msg": msg,
+            "uuid": CryptoUtil.generate_publish_uuid(),
+            "csrf_token": csrf,
+        }
+        if check_token:
+            params["checkToken"] = check_token
+        else:
+            logger.warning("checkToken 生成失败（缺少 JS 运行时/Node.js 或 execjs 不可用），将不携带 checkToken 进行分享请求")
+        return await self.client.request('POST', f'/weapi/share/friends/resource?csrf_token={csrf}', params)
+
+    async def delete_dynamic(self, event_id):
+        csrf = self.client.csrf_token
+        return await self.client.request('POST', f'/weapi/event/delete?csrf_token={csrf}', {'id': str(event_id)})
+
+
+async def async_retry_with_backoff(func, max_retries=3, delay=2, task_name="任务"):
+    """retry_with_backoff 的协程版本：func 为无参协程函数，返回 False/None 视为失败"""
+    for attempt in range(max_retries):
+        try:
+            result = await func()
+            if result is False or result is None:
+                if attempt < max_retries - 1:
+                    logger.warning(f"{task_name} 执行失败，{delay}秒后进行第 {attempt + 2} 次重试（共{max_retries}次）")
+                    await asyncio.sleep(delay)
+                    continue
+                logger.error(f"{task_name} 执行失败，已达最大重试次数 {max_retries} 次")
+                return None
+            return result
+        except Exception as e:
+            if attempt < max_retries - 1:
+                logger.warning(f"{task_name} 执行异常: {e}，{delay}秒后进行第 {attempt + 2} 次重试（共{max_retries}次）")
+                await asyncio.sleep(delay)
+                continue
+            logger.error(f"{task_name} 执行异常，已达最大重试次数 {max_retries} 次: {e}")
+            return None
+    return None
+
+
+# ---------- 用户会话 ----------
+class AsyncUserSession:
+    """UserSession 的协程版本：登录态只获取一次，浏览器步骤一次性预取，各阶段共用"""
+
+    def __init__(self, auth, user):
+        self.auth = auth
+        self.user = user
+        self.uid = user.get('uid', user.get('phone'))
+        self.cache_key = str(user.get('task_key') or self.uid)
+        self.profile_dir = runner.get_user_profile_dir(user)
+        self._client: AsyncNeteaseClient | None = None
+        self._client_resolved = False
+        self._vip_state = None
+        self._vip_state_resolved = False
+        self._browser_results: dict = {}
+        self._done_tasks: set[str] | None = None
+
+    def _set_client(self, cookie_str: str):
+        self._client = AsyncNeteaseClient(cookie_str=cookie_str, uid=self.user.get('uid'))
+        _cookie_cache[self.cache_key] = (cookie_str, time.time())
+        return self._client
+
+    async def _get_client_by_uid(self, uid):
+        """AuthManager.get_client_by_uid 的异步版本：读取 Redis Cookie 并校验有效性"""
+        r = get_async_redis()
+        if not uid or not r:
+            return None
+        try:
+            cookie_str = await r.get(USER_COOKIE_KEY_TPL.format(uid=uid))
+            if not cookie_str:
+                return None
+            client = AsyncNeteaseClient(cookie_str=cookie_str, uid=uid)
+            logger.info(f"正在检查用户 {uid} 的 Cookie 有效性...")
+            check = await client.request('GET', f'/api/v1/user/detail/{uid}', encrypt=False)
+            if check.get('code') == 200 and check.get('profile'):
+                logger.info(f"用户 {uid} Cookie 有效 (昵称: {check['profile'].get('nickname', '未知')})")
+                return client
+            logger.warning(f"用户 {uid} Cookie 可能已失效，状态码: {check.get('code')}")
+            await client.aclose()
+            try:
+                await r.delete(USER_COOKIE_KEY_TPL.format(uid=uid), USER_DATA_KEY_TPL.format(uid=uid))
+                logger.info(f"已删除用户 {uid} 的失效Cookie")
+            except Exception as e:
+                logger.error(f"删除失效Cookie失败: {e}")
+        except Exception as e:
+            logger.warning(f"检测用户 {uid} 时发生异常: {e}")
+        return None
+
+    async def _login(self):
+        """登录仍为同步实现（api 登录 / Playwright 浏览器登录），放到线程中执行"""
+        sync_client = await asyncio.to_thread(runner._login_user, self.auth, self.user)
+        if not sync_client:
+            return None
+        return self._set_client(sync_client.get_cookie_str())
+
+    async def get_client(self):
+        if self._client_resolved:
+            return self._client
+        self._client_resolved = True
+
+        cached = _cookie_cache.get(self.cache_key)
+        if cached and time.time() - cached[1] < runner.SESSION_REUSE_SECONDS:
+            logger.info(f"用户 {self.uid} 复用 {int((time.time() - cached[1]) // 60)} 分钟内已校验的登录态")
+            self._client = AsyncNeteaseClient(cookie_str=cached[0], uid=self.user.get('uid'))
+            return self._client
+
+        client = None
+        if self.user.get('uid') and str(self.user.get('uid')) != str(self.user.get('phone')):
+            client = await self._get_client_by_uid(self.user.get('uid'))
+        if client:
+            self._client = client
+            _cookie_cache[self.cache_key] = (client.get_cookie_str(), time.time())
+            return client
+        return await self._login()
+
+    async def relogin(self):
+        old = self._client
+        client = await self._login()
+        if client and old:
+            await old.aclose()
+        return client
+
+    async def update_cookie(self, cookie_str: str):
+        """AuthManager.update_cookie 的异步版本"""
+        r = get_async_redis()
+        if not r or not cookie_str:
+            return
+        try:
+            await r.set(USER_COOKIE_KEY_TPL.format(uid=self.user['uid']), cookie_str, ex=COOKIE_TTL_SECONDS)
+            logger.info(f"已更新用户 {self.user['uid']} 的Cookie到Redis")
+        except Exception as e:
+            logger.warning(f"更新用户 {self.user['uid']} Cookie失败: {e}")
+
+    async def get_vip_state(self):
+        if not self._vip_state_resolved:
+            self._vip_state_resolved = True
+            if LOGIN_METHOD == 'playwright':
+                try:
+                    r = get_async_redis()
+                    raw = await r.get(runner._vip_key(self.uid)) if r else None
+                    self._vip_state = runner.vip_due_state_from_ms(runner.parse_vip_further_get_time(raw))
+                except Exception as e:
+                    logger.error(f"用户 {self.uid} 读取 VIP 领取状态时发生异常: {e}")
+        return self._vip_state
+
+    async def run_browser_job(self, name: str, *args, **kwargs):
+        """
+        执行浏览器任务（进程池 / 本事件循环），同时运行的浏览器上下文数受 PLAYWRIGHT_USER_CONCURRENCY 限制。
+        流程中回调的下次可领取 VIP 时间先记下，任务结束后再在线程中写入 Redis（同步写入会阻塞事件循环）。
+        """
+        from playwright_handle.worker_pool import run_browser_job_async
+
+        vip_times: list[int] = []
+        try:
+            async with _get_browser_slots():
+                return await run_browser_job_async(
+                    name, *args, vip_further_get_time_callback=vip_times.append, **kwargs
+                )
+        finally:
+            if vip_times:
+                await asyncio.to_thread(runner.set_vip_further_get_time_ms, self.uid, int(vip_times[-1]))
+
+    async def run_browser_stages(self, stages: list[str]):
+        client = await self.get_client()
+        if not stages or not client:
+            return
+        try:
+            self._browser_results = await self.run_browser_job(
+                "run_user_browser_stages",
+                self.profile_dir,
+                stages,
+                cookie_str=client.get_cookie_str(),
+                phone=self.user.get("phone"),
+                password=self.user.get("password"),
+                share_msg=f"{datetime.now().strftime('%Y年%m月%d日%H:%M:%S')}早上好",
+                search_keyword="你好",
+                uid=self.user.get("uid"),
+                **stage_timeout_kwargs(len(stages)),
+                **login_timeout_kwargs(),
+            ) or {}
+        except Exception as e:
+            logger.warning(f"用户 {self.uid} 共享浏览器执行 {stages} 失败，将按阶段单独执行：{e}")
+            self._browser_results = {}
+
+    def has_browser_result(self, stage: str) -> bool:
+        return stage in self._browser_results
+
+    async def done_tasks(self) -> set[str]:
+        """当天已完成的任务（见 run_state.get_done_tasks），流程内只读取一次 Redis"""
+        if self._done_tasks is None:
+            self._done_tasks = await asyncio.to_thread(get_done_tasks, self.uid)
+        return self._done_tasks
+
+    async def is_done(self, task: str) -> bool:
+        return task in await self.done_tasks()
+
+    async def mark_done(self, task: str):
+        (await self.done_tasks()).add(task)
+        await asyncio.to_thread(mark_task_done, self.uid, task)
+
+    def take_browser_result(self, stage: str):
+        return self._browser_results.pop(stage, None)
+
+    async def close(self):
+        if self._client:
+            await self._client.aclose()
+
+
+# ---------- 各阶段 ----------
+async def process_daily_user_async(session: AsyncUserSession) -> list[str]:
+    """process_daily_user 的协程版本"""
+    user = session.user
+    lines: list[str] = []
+    user_label = f"用户{user.get('uid') or user.get('phone')}"
+    musician_checkin_res = None
+    mission_lines: list[str] = []
+    daily_task_res = None
+    try:
+        missions_done = await session.is_done(TASK_MISSIONS)
+        daily_done = await session.is_done(TASK_DAILY)
+        if missions_done and daily_done:
+            logger.info(f"用户 {session.uid} 今日音乐人签到与日常签到均已完成，跳过每日任务")
+            return runner.daily_result_lines(user_label, "今日已完成，跳过", "今日已完成，跳过")
+
+        client = await session.get_client()
+        if not client:
+            logger.error(f"用户 {user.get('uid')} 登录失败，无法执行每日任务")
+            return runner.daily_result_lines(user_label, "用户登录失败，未能执行任务", "用户登录失败，未能执行任务")
+
+        logger.info(f"正在处理用户 {user['uid']} 的每日任务")
+        task = AsyncTaskManager(client)
+
+        async def execute_musician_checkin():
+            nonlocal client, task, musician_checkin_res
+            if LOGIN_METHOD == "playwright":
+                res = session.take_browser_result("missions")
+                if res is None:
+                    res = await session.run_browser_job(
+                        "get_musician_cycle_mission_by_playwright",
+                        session.profile_dir,
+                        cookie_str=client.get_cookie_str(),
+                        phone=user.get("phone"),
+                        password=user.get("password"),
+                        **stage_timeout_kwargs(),
+                    )
+            else:
+                res = await task.get_musician_cycle_mission()
+            if res.get('code') == 301:
+                logger.warning(f"用户 {user['uid']} 音乐人接口返回 301，尝试自动登录刷新 Cookie 后重试")
+                new_client = await session.relogin()
+                if new_client:
+                    client = new_client
+                    task = AsyncTaskManager(client)
+                return False
+            if res.get('code') != 200:
+                logger.error(f"获取音乐人循环任务失败：{json.dumps(res, ensure_ascii=False)[:100]}")
+                musician_checkin_res = res
+                return False
+
+            report = await claim_mission_rewards_async(task, res)
+            mission_lines.extend(report.summary_lines())
+            if report.checkin_result is not None:
+                musician_checkin_res = report.checkin_result
+            if report.completed:
+                await session.mark_done(TASK_MISSIONS)
+            # 可领取的任务缺少参数时触发重试；没有可领取的任务也算成功（可能已经领过了）
+            return not report.missing
+
+        if missions_done:
+            logger.info(f"用户 {user['uid']} 今日音乐人签到已完成，跳过任务列表获取")
+            musician_checkin_res = {"message": "今日已完成，跳过"}
+        else:
+            await async_retry_with_backoff(
+                execute_musician_checkin, max_retries=3, delay=2, task_name=f"用户 {user['uid']} 的音乐人签到任务"
+            )
+
+        if daily_done:
+            daily_task_res = {"message": "今日已完成，跳过"}
+        else:
+            daily_task_res = await task.daily_task()
+            logger.info(f"日常签到任务结果：{json.dumps(daily_task_res, ensure_ascii=False)[:100]}")
+            if daily_task_res.get('code') in runner.DAILY_TASK_DONE_CODES:
+                await session.mark_done(TASK_DAILY)
+
+        await session.update_cookie(client.get_cookie_str())
+
+        lines = runner.daily_result_lines(
+            user_label,
+            musician_checkin_res or {"message": "未获取到音乐人中心签到结果"},
+            daily_task_res or {"message": "未获取到日常签到任务结果"},
+            mission_lines,
+        )
+    except Exception as e:
+        logger.error(f"处理用户 {user.get('uid')} 的每日任务时发生异常: {e}")
+        lines = runner.daily_result_lines(user_label, f"执行任务时发生异常：{e}", "执行任务时发生异常")
+    return lines
+
+
+async def process_vip_user_async(session: AsyncUserSession, vip_state) -> None:
+    """process_vip_user 的协程版本"""
+    user_uid = session.uid
+    try:
+        if vip_state == 'today':
+            logger.info(f"用户 {user_uid} 今天是 VIP 可领取日期，将仅打开权益页自动领取并刷新时间，当天不再执行发布动态任务。")
+        else:
+            logger.info(f"用户 {user_uid} 已错过 VIP 领取日期，本次将先尝试补领 VIP，再按正常逻辑检查并执行发布动态任务。")
+
+        if session.has_browser_result("vip"):
+            ms = session.take_browser_result("vip")
+        else:
+            client = await session.get_client()
+            if not client:
+                logger.error(f"用户 {user_uid} 无法获取有效登录态，跳过本次 VIP 权益页打开")
+                return
+            ms = await session.run_browser_job(
+                "open_vip_right_page_and_listen",
+                session.profile_dir,
+                cookie_str=client.get_cookie_str(),
+                phone=session.user.get("phone"),
+                password=session.user.get("password"),
+                **stage_timeout_kwargs(),
+            )
+        if ms:
+            r = get_async_redis()
+            if r:
+                await r.set(runner._vip_key(user_uid), str(int(ms)))
+            await session.mark_done(TASK_VIP)
+            logger.info(f"用户 {user_uid} 本次权益页监听完成，下次可领取 VIP 时间：{runner._fmt_ms(ms)}（ms={ms}）")
+        else:
+            logger.warning(f"用户 {user_uid} 本次权益页未解析到 furtherVipGetTime（将下次继续补偿执行）")
+    except Exception as e:
+        logger.error(f"用户 {user_uid} 执行 VIP 权益页逻辑时发生异常: {e}")
+
+
+async def process_share_user_async(session: AsyncUserSession) -> list[str]:
+    """process_share_user 的协程版本"""
+    user = session.user
+    user_uid = session.uid
+    user_label = f"用户{user_uid}"
+    lines: list[str] = []
+    try:
+        skip_lines = await asyncio.to_thread(
+            runner.share_skip_lines, user_uid, user_label, await session.is_done(TASK_SHARE)
+        )
+        if skip_lines:
+            return skip_lines
+
+        client = await session.get_client()
+        if not client:
+            logger.error(f"用户 {user['uid']} 登录失败，跳过发布动态任务")
+            return runner.share_result_lines(user_label, "用户登录失败，跳过发布动态任务")
+
+        logger.info(f"正在处理用户 {user['uid']} 的发布动态任务")
+        task = AsyncTaskManager(client)
+        share_res = None
+        fresh_cookie_from_browser = None
+
+        async def execute_share_song():
+            nonlocal client, task, share_res, fresh_cookie_from_browser
+            if LOGIN_METHOD == 'playwright':
+                shared_res = session.take_browser_result("share")
+                if shared_res is not None:
+                    ok, fresh_cookie_from_browser = shared_res
+                else:
+                    ok, fresh_cookie_from_browser = await session.run_browser_job(
+                        "share_note_and_delete",
+                        session.profile_dir,
+                        f"{datetime.now().strftime('%Y年%m月%d日%H:%M:%S')}早上好",
+                        search_keyword="你好",
+                        cookie_str=client.get_cookie_str(),
+                        phone=user.get("phone"),
+                        password=user.get("password"),
+                        uid=user.get("uid"),
+                    )
+                share_res = {"code": 200} if ok else {"code": 250, "msg": "playwright share failed"}
+            else:
+                share_res = await task.share_song()
+            if share_res.get('code') == 301:
+                logger.warning(f"用户 {user['uid']} 分享接口返回 301，尝试自动登录刷新 Cookie 后重试")
+                new_client = await session.relogin()
+                if new_client:
+                    client = new_client
+                    task = AsyncTaskManager(client)
+                return False
+            if share_res.get('code') == 200:
+                logger.info(f"发布动态成功：{json.dumps(share_res, ensure_ascii=False)[:100]}")
+                return True
+            logger.warning(f"发布动态失败：{json.dumps(share_res, ensure_ascii=False)[:100]}")
+            return False
+
+        success = await async_retry_with_backoff(
+            execute_share_song, max_retries=3, delay=3, task_name=f"用户 {user['uid']} 的发布动态任务"
+        )
+
+        if LOGIN_METHOD == 'playwright' and fresh_cookie_from_browser:
+            await session.update_cookie(fresh_cookie_from_browser)
+        else:
+            await session.update_cookie(client.get_cookie_str())
+
+        if success and share_res and share_res.get('code') == 200:
+            await asyncio.to_thread(runner.update_last_send_record, user_uid)
+            await session.mark_done(TASK_SHARE)
+            # playwright 分支内部已负责登记删除
+            if LOGIN_METHOD != 'playwright':
+                id_ = share_res.get('event', {}).get('id')
+                if id_:
+                    # 交给延迟删除队列；Redis 不可用时退回等待后直接删除
+                    if not await asyncio.to_thread(schedule_delete, user.get('uid'), id_):
+                        logger.info(f"等待 {DYNAMIC_DELETE_DELAY_SECONDS} 秒后删除动态")
+                        await asyncio.sleep(DYNAMIC_DELETE_DELAY_SECONDS)
+                        logger.info(f'删除动态结果: {await task.delete_dynamic(id_)}')
+                else:
+                    logger.warning("删除动态失败：动态ID获取失败")
+            lines.extend(await asyncio.to_thread(runner.share_success_lines, user_label, user_uid, share_res))
+        elif not success:
+            logger.error(f"用户 {user['uid']} 发布动态任务重试3次后仍然失败")
+            lines.extend(runner.share_result_lines(
+                user_label, f"执行失败，结果：{json.dumps(share_res or {}, ensure_ascii=False)}"
+            ))
+    except Exception as e:
+        logger.error(f"处理用户 {user.get('uid')} 的发布动态任务时发生异常: {e}")
+        lines = runner.share_result_lines(user_label, f"执行任务时发生异常：{e}")
+    return lines
+
+
+async def process_interval_user_async(session: AsyncUserSession) -> list[str]:
+    """process_interval_user 的协程版本（VIP 领取 + 发布动态）"""
+    vip_state = await session.get_vip_state()
+    run_vip, run_share = runner.interval_steps(session.uid, vip_state, await session.is_done(TASK_VIP))
+    if run_vip:
+        await process_vip_user_async(session, vip_state)
+    if not run_share:
+        return []
+    return await process_share_user_async(session)
+
+
+async def run_user_pipeline_async(auth, user, *, daily: bool = True, interval: bool = True) -> tuple[list[str], list[str]]:
+    """run_user_pipeline 的协程版本"""
+    session = AsyncUserSession(auth, user)
+    try:
+        if LOGIN_METHOD == 'playwright':
+            stages = await asyncio.to_thread(
+                runner.plan_browser_stages, session.uid, await session.done_tasks(),
+                await session.get_vip_state() if interval else None, daily=daily, interval=interval,
+            )
+            require_user_time(f"用户 {session.uid} ", len(stages))
+            await session.run_browser_stages(stages)
+        else:
+            require_user_time(f"用户 {session.uid} ")
+        daily_lines = await process_daily_user_async(session) if daily else []
+        interval_lines = await process_interval_user_async(session) if interval else []
+        return daily_lines, interval_lines
+    finally:
+        await session.close()
+
+
+# ---------- 运行 ----------
+async def load_users_async() -> list[dict] | None:
+    """从 Redis 读取所有用户凭证（结构与 AuthManager.get_all_users_credentials 一致），失败返回 None"""
+    r = get_async_redis()
+    if not r:
+        return None
+    users = await r.hgetall(USER_TASK_KEY)
+    user_list = []
+    for task_key, info_str in users.items():
+        try:
+            user = parse_user_credentials(task_key, info_str)
+        except json.JSONDecodeError:
+            logger.error(f"解析用户数据失败: {task_key}")
+            continue
+        if user:
+            user_list.append(user)
+    return user_list
+
+
+async def run_users_async(
+    user_list, handler, task_name="任务", checkpoint=None, budget: RunBudget | None = None, priority=None,
+) -> list[str]:
+    """
+    run_users_concurrently 的协程版本：最多 ASYNC_USER_CONCURRENCY 个用户同时处理，汇总按原顺序输出。
+    budget / priority 的含义与线程版一致（priority 为同步函数，在线程中计算）。
+    """
+    results: list[list[str]] = [[] for _ in user_list]
+
+    def _split_done() -> list[int]:
+        """复用今日已完成用户的结果（读 Redis，在线程中执行），返回待处理用户的下标"""
+        pending = []
+        for idx, user in enumerate(user_list):
+            if checkpoint and checkpoint.status(user.get('task_key')) == STATUS_DONE:
+                results[idx] = checkpoint.result(user.get('task_key')) or []
+            else:
+                pending.append(idx)
+        return pending
+
+    pending = await asyncio.to_thread(_split_done) if checkpoint else list(range(len(user_list)))
+    if len(pending) < len(user_list):
+        logger.info(f"{task_name}：{len(user_list) - len(pending)} 个用户今日已完成，复用上次结果，不再重复执行")
+    logger.info(f"{task_name}：共 {len(pending)} 个用户待处理，协程并发数 {ASYNC_USER_CONCURRENCY}")
+    if priority and pending:
+        # 信号量按等待顺序放行，紧急的用户先创建协程
+        keys = await asyncio.gather(*(asyncio.to_thread(priority, user_list[idx]) for idx in pending))
+        order = dict(zip(pending, keys))
+        pending.sort(key=lambda idx: (order[idx], idx))
+
+    slots = asyncio.Semaphore(ASYNC_USER_CONCURRENCY)
+
+    async def _deferred(idx, reason: str):
+        user = user_list[idx]
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.mark_deferred, user.get('task_key'), reason)
+        results[idx] = runner.user_deferred_lines(user, task_name, reason)
+
+    async def _run(idx):
+        user = user_list[idx]
+        task_key = user.get('task_key')
+        async with slots:
+            if budget and budget.expired():
+                await _deferred(idx, "本次运行时间预算已用完")
+                return
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.mark_running, task_key)
+            try:
+                with use_budget(budget), span(
+                    "user", uid=user.get('uid') or user.get('phone'),
+                    run_id=checkpoint.run_id if checkpoint else None, task=task_name,
+                ):
+                    user_lines = await handler(user) or []
+            except RunDeferred as e:
+                await _deferred(idx, str(e))
+                return
+            except Exception as e:
+                # handler 内部已兜底异常，这里只防御意外情况，保证其他用户结果不受影响
+                results[idx] = runner.user_error_lines(user, task_name, e)
+                if checkpoint:
+                    await asyncio.to_thread(checkpoint.mark_failed, task_key, [], str(e))
+                return
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.mark_done, task_key, user_lines)
+            results[idx] = user_lines
+
+    await asyncio.gather(*(_run(idx) for idx in pending))
+    return [line for user_lines in results for line in user_lines]
+
+
+async def _finish_run(checkpoint, task_name: str):
+    """main.finish_run 的协程版：有用户被推迟时在 asyncio 调度器上安排补跑"""
+    deferred = await asyncio.to_thread(checkpoint.count, STATUS_DEFERRED)
+    if not deferred:
+        await asyncio.to_thread(checkpoint.finish)
+        return
+    logger.warning(f"{task_name}有 {deferred} 个用户因时间预算不足被推迟，{RUN_FOLLOWUP_DELAY_SECONDS} 秒后补跑")
+    if _scheduler is None:
+        logger.warning("调度器未启动，无法安排补跑，被推迟的用户将在下次启动或手动重跑时处理")
+        return
+    _scheduler.add_job(
+        resume_unfinished_runs_async,
+        trigger=DateTrigger(run_date=datetime.now() + timedelta(seconds=RUN_FOLLOWUP_DELAY_SECONDS)),
+        id='netease_followup_runs',
+        name='补跑被推迟的用户',
+        replace_existing=True,
+        jobstore='memory',
+        misfire_grace_time=None,
+    )
+
+
+async def _run_task_async(kind: str, task_name: str, title: str, handler_factory, priority=None):
+    """每日 / 间隔任务的公共流程：加载用户 → 断点检查 → 并发处理 → 企业微信汇总"""
+    # 与线程版 serial 执行器一致：同一时间只运行一个定时任务，每日任务不会与间隔任务重叠
+    async with _get_run_lock():
+        wecom_lines: list[str] = []
+        logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始执行{task_name}")
+        try:
+            user_list = None
+            for attempt in range(3):
+                try:
+                    user_list = await load_users_async()
+                except Exception as e:
+                    logger.error(f"获取{task_name}用户列表时发生异常: {e}")
+                if user_list is not None:
+                    break
+                if attempt < 2:
+                    logger.warning(f"加载{task_name}用户列表失败，5秒后进行第 {attempt + 2} 次重试（共3次）")
+                    await asyncio.sleep(5)
+            if user_list is None:
+                logger.error(f"多次重试后仍无法从 Redis 获取{task_name}用户列表，本次{task_name}终止")
+                if WECOM_WEBHOOK_KEY:
+                    from wecom_notify import send_wecom_webhook
+                    await asyncio.to_thread(send_wecom_webhook, WECOM_WEBHOOK_KEY, "Redis连接失败，跳过执行", title=title)
+                return
+
+            logger.info(f"发现 {len(user_list)} 个待处理用户")
+            if not user_list:
+                logger.info(f"没有待处理的用户，【{task_name}】结束")
+                return
+
+            checkpoint = await asyncio.to_thread(open_run, kind)
+            if await asyncio.to_thread(checkpoint.is_finished):
+                logger.info(f"今日{task_name}已全部完成，跳过本次执行")
+                return
+            await asyncio.to_thread(checkpoint.start, user_list)
+
+            # 登录（同步）时才需要 AuthManager，放到线程中初始化
+            auth = await asyncio.to_thread(AuthManager)
+            wecom_lines.extend(
+                await run_users_async(
+                    user_list, handler_factory(auth), task_name=task_name, checkpoint=checkpoint,
+                    budget=RunBudget(), priority=priority,
+                )
+            )
+            await _finish_run(checkpoint, task_name)
+        except Exception as e:
+            logger.error(f"{task_name}执行异常: {e}")
+
+        logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {task_name}执行完毕")
+        try:
+            if WECOM_WEBHOOK_KEY:
+                from wecom_notify import send_wecom_webhook
+                content = "\n".join(wecom_lines) if wecom_lines else f"本次{task_name}已执行，无用户结果可汇总。"
+                await asyncio.to_thread(send_wecom_webhook, WECOM_WEBHOOK_KEY, content, title=title)
+        except Exception:
+            pass
+
+
+async def daily_task_runner_async():
+    """每日任务（协程版）"""
+    def handler_factory(auth):
+        async def handler(u):
+            return (await run_user_pipeline_async(auth, u, interval=False))[0]
+        return handler
+
+    await _run_task_async(
+        'daily', "每日任务", "网易音乐人日常任务", handler_factory,
+        priority=lambda u: runner.user_urgency(u, interval=False),
+    )
+
+
+async def interval_task_runner_async():
+    """间隔任务（协程版：VIP 领取 + 发布动态）"""
+    def handler_factory(auth):
+        async def handler(u):
+            return (await run_user_pipeline_async(auth, u, daily=False))[1]
+        return handler
+
+    await _run_task_async(
+        'interval', "间隔任务", "网易音乐人发布动态任务", handler_factory,
+        priority=lambda u: runner.user_urgency(u, daily=False),
+    )
+
+
+async def resume_unfinished_runs_async():
+    """启动时补跑当天被中断的运行（协程版）"""
+    kinds = await asyncio.to_thread(get_unfinished_runs)
+    for kind in kinds:
+        logger.info(f"发现当天未完成的运行：{kind}，开始补跑剩余用户")
+        if kind == 'daily':
+            await daily_task_runner_async()
+        elif kind == 'interval':
+            await interval_task_runner_async()
+        else:
+            logger.warning(f"asyncio 模式不支持补跑 {kind} 类型的运行，已跳过")
+
+
+async def main_async():
+    """asyncio 调度入口：注册定时任务后常驻运行，直到收到停止信号"""
+    global _scheduler
+    logger.info("网易音乐人任务调度器启动（asyncio 模式）")
+    if SEND_WINDOW:
+        logger.warning("asyncio 模式暂不支持 SEND_WINDOW，将按 SEND_TIME 统一执行（协程并发数由 ASYNC_USER_CONCURRENCY 控制）")
+    if TASK_QUEUE_MODE == 'producer':
+        logger.warning("asyncio 模式下不投递分布式任务队列，任务在本进程内以协程执行")
+
+    hour, minute = map(int, SEND_TIME.split(':'))
+    interval_total = hour * 60 + minute + 5
+    interval_hour, interval_minute = (interval_total // 60) % 24, interval_total % 60
+
+    redis_jobstore = runner.build_redis_jobstore()
+    scheduler = AsyncIOScheduler(
+        timezone='Asia/Shanghai',
+        jobstores={'default': redis_jobstore or MemoryJobStore(), 'memory': MemoryJobStore()},
+        executors={'default': AsyncIOExecutor(), 'serial': AsyncIOExecutor()},
+        job_defaults={'coalesce': True, 'max_instances': 1},
+    )
+    scheduler.add_listener(runner.on_scheduler_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    _scheduler = scheduler
+
+    stored_jobs = {}
+    if redis_jobstore is not None:
+        try:
+            stored_jobs = {job.id: job for job in redis_jobstore.get_all_jobs()}
+        except Exception as e:
+            logger.warning(f"读取已保存的定时任务失败，本次不做补跑检查：{e}")
+
+    catch_up_jobs = []
+    if runner.add_cron_job(
+        scheduler, stored_jobs, daily_task_runner_async,
+        CronTrigger(hour=hour, minute=minute, day_of_week='*'),
+        'netease_daily_task', '网易云音乐每日任务', SCHEDULER_DAILY_MISFIRE_GRACE,
+    ):
+        catch_up_jobs.append('每日任务')
+    if runner.add_cron_job(
+        scheduler, stored_jobs, interval_task_runner_async,
+        CronTrigger(hour=interval_hour, minute=interval_minute, day_of_week='*'),
+        'netease_interval_task', '网易音乐人发布动态任务', SCHEDULER_INTERVAL_MISFIRE_GRACE,
+    ):
+        catch_up_jobs.append('间隔任务')
+    scheduler.add_job(
+        resume_unfinished_runs_async,
+        trigger=DateTrigger(run_date=datetime.now()),
+        id='netease_resume_runs',
+        name='补跑当天中断的运行',
+        replace_existing=True,
+        jobstore='memory',
+        misfire_grace_time=None,
+    )
+    scheduler.add_job(
+        process_due_deletions,
+        trigger=IntervalTrigger(seconds=DYNAMIC_DELETE_POLL_SECONDS),
+        id='netease_dynamic_deleter',
+        name='延迟删除动态',
+        replace_existing=True,
+        jobstore='memory',
+        next_run_time=datetime.now(),
+    )
+
+    # 巡检浏览器进程：记录驱动 / Chromium 的内存与文件句柄，结束已失去父进程的残留进程（启动时先清理上次运行遗留的）
+    if PLAYWRIGHT_SUPERVISOR_SECONDS > 0:
+        from playwright_handle.supervisor import supervise
+        scheduler.add_job(
+            supervise,
+            trigger=IntervalTrigger(seconds=PLAYWRIGHT_SUPERVISOR_SECONDS),
+            id='netease_browser_supervisor',
+            name='巡检浏览器进程',
+            replace_existing=True,
+            jobstore='memory',
+            next_run_time=datetime.now(),
+        )
+
+    for job_id, job in stored_jobs.items():
+        try:
+            redis_jobstore.remove_job(job_id)
+            logger.info(f"已移除不再使用的定时任务：{job.name}（{job_id}）")
+        except Exception as e:
+            logger.warning(f"移除定时任务 {job_id} 失败：{e}")
+    if catch_up_jobs:
+        logger.info(f"启动补跑检查：{', '.join(catch_up_jobs)} 将在启动后立即补跑")
+
+    logger.info(f"每日任务已添加，每天 {SEND_TIME} 执行")
+    logger.info(f"间隔任务已添加，每天 {interval_hour:02d}:{interval_minute:02d} 执行检查，实际执行间隔：每 {EXECUTION_INTERVAL_DAYS} 天")
+    logger.info("任务调度器已启动（asyncio），按 Ctrl+C 停止")
+
+    from playwright_handle.browser_pool import close_browser_pool, enable_resident_browser
+
+    # 进程内执行的浏览器流程共享一个常驻浏览器（PLAYWRIGHT_BROWSER_POOL=0 时不启用）
+    enable_resident_browser()
+    scheduler.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown(wait=False)
+        await close_browser_pool()
+        r = get_async_redis()
+        if r:
+            await r.aclose()
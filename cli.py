@@ -0,0 +1,142 @@
+"""
+命令行手动运行：立即执行一次与定时任务相同的处理代码，结束后输出每个用户各阶段的耗时表与合计。
+
+用法（在项目根目录执行）：
+    python cli.py run daily                        # 立即执行一次每日任务（结果照常推送企业微信）
+    python cli.py run interval --users 123,456     # 只处理指定用户（uid / task_key / 手机号，逗号分隔）
+    python cli.py run vip --concurrency 8          # 只执行 VIP 领取
+    python cli.py run share                        # 只执行发布动态
+    python cli.py run daily --dry-run              # 模拟执行器 + fakeredis 中的模拟用户，不发网络请求（见 dry_run.py）
+
+只处理部分用户（--users）的运行不记录断点，不影响当天定时任务的执行。
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+
+from run_budget import RunBudget
+from run_timing import STAGE_SHARE, STAGE_VIP, RunTimings, timed, use_timings
+
+RUN_KINDS = ('daily', 'interval', 'vip', 'share')
+RUN_TITLES = {'daily': "每日任务", 'interval': "间隔任务", 'vip': "VIP 领取", 'share': "发布动态"}
+
+
+def _vip_handler(main, auth):
+    """只执行 VIP 领取（见 process_interval_user 的第一步）"""
+    def handler(user):
+        session = main.UserSession(auth, user)
+        user_label = f"用户{session.uid}"
+        vip_state = session.get_vip_state()
+        if not vip_state:
+            return [f"{user_label}：", "VIP领取：未到领取日期或没有记录，跳过", ""]
+        if session.is_done(main.TASK_VIP):
+            return [f"{user_label}：", "VIP领取：今日已完成，跳过", ""]
+        with timed(session.uid, STAGE_VIP):
+            main.process_vip_user(auth, user, vip_state, session)
+        ms = main.get_vip_further_get_time_ms(session.uid)
+        return [f"{user_label}：", f"VIP领取：下次领取时间 {main._fmt_ms(ms)}" if ms else "VIP领取：未获取到下次领取时间", ""]
+    return handler
+
+
+def _share_handler(main, auth):
+    """只执行发布动态（仍按间隔天数与每月上限判断是否执行）"""
+    def handler(user):
+        with timed(user.get('uid', user.get('phone')), STAGE_SHARE):
+            return main.process_share_user(auth, user)
+    return handler
+
+
+def _dry_run_handler(main, pipeline, kind: str):
+    """--dry-run 时 vip / share 使用模拟执行器"""
+    def handler(user):
+        uid = user.get('uid', user.get('phone'))
+        user_label = f"用户{uid}"
+        done = main.get_done_tasks(uid)
+        if kind == 'vip':
+            return pipeline.vip(uid, user_label, done, main.get_vip_due_state(uid)) or [
+                f"{user_label}：", "VIP领取：未到领取日期或今日已完成，跳过", "",
+            ]
+        return pipeline.share(uid, user_label, done)
+    return handler
+
+
+def run_single_stage(main, kind: str, users: list[str] | None, concurrency: int | None, pipeline=None) -> list[str]:
+    """只执行 vip 或 share 一个阶段，返回汇总行（不推送企业微信）"""
+    title = RUN_TITLES[kind]
+    load_res = main.load_users_with_retry(title)
+    if not load_res:
+        main.logger.error(f"多次重试后仍无法从 Redis 获取{title}用户列表")
+        return []
+    auth, user_list = load_res
+    if users:
+        user_list = main.select_users(user_list, users)
+    if pipeline is not None:
+        handler = _dry_run_handler(main, pipeline, kind)
+    else:
+        handler = (_vip_handler if kind == 'vip' else _share_handler)(main, auth)
+    return main.run_users_concurrently(
+        user_list, handler, task_name=title, budget=RunBudget(), concurrency=concurrency,
+    )
+
+
+def run(kind: str, users: list[str] | None, concurrency: int | None, dry_run: bool, dry_run_users: int):
+    env = None
+    if dry_run:
+        # 必须在导入 main 之前创建，替换 Redis 连接池
+        from dry_run import DryRunEnv
+        env = DryRunEnv(dry_run_users, datetime.now())
+
+    import main
+
+    timings = RunTimings()
+    lines: list[str] = []
+    try:
+        with use_timings(timings):
+            if kind == 'daily':
+                main.daily_task_runner(users=users, concurrency=concurrency)
+            elif kind == 'interval':
+                main.interval_task_runner(users=users, concurrency=concurrency)
+            else:
+                lines = run_single_stage(main, kind, users, concurrency, env.pipeline if env else None)
+    finally:
+        if env:
+            env.close()
+
+    for line in lines:
+        print(line)
+    print(f"\n{RUN_TITLES[kind]}各阶段耗时（秒）：")
+    for line in timings.format_table():
+        print(line)
+    if env:
+        print(f"（模拟运行，Redis 命令 {env.counter.count} 条）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网易音乐人任务手动运行")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help="立即执行一次任务，结束后输出耗时表")
+    p_run.add_argument('kind', choices=RUN_KINDS)
+    p_run.add_argument(
+        '--users', type=lambda v: [u.strip() for u in v.split(',') if u.strip()],
+        help="只处理这些用户（uid / task_key / 手机号，逗号分隔），默认全部用户",
+    )
+    p_run.add_argument('--concurrency', type=int, help="用户并发数，默认 API_USER_CONCURRENCY")
+    p_run.add_argument('--dry-run', action='store_true', help="使用模拟执行器与 fakeredis，不发网络请求")
+    p_run.add_argument('--dry-run-users', type=int, default=20, help="--dry-run 时的模拟用户数")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(
+            args.kind,
+            args.users,
+            max(1, args.concurrency) if args.concurrency else None,
+            args.dry_run,
+            max(1, args.dry_run_users),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -75,6 +75,61 @@ PLAYWRIGHT_PROFILE_BASEDIR = os.getenv('PLAYWRIGHT_PROFILE_BASEDIR', '.playwrigh
 # 多账号是否隔离 profile（建议 True，避免多账号串 Cookie）
 PLAYWRIGHT_PROFILE_PER_USER = os.getenv('PLAYWRIGHT_PROFILE_PER_USER', '1').strip() not in ('0', 'false', 'False')
 
+# 浏览器任务是否投递到独立的 worker 进程池执行（崩溃隔离，可多浏览器并行；默认关闭，在调度进程内执行）
+PLAYWRIGHT_WORKER_POOL = os.getenv('PLAYWRIGHT_WORKER_POOL', '0').strip() not in ('0', 'false', 'False')
+# worker 进程数；0 表示按 CPU 核数与可用内存自动计算
+PLAYWRIGHT_WORKER_PROCESSES = max(0, int(os.getenv('PLAYWRIGHT_WORKER_PROCESSES', '0')))
+# 自动计算进程数时，每个 worker（含 Chromium）预留的内存（MB）
+PLAYWRIGHT_WORKER_MEMORY_MB = max(64, int(os.getenv('PLAYWRIGHT_WORKER_MEMORY_MB', '512')))
+# 每个 worker 进程执行多少个任务后重启（0 表示不限制），防止长期运行内存增长
+PLAYWRIGHT_WORKER_MAX_TASKS = max(0, int(os.getenv('PLAYWRIGHT_WORKER_MAX_TASKS', '20')))
+# 是否复用常驻 Chromium：每个用户 / 任务只新建一个轻量的浏览器上下文（new_context + storage_state），
+# 不再每次 launch_persistent_context 加载整个 profile（默认关闭）；常驻浏览器在 worker 进程与 asyncio 调度进程中保留，
+# 线程模式的调度进程内按次启动
+PLAYWRIGHT_BROWSER_POOL = os.getenv('PLAYWRIGHT_BROWSER_POOL', '0').strip() not in ('0', 'false', 'False')
+# 常驻 Chromium 创建多少个上下文后连同 Playwright 驱动一起重启（0 表示不限制）
+PLAYWRIGHT_BROWSER_MAX_CONTEXTS = max(0, int(os.getenv('PLAYWRIGHT_BROWSER_MAX_CONTEXTS', '50')))
+# 常驻 Chromium 与驱动进程的总 RSS（MB）超过该值时，在当前上下文关闭后重启（0 表示不检查）
+PLAYWRIGHT_BROWSER_MAX_RSS_MB = max(0, int(os.getenv('PLAYWRIGHT_BROWSER_MAX_RSS_MB', '1536')))
+# 调度进程巡检浏览器进程的间隔（秒）：统计 Chromium / 驱动进程的内存与文件句柄，并结束已失去父进程的残留进程（0 表示关闭）
+PLAYWRIGHT_SUPERVISOR_SECONDS = max(0, int(os.getenv('PLAYWRIGHT_SUPERVISOR_SECONDS', '600')))
+
+
+def _parse_csv(value: str) -> tuple[str, ...]:
+    return tuple(item.strip().lower() for item in value.split(',') if item.strip())
+
+
+# 自动化页面（发布动态 / VIP / 任务列表，不含登录页）是否拦截不需要的请求
+PLAYWRIGHT_BLOCK_RESOURCES = os.getenv('PLAYWRIGHT_BLOCK_RESOURCES', '1').strip() not in ('0', 'false', 'False')
+# 直接拦截的资源类型（Playwright resource_type）
+PLAYWRIGHT_BLOCKED_RESOURCE_TYPES = _parse_csv(os.getenv('PLAYWRIGHT_BLOCKED_RESOURCE_TYPES', 'image,media,font'))
+# 允许访问的域名（后缀匹配），其余第三方域名（统计、广告等）一律拦截；页面需要的第三方脚本域名加在这里
+PLAYWRIGHT_ALLOWED_HOSTS = _parse_csv(os.getenv('PLAYWRIGHT_ALLOWED_HOSTS', '163.com,126.net,127.net,netease.com'))
+# 允许的域名下仍拦截的地址（包含任一关键字即拦截），用于统计上报
+PLAYWRIGHT_BLOCKED_URL_KEYWORDS = _parse_csv(os.getenv('PLAYWRIGHT_BLOCKED_URL_KEYWORDS', 'weblog'))
+
+# 所有浏览器上下文共用的静态资源（JS/CSS）缓存目录与容量上限（MB，0 表示关闭）
+PLAYWRIGHT_ASSET_CACHE_DIR = os.getenv('PLAYWRIGHT_ASSET_CACHE_DIR', '.playwright_asset_cache')
+PLAYWRIGHT_ASSET_CACHE_MB = max(0, int(os.getenv('PLAYWRIGHT_ASSET_CACHE_MB', '200')))
+# 缓存的资源类型（Playwright resource_type）
+PLAYWRIGHT_ASSET_CACHE_TYPES = _parse_csv(os.getenv('PLAYWRIGHT_ASSET_CACHE_TYPES', 'script,stylesheet'))
+# 浏览器步骤是否在已登录的页面内直接调用 weapi（见 playwright_handle/page_api.py），失败时回退为点击页面
+PLAYWRIGHT_PAGE_API = os.getenv('PLAYWRIGHT_PAGE_API', '1').strip() not in ('0', 'false', 'False')
+
+# 浏览器流程的分步 span（启动、打开页面、等待元素、滑块、等待接口、读取 Cookie 等）：按用户 / 运行嵌套，逐行写入 JSON 文件
+# （默认留空不记录，排查耗时时设为例如 log/spans.jsonl）
+TRACE_SPANS_FILE = os.getenv('TRACE_SPANS_FILE', '').strip()
+# span 文件超过该大小（MB）时轮转，最多保留 TRACE_SPANS_BACKUPS 个旧文件
+TRACE_SPANS_MAX_MB = max(1, int(os.getenv('TRACE_SPANS_MAX_MB', '20')))
+TRACE_SPANS_BACKUPS = max(0, int(os.getenv('TRACE_SPANS_BACKUPS', '3')))
+# 同时导出到 OpenTelemetry（需自行安装并配置 opentelemetry-sdk 与 exporter）
+TRACE_OTEL = os.getenv('TRACE_OTEL', '0').strip() not in ('0', 'false', 'False')
+# 各类 span 的耗时预算（毫秒），格式 name=ms,name=ms；超出预算记为 over_budget，覆盖默认值
+TRACE_SPAN_BUDGETS = os.getenv('TRACE_SPAN_BUDGETS', '')
+# 录制 Playwright trace，仅在有 span 失败或超出预算时把 trace.zip 保存到 PLAYWRIGHT_TRACE_DIR（录制本身有开销，默认关闭）
+PLAYWRIGHT_TRACE_ON_SLOW = os.getenv('PLAYWRIGHT_TRACE_ON_SLOW', '0').strip() not in ('0', 'false', 'False')
+PLAYWRIGHT_TRACE_DIR = os.getenv('PLAYWRIGHT_TRACE_DIR', 'log/playwright_traces')
+
 # ========== 任务调度配置 ==========
 MAX_MONTHLY_SENDS = int(os.getenv('MAX_MONTHLY_SENDS', '4'))  # 每月最多发送次数
 
@@ -111,6 +166,91 @@ except ValueError as e:
 
 EXECUTION_INTERVAL_DAYS = int(os.getenv('EXECUTION_INTERVAL_DAYS', '3'))  # 执行间隔天数
 
+def validate_send_window(send_window):
+    """验证SEND_WINDOW格式（HH:MM-HH:MM），返回窗口起止的 (hour, minute) 元组"""
+    parts = send_window.split('-')
+    if len(parts) != 2:
+        raise ValueError(f"SEND_WINDOW格式错误：应为 HH:MM-HH:MM 格式（例如 09:30-10:30），当前值：{send_window}")
+    start = validate_send_time(parts[0].strip())
+    end = validate_send_time(parts[1].strip())
+    if end <= start:
+        raise ValueError(f"SEND_WINDOW结束时间必须晚于开始时间（不支持跨天），当前值：{send_window}")
+    return start, end
+
+# 发送窗口（HH:MM-HH:MM）：配置后每个用户在窗口内按固定的哈希偏移错峰执行，留空则沿用 SEND_TIME 统一执行
+_send_window_raw = os.getenv('SEND_WINDOW', '').strip()
+SEND_WINDOW = None
+if _send_window_raw:
+    try:
+        SEND_WINDOW = validate_send_window(_send_window_raw)
+    except ValueError as e:
+        _logger.error(f"配置错误：{e}")
+        _logger.error("已关闭发送窗口模式，使用 SEND_TIME 统一执行")
+
+# ========== 并发配置 ==========
+# 同时处理的用户数（线程池大小）；纯接口任务只受此项限制
+API_USER_CONCURRENCY = max(1, int(os.getenv('API_USER_CONCURRENCY', '4')))
+# 同时运行的浏览器任务数（每个浏览器任务会启动一个 Chromium，按机器内存调整）
+PLAYWRIGHT_USER_CONCURRENCY = max(1, int(os.getenv('PLAYWRIGHT_USER_CONCURRENCY', '2')))
+# 单个用户同时领取的音乐人任务奖励数
+MISSION_REWARD_CONCURRENCY = max(1, int(os.getenv('MISSION_REWARD_CONCURRENCY', '4')))
+# 领取奖励接口的全局限速（所有用户共用）：每秒请求数与允许的突发数
+MISSION_REWARD_RATE = max(0.1, float(os.getenv('MISSION_REWARD_RATE', '5')))
+MISSION_REWARD_BURST = max(1, int(os.getenv('MISSION_REWARD_BURST', '5')))
+# 除签到任务外，cycle/list 中 status 属于这些取值（逗号分隔的整数）的任务也领取奖励；默认为空，只领取签到任务
+MISSION_CLAIMABLE_STATUSES = tuple(int(v) for v in _parse_csv(os.getenv('MISSION_CLAIMABLE_STATUSES', '')))
+
+# ========== 调度器配置 ==========
+# SCHEDULER_JOBSTORE 可选：
+# - 'redis'  定时任务的下次执行时间持久化到 Redis，进程停机 / 晚启动错过的执行会在启动后补跑（默认）
+# - 'memory' 仅保存在内存中（旧行为），停机期间错过的执行直接丢失
+SCHEDULER_JOBSTORE = os.getenv('SCHEDULER_JOBSTORE', 'redis').strip().lower()
+if SCHEDULER_JOBSTORE not in ('redis', 'memory'):
+    _logger.warning(f"未知的 SCHEDULER_JOBSTORE={SCHEDULER_JOBSTORE}，已回退为 'redis'")
+    SCHEDULER_JOBSTORE = 'redis'
+# SCHEDULER_MODE 可选：
+# - 'thread'  BlockingScheduler + 线程池执行用户任务（默认）
+# - 'asyncio' AsyncIOScheduler + 协程：接口请求、Redis 读写与等待均为异步，单进程可驱动更多账号
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'thread').strip().lower()
+if SCHEDULER_MODE not in ('thread', 'asyncio'):
+    _logger.warning(f"未知的 SCHEDULER_MODE={SCHEDULER_MODE}，已回退为 'thread'")
+    SCHEDULER_MODE = 'thread'
+# asyncio 模式下同时处理的用户数（协程数，浏览器任务仍受 PLAYWRIGHT_USER_CONCURRENCY 限制）
+ASYNC_USER_CONCURRENCY = max(1, int(os.getenv('ASYNC_USER_CONCURRENCY', '50')))
+# 每日任务 / 间隔任务错过执行时间后仍允许补跑的秒数（默认 6 小时），超过则跳过当天
+SCHEDULER_DAILY_MISFIRE_GRACE = max(1, int(os.getenv('SCHEDULER_DAILY_MISFIRE_GRACE', '21600')))
+SCHEDULER_INTERVAL_MISFIRE_GRACE = max(1, int(os.getenv('SCHEDULER_INTERVAL_MISFIRE_GRACE', '21600')))
+
+# 每次每日 / 间隔任务运行的时间预算（秒，0 表示不限时）：超时后尚未开始的用户推迟到补跑，各阶段超时按剩余时间收紧
+RUN_TIME_BUDGET_SECONDS = max(0, int(os.getenv('RUN_TIME_BUDGET_SECONDS', '1800')))
+# 有用户被推迟时，多久后发起补跑（秒）
+RUN_FOLLOWUP_DELAY_SECONDS = max(0, int(os.getenv('RUN_FOLLOWUP_DELAY_SECONDS', '600')))
+
+# ========== 分布式任务队列（Redis Streams） ==========
+# TASK_QUEUE_MODE 可选：
+# - 'off'      调度进程内直接执行所有用户任务（默认）
+# - 'producer' 调度进程只把每个用户的任务投递到 Redis Stream，由 `python task_queue.py worker` 进程（可多机部署）消费执行
+TASK_QUEUE_MODE = os.getenv('TASK_QUEUE_MODE', 'off').strip().lower()
+if TASK_QUEUE_MODE not in ('off', 'producer'):
+    _logger.warning(f"未知的 TASK_QUEUE_MODE={TASK_QUEUE_MODE}，已回退为 'off'")
+    TASK_QUEUE_MODE = 'off'
+TASK_QUEUE_STREAM = os.getenv('TASK_QUEUE_STREAM', 'netease:music:queue:jobs')
+TASK_QUEUE_DEAD_STREAM = os.getenv('TASK_QUEUE_DEAD_STREAM', 'netease:music:queue:dead')
+TASK_QUEUE_GROUP = os.getenv('TASK_QUEUE_GROUP', 'netease-workers')
+# 任务被 worker 取走后多久未确认（秒）即视为 worker 已失联，可被其他 worker 重新认领；需大于单个用户任务的最长耗时
+TASK_QUEUE_VISIBILITY_TIMEOUT = max(60, int(os.getenv('TASK_QUEUE_VISIBILITY_TIMEOUT', '1800')))
+# 单个任务最多投递次数，超过后转入死信队列
+TASK_QUEUE_MAX_DELIVERIES = max(1, int(os.getenv('TASK_QUEUE_MAX_DELIVERIES', '3')))
+
+# ========== 延迟删除动态 ==========
+# 发布动态成功后等待多久（秒）再删除；删除任务记录在 Redis 中，由调度进程的后台任务批量执行，重启不丢失
+DYNAMIC_DELETE_DELAY_SECONDS = max(0, int(os.getenv('DYNAMIC_DELETE_DELAY_SECONDS', '10')))
+# 后台删除任务的轮询间隔（秒）与每轮最多处理的删除数
+DYNAMIC_DELETE_POLL_SECONDS = max(1, int(os.getenv('DYNAMIC_DELETE_POLL_SECONDS', '5')))
+DYNAMIC_DELETE_BATCH_SIZE = max(1, int(os.getenv('DYNAMIC_DELETE_BATCH_SIZE', '50')))
+# 单条动态删除失败后的最多尝试次数，超过后放弃并记录日志
+DYNAMIC_DELETE_MAX_ATTEMPTS = max(1, int(os.getenv('DYNAMIC_DELETE_MAX_ATTEMPTS', '5')))
+
 # ========== 企业微信 Webhook 通知 ==========
 # 企业微信自定义机器人 Webhook 机器人的 key（不填则不发送）
 WECOM_WEBHOOK_KEY = os.getenv('WECOM_WEBHOOK_KEY', '').strip()
@@ -47,6 +47,19 @@ if not logger.handlers:
 # 从配置文件导入Redis配置
 from config import REDIS_POOL, REDIS_CONF, LOGIN_METHOD, PLAYWRIGHT_PROFILE_BASEDIR, PLAYWRIGHT_PROFILE_PER_USER
 
+# Redis 键：用户任务表（task_key -> 账号 JSON）、Cookie 与登录返回数据
+USER_TASK_KEY = 'netease:music:task'
+USER_COOKIE_KEY_TPL = 'netease:music:user:{uid}:cookie'
+USER_DATA_KEY_TPL = 'netease:music:user:{uid}:userdata'
+COOKIE_TTL_SECONDS = 86400 * 30  # 30天过期
+
+# 接口请求的通用 Header
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.30 Safari/537.36',
+    'Referer': 'https://music.163.com/',
+    'Accept': '*/*'
+}
+
 
 # --- 1. 基础加解密工具类 ---
 class CryptoUtil:
@@ -168,11 +181,7 @@ class NeteaseClient:
         self.uid = uid
 
         # 通用 Header
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.30 Safari/537.36',
-            'Referer': 'https://music.163.com/',
-            'Accept': '*/*'
-        })
+        self.session.headers.update(DEFAULT_HEADERS)
 
         if cookie_str:
             self._parse_and_set_cookie(cookie_str)
@@ -311,12 +320,12 @@ class AuthManager:
             # 回写真实 UID 逻辑
             if task_key and self.redis:
                 try:
-                    user_info_str = self.redis.hget('netease:music:task', task_key)
+                    user_info_str = self.redis.hget(USER_TASK_KEY, task_key)
                     if user_info_str:
                         user_info = json.loads(user_info_str)
                         if str(user_info.get('uid')) != str(real_uid):
                             user_info['uid'] = real_uid
-                            self.redis.hset('netease:music:task', task_key, json.dumps(user_info))
+                            self.redis.hset(USER_TASK_KEY, task_key, json.dumps(user_info))
                             logger.info(f"绑定真实 UID: {real_uid}")
                 except Exception as e:
                     logger.error(f"回写 UID 失败: {e}")
@@ -327,12 +336,13 @@ class AuthManager:
             logger.error(f"登录失败: {res.get('msg', res)}")
             return None
 
-    def _login_via_playwright(self, phone, password, task_key=None):
+    def _login_via_playwright(self, phone, password, task_key=None, verify_timeout=None):
         """
         使用 Playwright 浏览器完成登录，并把 Cookie 写入 Redis，返回 NeteaseClient。
+        verify_timeout：二次验证的最长等待秒数，不传时使用 browser_login 的默认值。
         """
         try:
-            from playwright_handle.login import browser_login  # 延迟导入，避免循环
+            from playwright_handle.worker_pool import run_browser_job  # 延迟导入，避免循环
         except ImportError as e:
             logger.error(f"导入 Playwright 登录模块失败: {e}")
             return None
@@ -345,7 +355,9 @@ class AuthManager:
 
         logger.info(f"使用 Playwright 为账号 {phone} 执行登录（profile={profile_dir}）...")
         try:
-            cookie_str = browser_login(phone, password, profile_dir=profile_dir)
+            # 在浏览器 worker 进程中执行登录（未启用进程池时在当前进程执行）
+            kwargs = {"verify_timeout": verify_timeout} if verify_timeout else {}
+            cookie_str = run_browser_job("browser_login", phone, password, profile_dir=profile_dir, **kwargs)
         except Exception as e:
             logger.error(f"Playwright 登录失败: {e}")
             return None
@@ -368,12 +380,12 @@ class AuthManager:
         # 回写真实 UID
         if task_key and self.redis:
             try:
-                user_info_str = self.redis.hget('netease:music:task', task_key)
+                user_info_str = self.redis.hget(USER_TASK_KEY, task_key)
                 if user_info_str:
                     user_info = json.loads(user_info_str)
                     if str(user_info.get('uid')) != str(uid):
                         user_info['uid'] = uid
-                        self.redis.hset('netease:music:task', task_key, json.dumps(user_info))
+                        self.redis.hset(USER_TASK_KEY, task_key, json.dumps(user_info))
                         logger.info(f"绑定真实 UID: {uid}")
             except Exception as e:
                 logger.error(f"回写 UID 失败: {e}")
@@ -381,9 +393,9 @@ class AuthManager:
         logger.info(f"用户 {uid} 通过 Playwright 登录成功")
         return client
 
-    def login(self, phone, password, task_key=None):
+    def login(self, phone, password, task_key=None, verify_timeout=None):
         if LOGIN_METHOD == 'playwright':
-            return self._login_via_playwright(phone, password, task_key)
+            return self._login_via_playwright(phone, password, task_key, verify_timeout=verify_timeout)
         # 默认走 API 登录
         return self._login_via_api(phone, password, task_key)
 
@@ -393,7 +405,7 @@ class AuthManager:
         
         try:
             # 读取字符串 Cookie
-            cookie_str = self.redis.get(f'netease:music:user:{uid}:cookie')
+            cookie_str = self.redis.get(USER_COOKIE_KEY_TPL.format(uid=uid))
             if cookie_str:
                 client = NeteaseClient(cookie_str=cookie_str, uid=uid)
 
@@ -410,8 +422,8 @@ class AuthManager:
                     logger.warning(f"用户 {uid} Cookie 可能已失效，状态码: {check.get('code')}")
                     # 删除失效的Cookie
                     try:
-                        self.redis.delete(f'netease:music:user:{uid}:cookie')
-                        self.redis.delete(f'netease:music:user:{uid}:userdata')
+                        self.redis.delete(USER_COOKIE_KEY_TPL.format(uid=uid))
+                        self.redis.delete(USER_DATA_KEY_TPL.format(uid=uid))
                         logger.info(f"已删除用户 {uid} 的失效Cookie")
                     except Exception as e:
                         logger.error(f"删除失效Cookie失败: {e}")
@@ -424,26 +436,36 @@ class AuthManager:
 
         return None
 
+    def get_user_credentials(self, task_key):
+        """按 task_key 读取单个用户凭证（结构与 get_all_users_credentials 的元素一致），不存在时返回 None"""
+        if not self.redis:
+            logger.error("Redis连接不可用，无法获取用户凭证")
+            return None
+
+        try:
+            info_str = self.redis.hget(USER_TASK_KEY, task_key)
+            if not info_str:
+                return None
+            return parse_user_credentials(task_key, info_str)
+        except json.JSONDecodeError:
+            logger.error(f"解析用户数据失败: {task_key}")
+        except Exception as e:
+            logger.error(f"获取用户 {task_key} 凭证时发生异常: {e}")
+        return None
+
     def get_all_users_credentials(self):
         if not self.redis:
             logger.error("Redis连接不可用，无法获取用户凭证")
             return []
             
         try:
-            users = self.redis.hgetall('netease:music:task')
+            users = self.redis.hgetall(USER_TASK_KEY)
             user_list = []
             for task_key, info_str in users.items():
                 try:
-                    info = json.loads(info_str)
-                    if all(key in info for key in ['phone', 'password']):
-                        user_list.append({
-                            'task_key': task_key,
-                            'uid': info.get('uid', task_key),  # 优先取 uid
-                            'phone': info.get('phone'),
-                            'password': info.get('password')
-                        })
-                    else:
-                        logger.warning(f"用户数据不完整，缺少必要字段: {task_key}")
+                    user = parse_user_credentials(task_key, info_str)
+                    if user:
+                        user_list.append(user)
                 except json.JSONDecodeError:
                     logger.error(f"解析用户数据失败: {task_key}")
                 except Exception as e:
@@ -459,8 +481,8 @@ class AuthManager:
 
         try:
             # Key 改回简单的 :cookie，存纯字符串
-            self.redis.set(f'netease:music:user:{uid}:cookie', cookie_str, ex=86400 * 30)  # 30天过期
-            self.redis.set(f'netease:music:user:{uid}:userdata', json.dumps(user_data), ex=86400 * 30)
+            self.redis.set(USER_COOKIE_KEY_TPL.format(uid=uid), cookie_str, ex=COOKIE_TTL_SECONDS)
+            self.redis.set(USER_DATA_KEY_TPL.format(uid=uid), json.dumps(user_data), ex=COOKIE_TTL_SECONDS)
             return True
         except Exception as e:
             logger.error(f"保存用户 {uid} 会话失败: {e}")
@@ -471,7 +493,7 @@ class AuthManager:
         if not self.redis or not cookie_str:
             return False
         try:
-            self.redis.set(f'netease:music:user:{uid}:cookie', cookie_str, ex=86400 * 30)
+            self.redis.set(USER_COOKIE_KEY_TPL.format(uid=uid), cookie_str, ex=COOKIE_TTL_SECONDS)
             logger.info(f"已更新用户 {uid} 的Cookie到Redis")
             return True
         except Exception as e:
@@ -479,6 +501,20 @@ class AuthManager:
             return False
 
 
+def parse_user_credentials(task_key, info_str):
+    """把任务表中的一条记录解析为用户凭证，缺少 phone / password 时返回 None（JSON 格式错误时抛出 JSONDecodeError）"""
+    info = json.loads(info_str)
+    if not all(key in info for key in ['phone', 'password']):
+        logger.warning(f"用户数据不完整，缺少必要字段: {task_key}")
+        return None
+    return {
+        'task_key': task_key,
+        'uid': info.get('uid', task_key),  # 优先取 uid
+        'phone': info.get('phone'),
+        'password': info.get('password')
+    }
+
+
 # --- 5. 任务执行类 ---
 class TaskManager:
     def __init__(self, client: NeteaseClient):
@@ -528,14 +564,17 @@ class TaskManager:
         actionType: str = "102",
         platform: str = "200",
         timeout_ms: int = 30000,
+        vip_further_get_time_callback=None,
     ):
         """
-        使用 Playwright 打开音乐人后台页面并监听 cycle/list 接口返回。
+        使用 Playwright 打开音乐人后台页面并监听 cycle/list 接口返回（同一次页面加载中顺带取得 VIP 状态，
+        通过 vip_further_get_time_callback 传出）。
         适用于直接 weapi 调用易触发 301/风控（checkToken 敏感）的场景。
         """
-        from playwright_handle.musician import get_musician_cycle_mission_by_playwright
+        from playwright_handle.worker_pool import run_browser_job
 
-        return get_musician_cycle_mission_by_playwright(
+        return run_browser_job(
+            "get_musician_cycle_mission_by_playwright",
             profile_dir,
             cookie_str=self.client.get_cookie_str(),
             phone=phone,
@@ -543,6 +582,7 @@ class TaskManager:
             actionType=actionType,
             platform=platform,
             timeout_ms=timeout_ms,
+            vip_further_get_time_callback=vip_further_get_time_callback,
         )
 
     # 领取音乐人云豆签到任务
@@ -643,22 +683,11 @@ if __name__ == '__main__':
                         task = TaskManager(client)
                         musician_cycle_missions_res = task.get_musician_cycle_mission()
                 if musician_cycle_missions_res.get('code') == 200:
-                    musician_cycle_missions_data = musician_cycle_missions_res.get('data', {})
-                    musician_cycle_missions_list = musician_cycle_missions_data.get('list', [])
-                    for mission in musician_cycle_missions_list:
-                        description = mission.get('description')
-                        if "签到" in description:
-                            logger.info(f"发现签到任务：{description}")
-                            userMissionId = mission.get('userMissionId')
-                            period = mission.get('period')
-                            if userMissionId and period:
-                                logger.info(f"{description}：userMissionId={userMissionId}, period={period}")
-                                reward_obtain_res = task.reward_obtain(userMissionId, period)
-                                logger.info(f"{description}结果：{json.dumps(reward_obtain_res, ensure_ascii=False)[:100]}")
-                            else:
-                                logger.error(f"执行任务 {description} 失败：mission={mission}")
-                    if not musician_cycle_missions_list:
+                    from mission_engine import claim_mission_rewards
+
+                    if not (musician_cycle_missions_res.get('data') or {}).get('list'):
                         logger.info("未找到任何音乐人任务")
+                    claim_mission_rewards(task, musician_cycle_missions_res)
                 else:
                     logger.error(f"获取音乐人循环任务失败：{json.dumps(musician_cycle_missions_res, ensure_ascii=False)[:100]}")
 
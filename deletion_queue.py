@@ -0,0 +1,158 @@
+"""
+发布动态后的延迟删除队列。
+
+发布成功后不再原地等待 DYNAMIC_DELETE_DELAY_SECONDS 再删除（那样会占住浏览器上下文、worker 进程与并发名额），
+而是把 (uid, event_id, 删除时间) 写入 Redis 有序集合，由调度进程中的后台任务定期批量删除：
+
+- 有序集合 netease:music:delete:pending，分数为可删除的时间戳，成员为 {"uid", "event_id", "attempts"} JSON
+- 后台任务每 DYNAMIC_DELETE_POLL_SECONDS 秒取出已到期的记录，按用户分组，用该用户 Redis 中的 Cookie 删除
+- 删除失败的记录延后重新入队，累计失败 DYNAMIC_DELETE_MAX_ATTEMPTS 次后放弃
+- 记录保存在 Redis 中，进程重启后未删除的动态会继续删除
+- Redis 不可用时 schedule_delete 返回 False，由调用方退回原先的等待后直接删除
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+import redis
+
+from core import NeteaseClient, TaskManager, USER_COOKIE_KEY_TPL, logger
+from config import (
+    REDIS_POOL,
+    DYNAMIC_DELETE_DELAY_SECONDS, DYNAMIC_DELETE_BATCH_SIZE, DYNAMIC_DELETE_MAX_ATTEMPTS,
+)
+
+PENDING_DELETE_KEY = 'netease:music:delete:pending'
+# 删除失败后重新入队的延迟（秒），按失败次数线性增加
+RETRY_BACKOFF_SECONDS = 60
+
+
+def _get_redis():
+    try:
+        r = redis.Redis(connection_pool=REDIS_POOL) if REDIS_POOL else None
+        if r:
+            r.ping()
+        return r
+    except Exception as e:
+        logger.warning(f"[延迟删除] Redis 不可用：{e}")
+        return None
+
+
+def _member(uid, event_id, attempts: int = 0) -> str:
+    return json.dumps({"uid": str(uid), "event_id": str(event_id), "attempts": attempts}, sort_keys=True)
+
+
+def schedule_delete(uid, event_id, delay: int = DYNAMIC_DELETE_DELAY_SECONDS) -> bool:
+    """登记一条待删除的动态，delay 秒后由后台任务删除；登记失败返回 False。"""
+    if not uid or not event_id:
+        return False
+    r = _get_redis()
+    if not r:
+        return False
+    try:
+        r.zadd(PENDING_DELETE_KEY, {_member(uid, event_id): time.time() + delay})
+        logger.info(f"用户 {uid} 的动态 {event_id} 已加入延迟删除队列，{delay} 秒后删除")
+        return True
+    except Exception as e:
+        logger.warning(f"[延迟删除] 登记用户 {uid} 的动态 {event_id} 失败：{e}")
+        return False
+
+
+def delete_now(cookie_str: str | None, event_id, delay: int = DYNAMIC_DELETE_DELAY_SECONDS):
+    """无法登记到队列时的回退：等待 delay 秒后直接删除（原先的行为）。"""
+    logger.info(f"等待 {delay} 秒后删除动态")
+    time.sleep(delay)
+    delete_res = TaskManager(NeteaseClient(cookie_str=cookie_str)).delete_dynamic(event_id)
+    logger.info(f"删除动态结果: {delete_res}")
+    return delete_res
+
+
+def pending_count() -> int:
+    r = _get_redis()
+    if not r:
+        return 0
+    try:
+        return r.zcard(PENDING_DELETE_KEY)
+    except Exception:
+        return 0
+
+
+def _claim_due(r, now: float, limit: int) -> list[dict]:
+    """取出已到期的记录；ZREM 成功的才算领取到，多个进程同时执行时不会重复删除。"""
+    members = r.zrangebyscore(PENDING_DELETE_KEY, '-inf', now, start=0, num=limit)
+    if not members:
+        return []
+    pipe = r.pipeline()
+    for m in members:
+        pipe.zrem(PENDING_DELETE_KEY, m)
+    claimed = []
+    for m, removed in zip(members, pipe.execute()):
+        if not removed:
+            continue
+        try:
+            claimed.append(json.loads(m))
+        except json.JSONDecodeError:
+            logger.warning(f"[延迟删除] 丢弃无法解析的记录：{m}")
+    return claimed
+
+
+def _requeue(r, item: dict, error: str):
+    attempts = int(item.get("attempts", 0)) + 1
+    uid, event_id = item.get("uid"), item.get("event_id")
+    if attempts >= DYNAMIC_DELETE_MAX_ATTEMPTS:
+        logger.error(f"用户 {uid} 的动态 {event_id} 删除失败 {attempts} 次，已放弃：{error}")
+        return
+    delay = RETRY_BACKOFF_SECONDS * attempts
+    try:
+        r.zadd(PENDING_DELETE_KEY, {_member(uid, event_id, attempts): time.time() + delay})
+        logger.warning(f"用户 {uid} 的动态 {event_id} 删除失败（第 {attempts} 次），{delay} 秒后重试：{error}")
+    except Exception as e:
+        logger.error(f"[延迟删除] 重新登记用户 {uid} 的动态 {event_id} 失败：{e}")
+
+
+def process_due_deletions(limit: int = DYNAMIC_DELETE_BATCH_SIZE) -> int:
+    """删除所有已到期的动态（每轮最多 limit 条），返回成功删除的条数。"""
+    r = _get_redis()
+    if not r:
+        return 0
+    try:
+        items = _claim_due(r, time.time(), limit)
+    except Exception as e:
+        logger.warning(f"[延迟删除] 读取待删除记录失败：{e}")
+        return 0
+    if not items:
+        return 0
+
+    by_uid: dict[str, list[dict]] = {}
+    for item in items:
+        by_uid.setdefault(item.get("uid"), []).append(item)
+
+    deleted = 0
+    for uid, user_items in by_uid.items():
+        try:
+            cookie_str = r.get(USER_COOKIE_KEY_TPL.format(uid=uid))
+        except Exception as e:
+            cookie_str = None
+            logger.warning(f"[延迟删除] 读取用户 {uid} 的 Cookie 失败：{e}")
+        if not cookie_str:
+            for item in user_items:
+                _requeue(r, item, "Redis 中没有该用户的 Cookie")
+            continue
+
+        task = TaskManager(NeteaseClient(cookie_str=cookie_str, uid=uid))
+        for item in user_items:
+            try:
+                res = task.delete_dynamic(item.get("event_id"))
+            except Exception as e:
+                _requeue(r, item, str(e))
+                continue
+            if isinstance(res, dict) and res.get("code") == 200:
+                deleted += 1
+                logger.info(f"已删除用户 {uid} 的动态 {item.get('event_id')}")
+            else:
+                _requeue(r, item, json.dumps(res, ensure_ascii=False)[:100])
+
+    logger.info(f"[延迟删除] 本轮处理 {len(items)} 条，成功删除 {deleted} 条")
+    return deleted
@@ -0,0 +1,365 @@
+"""
+调度逻辑的模拟时钟演练（dry run）。
+
+不需要真实账号、也不需要真的等上几个月：用虚拟时钟逐日推进，在 fakeredis（或一个空的本地 Redis 库）里
+造出一批模拟用户，按 cron 的节奏依次调用真实的 daily_task_runner / interval_task_runner。
+
+- 虚拟时钟：替换 main、run_state 中的 date / datetime，should_execute_task、update_last_send_record、
+  VIP 日期判断、当日完成标记与断点记录都按模拟日期计算
+- 模拟执行器：替换 main.run_user_pipeline，签到 / VIP 领取 / 发布动态不发网络请求，只按配置的耗时与失败率
+  返回结果；是否领取 VIP、是否发布动态仍由真实的调度函数决定
+- 企业微信汇总照常拼接，但不推送，只统计大小
+- 每次运行输出耗时、Redis 命令数、内存峰值，结束后输出每月发布次数的分布
+
+用法（在项目根目录执行，默认使用 fakeredis，需要 pip install fakeredis）：
+    python dry_run.py --users 1000 --days 60
+    python dry_run.py --users 10000 --days 30 --latency 0.01 --failure-rate 0.05 --concurrency 50
+    python dry_run.py --redis-url redis://localhost:6379/15   # 使用一个空的本地 Redis 库
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import redis
+
+import config
+from run_timing import STAGE_DAILY, STAGE_SHARE, STAGE_VIP, timed
+
+# 模拟的 VIP 领取周期（天），领取成功后下次可领取时间顺延这么多天
+VIP_PERIOD_DAYS = 31
+
+
+class VirtualClock:
+    """模拟的当前时间；install 后目标模块中的 date.today() / datetime.now() 返回模拟时间。"""
+
+    def __init__(self, now: datetime):
+        self.now = now
+        self._patched: list[tuple[object, object, object]] = []
+
+    def install(self, *modules):
+        clock = self
+
+        class VirtualDate(date):
+            @classmethod
+            def today(cls):
+                return clock.now.date()
+
+        class VirtualDateTime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.now if tz is None else clock.now.astimezone(tz)
+
+            @classmethod
+            def today(cls):
+                return clock.now
+
+        for module in modules:
+            self._patched.append((module, module.date, module.datetime))
+            module.date = VirtualDate
+            module.datetime = VirtualDateTime
+
+    def uninstall(self):
+        for module, date_cls, datetime_cls in reversed(self._patched):
+            module.date = date_cls
+            module.datetime = datetime_cls
+        self._patched.clear()
+
+
+class RedisOpCounter:
+    """统计经过连接池发出的 Redis 命令数（pipeline 中的每条命令单独计数）。"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+    def connection_class(self, base):
+        counter = self
+
+        class CountingConnection(base):
+            def send_command(self, *args, **kwargs):
+                counter.add()
+                return super().send_command(*args, **kwargs)
+
+            def pack_commands(self, commands):
+                commands = list(commands)
+                counter.add(len(commands))
+                return super().pack_commands(commands)
+
+        return CountingConnection
+
+
+def build_redis_pool(redis_url: str | None, counter: RedisOpCounter):
+    """默认使用 fakeredis；指定 redis_url 时使用该 Redis（必须是空库，避免与真实数据混在一起）。"""
+    if redis_url:
+        pool = redis.ConnectionPool.from_url(
+            redis_url, decode_responses=True, connection_class=counter.connection_class(redis.Connection),
+        )
+        size = redis.Redis(connection_pool=pool).dbsize()
+        if size:
+            raise SystemExit(f"{redis_url} 中已有 {size} 个键，请指定一个空的 Redis 库（例如 /15）")
+        return pool
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("未安装 fakeredis：请 pip install fakeredis，或用 --redis-url 指定一个空的本地 Redis 库")
+    return redis.ConnectionPool(
+        connection_class=counter.connection_class(getattr(fakeredis, 'FakeRedisConnection', None) or fakeredis.FakeConnection),
+        server=fakeredis.FakeServer(),
+        decode_responses=True,
+    )
+
+
+class StubExecutor:
+    """模拟的任务执行：每次调用耗时 latency 秒，按 failure_rate 随机失败。"""
+
+    def __init__(self, latency: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls: Counter = Counter()
+        self.failures: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, stage: str) -> bool:
+        with self._lock:
+            self.calls[stage] += 1
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures[stage] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return not failed
+
+
+class StubPipeline:
+    """
+    与 run_user_pipeline 签名一致的模拟流程，各阶段是否执行沿用真实的判断函数；
+    daily / vip / share 也可单独调用（cli.py run vip|share --dry-run）。
+    run_state 中的常量与函数通过 main 取用，本模块在替换连接池之前不能导入 run_state。
+    """
+
+    def __init__(self, main, executor: StubExecutor, clock: VirtualClock):
+        self.main = main
+        self.executor = executor
+        self.clock = clock
+
+    def daily(self, uid, label, done) -> list[str]:
+        if {self.main.TASK_MISSIONS, self.main.TASK_DAILY} <= done:
+            return [f"{label}：", "今日签到任务已完成，跳过", ""]
+        with timed(uid, STAGE_DAILY):
+            if not self.executor.call('daily'):
+                return [f"{label}：", "日常签到：失败（模拟）", ""]
+            self.main.mark_task_done(uid, self.main.TASK_MISSIONS)
+            self.main.mark_task_done(uid, self.main.TASK_DAILY)
+        return [f"{label}：", "音乐人签到：成功", "日常签到：成功", ""]
+
+    def vip(self, uid, label, done, vip_state) -> list[str]:
+        if not vip_state or self.main.TASK_VIP in done:
+            return []
+        with timed(uid, STAGE_VIP):
+            if not self.executor.call('vip'):
+                return [f"{label}：", "VIP领取：失败（模拟）", ""]
+            next_ms = int((self.clock.now + timedelta(days=VIP_PERIOD_DAYS)).timestamp() * 1000)
+            self.main.set_vip_further_get_time_ms(uid, next_ms)
+            self.main.mark_task_done(uid, self.main.TASK_VIP)
+        return [f"{label}：", f"VIP领取：成功，下次领取时间 {self.main._fmt_ms(next_ms)}", ""]
+
+    def share(self, uid, label, done) -> list[str]:
+        skip_lines = self.main.share_skip_lines(uid, label, self.main.TASK_SHARE in done)
+        if skip_lines:
+            return skip_lines
+        with timed(uid, STAGE_SHARE):
+            if not self.executor.call('share'):
+                return self.main.share_result_lines(label, "失败（模拟）")
+            self.main.update_last_send_record(uid)
+            self.main.mark_task_done(uid, self.main.TASK_SHARE)
+        event = {"id": f"dry-{uid}-{self.clock.now:%Y%m%d}"}
+        return self.main.share_success_lines(label, uid, {"code": 200, "event": event})
+
+    def __call__(self, auth, user, *, daily: bool = True, interval: bool = True):
+        uid = user.get('uid', user.get('phone'))
+        label = f"用户{uid}"
+        done = self.main.get_done_tasks(uid)
+        daily_lines = self.daily(uid, label, done) if daily else []
+        interval_lines: list[str] = []
+        if interval:
+            vip_state = self.main.get_vip_due_state(uid)
+            interval_lines = self.vip(uid, label, done, vip_state)
+            # 领取日当天不发动态（与 process_interval_user 一致）
+            if vip_state != 'today':
+                interval_lines += self.share(uid, label, done)
+        return daily_lines, interval_lines
+
+
+class DryRunEnv:
+    """
+    演练环境：fakeredis（或空的本地 Redis 库）+ 虚拟时钟 + 模拟执行器 + 不推送的企业微信，并写入模拟用户。
+    必须在导入 main / run_state 等模块之前创建，它们在导入时读取 config.REDIS_POOL。
+    """
+
+    def __init__(
+        self, users: int, now: datetime, latency: float = 0.0, failure_rate: float = 0.0,
+        vip_ratio: float = 0.5, redis_url: str | None = None, seed: int = 0, verbose: bool = False,
+    ):
+        self.counter = RedisOpCounter()
+        config.REDIS_POOL = build_redis_pool(redis_url, self.counter)
+
+        import main
+        import run_state
+        import wecom_notify
+
+        if not verbose:
+            main.logger.setLevel(logging.WARNING)
+
+        self.main = main
+        self.clock = VirtualClock(now)
+        self.clock.install(main, run_state)
+        self.executor = StubExecutor(latency, failure_rate, seed)
+        self.pipeline = StubPipeline(main, self.executor, self.clock)
+        self.summaries: list[int] = []
+
+        def send_wecom_webhook(key, content, title=None, **kwargs):
+            self.summaries.append(len(content.encode('utf-8')))
+
+        # 模拟执行器、VIP 分支（仅 playwright 模式生效）与企业微信推送
+        main.run_user_pipeline = self.pipeline
+        main.LOGIN_METHOD = 'playwright'
+        main.WECOM_WEBHOOK_KEY = 'dry-run'
+        wecom_notify.send_wecom_webhook = send_wecom_webhook
+
+        seed_users(redis.Redis(connection_pool=config.REDIS_POOL), users, self.clock, vip_ratio, seed)
+
+    def close(self):
+        self.clock.uninstall()
+
+
+def seed_users(r, users: int, clock: VirtualClock, vip_ratio: float, seed: int):
+    """写入模拟用户；vip_ratio 比例的用户带有未来 VIP_PERIOD_DAYS 天内随机一天的 VIP 领取时间。"""
+    rng = random.Random(seed)
+    pipe = r.pipeline()
+    for i in range(users):
+        uid = str(100000000 + i)
+        pipe.hset('netease:music:task', uid, json.dumps({"uid": uid, "phone": f"dry{i}", "password": "dry-run"}))
+        if rng.random() < vip_ratio:
+            vip_at = clock.now + timedelta(days=rng.randrange(VIP_PERIOD_DAYS))
+            pipe.set(f"netease:music:user:{uid}:vip:furtherVipGetTime", str(int(vip_at.timestamp() * 1000)))
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+
+def print_send_distribution(send_records: dict, users: int, months: list[str], max_sends: int):
+    """每月发布次数的分布：每列是发布了 n 次的用户数"""
+    header = "".join(f"{f'{n}次':>8}" for n in range(max_sends + 1))
+    print(f"\n每月发布次数分布（共 {users} 个用户）")
+    print(f"{'月份':>8} {header} {'平均':>8}")
+    for month in months:
+        counts = Counter()
+        for i in range(users):
+            record = send_records.get(str(100000000 + i), {})
+            counts[min(max_sends, (record.get('monthly_sends') or {}).get(month, 0))] += 1
+        average = sum(n * c for n, c in counts.items()) / users if users else 0.0
+        row = "".join(f"{counts[n]:>8}" for n in range(max_sends + 1))
+        print(f"{month:>8} {row} {average:>8.2f}")
+
+
+def run_dry_run(
+    users: int, days: int, start: date, latency: float, failure_rate: float,
+    concurrency: int, vip_ratio: float, redis_url: str | None, seed: int, verbose: bool,
+):
+    send_hour, send_minute = map(int, config.SEND_TIME.split(':'))
+    env = DryRunEnv(
+        users, datetime.combine(start, datetime.min.time()).replace(hour=send_hour, minute=send_minute),
+        latency=latency, failure_rate=failure_rate, vip_ratio=vip_ratio, redis_url=redis_url, seed=seed,
+        verbose=verbose,
+    )
+    main, clock, counter, executor, summaries = env.main, env.clock, env.counter, env.executor, env.summaries
+    concurrency = max(1, concurrency)
+    print(
+        f"模拟 {users} 个用户 × {days} 天（{start} 起），每步耗时 {latency}s，失败率 {failure_rate:.0%}，"
+        f"并发数 {concurrency}"
+    )
+    print(f"{'日期':>10} {'运行':>8} {'耗时(s)':>9} {'Redis命令':>10} {'内存峰值(MB)':>12} {'汇总(KB)':>9}")
+
+    runs = (
+        ('daily', main.daily_task_runner, timedelta()),
+        ('interval', main.interval_task_runner, timedelta(minutes=5)),
+    )
+    totals = Counter()
+    tracemalloc.start()
+    try:
+        for offset in range(days):
+            day_start = datetime.combine(start + timedelta(days=offset), datetime.min.time())
+            for name, runner, delay in runs:
+                clock.now = day_start.replace(hour=send_hour, minute=send_minute) + delay
+                ops_before, summary_count = counter.count, len(summaries)
+                tracemalloc.reset_peak()
+                started = time.perf_counter()
+                runner(concurrency=concurrency)
+                elapsed = time.perf_counter() - started
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                ops = counter.count - ops_before
+                summary_kb = sum(summaries[summary_count:]) / 1024
+                totals['elapsed'] += elapsed
+                totals['ops'] += ops
+                totals['peak_mb'] = max(totals['peak_mb'], peak_mb)
+                print(f"{clock.now:%Y-%m-%d} {name:>8} {elapsed:>9.2f} {ops:>10} {peak_mb:>12.1f} {summary_kb:>9.1f}")
+    finally:
+        tracemalloc.stop()
+        env.close()
+
+    print(
+        f"\n合计：{days * len(runs)} 次运行，耗时 {totals['elapsed']:.1f}s，Redis 命令 {totals['ops']}，"
+        f"内存峰值 {totals['peak_mb']:.1f}MB"
+    )
+    print("模拟执行：" + "，".join(
+        f"{stage} {executor.calls[stage]} 次（失败 {executor.failures[stage]}）" for stage in ('daily', 'vip', 'share')
+    ))
+
+    months = sorted({(start + timedelta(days=offset)).strftime('%Y-%m') for offset in range(days)})
+    print_send_distribution(main.load_send_records(), users, months, config.MAX_MONTHLY_SENDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="调度逻辑的模拟时钟演练（不发网络请求）")
+    parser.add_argument('--users', type=int, default=1000, help="模拟用户数")
+    parser.add_argument('--days', type=int, default=60, help="模拟天数")
+    parser.add_argument('--start', type=date.fromisoformat, default=date.today(), help="起始日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个模拟步骤的耗时（秒）")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="每个模拟步骤的失败率（0-1）")
+    parser.add_argument('--concurrency', type=int, default=config.API_USER_CONCURRENCY, help="用户并发数")
+    parser.add_argument('--vip-ratio', type=float, default=0.5, help="带有 VIP 领取时间的用户比例（0-1）")
+    parser.add_argument('--redis-url', help="使用指定的空 Redis 库代替 fakeredis")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--verbose', action='store_true', help="输出任务日志（默认只输出警告）")
+
+    args = parser.parse_args()
+    run_dry_run(
+        users=max(1, args.users),
+        days=max(1, args.days),
+        start=args.start,
+        latency=max(0.0, args.latency),
+        failure_rate=min(1.0, max(0.0, args.failure_rate)),
+        concurrency=args.concurrency,
+        vip_ratio=min(1.0, max(0.0, args.vip_ratio)),
+        redis_url=args.redis_url,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+
+
+if __name__ == '__main__':
+    main()
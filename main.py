@@ -1,22 +1,50 @@
+import contextvars
+import hashlib
 import logging
 import json
+import sys
+import threading
 import time
 import redis
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
 from logging.handlers import RotatingFileHandler
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 # 导入项目核心模块
 from core import AuthManager, TaskManager, logger
+from run_budget import (
+    RunBudget, RunDeferred, login_timeout_kwargs, require_user_time, stage_timeout_kwargs, use_budget,
+)
+from run_timing import STAGE_BROWSER, STAGE_DAILY, STAGE_LOGIN, STAGE_SHARE, STAGE_TOTAL, STAGE_VIP, timed
+from tracing import span
+from run_state import (
+    STATUS_DEFERRED, STATUS_DONE, TASK_DAILY, TASK_MISSIONS, TASK_SHARE, TASK_VIP,
+    open_run, get_unfinished_runs, get_done_tasks, mark_task_done,
+)
+from deletion_queue import delete_now, process_due_deletions, schedule_delete
+from mission_engine import claim_mission_rewards
 
 # 从配置文件导入所有配置
 from config import (
     REDIS_KEY, REDIS_CONF, REDIS_POOL,
-    MAX_MONTHLY_SENDS, SEND_TIME, EXECUTION_INTERVAL_DAYS,
+    MAX_MONTHLY_SENDS, SEND_TIME, SEND_WINDOW, EXECUTION_INTERVAL_DAYS,
     LOGIN_METHOD,
     PLAYWRIGHT_PROFILE_BASEDIR, PLAYWRIGHT_PROFILE_PER_USER,
-    WECOM_WEBHOOK_KEY,
+    WECOM_WEBHOOK_KEY, TASK_QUEUE_MODE,
+    API_USER_CONCURRENCY, PLAYWRIGHT_USER_CONCURRENCY,
+    SCHEDULER_JOBSTORE, SCHEDULER_MODE, SCHEDULER_DAILY_MISFIRE_GRACE, SCHEDULER_INTERVAL_MISFIRE_GRACE,
+    RUN_FOLLOWUP_DELAY_SECONDS,
+    DYNAMIC_DELETE_POLL_SECONDS,
+    PLAYWRIGHT_SUPERVISOR_SECONDS,
 )
 
 import os
@@ -66,6 +94,9 @@ except Exception as e:
     logger.error(f"Redis连接失败: {e}")
     redis_client = None
 
+# 发送记录（REDIS_KEY）读改写锁，供多线程并发处理用户时使用
+_send_records_lock = threading.Lock()
+
 VIP_FURTHER_GET_TIME_KEY_TPL = "netease:music:user:{uid}:vip:furtherVipGetTime"
 
 
@@ -73,30 +104,34 @@ def _vip_key(user_uid) -> str:
     return VIP_FURTHER_GET_TIME_KEY_TPL.format(uid=str(user_uid))
 
 
+def parse_vip_further_get_time(v) -> int | None:
+    """解析 Redis 中保存的 furtherVipGetTime（ms），兼容存成 JSON/字符串数字的场景。"""
+    if v is None:
+        return None
+    if isinstance(v, (bytes, bytearray)):
+        v = v.decode("utf-8", errors="ignore")
+    v = str(v).strip()
+    if not v:
+        return None
+    if v.isdigit():
+        return int(v)
+    try:
+        obj = json.loads(v)
+        if isinstance(obj, (int, float)):
+            return int(obj)
+        if isinstance(obj, str) and obj.isdigit():
+            return int(obj)
+    except Exception:
+        pass
+    return None
+
+
 def get_vip_further_get_time_ms(user_uid) -> int | None:
     """从 Redis 获取用户下次可领取 VIP 的时间（ms）。"""
     if not redis_client:
         return None
     try:
-        v = redis_client.get(_vip_key(user_uid))
-        if v is None:
-            return None
-        if isinstance(v, (bytes, bytearray)):
-            v = v.decode("utf-8", errors="ignore")
-        v = str(v).strip()
-        if not v:
-            return None
-        # 兼容存成 JSON/字符串数字的场景
-        if v.isdigit():
-            return int(v)
-        try:
-            obj = json.loads(v)
-            if isinstance(obj, (int, float)):
-                return int(obj)
-            if isinstance(obj, str) and obj.isdigit():
-                return int(obj)
-        except Exception:
-            pass
+        return parse_vip_further_get_time(redis_client.get(_vip_key(user_uid)))
     except Exception as e:
         logger.error(f"读取用户 {user_uid} 的 VIP furtherVipGetTime 失败: {e}")
     return None
@@ -187,6 +222,12 @@ def should_execute_task(user_uid):
 
 def update_last_send_record(user_uid):
     """更新用户的最后发送记录和月度发送计数"""
+    # 发送记录是一整个 JSON，多用户并发时需串行化“读-改-写”，避免互相覆盖
+    with _send_records_lock:
+        _update_last_send_record(user_uid)
+
+
+def _update_last_send_record(user_uid):
     send_records = load_send_records()
     today = date.today()
     today_str = today.strftime('%Y-%m-%d')
@@ -213,6 +254,266 @@ def update_last_send_record(user_uid):
     else:
         logger.error(f"更新用户 {user_uid} 的最后发送记录失败")
 
+# 浏览器并发闸门：线程池中同时运行的 Chromium 数量不超过 PLAYWRIGHT_USER_CONCURRENCY
+_playwright_slots = threading.BoundedSemaphore(PLAYWRIGHT_USER_CONCURRENCY)
+
+
+@contextmanager
+def playwright_slot():
+    """LOGIN_METHOD=playwright 时占用一个浏览器并发名额；api 模式下不做限制"""
+    if LOGIN_METHOD != "playwright":
+        yield
+        return
+    with _playwright_slots:
+        yield
+
+
+def _login_user(auth, user):
+    """重新登录用户；playwright 登录会启动浏览器，因此同样需要占用浏览器并发名额"""
+    with playwright_slot():
+        # 运行有时间预算时，二次验证的等待按剩余时间收紧（见 run_budget）
+        return auth.login(
+            user.get('phone'), user.get('password'), task_key=user.get('task_key'), **login_timeout_kwargs()
+        )
+
+
+def get_user_profile_dir(user) -> str:
+    """用户的 Playwright profile 目录（PLAYWRIGHT_PROFILE_PER_USER 时按手机号分子目录）"""
+    if not PLAYWRIGHT_PROFILE_PER_USER:
+        return PLAYWRIGHT_PROFILE_BASEDIR
+    safe_phone = "".join([c for c in str(user.get("phone")) if c.isdigit()]) or str(user.get("phone"))
+    return os.path.join(PLAYWRIGHT_PROFILE_BASEDIR, safe_phone)
+
+
+# 已校验过的登录态在同一进程内复用的时长：同一天的每日任务与间隔任务（相隔约 5 分钟）只校验一次 Cookie
+SESSION_REUSE_SECONDS = 30 * 60
+_session_cache: dict[str, tuple] = {}
+_session_cache_lock = threading.Lock()
+
+
+class UserSession:
+    """
+    单个用户一次处理流程中各阶段共用的会话：
+    - 登录态只获取一次（Redis Cookie 校验或重新登录），各阶段复用同一个 client
+    - playwright 模式下，当天需要的浏览器步骤通过 run_browser_stages 在同一个浏览器上下文中一次执行完，
+      各阶段再依次取用结果；未预取或预取失败的阶段回退到单独启动浏览器
+    """
+
+    def __init__(self, auth, user):
+        self.auth = auth
+        self.user = user
+        self.uid = user.get('uid', user.get('phone'))
+        self.cache_key = str(user.get('task_key') or self.uid)
+        self.profile_dir = get_user_profile_dir(user)
+        self._client = None
+        self._client_resolved = False
+        self._vip_state = None
+        self._vip_state_resolved = False
+        self._browser_results: dict = {}
+        self._done_tasks: set[str] | None = None
+
+    def _remember(self, client):
+        with _session_cache_lock:
+            _session_cache[self.cache_key] = (client, time.time())
+
+    def get_client(self):
+        """获取可用 client：优先复用近期已校验的登录态，其次 Redis Cookie，失败再登录"""
+        if self._client_resolved:
+            return self._client
+        self._client_resolved = True
+
+        with _session_cache_lock:
+            cached = _session_cache.get(self.cache_key)
+        if cached and time.time() - cached[1] < SESSION_REUSE_SECONDS:
+            logger.info(f"用户 {self.uid} 复用 {int((time.time() - cached[1]) // 60)} 分钟内已校验的登录态")
+            self._client = cached[0]
+            return self._client
+
+        client = None
+        with timed(self.uid, STAGE_LOGIN):
+            # 1. 尝试使用redis存的 Cookie
+            if self.user.get('uid') and str(self.user.get('uid')) != str(self.user.get('phone')):
+                client = self.auth.get_client_by_uid(self.user.get('uid'))
+            # 2. 失败则登录（仅当 LOGIN_METHOD=api 时才会真正走接口）
+            if not client:
+                client = _login_user(self.auth, self.user)
+        if client:
+            self._remember(client)
+        self._client = client
+        return client
+
+    def relogin(self):
+        """接口返回 301 等未登录状态时重新登录，成功则替换当前 client"""
+        client = _login_user(self.auth, self.user)
+        if client:
+            self._client = client
+            self._client_resolved = True
+            self._remember(client)
+        return client
+
+    def get_vip_state(self):
+        """VIP 领取状态（见 get_vip_due_state），流程内只读取一次，避免预取步骤刷新时间后前后判断不一致"""
+        if not self._vip_state_resolved:
+            self._vip_state_resolved = True
+            try:
+                self._vip_state = get_vip_due_state(self.uid)
+            except Exception as e:
+                logger.error(f"用户 {self.uid} 读取 VIP 领取状态时发生异常: {e}")
+                self._vip_state = None
+        return self._vip_state
+
+    def run_browser_stages(self, stages: list[str]):
+        """在同一个浏览器上下文中一次执行 stages（见 playwright_handle.browser.run_user_browser_stages）"""
+        client = self.get_client()
+        if not stages or not client:
+            return
+        from playwright_handle.worker_pool import run_browser_job
+
+        try:
+            with playwright_slot(), timed(self.uid, STAGE_BROWSER):
+                self._browser_results = run_browser_job(
+                    "run_user_browser_stages",
+                    self.profile_dir,
+                    stages,
+                    cookie_str=client.get_cookie_str(),
+                    phone=self.user.get("phone"),
+                    password=self.user.get("password"),
+                    share_msg=f"{datetime.now().strftime('%Y年%m月%d日%H:%M:%S')}早上好",
+                    search_keyword="你好",
+                    vip_further_get_time_callback=lambda ms: set_vip_further_get_time_ms(self.uid, int(ms)),
+                    uid=self.user.get("uid"),
+                    **stage_timeout_kwargs(len(stages)),
+                    **login_timeout_kwargs(),
+                ) or {}
+        except Exception as e:
+            logger.warning(f"用户 {self.uid} 共享浏览器执行 {stages} 失败，将按阶段单独执行：{e}")
+            self._browser_results = {}
+
+    def has_browser_result(self, stage: str) -> bool:
+        return stage in self._browser_results
+
+    def done_tasks(self) -> set[str]:
+        """当天已完成的任务（见 run_state.get_done_tasks），流程内只读取一次 Redis"""
+        if self._done_tasks is None:
+            self._done_tasks = get_done_tasks(self.uid)
+        return self._done_tasks
+
+    def is_done(self, task: str) -> bool:
+        return task in self.done_tasks()
+
+    def mark_done(self, task: str):
+        self.done_tasks().add(task)
+        mark_task_done(self.uid, task)
+
+    def take_browser_result(self, stage: str):
+        """取出预取的浏览器步骤结果（只取一次，重试时回退到单独执行）"""
+        return self._browser_results.pop(stage, None)
+
+
+def user_deferred_lines(user, task_name: str, reason: str) -> list[str]:
+    """用户被推迟到补跑时的汇总行"""
+    user_label = f"用户{user.get('uid') or user.get('phone')}"
+    logger.warning(f"{user_label}的{task_name}推迟到补跑：{reason}")
+    return [f"{user_label}：", f"{task_name}：{reason}，已推迟到补跑", ""]
+
+
+def user_error_lines(user, task_name: str, e: Exception) -> list[str]:
+    """处理用户时出现未捕获异常的汇总行"""
+    user_label = f"用户{user.get('uid') or user.get('phone')}"
+    logger.error(f"处理{user_label}的{task_name}时发生未捕获异常: {e}")
+    return [f"{user_label}：", f"{task_name}：执行任务时发生异常：{e}", ""]
+
+
+def run_users_concurrently(
+    user_list, handler, task_name="任务", checkpoint=None, budget: RunBudget | None = None, priority=None,
+    concurrency: int | None = None,
+) -> list[str]:
+    """
+    用有界线程池并发处理多个用户，返回按 user_list 原顺序拼接的汇总行。
+
+    Args:
+        user_list: 用户列表
+        handler: 处理单个用户的函数，接收 user，返回该用户的汇总行列表
+        task_name: 任务名称，用于日志
+        checkpoint: 断点记录（run_state.RunCheckpoint），已完成的用户直接复用记录的汇总行
+        budget: 本次运行的时间预算；到期后尚未开始的用户、handler 抛出 RunDeferred 的用户记为 deferred
+        priority: 接收 user 返回排序键（越小越先开始），见 user_urgency
+        concurrency: 并发数，默认 API_USER_CONCURRENCY
+
+    Returns:
+        所有用户的汇总行（顺序与 user_list 一致，不受完成先后影响）
+    """
+    if not user_list:
+        return []
+
+    results: list[list[str]] = [[] for _ in user_list]
+    pending = []
+    for idx, user in enumerate(user_list):
+        if checkpoint and checkpoint.status(user.get('task_key')) == STATUS_DONE:
+            results[idx] = checkpoint.result(user.get('task_key')) or []
+        else:
+            pending.append(idx)
+    if len(pending) < len(user_list):
+        logger.info(f"{task_name}：{len(user_list) - len(pending)} 个用户今日已完成，复用上次结果，不再重复执行")
+    if not pending:
+        return [line for user_lines in results for line in user_lines]
+    if priority:
+        # 线程池按提交顺序开始执行，紧急的用户先提交
+        keys = {idx: priority(user_list[idx]) for idx in pending}
+        pending.sort(key=lambda idx: (keys[idx], idx))
+
+    def _run(user):
+        task_key = user.get('task_key')
+        if budget and budget.expired():
+            if checkpoint:
+                checkpoint.mark_deferred(task_key, "本次运行时间预算已用完")
+            raise RunDeferred("本次运行时间预算已用完")
+        if checkpoint:
+            checkpoint.mark_running(task_key)
+        try:
+            with use_budget(budget), timed(user.get('uid', user.get('phone')), STAGE_TOTAL), span(
+                "user", uid=user.get('uid', user.get('phone')), run_id=checkpoint.run_id if checkpoint else None,
+                task=task_name,
+            ):
+                user_lines = handler(user) or []
+        except RunDeferred as e:
+            if checkpoint:
+                checkpoint.mark_deferred(task_key, str(e))
+            raise
+        except Exception as e:
+            if checkpoint:
+                checkpoint.mark_failed(task_key, [], str(e))
+            raise
+        if checkpoint:
+            checkpoint.mark_done(task_key, user_lines)
+        return user_lines
+
+    workers = max(1, min(concurrency or API_USER_CONCURRENCY, len(pending)))
+    logger.info(
+        f"{task_name}：共 {len(pending)} 个用户待处理，并发数 {workers}"
+        + (f"（浏览器并发上限 {PLAYWRIGHT_USER_CONCURRENCY}）" if LOGIN_METHOD == "playwright" else "")
+    )
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="user-worker") as executor:
+        # 每个用户带上调用方上下文的副本（如 run_timing 的耗时统计）
+        futures = {executor.submit(contextvars.copy_context().run, _run, user_list[idx]): idx for idx in pending}
+        for future in as_completed(futures):
+            idx = futures[future]
+            user = user_list[idx]
+            try:
+                results[idx] = future.result() or []
+            except RunDeferred as e:
+                results[idx] = user_deferred_lines(user, task_name, str(e))
+            except Exception as e:
+                # handler 内部已兜底异常，这里只防御意外情况，保证其他用户结果不受影响
+                results[idx] = user_error_lines(user, task_name, e)
+
+    lines: list[str] = []
+    for user_lines in results:
+        lines.extend(user_lines)
+    return lines
+
+
 def retry_with_backoff(func, max_retries=3, delay=2, task_name="任务"):
     """
     重试装饰器函数，最多重试max_retries次，每次重试前等待delay秒
@@ -249,25 +550,588 @@ def retry_with_backoff(func, max_retries=3, delay=2, task_name="任务"):
                 return None
     return None
 
-def daily_task_runner():
-    """每日任务执行函数（日常签到、音乐人签到等）"""
-    # 汇总给企业微信的精简结果（按用户聚合），避免推送完整日志
-    daily_wecom_lines: list[str] = []
+# dailyTask 返回这些 code 时视为今日已签到（-2：重复签到）
+DAILY_TASK_DONE_CODES = (200, -2)
+
+
+def _result_text(value) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def daily_result_lines(user_label: str, musician_res, daily_res, mission_lines=()) -> list[str]:
+    """每日任务汇总给企业微信的精简结果行（结果为 dict 时序列化为 JSON）"""
+    return [
+        f"{user_label}：",
+        f"音乐人中心签到结果：{_result_text(musician_res)}",
+        *mission_lines,
+        f"日常签到任务结果：{_result_text(daily_res)}",
+        "",
+    ]
+
+
+def share_result_lines(user_label: str, text: str) -> list[str]:
+    """发布动态任务汇总给企业微信的精简结果行"""
+    return [f"{user_label}：", f"动态分享任务：{text}", ""]
+
+
+def process_daily_user(auth, user, session: UserSession | None = None) -> list[str]:
+    """处理单个用户的每日任务，返回汇总给企业微信的精简结果行"""
+    lines: list[str] = []
+    user_label = f"用户{user.get('uid') or user.get('phone')}"
+    musician_checkin_res = None
+    mission_lines: list[str] = []
+    daily_task_res = None
+    session = session or UserSession(auth, user)
+    try:
+        # 当天已完成的步骤直接跳过；全部完成时连登录态都不再校验
+        missions_done = session.is_done(TASK_MISSIONS)
+        daily_done = session.is_done(TASK_DAILY)
+        if missions_done and daily_done:
+            logger.info(f"用户 {session.uid} 今日音乐人签到与日常签到均已完成，跳过每日任务")
+            return daily_result_lines(user_label, "今日已完成，跳过", "今日已完成，跳过")
+
+        client = session.get_client()
+
+        if client:
+            logger.info(f"正在处理用户 {user['uid']} 的每日任务")
+            task = TaskManager(client)
+
+            # 获取音乐人任务列表并领取奖励（带重试）
+            def execute_musician_checkin():
+                nonlocal client, task, musician_checkin_res
+                if LOGIN_METHOD == "playwright":
+                    # 用浏览器打开音乐人后台并监听 cycle/list（规避 checkToken/风控 301）；优先使用共享浏览器预取的结果
+                    musician_cycle_missions_res = session.take_browser_result("missions")
+                    if musician_cycle_missions_res is None:
+                        with playwright_slot():
+                            musician_cycle_missions_res = task.get_musician_cycle_mission_by_playwright(
+                                session.profile_dir,
+                                phone=user.get("phone"),
+                                password=user.get("password"),
+                                vip_further_get_time_callback=lambda ms: set_vip_further_get_time_ms(user['uid'], int(ms)),
+                                **stage_timeout_kwargs(),
+                            )
+                else:
+                    musician_cycle_missions_res = task.get_musician_cycle_mission()
+                # 遇到 301（未登录）时，触发自动登录并重试
+                if musician_cycle_missions_res.get('code') == 301:
+                    logger.warning(f"用户 {user['uid']} 音乐人接口返回 301，尝试自动登录刷新 Cookie 后重试")
+                    new_client = session.relogin()
+                    if new_client:
+                        client = new_client
+                        task = TaskManager(client)
+                    return False
+                if musician_cycle_missions_res.get('code') == 200:
+                    # 领取列表中所有可领取的任务奖励（并发 + 全局限速）
+                    report = claim_mission_rewards(task, musician_cycle_missions_res)
+                    mission_lines.extend(report.summary_lines())
+                    if report.checkin_result is not None:
+                        musician_checkin_res = report.checkin_result
+                    if report.completed:
+                        session.mark_done(TASK_MISSIONS)
+                    # 可领取的任务缺少参数时返回 False 触发重试；没有可领取的任务也算成功（可能已经领过了）
+                    return not report.missing
+                else:
+                    logger.error(f"获取音乐人循环任务失败：{json.dumps(musician_cycle_missions_res, ensure_ascii=False)[:100]}")
+                    musician_checkin_res = musician_cycle_missions_res
+                    return False  # 返回False触发重试
 
-    # 为 Redis / 用户列表获取增加重试，避免短暂网络问题导致本次任务完全跳过
-    def _load_users_for_daily():
+            # 使用重试机制执行音乐人签到任务
+            if missions_done:
+                logger.info(f"用户 {user['uid']} 今日音乐人签到已完成，跳过任务列表获取")
+                musician_checkin_res = {"message": "今日已完成，跳过"}
+            else:
+                retry_with_backoff(
+                    execute_musician_checkin,
+                    max_retries=3,
+                    delay=2,
+                    task_name=f"用户 {user['uid']} 的音乐人签到任务"
+                )
+
+            # 执行日常签到任务
+            if daily_done:
+                daily_task_res = {"message": "今日已完成，跳过"}
+            else:
+                daily_task_res = task.daily_task()
+                logger.info(f"日常签到任务结果：{json.dumps(daily_task_res, ensure_ascii=False)[:100]}")
+                if daily_task_res.get('code') in DAILY_TASK_DONE_CODES:
+                    session.mark_done(TASK_DAILY)
+
+            # 任务执行完成后，更新Cookie到Redis
+            if client:
+                try:
+                    fresh_cookie = client.get_cookie_str()
+                    if fresh_cookie:
+                        auth.update_cookie(user['uid'], fresh_cookie)
+                        logger.info(f"用户 {user['uid']} 每日任务完成，已更新Cookie到Redis")
+                except Exception as e:
+                    logger.warning(f"更新用户 {user['uid']} Cookie失败: {e}")
+
+            # 汇总给企业微信的精简结果
+            lines = daily_result_lines(
+                user_label,
+                musician_checkin_res or {"message": "未获取到音乐人中心签到结果"},
+                daily_task_res or {"message": "未获取到日常签到任务结果"},
+                mission_lines,
+            )
+
+        else:
+            logger.error(f"用户 {user.get('uid')} 登录失败，无法执行每日任务")
+            lines = daily_result_lines(user_label, "用户登录失败，未能执行任务", "用户登录失败，未能执行任务")
+    except Exception as e:
+        logger.error(f"处理用户 {user.get('uid')} 的每日任务时发生异常: {e}")
+        lines = daily_result_lines(user_label, f"执行任务时发生异常：{e}", "执行任务时发生异常")
+    return lines
+
+
+def get_vip_due_state(user_uid) -> str | None:
+    """
+    根据 Redis 中的 furtherVipGetTime 判断 VIP 领取状态（仅 playwright 模式）：
+    - 'today'：今天正好是领取日，仅打开权益页自动领取并刷新时间，当天不发动态，也不做“距离上次执行不足X天”的检测
+    - 'overdue'：已错过领取日（例如 Redis 写的是 3.8，今天是 3.12），先尝试补领，然后仍按正常逻辑检测/发动态
+    - None：未到日期，或 Redis 中没有记录（由正常发动态流程中的监听来写入首个时间）
+    """
+    if LOGIN_METHOD != "playwright":
+        return None
+    return vip_due_state_from_ms(get_vip_further_get_time_ms(user_uid))
+
+
+def vip_due_state_from_ms(vip_ms: int | None) -> str | None:
+    """按下次可领取时间（ms）与今天比较，返回 'today' / 'overdue' / None（含义见 get_vip_due_state）"""
+    if not vip_ms:
+        return None
+    vip_date = datetime.fromtimestamp(int(vip_ms) / 1000).date()
+    today = date.today()
+    if today == vip_date:
+        return 'today'
+    if today > vip_date:
+        return 'overdue'
+    return None
+
+
+def process_vip_user(auth, user, vip_state, session: UserSession | None = None) -> None:
+    """打开 VIP 权益页自动领取，并刷新下次可领取时间（vip_state 见 get_vip_due_state）"""
+    user_uid = user.get('uid', user.get('phone'))
+    session = session or UserSession(auth, user)
+    try:
+        vip_date = _fmt_ms(get_vip_further_get_time_ms(user_uid) or 0)[:10]
+        if vip_state == 'today':
+            logger.info(
+                f"用户 {user_uid} 今天是 VIP 可领取日期 {vip_date}，"
+                f"将仅打开权益页自动领取并刷新时间，当天不再执行发布动态任务。"
+            )
+        else:
+            logger.info(
+                f"用户 {user_uid} 已错过 VIP 领取日期 {vip_date}，"
+                f"本次将先尝试补领 VIP，再按正常逻辑检查并执行发布动态任务。"
+            )
+
+        if session.has_browser_result("vip"):
+            # 共享浏览器已完成领取（下次可领取时间已在回调中写入）
+            ms = session.take_browser_result("vip")
+        else:
+            # 获取可用 client（用于拿 cookie 注入浏览器）
+            client = session.get_client()
+            if not client:
+                logger.error(f"用户 {user_uid} 无法获取有效登录态，跳过本次 VIP 权益页打开")
+                return
+
+            from playwright_handle.worker_pool import run_browser_job
+
+            def _on_vip_time(ms: int):
+                set_vip_further_get_time_ms(user_uid, ms)
+                logger.info(f"用户 {user_uid} 已更新下次可领取 VIP 时间：{_fmt_ms(ms)}（ms={ms}）")
+
+            with playwright_slot():
+                ms = run_browser_job(
+                    "open_vip_right_page_and_listen",
+                    session.profile_dir,
+                    cookie_str=client.get_cookie_str(),
+                    phone=user.get("phone"),
+                    password=user.get("password"),
+                    vip_further_get_time_callback=_on_vip_time,
+                    **stage_timeout_kwargs(),
+                )
+
+        if ms:
+            # 再次兜底写入（即使回调没触发）
+            set_vip_further_get_time_ms(user_uid, int(ms))
+            session.mark_done(TASK_VIP)
+            logger.info(f"用户 {user_uid} 本次权益页监听完成，下次可领取 VIP 时间：{_fmt_ms(ms)}（ms={ms}）")
+        else:
+            logger.warning(f"用户 {user_uid} 本次权益页未解析到 furtherVipGetTime（将下次继续补偿执行）")
+    except Exception as e:
+        logger.error(f"用户 {user_uid} 执行 VIP 权益页逻辑时发生异常: {e}")
+
+
+def interval_steps(user_uid, vip_state, vip_done: bool) -> tuple[bool, bool]:
+    """
+    间隔任务要执行的步骤：(是否打开 VIP 权益页, 是否继续发布动态)。
+    VIP 领取日当天以“领取 VIP”为主，不再进行发布动态的间隔检测/执行。
+    """
+    if vip_state and vip_done:
+        logger.info(f"用户 {user_uid} 今日已领取 VIP，跳过权益页")
+    return bool(vip_state) and not vip_done, vip_state != 'today'
+
+
+def process_interval_user(auth, user, session: UserSession | None = None) -> list[str]:
+    """处理单个用户的间隔任务（VIP 领取 + 发布动态），返回汇总给企业微信的精简结果行"""
+    session = session or UserSession(auth, user)
+    # 1) VIP 领取逻辑（见 get_vip_due_state）
+    vip_state = session.get_vip_state()
+    run_vip, run_share = interval_steps(session.uid, vip_state, session.is_done(TASK_VIP))
+    if run_vip:
+        with timed(session.uid, STAGE_VIP):
+            process_vip_user(auth, user, vip_state, session)
+    if not run_share:
+        return []
+    # 2) 发布动态
+    with timed(session.uid, STAGE_SHARE):
+        return process_share_user(auth, user, session)
+
+
+def describe_share_skip(user_uid) -> tuple[str, str]:
+    """不满足发布动态条件时，返回 (跳过原因, 预计下次执行时间) 用于日志与企业微信汇总"""
+    # 计算预计下次执行时间
+    send_records = load_send_records()
+    user_record = send_records.get(str(user_uid), {})
+    last_send_date_str = user_record.get('last_send_date')
+
+    skip_reason = ""
+    next_execution_time = "未知"
+
+    if last_send_date_str:
         try:
-            auth_local = AuthManager()
-            # 如果 Redis 未就绪，视为失败以触发重试
-            if not getattr(auth_local, "redis", None):
-                logger.error("Redis 未就绪，获取每日任务用户列表失败，准备重试")
-                return None
-            user_list_local = auth_local.get_all_users_credentials()
-            # 正常情况下，0 个用户也算成功（可能本来就没配置用户）
-            return auth_local, user_list_local
+            last_send_date = datetime.strptime(last_send_date_str, '%Y-%m-%d').date()
+            today = date.today()
+            now = datetime.now()
+            days_since_last_send = (today - last_send_date).days
+
+            # 检查间隔天数是否满足
+            if days_since_last_send < EXECUTION_INTERVAL_DAYS:
+                # 间隔天数不足
+                days_remaining = EXECUTION_INTERVAL_DAYS - days_since_last_send
+                next_execution_date = today + timedelta(days=days_remaining)
+                skip_reason = f"距离上次执行不足 {EXECUTION_INTERVAL_DAYS} 天（已过 {days_since_last_send} 天）"
+            else:
+                # 间隔天数已满足，检查每月发送次数
+                current_year_month = today.strftime('%Y-%m')
+                monthly_sends = user_record.get('monthly_sends', {})
+                current_month_count = monthly_sends.get(current_year_month, 0)
+
+                if current_month_count >= MAX_MONTHLY_SENDS:
+                    # 每月发送次数已达上限，显示下个月1号的时间
+                    year, month = map(int, current_year_month.split('-'))
+                    if month == 12:
+                        next_month_date = date(year + 1, 1, 1)
+                    else:
+                        next_month_date = date(year, month + 1, 1)
+                    next_execution_date = next_month_date
+                    skip_reason = f"本月已发送 {current_month_count} 次，已达每月上限 {MAX_MONTHLY_SENDS} 次"
+                else:
+                    # 间隔天数已满足，但今天执行时间已过
+                    # SEND_TIME已在config.py中验证过，直接使用
+                    send_hour, send_minute = map(int, SEND_TIME.split(':'))
+                    send_time_today = datetime.combine(today, datetime.min.time().replace(hour=send_hour, minute=send_minute))
+                    if now >= send_time_today:
+                        next_execution_date = today + timedelta(days=1)
+                        skip_reason = "间隔天数已满足，但今天执行时间已过"
+                    else:
+                        next_execution_date = today
+                        skip_reason = "间隔天数已满足，等待执行时间"
+
+            next_execution_time = f"{next_execution_date.strftime('%Y-%m-%d')} {SEND_TIME}"
         except Exception as e:
-            logger.error(f"获取每日任务用户列表时发生异常: {e}")
-            return None
+            logger.error(f"计算预计下次执行时间时发生错误: {e}")
+            skip_reason = "计算时间时发生错误"
+    else:
+        skip_reason = "没有发送记录"
+        next_execution_time = "下次定时检查时"
+
+    return skip_reason, next_execution_time
+
+
+def share_success_lines(user_label: str, user_uid, share_res: dict) -> list[str]:
+    """发布动态成功时汇总给企业微信的精简结果行"""
+    lines: list[str] = []
+    lines.append(f"{user_label}：")
+    vip_ms = get_vip_further_get_time_ms(user_uid)
+    if vip_ms:
+        try:
+            vip_date = datetime.fromtimestamp(int(vip_ms) / 1000).strftime("%Y-%m-%d")
+        except Exception:
+            vip_date = str(vip_ms)
+        lines.append(f"下次VIP领取时间：{vip_date}")
+    event_id = None
+    try:
+        event = share_res.get('event')
+        if isinstance(event, dict):
+            event_id = event.get('id') or event.get('event_id')
+    except Exception:
+        event_id = None
+    msg = "动态分享任务：分享成功"
+    if event_id:
+        msg += f"，event_id={event_id}"
+    lines.append(msg)
+    lines.append("")
+    return lines
+
+
+def share_skip_lines(user_uid, user_label: str, share_done: bool) -> list[str] | None:
+    """今日已发布，或不满足发布条件（距离上次执行>=设置的间隔天数、每月上限）时返回跳过的汇总行，否则返回 None"""
+    if share_done:
+        logger.info(f"用户 {user_uid} 今日已发布动态，跳过")
+        return share_result_lines(user_label, "今日已完成，跳过")
+    if not should_execute_task(user_uid):
+        skip_reason, next_execution_time = describe_share_skip(user_uid)
+        logger.info(f"用户 {user_uid} {skip_reason}，跳过本次发布动态任务，预计下次执行时间：{next_execution_time}")
+        return share_result_lines(user_label, f"{skip_reason}，预计下次执行时间：{next_execution_time}")
+    return None
+
+
+def process_share_user(auth, user, session: UserSession | None = None) -> list[str]:
+    """处理单个用户的发布动态任务（按间隔天数与每月上限判断是否执行），返回汇总给企业微信的精简结果行"""
+    lines: list[str] = []
+    user_uid = user.get('uid', user.get('phone'))
+    user_label = f"用户{user_uid}"
+    session = session or UserSession(auth, user)
+    try:
+        skip_lines = share_skip_lines(user_uid, user_label, session.is_done(TASK_SHARE))
+        if skip_lines:
+            return skip_lines
+
+        client = session.get_client()
+
+        if client:
+            logger.info(f"正在处理用户 {user['uid']} 的发布动态任务")
+            task = TaskManager(client)
+
+            # 发布动态任务（带重试）
+            share_res = None
+            fresh_cookie_from_browser = None
+            def execute_share_song():
+                nonlocal client, task
+                nonlocal share_res, fresh_cookie_from_browser
+                if LOGIN_METHOD == 'playwright':
+                    # 用浏览器发布（避免 code=250 安全验证分享异常）；优先使用共享浏览器已完成的发布结果
+                    shared_res = session.take_browser_result("share")
+                    if shared_res is not None:
+                        ok, fresh_cookie_from_browser = shared_res
+                    else:
+                        from playwright_handle.worker_pool import run_browser_job
+
+                        msg = f"{datetime.now().strftime('%Y年%m月%d日%H:%M:%S')}早上好"
+                        # 将当前可用的 cookie 注入到浏览器；若仍未登录则用账号密码再走一次登录流程
+                        with playwright_slot():
+                            ok, fresh_cookie_from_browser = run_browser_job(
+                                "share_note_and_delete",
+                                session.profile_dir,
+                                msg,
+                                search_keyword="你好",
+                                cookie_str=client.get_cookie_str(),
+                                phone=user.get("phone"),
+                                password=user.get("password"),
+                                vip_further_get_time_callback=lambda ms: set_vip_further_get_time_ms(user_uid, int(ms)),
+                                uid=user.get("uid"),
+                            )
+                    share_res = {"code": 200} if ok else {"code": 250, "msg": "playwright share failed"}
+                else:
+                    share_res = task.share_song()
+                # 遇到 301（未登录）时，触发自动登录并重试
+                if share_res.get('code') == 301:
+                    logger.warning(f"用户 {user['uid']} 分享接口返回 301，尝试自动登录刷新 Cookie 后重试")
+                    new_client = session.relogin()
+                    if new_client:
+                        client = new_client
+                        task = TaskManager(client)
+                    return False
+                if share_res.get('code') == 200:
+                    logger.info(f"发布动态成功：{json.dumps(share_res, ensure_ascii=False)[:100]}")
+                    return True
+                else:
+                    logger.warning(f"发布动态失败：{json.dumps(share_res, ensure_ascii=False)[:100]}")
+                    return False  # 返回False触发重试
+
+            # 使用重试机制执行发布动态任务
+            success = retry_with_backoff(
+                execute_share_song,
+                max_retries=3,
+                delay=3,
+                task_name=f"用户 {user['uid']} 的发布动态任务"
+            )
+
+            # 任务执行完成后，更新Cookie到Redis
+            # playwright模式：使用浏览器返回的最新Cookie
+            # api模式：使用client当前的Cookie
+            if client:
+                try:
+                    if LOGIN_METHOD == 'playwright' and fresh_cookie_from_browser:
+                        auth.update_cookie(user['uid'], fresh_cookie_from_browser)
+                        logger.info(f"用户 {user['uid']} 发布动态任务完成，已从浏览器更新Cookie到Redis")
+                    else:
+                        fresh_cookie = client.get_cookie_str()
+                        if fresh_cookie:
+                            auth.update_cookie(user['uid'], fresh_cookie)
+                            logger.info(f"用户 {user['uid']} 发布动态任务完成，已更新Cookie到Redis")
+                except Exception as e:
+                    logger.warning(f"更新用户 {user['uid']} Cookie失败: {e}")
+
+            if success and share_res and share_res.get('code') == 200:
+                # 更新最后发送记录
+                update_last_send_record(user_uid)
+                session.mark_done(TASK_SHARE)
+
+                # playwright 分支内部已负责监听分享接口并登记删除，这里不再重复删除
+                if LOGIN_METHOD != 'playwright':
+                    id_ = share_res.get('event', {}).get('id')
+                    if id_:
+                        # 交给延迟删除队列，不在这里等待；Redis 不可用时退回等待后直接删除
+                        if not schedule_delete(user.get('uid'), id_):
+                            delete_now(client.get_cookie_str(), id_)
+                    else:
+                        logger.warning("删除动态失败：动态ID获取失败")
+                # 汇总成功结果给企业微信
+                lines.extend(share_success_lines(user_label, user_uid, share_res))
+            elif not success:
+                logger.error(f"用户 {user['uid']} 发布动态任务重试3次后仍然失败")
+                lines.extend(share_result_lines(user_label, f"执行失败，结果：{_result_text(share_res or {})}"))
+        else:
+            logger.error(f"用户 {user['uid']} 登录失败，跳过发布动态任务")
+            lines.extend(share_result_lines(user_label, "用户登录失败，跳过发布动态任务"))
+    except Exception as e:
+        logger.error(f"处理用户 {user.get('uid')} 的发布动态任务时发生异常: {e}")
+        lines = share_result_lines(user_label, f"执行任务时发生异常：{e}")
+    return lines
+
+
+# 用户紧急程度（越小越先开始），有时间预算时保证最要紧的账号先处理
+URGENCY_VIP_DUE = 0        # VIP 今天（或已过期）可领取
+URGENCY_SHARE_QUOTA = 1    # 本月发布次数有完不成的风险
+URGENCY_CHECKIN = 2        # 今日签到尚未完成
+URGENCY_NONE = 3
+
+
+def share_quota_at_risk(user_uid) -> bool:
+    """今天可以发布，且本月剩余的执行机会不多于还差的发布次数（错过今天就可能达不到 MAX_MONTHLY_SENDS）"""
+    if not should_execute_task(user_uid):
+        return False
+    today = date.today()
+    user_record = load_send_records().get(str(user_uid), {})
+    sent = (user_record.get('monthly_sends') or {}).get(today.strftime('%Y-%m'), 0)
+    remaining_sends = MAX_MONTHLY_SENDS - sent
+    next_month = date(today.year + (today.month == 12), today.month % 12 + 1, 1)
+    remaining_chances = 1 + ((next_month - today).days - 1) // max(1, EXECUTION_INTERVAL_DAYS)
+    return 0 < remaining_sends and remaining_chances <= remaining_sends
+
+
+def user_urgency(user, *, daily: bool = True, interval: bool = True) -> int:
+    """用户的紧急程度（URGENCY_*），只读取 Redis，不发起网络请求"""
+    user_uid = user.get('uid', user.get('phone'))
+    try:
+        done = get_done_tasks(user_uid)
+        if interval:
+            if TASK_VIP not in done and get_vip_due_state(user_uid):
+                return URGENCY_VIP_DUE
+            if TASK_SHARE not in done and share_quota_at_risk(user_uid):
+                return URGENCY_SHARE_QUOTA
+        if daily and not {TASK_MISSIONS, TASK_DAILY} <= done:
+            return URGENCY_CHECKIN
+    except Exception as e:
+        logger.warning(f"计算用户 {user_uid} 的紧急程度失败，按普通优先级处理：{e}")
+        return URGENCY_CHECKIN
+    return URGENCY_NONE
+
+
+def select_users(user_list, users: list[str]) -> list[dict]:
+    """按 uid / task_key / 手机号筛选用户，保持 user_list 原顺序"""
+    wanted = {str(u) for u in users}
+    return [
+        user for user in user_list
+        if wanted & {str(user.get('uid')), str(user.get('task_key')), str(user.get('phone'))}
+    ]
+
+
+def plan_browser_stages(user_uid, done: set[str], vip_state, *, daily: bool = True, interval: bool = True) -> list[str]:
+    """
+    playwright 模式下当天需要在共享浏览器中执行的步骤（missions / vip / share）。
+    当天已完成的步骤（见 run_state 完成标记）不再打开浏览器；VIP 领取日当天不发布动态。
+    """
+    stages = []
+    if daily and TASK_MISSIONS not in done:
+        stages.append("missions")
+    if interval:
+        if vip_state and TASK_VIP not in done:
+            stages.append("vip")
+        if vip_state != 'today' and TASK_SHARE not in done and should_execute_task(user_uid):
+            stages.append("share")
+    return stages
+
+
+def run_user_pipeline(auth, user, *, daily: bool = True, interval: bool = True) -> tuple[list[str], list[str]]:
+    """
+    单个用户的完整处理流程，各阶段共用同一个 UserSession：
+    获取登录态 → 音乐人签到 → 日常签到 → VIP 领取 → 发布动态 → 删除动态，未到期的阶段跳过。
+
+    playwright 模式下先在同一个浏览器上下文中一次完成当天到期的浏览器步骤（任务列表 / VIP / 发布），
+    各阶段再按顺序使用预取结果完成领奖、签到与记录，每个用户只校验一次登录态、只启动一次浏览器。
+
+    运行有时间预算（见 run_budget）且剩余时间放不下该用户时抛出 RunDeferred，由调用方推迟到补跑。
+
+    Returns:
+        (每日任务汇总行, 间隔任务汇总行)
+    """
+    session = UserSession(auth, user)
+    if LOGIN_METHOD == 'playwright':
+        stages = plan_browser_stages(
+            session.uid, session.done_tasks(), session.get_vip_state() if interval else None,
+            daily=daily, interval=interval,
+        )
+        # 剩余时间放不下该用户时推迟到补跑，不再开始
+        require_user_time(f"用户 {session.uid} ", len(stages))
+        session.run_browser_stages(stages)
+    else:
+        require_user_time(f"用户 {session.uid} ")
+
+    daily_lines: list[str] = []
+    if daily:
+        with timed(session.uid, STAGE_DAILY):
+            daily_lines = process_daily_user(auth, user, session)
+    interval_lines = process_interval_user(auth, user, session) if interval else []
+    return daily_lines, interval_lines
+
+
+def finish_run(checkpoint, task_name: str):
+    """所有用户都已处理时标记运行完成；有用户因时间预算被推迟时保留运行记录，并安排补跑"""
+    deferred = checkpoint.count(STATUS_DEFERRED)
+    if not deferred:
+        checkpoint.finish()
+        return
+    logger.warning(f"{task_name}有 {deferred} 个用户因时间预算不足被推迟，{RUN_FOLLOWUP_DELAY_SECONDS} 秒后补跑")
+    if _scheduler is None:
+        logger.warning("调度器未启动，无法安排补跑，被推迟的用户将在下次启动或手动重跑时处理")
+        return
+    _scheduler.add_job(
+        func=resume_unfinished_runs,
+        trigger=DateTrigger(run_date=datetime.now() + timedelta(seconds=RUN_FOLLOWUP_DELAY_SECONDS)),
+        id='netease_followup_runs',
+        name='补跑被推迟的用户',
+        replace_existing=True,
+        jobstore='memory',
+        executor='serial',
+        misfire_grace_time=None,
+    )
+
+
+def daily_task_runner(users: list[str] | None = None, concurrency: int | None = None):
+    """
+    每日任务执行函数（日常签到、音乐人签到等）
+
+    Args:
+        users: 只处理这些用户（uid / task_key / 手机号），默认全部用户
+        concurrency: 用户并发数，默认 API_USER_CONCURRENCY
+    """
+    # 汇总给企业微信的精简结果（按用户聚合），避免推送完整日志
+    daily_wecom_lines: list[str] = []
 
     # 运行日志收集与企业微信通知（仅本次运行有效）
     wecom_handler = None
@@ -283,12 +1147,7 @@ def daily_task_runner():
     
     try:
         # 初始化认证管理器并获取所有用户凭证（带重试）
-        load_res = retry_with_backoff(
-            _load_users_for_daily,
-            max_retries=3,
-            delay=5,
-            task_name="加载每日任务用户列表",
-        )
+        load_res = load_users_with_retry("每日任务")
         if not load_res:
             logger.error("多次重试后仍无法从 Redis 获取每日任务用户列表，本次每日任务终止")
             # Redis 多次重试仍失败时，发送简要企业微信通知
@@ -311,134 +1170,35 @@ def daily_task_runner():
             logger.info("没有待处理的用户，【每日任务】结束")
             return
             
-        for user in user_list:
-            user_label = f"用户{user.get('uid') or user.get('phone')}"
-            musician_checkin_res = None
-            daily_task_res = None
-            try:
-                client = None
-                # 1. 尝试使用redis存的 Cookie
-                if user['uid'] and str(user['uid']) != str(user['phone']):
-                    client = auth.get_client_by_uid(user['uid'])
-                
-                # 2. 失败则登录（仅当 LOGIN_METHOD=api 时才会真正走接口）
-                if not client:
-                    client = auth.login(user['phone'], user['password'], task_key=user['task_key'])
-                
-                if client:
-                    logger.info(f"正在处理用户 {user['uid']} 的每日任务")
-                    task = TaskManager(client)
-                    
-                    # 获取并执行音乐人签到任务（带重试）
-                    def execute_musician_checkin():
-                        nonlocal client, task, musician_checkin_res
-                        if LOGIN_METHOD == "playwright":
-                            # 用浏览器打开音乐人后台并监听 cycle/list（规避 checkToken/风控 301）
-                            profile_dir = PLAYWRIGHT_PROFILE_BASEDIR
-                            if PLAYWRIGHT_PROFILE_PER_USER:
-                                safe_phone = "".join([c for c in str(user.get("phone")) if c.isdigit()]) or str(user.get("phone"))
-                                profile_dir = os.path.join(PLAYWRIGHT_PROFILE_BASEDIR, safe_phone)
-                            musician_cycle_missions_res = task.get_musician_cycle_mission_by_playwright(
-                                profile_dir,
-                                phone=user.get("phone"),
-                                password=user.get("password"),
-                            )
-                        else:
-                            musician_cycle_missions_res = task.get_musician_cycle_mission()
-                        # 遇到 301（未登录）时，触发自动登录并重试
-                        if musician_cycle_missions_res.get('code') == 301:
-                            logger.warning(f"用户 {user['uid']} 音乐人接口返回 301，尝试自动登录刷新 Cookie 后重试")
-                            new_client = auth.login(user['phone'], user['password'], task_key=user.get('task_key'))
-                            if new_client:
-                                client = new_client
-                                task = TaskManager(client)
-                            return False
-                        if musician_cycle_missions_res.get('code') == 200:
-                            musician_cycle_missions_data = musician_cycle_missions_res.get('data', {})
-                            musician_cycle_missions_list = musician_cycle_missions_data.get('list', [])
-                            success_count = 0
-                            has_checkin_mission = False
-                            missing_params = False
-                            
-                            for mission in musician_cycle_missions_list:
-                                description = mission.get('description')
-                                if "签到" not in description:
-                                    continue
-                                
-                                has_checkin_mission = True
-                                logger.info(f"发现签到任务：{description}")
-                                userMissionId = mission.get('userMissionId')
-                                period = mission.get('period')
-                                
-                                if userMissionId and period:
-                                    logger.info(f"{description}：userMissionId={userMissionId}, period={period}")
-                                    reward_obtain_res = task.reward_obtain(userMissionId, period)
-                                    logger.info(f"{description}结果：{json.dumps(reward_obtain_res, ensure_ascii=False)[:100]}")
-                                    musician_checkin_res = reward_obtain_res
-                                    if reward_obtain_res.get('code') == 200:
-                                        success_count += 1
-                                else:
-                                    logger.warning(f"任务 {description} 缺少必要参数：userMissionId={userMissionId}, period={period}\nmission={mission}")
-                                    missing_params = True  # 标记有参数缺失，但不立即返回，继续处理其他任务
-                            
-                            # 如果找到了签到任务但参数缺失，返回False触发重试
-                            if has_checkin_mission and missing_params:
-                                return False
-                            
-                            # 如果至少有一个签到任务成功，返回True
-                            if success_count > 0:
-                                return True
-                            
-                            # 如果没有找到签到任务，也算成功（可能已经签到过了）
-                            return True
-                        else:
-                            logger.error(f"获取音乐人循环任务失败：{json.dumps(musician_cycle_missions_res, ensure_ascii=False)[:100]}")
-                            musician_checkin_res = musician_cycle_missions_res
-                            return False  # 返回False触发重试
-                    
-                    # 使用重试机制执行音乐人签到任务
-                    retry_with_backoff(
-                        execute_musician_checkin,
-                        max_retries=3,
-                        delay=2,
-                        task_name=f"用户 {user['uid']} 的音乐人签到任务"
-                    )
+        if users:
+            user_list = select_users(user_list, users)
+            if not user_list:
+                logger.info(f"没有匹配 {users} 的用户，【每日任务】结束")
+                return
 
-                    # 执行日常签到任务
-                    daily_task_res = task.daily_task()
-                    logger.info(f"日常签到任务结果：{json.dumps(daily_task_res, ensure_ascii=False)[:100]}")
-
-                    # 任务执行完成后，更新Cookie到Redis
-                    if client:
-                        try:
-                            fresh_cookie = client.get_cookie_str()
-                            if fresh_cookie:
-                                auth.update_cookie(user['uid'], fresh_cookie)
-                                logger.info(f"用户 {user['uid']} 每日任务完成，已更新Cookie到Redis")
-                        except Exception as e:
-                            logger.warning(f"更新用户 {user['uid']} Cookie失败: {e}")
-
-                    # 汇总给企业微信的精简结果
-                    musician_summary = musician_checkin_res or {"message": "未获取到音乐人中心签到结果"}
-                    daily_summary = daily_task_res or {"message": "未获取到日常签到任务结果"}
-                    daily_wecom_lines.append(f"{user_label}：")
-                    daily_wecom_lines.append(f"音乐人中心签到结果：{json.dumps(musician_summary, ensure_ascii=False)}")
-                    daily_wecom_lines.append(f"日常签到任务结果：{json.dumps(daily_summary, ensure_ascii=False)}")
-                    daily_wecom_lines.append("")
+        # 断点记录：同一天重复触发（手动重跑 / 重启恢复）时只执行尚未完成的用户；
+        # 只处理部分用户的手动运行不记录断点，以免把当天的整次运行标记为已完成
+        checkpoint = None if users else open_run('daily')
+        if checkpoint:
+            if checkpoint.is_finished():
+                logger.info("今日每日任务已全部完成，跳过本次执行")
+                return
+            checkpoint.start(user_list)
 
-                else:
-                    logger.error(f"用户 {user.get('uid')} 登录失败，无法执行每日任务")
-                    daily_wecom_lines.append(f"{user_label}：")
-                    daily_wecom_lines.append("音乐人中心签到结果：用户登录失败，未能执行任务")
-                    daily_wecom_lines.append("日常签到任务结果：用户登录失败，未能执行任务")
-                    daily_wecom_lines.append("")
-            except Exception as e:
-                logger.error(f"处理用户 {user.get('uid')} 的每日任务时发生异常: {e}")
-                daily_wecom_lines.append(f"{user_label}：")
-                daily_wecom_lines.append(f"音乐人中心签到结果：执行任务时发生异常：{e}")
-                daily_wecom_lines.append("日常签到任务结果：执行任务时发生异常")
-                daily_wecom_lines.append("")
-                continue
+        # 多用户并发处理（按紧急程度开始，超出时间预算的用户推迟到补跑），汇总结果仍按用户列表顺序输出
+        daily_wecom_lines.extend(
+            run_users_concurrently(
+                user_list,
+                lambda u: run_user_pipeline(auth, u, interval=False)[0],
+                task_name="每日任务",
+                checkpoint=checkpoint,
+                budget=RunBudget(),
+                priority=lambda u: user_urgency(u, interval=False),
+                concurrency=concurrency,
+            )
+        )
+        if checkpoint:
+            finish_run(checkpoint, "每日任务")
                 
     except Exception as e:
         logger.error(f"每日任务执行异常: {e}")
@@ -463,36 +1223,16 @@ def daily_task_runner():
         except Exception:
             pass
 
-def interval_task_runner():
-    """间隔任务执行函数（音乐人发布动态任务）"""
+def interval_task_runner(users: list[str] | None = None, concurrency: int | None = None):
+    """间隔任务执行函数（音乐人发布动态任务），参数同 daily_task_runner"""
     # 汇总给企业微信的精简结果（按用户聚合），避免推送完整日志
     interval_wecom_lines: list[str] = []
 
-    # 为 Redis / 用户列表获取增加重试，避免短暂网络问题导致本次任务完全跳过
-    def _load_users_for_interval():
-        try:
-            auth_local = AuthManager()
-            # 如果 Redis 未就绪，视为失败以触发重试
-            if not getattr(auth_local, "redis", None):
-                logger.error("Redis 未就绪，获取间隔任务用户列表失败，准备重试")
-                return None
-            user_list_local = auth_local.get_all_users_credentials()
-            # 正常情况下，0 个用户也算成功（可能本来就没配置用户）
-            return auth_local, user_list_local
-        except Exception as e:
-            logger.error(f"获取间隔任务用户列表时发生异常: {e}")
-            return None
-
     logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始执行间隔任务")
     
     try:
         # 初始化认证管理器并获取所有用户凭证（带重试）
-        load_res = retry_with_backoff(
-            _load_users_for_interval,
-            max_retries=3,
-            delay=5,
-            task_name="加载间隔任务用户列表",
-        )
+        load_res = load_users_with_retry("间隔任务")
         if not load_res:
             logger.error("多次重试后仍无法从 Redis 获取间隔任务用户列表，本次间隔任务终止")
             # Redis 多次重试仍失败时，发送简要企业微信通知
@@ -515,304 +1255,35 @@ def interval_task_runner():
             logger.info("没有待处理的用户，【间隔任务】结束")
             return
         
-        for user in user_list:
-            user_uid = user.get('uid', user.get('phone'))
-            user_label = f"用户{user_uid}"
-            try:
-                # 检查是否应该执行任务（距离上次执行>=设置的间隔天数）
-                # user_uid 已在循环开头计算
-                # 1) VIP 领取逻辑：
-                #    - 如果 Redis 中有 furtherVipGetTime：
-                #        * 今天 == 领取日：仅打开权益页自动领取并刷新时间，当天不发动态，也不做“距离上次执行不足X天”的检测
-                #        * 今天 > 领取日：说明之前异常未执行，本次先尝试补领，然后仍按正常逻辑检测/发动态
-                #        * 今天 < 领取日：未到日期，不额外处理
-                #    - 如果 Redis 中没有记录：不做额外处理，由正常发动态流程中的监听来写入首个时间
-                if LOGIN_METHOD == "playwright":
-                    try:
-                        vip_ms = get_vip_further_get_time_ms(user_uid)
-                        if vip_ms:
-                            vip_date = datetime.fromtimestamp(int(vip_ms) / 1000).date()
-                            today = date.today()
-
-                            # 情况一：今天正好是领取日，只领 VIP，不发动态
-                            if today == vip_date:
-                                logger.info(
-                                    f"用户 {user_uid} 今天是 VIP 可领取日期 {vip_date}，"
-                                    f"将仅打开权益页自动领取并刷新时间，当天不再执行发布动态任务。"
-                                )
-
-                                # 获取可用 client（用于拿 cookie 注入浏览器）
-                                client = None
-                                if user.get("uid") and str(user.get("uid")) != str(user.get("phone")):
-                                    client = auth.get_client_by_uid(user.get("uid"))
-                                if not client:
-                                    client = auth.login(user.get("phone"), user.get("password"), task_key=user.get("task_key"))
-                                if not client:
-                                    logger.error(f"用户 {user_uid} 无法获取有效登录态，跳过本次 VIP 权益页打开")
-                                else:
-                                    from playwright_handle.musician import open_vip_right_page_and_listen
-
-                                    profile_dir = PLAYWRIGHT_PROFILE_BASEDIR
-                                    if PLAYWRIGHT_PROFILE_PER_USER:
-                                        safe_phone = "".join([c for c in str(user.get("phone")) if c.isdigit()]) or str(user.get("phone"))
-                                        profile_dir = os.path.join(PLAYWRIGHT_PROFILE_BASEDIR, safe_phone)
-
-                                    def _on_vip_time(ms: int):
-                                        set_vip_further_get_time_ms(user_uid, ms)
-                                        logger.info(f"用户 {user_uid} 已更新下次可领取 VIP 时间：{_fmt_ms(ms)}（ms={ms}）")
-
-                                    ms = open_vip_right_page_and_listen(
-                                        profile_dir,
-                                        cookie_str=client.get_cookie_str(),
-                                        phone=user.get("phone"),
-                                        password=user.get("password"),
-                                        vip_further_get_time_callback=_on_vip_time,
-                                    )
-
-                                    if ms:
-                                        # 再次兜底写入（即使回调没触发）
-                                        set_vip_further_get_time_ms(user_uid, int(ms))
-                                        logger.info(f"用户 {user_uid} 本次权益页监听完成，下次可领取 VIP 时间：{_fmt_ms(ms)}（ms={ms}）")
-                                    else:
-                                        logger.warning(f"用户 {user_uid} 本次权益页未解析到 furtherVipGetTime（将下次继续补偿执行）")
-
-                                # 当天以“领取 VIP”为主，不再进行发布动态的间隔检测/执行
-                                continue
-
-                            # 情况二：已经错过领取日（例如 Redis 写的是 3.8，今天是 3.12），本次先补领，再继续正常发动态逻辑
-                            if today > vip_date:
-                                logger.info(
-                                    f"用户 {user_uid} 已错过 VIP 领取日期 {vip_date}，"
-                                    f"本次将先尝试补领 VIP，再按正常逻辑检查并执行发布动态任务。"
-                                )
-
-                                client = None
-                                if user.get("uid") and str(user.get("uid")) != str(user.get("phone")):
-                                    client = auth.get_client_by_uid(user.get("uid"))
-                                if not client:
-                                    client = auth.login(user.get("phone"), user.get("password"), task_key=user.get("task_key"))
-                                if client:
-                                    from playwright_handle.musician import open_vip_right_page_and_listen
-
-                                    profile_dir = PLAYWRIGHT_PROFILE_BASEDIR
-                                    if PLAYWRIGHT_PROFILE_PER_USER:
-                                        safe_phone = "".join([c for c in str(user.get("phone")) if c.isdigit()]) or str(user.get("phone"))
-                                        profile_dir = os.path.join(PLAYWRIGHT_PROFILE_BASEDIR, safe_phone)
-
-                                    def _on_vip_time2(ms: int):
-                                        set_vip_further_get_time_ms(user_uid, ms)
-                                        logger.info(f"用户 {user_uid} 补领后已更新下次可领取 VIP 时间：{_fmt_ms(ms)}（ms={ms}）")
-
-                                    ms2 = open_vip_right_page_and_listen(
-                                        profile_dir,
-                                        cookie_str=client.get_cookie_str(),
-                                        phone=user.get("phone"),
-                                        password=user.get("password"),
-                                        vip_further_get_time_callback=_on_vip_time2,
-                                    )
-                                    if ms2:
-                                        set_vip_further_get_time_ms(user_uid, int(ms2))
-                                        logger.info(f"用户 {user_uid} 补领完成，下次可领取 VIP 时间：{_fmt_ms(ms2)}（ms={ms2}）")
-                                else:
-                                    logger.error(f"用户 {user_uid} 无法获取有效登录态，跳过本次 VIP 补领")
-                    except Exception as e:
-                        logger.error(f"用户 {user_uid} 执行 VIP 权益页逻辑时发生异常: {e}")
-
-                if not should_execute_task(user_uid):
-                    # 计算预计下次执行时间
-                    send_records = load_send_records()
-                    user_record = send_records.get(str(user_uid), {})
-                    last_send_date_str = user_record.get('last_send_date')
-                    
-                    skip_reason = ""
-                    next_execution_time = "未知"
-                    
-                    if last_send_date_str:
-                        try:
-                            last_send_date = datetime.strptime(last_send_date_str, '%Y-%m-%d').date()
-                            today = date.today()
-                            now = datetime.now()
-                            days_since_last_send = (today - last_send_date).days
-                            
-                            # 检查间隔天数是否满足
-                            if days_since_last_send < EXECUTION_INTERVAL_DAYS:
-                                # 间隔天数不足
-                                days_remaining = EXECUTION_INTERVAL_DAYS - days_since_last_send
-                                next_execution_date = today + timedelta(days=days_remaining)
-                                skip_reason = f"距离上次执行不足 {EXECUTION_INTERVAL_DAYS} 天（已过 {days_since_last_send} 天）"
-                            else:
-                                # 间隔天数已满足，检查每月发送次数
-                                current_year_month = today.strftime('%Y-%m')
-                                monthly_sends = user_record.get('monthly_sends', {})
-                                current_month_count = monthly_sends.get(current_year_month, 0)
-                                
-                                if current_month_count >= MAX_MONTHLY_SENDS:
-                                    # 每月发送次数已达上限，显示下个月1号的时间
-                                    year, month = map(int, current_year_month.split('-'))
-                                    if month == 12:
-                                        next_month_date = date(year + 1, 1, 1)
-                                    else:
-                                        next_month_date = date(year, month + 1, 1)
-                                    next_execution_date = next_month_date
-                                    skip_reason = f"本月已发送 {current_month_count} 次，已达每月上限 {MAX_MONTHLY_SENDS} 次"
-                                else:
-                                    # 间隔天数已满足，但今天执行时间已过
-                                    # SEND_TIME已在config.py中验证过，直接使用
-                                    send_hour, send_minute = map(int, SEND_TIME.split(':'))
-                                    send_time_today = datetime.combine(today, datetime.min.time().replace(hour=send_hour, minute=send_minute))
-                                    if now >= send_time_today:
-                                        next_execution_date = today + timedelta(days=1)
-                                        skip_reason = "间隔天数已满足，但今天执行时间已过"
-                                    else:
-                                        next_execution_date = today
-                                        skip_reason = "间隔天数已满足，等待执行时间"
-                            
-                            next_execution_time = f"{next_execution_date.strftime('%Y-%m-%d')} {SEND_TIME}"
-                        except Exception as e:
-                            logger.error(f"计算预计下次执行时间时发生错误: {e}")
-                            skip_reason = "计算时间时发生错误"
-                    else:
-                        skip_reason = "没有发送记录"
-                        next_execution_time = "下次定时检查时"
-                    
-                    logger.info(f"用户 {user_uid} {skip_reason}，跳过本次发布动态任务，预计下次执行时间：{next_execution_time}")
-                    interval_wecom_lines.append(f"{user_label}：")
-                    interval_wecom_lines.append(f"动态分享任务：{skip_reason}，预计下次执行时间：{next_execution_time}")
-                    interval_wecom_lines.append("")
-                    continue
-                
-                client = None
-                # 1. 尝试使用redis存的 Cookie
-                if user['uid'] and str(user['uid']) != str(user['phone']):
-                    client = auth.get_client_by_uid(user['uid'])
-                
-                # 2. 失败则登录（仅当 LOGIN_METHOD=api 时才会真正走接口）
-                if not client:
-                    client = auth.login(user['phone'], user['password'], task_key=user['task_key'])
-                
-                if client:
-                    logger.info(f"正在处理用户 {user['uid']} 的发布动态任务")
-                    task = TaskManager(client)
-                    
-                    # 发布动态任务（带重试）
-                    share_res = None
-                    fresh_cookie_from_browser = None
-                    def execute_share_song():
-                        nonlocal client, task
-                        nonlocal share_res, fresh_cookie_from_browser
-                        if LOGIN_METHOD == 'playwright':
-                            # 用浏览器发布（避免 code=250 安全验证分享异常）
-                            from playwright_handle.friend import share_note_and_delete
-
-                            profile_dir = PLAYWRIGHT_PROFILE_BASEDIR
-                            if PLAYWRIGHT_PROFILE_PER_USER:
-                                safe_phone = "".join([c for c in str(user.get('phone')) if c.isdigit()]) or str(user.get('phone'))
-                                profile_dir = os.path.join(PLAYWRIGHT_PROFILE_BASEDIR, safe_phone)
-
-                            msg = f"{datetime.now().strftime('%Y年%m月%d日%H:%M:%S')}早上好"
-                            # 将当前可用的 cookie 注入到浏览器；若仍未登录则用账号密码再走一次登录流程
-                            ok, fresh_cookie_from_browser = share_note_and_delete(
-                                profile_dir,
-                                msg,
-                                search_keyword="你好",
-                                cookie_str=client.get_cookie_str(),
-                                phone=user.get("phone"),
-                                password=user.get("password"),
-                                vip_further_get_time_callback=lambda ms: set_vip_further_get_time_ms(user_uid, int(ms)),
-                            )
-                            share_res = {"code": 200} if ok else {"code": 250, "msg": "playwright share failed"}
-                        else:
-                            share_res = task.share_song()
-                        # 遇到 301（未登录）时，触发自动登录并重试
-                        if share_res.get('code') == 301:
-                            logger.warning(f"用户 {user['uid']} 分享接口返回 301，尝试自动登录刷新 Cookie 后重试")
-                            new_client = auth.login(user['phone'], user['password'], task_key=user.get('task_key'))
-                            if new_client:
-                                client = new_client
-                                task = TaskManager(client)
-                            return False
-                        if share_res.get('code') == 200:
-                            logger.info(f"发布动态成功：{json.dumps(share_res, ensure_ascii=False)[:100]}")
-                            return True
-                        else:
-                            logger.warning(f"发布动态失败：{json.dumps(share_res, ensure_ascii=False)[:100]}")
-                            return False  # 返回False触发重试
-                    
-                    # 使用重试机制执行发布动态任务
-                    success = retry_with_backoff(
-                        execute_share_song,
-                        max_retries=3,
-                        delay=3,
-                        task_name=f"用户 {user['uid']} 的发布动态任务"
-                    )
+        if users:
+            user_list = select_users(user_list, users)
+            if not user_list:
+                logger.info(f"没有匹配 {users} 的用户，【间隔任务】结束")
+                return
 
-                    # 任务执行完成后，更新Cookie到Redis
-                    # playwright模式：使用浏览器返回的最新Cookie
-                    # api模式：使用client当前的Cookie
-                    if client:
-                        try:
-                            if LOGIN_METHOD == 'playwright' and fresh_cookie_from_browser:
-                                auth.update_cookie(user['uid'], fresh_cookie_from_browser)
-                                logger.info(f"用户 {user['uid']} 发布动态任务完成，已从浏览器更新Cookie到Redis")
-                            else:
-                                fresh_cookie = client.get_cookie_str()
-                                if fresh_cookie:
-                                    auth.update_cookie(user['uid'], fresh_cookie)
-                                    logger.info(f"用户 {user['uid']} 发布动态任务完成，已更新Cookie到Redis")
-                        except Exception as e:
-                            logger.warning(f"更新用户 {user['uid']} Cookie失败: {e}")
-
-                    if success and share_res and share_res.get('code') == 200:
-                        # 更新最后发送记录
-                        update_last_send_record(user_uid)
-
-                        # playwright 分支内部已负责监听分享接口并删除动态，这里不再重复删除
-                        if LOGIN_METHOD != 'playwright':
-                            id_ = share_res.get('event', {}).get('id')
-                            if id_:
-                                logger.info("等待 10 秒后删除动态")
-                                time.sleep(10)
-                                delete_res = task.delete_dynamic(id_)
-                                logger.info(f'删除动态结果: {delete_res}')
-                            else:
-                                logger.warning("删除动态失败：动态ID获取失败")
-                        # 汇总成功结果给企业微信
-                        interval_wecom_lines.append(f"{user_label}：")
-                        vip_ms = get_vip_further_get_time_ms(user_uid)
-                        if vip_ms:
-                            try:
-                                vip_date = datetime.fromtimestamp(int(vip_ms) / 1000).strftime("%Y-%m-%d")
-                            except Exception:
-                                vip_date = str(vip_ms)
-                            interval_wecom_lines.append(f"下次VIP领取时间：{vip_date}")
-                        event_id = None
-                        try:
-                            event = share_res.get('event')
-                            if isinstance(event, dict):
-                                event_id = event.get('id') or event.get('event_id')
-                        except Exception:
-                            event_id = None
-                        msg = "动态分享任务：分享成功"
-                        if event_id:
-                            msg += f"，event_id={event_id}"
-                        interval_wecom_lines.append(msg)
-                        interval_wecom_lines.append("")
-                    elif not success:
-                        logger.error(f"用户 {user['uid']} 发布动态任务重试3次后仍然失败")
-                        interval_wecom_lines.append(f"{user_label}：")
-                        interval_wecom_lines.append(f"动态分享任务：执行失败，结果：{json.dumps(share_res or {}, ensure_ascii=False)}")
-                        interval_wecom_lines.append("")
-                else:
-                    logger.error(f"用户 {user['uid']} 登录失败，跳过发布动态任务")
-                    interval_wecom_lines.append(f"{user_label}：")
-                    interval_wecom_lines.append("动态分享任务：用户登录失败，跳过发布动态任务")
-                    interval_wecom_lines.append("")
-            except Exception as e:
-                logger.error(f"处理用户 {user.get('uid')} 的发布动态任务时发生异常: {e}")
-                interval_wecom_lines.append(f"{user_label}：")
-                interval_wecom_lines.append(f"动态分享任务：执行任务时发生异常：{e}")
-                interval_wecom_lines.append("")
-                continue
+        # 断点记录：同一天重复触发（手动重跑 / 重启恢复）时只执行尚未完成的用户；
+        # 只处理部分用户的手动运行不记录断点，以免把当天的整次运行标记为已完成
+        checkpoint = None if users else open_run('interval')
+        if checkpoint:
+            if checkpoint.is_finished():
+                logger.info("今日间隔任务已全部完成，跳过本次执行")
+                return
+            checkpoint.start(user_list)
+
+        # 多用户并发处理，汇总结果仍按用户列表顺序输出
+        interval_wecom_lines.extend(
+            run_users_concurrently(
+                user_list,
+                lambda u: run_user_pipeline(auth, u, daily=False)[1],
+                task_name="间隔任务",
+                checkpoint=checkpoint,
+                budget=RunBudget(),
+                priority=lambda u: user_urgency(u, daily=False),
+                concurrency=concurrency,
+            )
+        )
+        if checkpoint:
+            finish_run(checkpoint, "间隔任务")
                 
     except Exception as e:
         logger.error(f"间隔任务执行异常: {e}")
@@ -830,15 +1301,369 @@ def interval_task_runner():
         pass
 
 
+def load_users_with_retry(task_name: str):
+    """
+    初始化认证管理器并获取所有用户凭证（带重试），避免短暂网络问题导致本次任务完全跳过。
+    成功返回 (auth, user_list)，多次重试仍失败返回 None。
+    """
+    def _load():
+        try:
+            auth_local = AuthManager()
+            # 如果 Redis 未就绪，视为失败以触发重试
+            if not getattr(auth_local, "redis", None):
+                logger.error(f"Redis 未就绪，获取{task_name}用户列表失败，准备重试")
+                return None
+            # 正常情况下，0 个用户也算成功（可能本来就没配置用户）
+            return auth_local, auth_local.get_all_users_credentials()
+        except Exception as e:
+            logger.error(f"获取{task_name}用户列表时发生异常: {e}")
+            return None
+
+    return retry_with_backoff(_load, max_retries=3, delay=5, task_name=f"加载{task_name}用户列表")
+
+
+# ========== 分布式任务队列（TASK_QUEUE_MODE=producer） ==========
+def daily_task_producer():
+    """把每个用户的每日任务投递到 Redis Stream，由 task_queue.py worker 执行"""
+    from task_queue import enqueue_run
+
+    load_res = load_users_with_retry("每日任务")
+    if not load_res:
+        logger.error("多次重试后仍无法从 Redis 获取每日任务用户列表，本次投递终止")
+        return
+    _, user_list = load_res
+    if not user_list:
+        logger.info("没有待处理的用户，【每日任务】投递结束")
+        return
+    enqueue_run('daily', [('daily', user['task_key'], {}) for user in user_list])
+
+
+def interval_task_producer():
+    """
+    把每个用户的间隔任务投递到 Redis Stream。
+    VIP 领取状态在投递时确定（见 get_vip_due_state）：领取日只投递 vip，补领投递 vip + share，其余只投递 share。
+    """
+    from task_queue import enqueue_run
+
+    load_res = load_users_with_retry("间隔任务")
+    if not load_res:
+        logger.error("多次重试后仍无法从 Redis 获取间隔任务用户列表，本次投递终止")
+        return
+    _, user_list = load_res
+    if not user_list:
+        logger.info("没有待处理的用户，【间隔任务】投递结束")
+        return
+
+    jobs = []
+    for user in user_list:
+        user_uid = user.get('uid', user.get('phone'))
+        try:
+            vip_state = get_vip_due_state(user_uid)
+        except Exception as e:
+            logger.error(f"用户 {user_uid} 读取 VIP 领取状态时发生异常: {e}")
+            vip_state = None
+        if vip_state:
+            jobs.append(('vip', user['task_key'], {'vip_state': vip_state}))
+        if vip_state != 'today':
+            jobs.append(('share', user['task_key'], {}))
+    enqueue_run('interval', jobs)
+
+
+# ========== 发送窗口模式（SEND_WINDOW） ==========
+# 调度器实例（发送窗口模式下需要在运行中动态注册每个用户的执行时间）
+_scheduler = None
+
+
+def get_user_window_offset_seconds(user, window_seconds: int) -> int:
+    """
+    按用户计算在发送窗口内的固定偏移（秒）。
+    使用 task_key 做哈希：同一用户每天的执行时间不变，不同用户在窗口内均匀分散。
+    """
+    if window_seconds <= 0:
+        return 0
+    key = str(user.get('task_key') or user.get('uid') or user.get('phone'))
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return int(digest[:12], 16) % window_seconds
+
+
+class WindowDispatchRun:
+    """发送窗口模式下的一批（一天）分发：收集每个用户的结果，全部完成后按用户顺序统一推送企业微信"""
+
+    def __init__(self, auth, user_list, checkpoint):
+        self.auth = auth
+        self.user_list = user_list
+        self.checkpoint = checkpoint
+        self.daily_lines: list[list[str]] = [[] for _ in user_list]
+        self.interval_lines: list[list[str]] = [[] for _ in user_list]
+        self.pending: list[int] = []
+        for idx, user in enumerate(user_list):
+            if checkpoint.status(user.get('task_key')) == STATUS_DONE:
+                # 今日已完成（重启恢复），复用记录的结果
+                result = checkpoint.result(user.get('task_key')) or {}
+                self.daily_lines[idx] = result.get('daily') or []
+                self.interval_lines[idx] = result.get('interval') or []
+            else:
+                self.pending.append(idx)
+        self.remaining = len(self.pending)
+        self._lock = threading.Lock()
+
+    def finish_user(self, idx, daily_lines, interval_lines) -> bool:
+        """记录单个用户的结果，返回是否全部用户都已完成"""
+        self.checkpoint.mark_done(
+            self.user_list[idx].get('task_key'),
+            {'daily': daily_lines or [], 'interval': interval_lines or []},
+        )
+        with self._lock:
+            self.daily_lines[idx] = daily_lines or []
+            self.interval_lines[idx] = interval_lines or []
+            self.remaining -= 1
+            return self.remaining == 0
+
+    def send_summary(self):
+        try:
+            if WECOM_WEBHOOK_KEY:
+                from wecom_notify import send_wecom_webhook
+                daily = [line for lines in self.daily_lines for line in lines]
+                interval = [line for lines in self.interval_lines for line in lines]
+                send_wecom_webhook(
+                    WECOM_WEBHOOK_KEY,
+                    "\n".join(daily) if daily else "本次每日任务已执行，无用户结果可汇总。",
+                    title="网易音乐人日常任务",
+                )
+                send_wecom_webhook(
+                    WECOM_WEBHOOK_KEY,
+                    "\n".join(interval) if interval else "本次发送任务已执行，无用户结果可汇总。",
+                    title="网易音乐人发送任务",
+                )
+        except Exception:
+            pass
+
+
+def window_user_job(run: WindowDispatchRun, idx: int):
+    """发送窗口内单个用户的执行任务：依次执行每日任务与间隔任务"""
+    user = run.user_list[idx]
+    logger.info(f"[发送窗口] 开始处理用户 {user.get('uid') or user.get('phone')}")
+    daily_lines: list[str] = []
+    interval_lines: list[str] = []
+    run.checkpoint.mark_running(user.get('task_key'))
+    try:
+        with span("user", uid=user.get('uid') or user.get('phone'), run_id=run.checkpoint.run_id, task="发送窗口"):
+            daily_lines, interval_lines = run_user_pipeline(run.auth, user)
+    except Exception as e:
+        logger.error(f"[发送窗口] 处理用户 {user.get('uid')} 时发生异常: {e}")
+    finally:
+        if run.finish_user(idx, daily_lines, interval_lines):
+            logger.info(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 发送窗口内所有用户处理完毕")
+            run.checkpoint.finish()
+            run.send_summary()
+
+
+def window_dispatch_planner():
+    """
+    发送窗口模式：在窗口开始时加载用户，按每个用户的哈希偏移注册当天的一次性执行任务。
+    启动较晚（已进入窗口）时，偏移已过的用户立即执行。
+    """
+    (start_hour, start_minute), (end_hour, end_minute) = SEND_WINDOW
+    now = datetime.now()
+    window_start = now.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
+    window_end = now.replace(hour=end_hour, minute=end_minute, second=0, microsecond=0)
+    window_seconds = int((window_end - window_start).total_seconds())
+
+    load_res = load_users_with_retry("发送窗口")
+    if not load_res:
+        logger.error("多次重试后仍无法从 Redis 获取用户列表，本次发送窗口终止")
+        try:
+            if WECOM_WEBHOOK_KEY:
+                from wecom_notify import send_wecom_webhook
+                send_wecom_webhook(WECOM_WEBHOOK_KEY, "Redis连接失败，跳过执行", title="网易音乐人日常任务")
+        except Exception:
+            pass
+        return
+
+    auth, user_list = load_res
+    if not user_list:
+        logger.info("没有待处理的用户，【发送窗口】结束")
+        return
+
+    checkpoint = open_run('window')
+    if checkpoint.is_finished():
+        logger.info("今日发送窗口任务已全部完成，跳过本次分发")
+        return
+    checkpoint.start(user_list)
+    run = WindowDispatchRun(auth, user_list, checkpoint)
+    if not run.pending:
+        logger.info("[发送窗口] 所有用户今日均已完成")
+        checkpoint.finish()
+        return
+    if len(run.pending) < len(user_list):
+        logger.info(f"[发送窗口] {len(user_list) - len(run.pending)} 个用户今日已完成，仅为剩余 {len(run.pending)} 个用户注册执行时间")
+
+    today_str = now.strftime('%Y%m%d')
+    for idx in run.pending:
+        user = user_list[idx]
+        run_at = window_start + timedelta(seconds=get_user_window_offset_seconds(user, window_seconds))
+        if run_at < now:
+            run_at = now
+        _scheduler.add_job(
+            func=window_user_job,
+            trigger=DateTrigger(run_date=run_at),
+            args=[run, idx],
+            id=f"netease_window_user_{today_str}_{user.get('task_key')}",
+            name=f"发送窗口用户任务 {user.get('uid') or user.get('phone')}",
+            replace_existing=True,
+            misfire_grace_time=window_seconds or None,
+            jobstore='memory',  # 参数含运行时对象，无法持久化
+        )
+        logger.info(f"[发送窗口] 用户 {user.get('uid') or user.get('phone')} 今日计划执行时间：{run_at.strftime('%H:%M:%S')}")
+    logger.info(f"[发送窗口] 已为 {len(run.pending)} 个用户注册今日执行时间")
+
+
+def resume_unfinished_runs():
+    """启动时补跑当天被中断（容器重启等）的运行：只执行尚未完成的用户，已完成的用户复用记录结果"""
+    kinds = get_unfinished_runs()
+    if not kinds:
+        return
+    logger.info(f"发现当天未完成的运行：{', '.join(kinds)}，开始补跑剩余用户")
+    for kind in kinds:
+        try:
+            if kind == 'daily':
+                daily_task_runner()
+            elif kind == 'interval':
+                interval_task_runner()
+            elif kind == 'window':
+                window_dispatch_planner()
+        except Exception as e:
+            logger.error(f"补跑 {kind} 运行时发生异常: {e}")
+
+
+# 定时任务持久化到 Redis 时使用的键
+SCHEDULER_JOBS_KEY = 'netease:music:scheduler:jobs'
+SCHEDULER_RUN_TIMES_KEY = 'netease:music:scheduler:run_times'
+
+
+def build_redis_jobstore():
+    """创建 Redis 作业存储，Redis 不可用或已关闭持久化时返回 None"""
+    if SCHEDULER_JOBSTORE != 'redis':
+        return None
+    try:
+        store_conf = dict(REDIS_CONF or {})
+        # 作业以 pickle 保存，不能按字符串解码
+        store_conf['decode_responses'] = False
+        store = RedisJobStore(jobs_key=SCHEDULER_JOBS_KEY, run_times_key=SCHEDULER_RUN_TIMES_KEY, **store_conf)
+        store.redis.ping()
+        return store
+    except Exception as e:
+        logger.warning(f"Redis 作业存储不可用，定时任务仅保存在内存中（停机期间错过的执行不会补跑）：{e}")
+        return None
+
+
+def on_scheduler_event(event):
+    """记录错过执行时限、或因上一次尚未结束而被跳过的任务"""
+    if event.code == EVENT_JOB_MISSED:
+        logger.warning(
+            f"任务 {event.job_id} 错过了 {event.scheduled_run_time.strftime('%Y-%m-%d %H:%M:%S')} 的执行，"
+            f"已超过补跑时限，本次跳过"
+        )
+    elif event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.warning(f"任务 {event.job_id} 上一次执行尚未结束，跳过本次触发")
+
+
+def _missed_fire_times(trigger, since, now, limit=366):
+    """从 since 起到 now 为止触发器应触发的时间列表（最多 limit 个）"""
+    fire_times = []
+    fire_time = since
+    while fire_time and fire_time <= now and len(fire_times) < limit:
+        fire_times.append(fire_time)
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return fire_times
+
+
+def add_cron_job(scheduler, stored_jobs, func, trigger, job_id, name, misfire_grace_time):
+    """
+    注册持久化的定时任务。
+
+    Redis 中保存的下次执行时间若已错过（进程停机 / 晚启动）且仍在补跑时限内，保留最近一次错过的时间，
+    调度器启动后立即补跑一次（多次错过合并为一次）；超过时限则跳过，按触发器计算下次执行时间。
+    定时任务统一放在单线程的 serial 执行器中，长时间的每日任务不会与间隔任务重叠执行。
+
+    Returns:
+        是否需要补跑
+    """
+    kwargs = {}
+    catch_up = False
+    stored = stored_jobs.pop(job_id, None)
+    now = datetime.now(scheduler.timezone)
+    if stored and stored.next_run_time and stored.next_run_time <= now:
+        missed = _missed_fire_times(trigger, stored.next_run_time, now)
+        latest = missed[-1]
+        late_seconds = int((now - latest).total_seconds())
+        if late_seconds <= misfire_grace_time:
+            kwargs['next_run_time'] = latest
+            catch_up = True
+            logger.info(
+                f"[补跑] {name}：停机期间错过 {len(missed)} 次执行，最近一次 {latest.strftime('%Y-%m-%d %H:%M')}"
+                f"（已晚 {late_seconds // 60} 分钟），启动后立即补跑一次"
+            )
+        else:
+            logger.warning(
+                f"[补跑] {name}：停机期间错过 {len(missed)} 次执行，最近一次 {latest.strftime('%Y-%m-%d %H:%M')} "
+                f"已超过补跑时限（{misfire_grace_time // 60} 分钟），跳过"
+            )
+
+    scheduler.add_job(
+        # 以文本引用保存到作业存储，重启后按名称重新导入
+        func=f"{'main' if func.__module__ == '__main__' else func.__module__}:{func.__name__}",
+        trigger=trigger,
+        id=job_id,
+        name=name,
+        replace_existing=True,
+        misfire_grace_time=misfire_grace_time,
+        coalesce=True,
+        max_instances=1,
+        executor='serial',
+        **kwargs
+    )
+    return catch_up
+
+
 def main():
     """主函数"""
+    if SCHEDULER_MODE == 'asyncio':
+        import asyncio
+        from async_runner import main_async
+
+        try:
+            asyncio.run(main_async())
+        except (KeyboardInterrupt, SystemExit):
+            logger.info("任务调度器已停止")
+        return
+
     logger.info("网易音乐人任务调度器启动")
     
     # 从配置文件导入的SEND_TIME已经验证过，直接使用
     hour, minute = map(int, SEND_TIME.split(':'))
     
-    # 创建调度器
-    scheduler = BlockingScheduler(timezone='Asia/Shanghai')
+    # 创建调度器：定时任务保存在 Redis（可补跑停机期间错过的执行），临时任务保存在内存
+    global _scheduler
+    redis_jobstore = build_redis_jobstore()
+    scheduler = BlockingScheduler(
+        timezone='Asia/Shanghai',
+        jobstores={'default': redis_jobstore or MemoryJobStore(), 'memory': MemoryJobStore()},
+        executors={'default': SchedulerThreadPool(10), 'serial': SchedulerThreadPool(1)},
+        job_defaults={'coalesce': True, 'max_instances': 1},
+    )
+    scheduler.add_listener(on_scheduler_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    _scheduler = scheduler
+
+    # 读取上次保存的定时任务，用于计算停机期间错过的执行
+    stored_jobs = {}
+    if redis_jobstore is not None:
+        try:
+            stored_jobs = {job.id: job for job in redis_jobstore.get_all_jobs()}
+        except Exception as e:
+            logger.warning(f"读取已保存的定时任务失败，本次不做补跑检查：{e}")
+        logger.info(f"定时任务已持久化到 Redis（{SCHEDULER_JOBS_KEY}），已保存 {len(stored_jobs)} 个任务")
+    catch_up_jobs = []
     
     # 计算间隔任务的执行时间（每日任务时间 + 5分钟）
     interval_minute = minute + 5
@@ -849,27 +1674,96 @@ def main():
         if interval_hour >= 24:
             interval_hour -= 24
     
+    # 分布式模式下调度进程只负责投递，任务由 task_queue.py worker 执行
+    if TASK_QUEUE_MODE == 'producer':
+        daily_func, interval_func = daily_task_producer, interval_task_producer
+        logger.info("分布式任务队列已启用：定时触发时投递任务到 Redis Stream，请另行启动 `python task_queue.py worker`")
+    else:
+        daily_func, interval_func = daily_task_runner, interval_task_runner
+
     try:
-        # 添加每日任务 - 每天在指定时间执行
-        scheduler.add_job(
-            func=daily_task_runner,
-            trigger=CronTrigger(hour=hour, minute=minute, day_of_week='*'),
-            id='netease_daily_task',
-            name='网易云音乐每日任务',
-            replace_existing=True
-        )
-        
-        # 添加间隔任务 - 每天在指定时间检查，但只在满足间隔天数时执行
+        if SEND_WINDOW and TASK_QUEUE_MODE == 'producer':
+            logger.warning("分布式任务队列模式下不支持 SEND_WINDOW，将按 SEND_TIME 统一投递（worker 数量决定实际并发）")
+        if SEND_WINDOW and TASK_QUEUE_MODE != 'producer':
+            # 发送窗口模式：窗口开始时为每个用户注册错峰执行时间（每日任务 + 间隔任务）
+            (start_hour, start_minute), (end_hour, end_minute) = SEND_WINDOW
+            if add_cron_job(
+                scheduler, stored_jobs, window_dispatch_planner,
+                CronTrigger(hour=start_hour, minute=start_minute, day_of_week='*'),
+                'netease_window_planner', '网易音乐人发送窗口分发', SCHEDULER_DAILY_MISFIRE_GRACE,
+            ):
+                catch_up_jobs.append('发送窗口分发')
+            logger.info(
+                f"发送窗口模式已启用：每天 {start_hour:02d}:{start_minute:02d}-{end_hour:02d}:{end_minute:02d} "
+                f"内按用户固定偏移错峰执行，发布动态实际执行间隔：每 {EXECUTION_INTERVAL_DAYS} 天"
+            )
+        else:
+            # 添加每日任务 - 每天在指定时间执行
+            if add_cron_job(
+                scheduler, stored_jobs, daily_func,
+                CronTrigger(hour=hour, minute=minute, day_of_week='*'),
+                'netease_daily_task', '网易云音乐每日任务', SCHEDULER_DAILY_MISFIRE_GRACE,
+            ):
+                catch_up_jobs.append('每日任务')
+            
+            # 添加间隔任务 - 每天在指定时间检查，但只在满足间隔天数时执行
+            if add_cron_job(
+                scheduler, stored_jobs, interval_func,
+                CronTrigger(hour=interval_hour, minute=interval_minute, day_of_week='*'),  # 间隔5分钟执行，避免冲突
+                'netease_interval_task', '网易音乐人发布动态任务', SCHEDULER_INTERVAL_MISFIRE_GRACE,
+            ):
+                catch_up_jobs.append('间隔任务')
+            
+            logger.info(f"每日任务已添加，每天 {SEND_TIME} 执行")
+            logger.info(f"间隔任务已添加，每天 {interval_hour:02d}:{interval_minute:02d} 执行检查，实际执行间隔：每 {EXECUTION_INTERVAL_DAYS} 天")
+        if TASK_QUEUE_MODE != 'producer':
+            # 启动后立即检查并补跑当天中断的运行
+            scheduler.add_job(
+                func=resume_unfinished_runs,
+                trigger=DateTrigger(run_date=datetime.now()),
+                id='netease_resume_runs',
+                name='补跑当天中断的运行',
+                replace_existing=True,
+                jobstore='memory',
+                executor='serial',
+                misfire_grace_time=None,  # 可能排在补跑任务之后执行，不设时限
+            )
+
+        # 后台批量删除已到期的动态（记录在 Redis 中，包括停机前未删除的）
         scheduler.add_job(
-            func=interval_task_runner,
-            trigger=CronTrigger(hour=interval_hour, minute=interval_minute, day_of_week='*'),  # 间隔5分钟执行，避免冲突
-            id='netease_interval_task',
-            name='网易音乐人发布动态任务',
-            replace_existing=True
+            func=process_due_deletions,
+            trigger=IntervalTrigger(seconds=DYNAMIC_DELETE_POLL_SECONDS),
+            id='netease_dynamic_deleter',
+            name='延迟删除动态',
+            replace_existing=True,
+            jobstore='memory',
+            next_run_time=datetime.now(),
         )
-        
-        logger.info(f"每日任务已添加，每天 {SEND_TIME} 执行")
-        logger.info(f"间隔任务已添加，每天 {interval_hour:02d}:{interval_minute:02d} 执行检查，实际执行间隔：每 {EXECUTION_INTERVAL_DAYS} 天")
+
+        # 巡检浏览器进程：记录驱动 / Chromium 的内存与文件句柄，结束已失去父进程的残留进程（启动时先清理上次运行遗留的）
+        if PLAYWRIGHT_SUPERVISOR_SECONDS > 0:
+            from playwright_handle.supervisor import supervise
+            scheduler.add_job(
+                func=supervise,
+                trigger=IntervalTrigger(seconds=PLAYWRIGHT_SUPERVISOR_SECONDS),
+                id='netease_browser_supervisor',
+                name='巡检浏览器进程',
+                replace_existing=True,
+                jobstore='memory',
+                next_run_time=datetime.now(),
+            )
+
+        # 移除切换模式后不再使用的已保存任务（如关闭 SEND_WINDOW 后的窗口分发任务）
+        for job_id, job in stored_jobs.items():
+            try:
+                redis_jobstore.remove_job(job_id)
+                logger.info(f"已移除不再使用的定时任务：{job.name}（{job_id}）")
+            except Exception as e:
+                logger.warning(f"移除定时任务 {job_id} 失败：{e}")
+        if catch_up_jobs:
+            logger.info(f"启动补跑检查：{', '.join(catch_up_jobs)} 将在启动后立即补跑")
+        elif redis_jobstore is not None:
+            logger.info("启动补跑检查：没有需要补跑的定时任务")
         logger.info("任务调度器已启动，按 Ctrl+C 停止")
         
         # 启动调度器
@@ -878,10 +1772,17 @@ def main():
     except KeyboardInterrupt:
         logger.info("接收到停止信号，正在关闭调度器...")
         scheduler.shutdown()
+        try:
+            from playwright_handle.worker_pool import shutdown_worker_pool
+            shutdown_worker_pool()
+        except Exception:
+            pass
         logger.info("调度器已关闭")
     except Exception as e:
         logger.error(f"调度器启动失败: {e}")
 
 
 if __name__ == '__main__':
+    # 作业存储中的任务以 "main:函数名" 引用，确保重新导入时拿到的是当前模块而不是再加载一份
+    sys.modules.setdefault('main', sys.modules[__name__])
     main()
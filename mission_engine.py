@@ -0,0 +1,195 @@
+"""
+音乐人任务奖励领取。
+
+读取 cycle/list 返回的完整任务列表，找出所有可领取奖励的任务，在限速器控制下并发调用 reward/obtain：
+
+- 签到任务（description 含「签到」）领取本身即完成任务，每次都尝试领取（与原先只领签到的行为一致）；
+  列表中没有签到任务时视为已签到
+- 其他任务只在 status 属于 MISSION_CLAIMABLE_STATUSES 时领取：cycle/list 各 status 取值的含义没有公开文档，
+  默认为空（只领签到），确认「已完成未领取」对应的取值后再配置
+- 并发数 MISSION_REWARD_CONCURRENCY，所有用户共用一个令牌桶（MISSION_REWARD_RATE 次/秒，突发 MISSION_REWARD_BURST），
+  多领几个任务不再线性增加耗时，也不会因为并发用户多而放大请求频率
+- 每个任务记录耗时与结果，汇总到企业微信
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import logger
+from config import (
+    MISSION_CLAIMABLE_STATUSES, MISSION_REWARD_CONCURRENCY, MISSION_REWARD_RATE, MISSION_REWARD_BURST,
+)
+
+# 列表中没有签到任务时的签到结果（原先也视为成功：可能已经签到过了）
+NO_CHECKIN_RESULT = {"message": "任务列表中没有签到任务，可能今日已签到"}
+
+
+class RateLimiter:
+    """线程安全的令牌桶；acquire 阻塞等待，acquire_async 在协程中等待。"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """预占一个令牌，返回需要等待的秒数（令牌不足时记为欠账，后来者依次顺延）。"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# 进程内所有用户共用
+reward_limiter = RateLimiter(MISSION_REWARD_RATE, MISSION_REWARD_BURST)
+
+
+def _is_checkin(mission: dict) -> bool:
+    return "签到" in (mission.get('description') or '')
+
+
+def _mission_list(missions_res: dict) -> list[dict]:
+    return (missions_res.get('data') or {}).get('list') or []
+
+
+def find_claimable_missions(missions_res: dict) -> tuple[list[dict], list[dict]]:
+    """返回 (可领取且参数完整的任务, 可领取但缺少 userMissionId/period 的任务)"""
+    claimable, missing = [], []
+    for mission in _mission_list(missions_res):
+        if not _is_checkin(mission) and mission.get('status') not in MISSION_CLAIMABLE_STATUSES:
+            continue
+        if mission.get('userMissionId') and mission.get('period'):
+            claimable.append(mission)
+        else:
+            logger.warning(
+                f"任务 {mission.get('description')} 缺少必要参数：userMissionId={mission.get('userMissionId')}, "
+                f"period={mission.get('period')}\nmission={mission}"
+            )
+            missing.append(mission)
+    return claimable, missing
+
+
+class MissionClaimReport:
+    """一次领取的结果：每个任务的耗时与返回，以及签到任务的结果（兼容原有汇总行）。"""
+
+    def __init__(self, missions_res: dict, outcomes: list[dict], missing: list[dict], elapsed_ms: int):
+        self.outcomes = outcomes
+        self.missing = missing
+        self.elapsed_ms = elapsed_ms
+        self.checkin_result = None
+        for outcome in outcomes:
+            if _is_checkin(outcome):
+                self.checkin_result = outcome['result']
+        if self.checkin_result is None and not any(_is_checkin(m) for m in _mission_list(missions_res)):
+            self.checkin_result = NO_CHECKIN_RESULT
+
+    @property
+    def success_count(self) -> int:
+        return sum(1 for o in self.outcomes if o['ok'])
+
+    @property
+    def completed(self) -> bool:
+        """签到任务已领取（或列表中没有签到任务），且可领取的任务全部领取成功"""
+        return self.checkin_result is not None and not self.missing and all(o['ok'] for o in self.outcomes)
+
+    def summary_lines(self) -> list[str]:
+        if not self.outcomes:
+            return []
+        lines = [f"音乐人任务奖励：领取 {len(self.outcomes)} 个，成功 {self.success_count} 个，耗时 {self.elapsed_ms}ms"]
+        for o in self.outcomes:
+            state = "成功" if o['ok'] else f"失败（code={o['code']}）"
+            lines.append(f"  - {o['description']}：{state}，{o['latency_ms']}ms")
+        return lines
+
+
+def _outcome(mission: dict, res, started: float) -> dict:
+    res = res if isinstance(res, dict) else {"code": -1, "msg": str(res)}
+    outcome = {
+        "description": mission.get('description'),
+        "userMissionId": mission.get('userMissionId'),
+        "period": mission.get('period'),
+        "ok": res.get('code') == 200,
+        "code": res.get('code'),
+        "latency_ms": int((time.monotonic() - started) * 1000),
+        "result": res,
+    }
+    logger.info(
+        f"{outcome['description']}结果（{outcome['latency_ms']}ms）：{json.dumps(res, ensure_ascii=False)[:100]}"
+    )
+    return outcome
+
+
+def _log_report(report: MissionClaimReport):
+    if report.outcomes:
+        logger.info(
+            f"音乐人任务奖励领取完成：{report.success_count}/{len(report.outcomes)} 成功，耗时 {report.elapsed_ms}ms"
+        )
+    else:
+        logger.info("没有可领取奖励的音乐人任务")
+
+
+def claim_mission_rewards(task, missions_res: dict) -> MissionClaimReport:
+    """并发领取所有可领取的任务奖励（task 为 TaskManager）。"""
+    claimable, missing = find_claimable_missions(missions_res)
+    started = time.monotonic()
+
+    def _claim(mission):
+        reward_limiter.acquire()
+        t0 = time.monotonic()
+        try:
+            res = task.reward_obtain(mission['userMissionId'], mission['period'])
+        except Exception as e:
+            res = {"code": -1, "msg": str(e)}
+        return _outcome(mission, res, t0)
+
+    outcomes: list[dict] = []
+    if claimable:
+        logger.info(f"发现 {len(claimable)} 个可领取奖励的任务：{[m.get('description') for m in claimable]}")
+        with ThreadPoolExecutor(max_workers=min(len(claimable), MISSION_REWARD_CONCURRENCY)) as pool:
+            outcomes = list(pool.map(_claim, claimable))
+    report = MissionClaimReport(missions_res, outcomes, missing, int((time.monotonic() - started) * 1000))
+    _log_report(report)
+    return report
+
+
+async def claim_mission_rewards_async(task, missions_res: dict) -> MissionClaimReport:
+    """claim_mission_rewards 的协程版本（task 为 AsyncTaskManager）。"""
+    claimable, missing = find_claimable_missions(missions_res)
+    started = time.monotonic()
+    slots = asyncio.Semaphore(MISSION_REWARD_CONCURRENCY)
+
+    async def _claim(mission):
+        async with slots:
+            await reward_limiter.acquire_async()
+            t0 = time.monotonic()
+            try:
+                res = await task.reward_obtain(mission['userMissionId'], mission['period'])
+            except Exception as e:
+                res = {"code": -1, "msg": str(e)}
+            return _outcome(mission, res, t0)
+
+    if claimable:
+        logger.info(f"发现 {len(claimable)} 个可领取奖励的任务：{[m.get('description') for m in claimable]}")
+    outcomes = list(await asyncio.gather(*(_claim(m) for m in claimable)))
+    report = MissionClaimReport(missions_res, outcomes, missing, int((time.monotonic() - started) * 1000))
+    _log_report(report)
+    return report
@@ -0,0 +1,371 @@
+"""
+所有浏览器上下文共用的静态资源缓存。
+
+常驻 Chromium 上的 new_context 没有磁盘缓存，持久化 profile 则每个手机号各存一份，
+music.163.com 的同一批 JS/CSS 每个账号都要重新下载一遍。这里在 context.route 中（见 routing）接管这些请求：
+
+- 按 URL 建索引（index/<sha1(url)>.json，记录 ETag / Last-Modified / 响应头 / 内容摘要），内容按 sha256 存放
+  （blobs/<sha256>），不同 URL 的相同内容只存一份
+- 在 Cache-Control max-age 内直接返回缓存；过期后带 If-None-Match / If-Modified-Since 重新验证，304 时仍返回缓存
+- 缓存在多个账号间共用：Cache-Control 为 no-store / private 或 Vary 含 Cookie 的响应不保存
+- 总大小超过 PLAYWRIGHT_ASSET_CACHE_MB 时按最近访问时间（索引文件的 mtime）淘汰，再删除不再被引用的内容；
+  总大小在进程内累计，只在首次写入与淘汰时遍历一次目录
+- 路由处理在事件循环上执行，读写文件放到线程中
+- 多个 worker 进程共用同一目录：写入先写临时文件再替换，读取时文件已被淘汰按未命中处理
+
+查看缓存与清理各 profile 中 Chromium 自带的磁盘缓存（在项目根目录执行）：
+    python playwright_handle/asset_cache.py stats
+    python playwright_handle/asset_cache.py clear
+    python playwright_handle/asset_cache.py prune-profiles
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 单独执行本文件时须先把项目根目录加入 path，否则找不到 core
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from core import logger
+from config import (
+    PLAYWRIGHT_ASSET_CACHE_DIR, PLAYWRIGHT_ASSET_CACHE_MB, PLAYWRIGHT_ASSET_CACHE_TYPES, PLAYWRIGHT_PROFILE_BASEDIR,
+)
+
+# 保存并在返回缓存时带上的响应头
+STORED_HEADERS = (
+    "content-type", "cache-control", "etag", "last-modified", "expires", "access-control-allow-origin", "timing-allow-origin",
+)
+# max-age 再长也最多直接使用这么久，之后重新验证
+MAX_FRESH_SECONDS = 7 * 86400
+# 淘汰时清理到容量上限的这个比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+# Chromium profile 中可以安全删除的缓存目录
+PROFILE_CACHE_DIRS = ("Cache", "Code Cache", "GPUCache", "Service Worker/CacheStorage")
+
+HIT = "hit"
+REVALIDATED = "revalidated"
+MISS = "miss"
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def shareable(headers: dict) -> bool:
+    """响应能否在不同账号之间共用"""
+    cache_control = (headers.get("cache-control") or "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    vary = (headers.get("vary") or "").lower()
+    return "cookie" not in vary and "*" not in vary
+
+
+def fresh_seconds(headers: dict) -> int:
+    """按 Cache-Control 计算可直接使用的秒数；no-cache / no-store 或没有 max-age 时为 0（每次重新验证）"""
+    cache_control = (headers.get("cache-control") or "").lower()
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    return min(int(match.group(1)), MAX_FRESH_SECONDS) if match else 0
+
+
+class AssetCache:
+    """磁盘上的共享静态资源缓存，可被多个进程同时使用。"""
+
+    def __init__(self, root: str, max_bytes: int, resource_types=PLAYWRIGHT_ASSET_CACHE_TYPES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.resource_types = tuple(resource_types)
+        self.index_dir = os.path.join(root, "index")
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # 内容目录的总字节数：首次写入时统计一次，之后随写入 / 淘汰累计（其他进程的写入在下次淘汰时计入）
+        self._bytes: int | None = None
+
+    # ---------- 索引与内容 ----------
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def lookup(self, url: str) -> tuple[dict, bytes] | None:
+        """返回 (索引记录, 内容)，并刷新访问时间；没有或内容已被淘汰时返回 None"""
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("url") != url:
+                return None
+            with open(self._blob_path(entry["sha256"]), "rb") as f:
+                body = f.read()
+            os.utime(index_path)
+            return entry, body
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store(self, url: str, headers: dict, body: bytes) -> dict | None:
+        """保存响应；不能跨账号共用、没有验证信息（ETag / Last-Modified / max-age）或单个内容过大时不保存"""
+        if not shareable(headers):
+            return None
+        if not (headers.get("etag") or headers.get("last-modified") or fresh_seconds(headers)):
+            return None
+        if len(body) > self.max_bytes // 10:
+            return None
+        digest = hashlib.sha256(body).hexdigest()
+        entry = {
+            "url": url,
+            "sha256": digest,
+            "size": len(body),
+            "headers": {k: headers[k] for k in STORED_HEADERS if headers.get(k)},
+            "stored_at": time.time(),
+        }
+        added = 0
+        try:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                _atomic_write(blob_path, body)
+                added = len(body)
+            _atomic_write(self._index_path(url), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"[静态资源缓存] 写入 {url} 失败：{e}")
+            return None
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self.size()
+            else:
+                self._bytes += added
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+        return entry
+
+    def refresh(self, url: str, entry: dict, headers: dict):
+        """304 后更新验证时间与新的缓存头"""
+        entry = dict(entry, stored_at=time.time())
+        entry["headers"] = dict(entry.get("headers") or {})
+        entry["headers"].update({k: headers[k] for k in STORED_HEADERS if k != "content-type" and headers.get(k)})
+        try:
+            _atomic_write(self._index_path(url), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"[静态资源缓存] 更新 {url} 失败：{e}")
+
+    def _entries(self) -> list[tuple[float, str, dict]]:
+        """(访问时间, 索引文件, 记录)，损坏的索引直接删除"""
+        entries = []
+        for name in os.listdir(self.index_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.index_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries.append((os.path.getmtime(path), path, json.load(f)))
+            except ValueError:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                pass
+        return entries
+
+    def size(self) -> int:
+        """遍历内容目录得到的实际大小（包括其他进程写入的内容）"""
+        return _dir_size(self.blob_dir)
+
+    def evict(self):
+        """超过容量上限时按最近访问时间淘汰索引，再删除不再被引用的内容"""
+        with self._lock:
+            total = self._bytes = self.size()
+            if total <= self.max_bytes:
+                return
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            entries = sorted(self._entries(), key=lambda item: item[0])
+            referenced: dict[str, int] = {}
+            for _, _, entry in entries:
+                referenced[entry.get("sha256")] = referenced.get(entry.get("sha256"), 0) + 1
+            removed = 0
+            for _, path, entry in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed += 1
+                digest = entry.get("sha256")
+                referenced[digest] -= 1
+                if referenced[digest] == 0:
+                    try:
+                        total -= os.path.getsize(self._blob_path(digest))
+                        os.remove(self._blob_path(digest))
+                    except OSError:
+                        pass
+            # 索引被覆盖（同一 URL 内容变化）后留下的旧内容
+            for name in os.listdir(self.blob_dir):
+                if referenced.get(name, 0) <= 0 and not name.endswith(".tmp"):
+                    try:
+                        total -= os.path.getsize(self._blob_path(name))
+                        os.remove(self._blob_path(name))
+                    except OSError:
+                        pass
+            self._bytes = total
+            logger.info(f"[静态资源缓存] 淘汰 {removed} 条记录，当前 {total / 1024 / 1024:.1f}MB")
+
+    def clear(self):
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+        shutil.rmtree(self.blob_dir, ignore_errors=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        with self._lock:
+            self._bytes = 0
+
+    # ---------- 路由 ----------
+
+    def handles(self, request) -> bool:
+        from playwright_handle.routing import host_allowed
+
+        if request.method != "GET" or request.resource_type not in self.resource_types:
+            return False
+        parts = urlsplit(request.url)
+        return parts.scheme in ("http", "https") and host_allowed(parts.hostname)
+
+    async def serve(self, route) -> tuple[str, int]:
+        """
+        处理一个请求，返回 (HIT / REVALIDATED / MISS, 由缓存返回、未经网络下载的字节数)；
+        网络请求失败时异常向上抛出。
+        """
+        request = route.request
+        url = request.url
+        cached = await asyncio.to_thread(self.lookup, url)
+        if cached:
+            entry, body = cached
+            headers = entry.get("headers") or {}
+            if time.time() - entry.get("stored_at", 0) < fresh_seconds(headers):
+                await route.fulfill(status=200, headers=headers, body=body)
+                return HIT, len(body)
+            conditional = dict(request.headers)
+            if headers.get("etag"):
+                conditional["if-none-match"] = headers["etag"]
+            if headers.get("last-modified"):
+                conditional["if-modified-since"] = headers["last-modified"]
+            response = await route.fetch(headers=conditional)
+            if response.status == 304:
+                await asyncio.to_thread(self.refresh, url, entry, response.headers)
+                await route.fulfill(status=200, headers=headers, body=body)
+                return REVALIDATED, len(body)
+        else:
+            response = await route.fetch()
+        if response.status == 200:
+            body = await response.body()
+            entry = await asyncio.to_thread(self.store, url, response.headers, body)
+            if entry:
+                await route.fulfill(status=200, headers=entry["headers"], body=body)
+                return MISS, 0
+        await route.fulfill(response=response)
+        return MISS, 0
+
+
+_cache: AssetCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache() -> AssetCache | None:
+    """当前进程共用的缓存；PLAYWRIGHT_ASSET_CACHE_MB=0 或目录不可用时返回 None"""
+    global _cache
+    if not PLAYWRIGHT_ASSET_CACHE_MB:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = AssetCache(_cache_root(), PLAYWRIGHT_ASSET_CACHE_MB * 1024 * 1024)
+            except OSError as e:
+                logger.warning(f"[静态资源缓存] 缓存目录 {PLAYWRIGHT_ASSET_CACHE_DIR} 不可用，不使用缓存：{e}")
+                return None
+        return _cache
+
+
+def _cache_root() -> str:
+    return PLAYWRIGHT_ASSET_CACHE_DIR if os.path.isabs(PLAYWRIGHT_ASSET_CACHE_DIR) else os.path.join(
+        _PROJECT_ROOT, PLAYWRIGHT_ASSET_CACHE_DIR,
+    )
+
+
+def prune_profile_caches(base_dir: str = PLAYWRIGHT_PROFILE_BASEDIR) -> int:
+    """删除各 profile 中 Chromium 自带的磁盘缓存（不影响 Cookie 与 localStorage），返回释放的字节数"""
+    if not os.path.isabs(base_dir):
+        base_dir = os.path.join(_PROJECT_ROOT, base_dir)
+    freed = 0
+    for root, _, _ in os.walk(base_dir):
+        if os.path.basename(root) != "Default":
+            continue
+        for name in PROFILE_CACHE_DIRS:
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                freed += _dir_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+    return freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="浏览器共享静态资源缓存")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="查看缓存条目数与占用空间")
+    sub.add_parser("clear", help="清空缓存")
+    sub.add_parser("prune-profiles", help="删除各 profile 中 Chromium 自带的磁盘缓存")
+
+    args = parser.parse_args()
+    if args.command == "prune-profiles":
+        print(f"已释放 {prune_profile_caches() / 1024 / 1024:.1f}MB")
+        return
+    cache = AssetCache(_cache_root(), PLAYWRIGHT_ASSET_CACHE_MB * 1024 * 1024)
+    if args.command == "clear":
+        cache.clear()
+        print(f"已清空 {cache.root}")
+    else:
+        entries = cache._entries()
+        print(f"目录：{cache.root}")
+        print(f"条目：{len(entries)}，内容：{len(os.listdir(cache.blob_dir))} 个")
+        print(f"占用：{cache.size() / 1024 / 1024:.1f}MB / {PLAYWRIGHT_ASSET_CACHE_MB}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+同一用户的多个浏览器步骤共用一次 Chromium 启动。
+
+- user_context / inject_cookie_str：各模块共用的浏览器上下文与 Cookie 注入
+  （PLAYWRIGHT_BROWSER_POOL 时使用常驻 Chromium 的轻量上下文，见 browser_pool）
+- run_user_browser_stages_async：在同一个浏览器上下文中依次执行当天需要的步骤
+  （音乐人任务列表 → VIP 领取 → 发布笔记并删除），每个用户只启动一次浏览器、只注入一次 Cookie；
+  run_user_browser_stages 为其同步版本（见 browser_pool.run_sync）
+"""
+
+from __future__ import annotations
+
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from playwright.async_api import BrowserContext, async_playwright
+
+from core import logger
+from config import PLAYWRIGHT_ASSET_CACHE_MB, PLAYWRIGHT_BLOCK_RESOURCES, PLAYWRIGHT_BROWSER_POOL
+from tracing import SPAN_COOKIE_HARVEST, SPAN_LAUNCH, capture_playwright_trace, span
+
+STEALTH_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+STEALTH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+]
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => false });
+    delete window.cdc_asyncScript;
+    delete window.cdc_file;
+    Object.defineProperty(navigator, 'languages', { get: () => ['zh-CN', 'zh', 'en'] });
+    window.chrome = { runtime: {} };
+"""
+
+# 可在同一上下文中执行的步骤，按此顺序执行
+BROWSER_STAGES = ("missions", "vip", "share")
+
+
+async def launch_user_context(p, profile_dir: str, *, stealth: bool = True, headless: bool = True) -> BrowserContext:
+    """
+    启动指定 profile 的持久化浏览器上下文；stealth=True 时附带反检测配置（保守版本）。
+    启用共享静态资源缓存时关闭 profile 自带的磁盘缓存，JS/CSS 不再在每个账号的 profile 中各存一份。
+    """
+    options = {
+        "user_data_dir": profile_dir,
+        "headless": headless,
+        "viewport": {"width": 1280, "height": 800},
+    }
+    args = list(STEALTH_ARGS) if stealth else []
+    if PLAYWRIGHT_ASSET_CACHE_MB:
+        args.append("--disk-cache-size=1")
+    if stealth:
+        options.update(
+            user_agent=STEALTH_USER_AGENT,
+            locale="zh-CN",
+            timezone_id="Asia/Shanghai",
+        )
+    if args:
+        options["args"] = args
+    context = await p.chromium.launch_persistent_context(**options)
+    if stealth:
+        await context.add_init_script(STEALTH_INIT_SCRIPT)
+    return context
+
+
+@asynccontextmanager
+async def user_context(
+    profile_dir: str,
+    *,
+    stealth: bool = True,
+    headless: bool = True,
+    session_key=None,
+    overwrite_session: bool = False,
+    block_resources: bool = True,
+    asset_cache: bool = True,
+):
+    """
+    打开该用户的浏览器上下文，退出时关闭：
+    PLAYWRIGHT_BROWSER_POOL 时为常驻 Chromium 上的 new_context（登录态来自 Redis 中以 session_key（手机号）保存的
+    storage_state，见 session_store），否则为 profile_dir 下的持久化 profile。
+    overwrite_session：登录时传 True，写回时不检查登录态是否已被其他任务更新。
+    block_resources：PLAYWRIGHT_BLOCK_RESOURCES 开启时拦截图片、字体、第三方统计等请求（见 routing），登录页传 False。
+    asset_cache：JS/CSS 经由所有上下文共用的静态资源缓存返回（见 asset_cache，PLAYWRIGHT_ASSET_CACHE_MB=0 时关闭）。
+    启动记为 launch span；PLAYWRIGHT_TRACE_ON_SLOW 时录制 Playwright trace（见 tracing.capture_playwright_trace）。
+    """
+    async with AsyncExitStack() as stack:
+        with span(SPAN_LAUNCH, pooled=PLAYWRIGHT_BROWSER_POOL, headless=headless):
+            if PLAYWRIGHT_BROWSER_POOL:
+                from playwright_handle.browser_pool import pooled_context
+
+                context = await stack.enter_async_context(pooled_context(
+                    profile_dir, stealth=stealth, headless=headless, session_key=session_key, overwrite=overwrite_session,
+                ))
+            else:
+                p = await stack.enter_async_context(async_playwright())
+                context = await launch_user_context(p, profile_dir, stealth=stealth, headless=headless)
+                stack.push_async_callback(context.close)
+        # trace 须在上下文关闭前停止
+        async with capture_playwright_trace(context), _route_policy(context, block_resources, asset_cache):
+            yield context
+
+
+@asynccontextmanager
+async def _route_policy(context: BrowserContext, block_resources: bool, asset_cache: bool):
+    block = block_resources and PLAYWRIGHT_BLOCK_RESOURCES
+    cache = None
+    if asset_cache:
+        from playwright_handle.asset_cache import get_asset_cache
+
+        cache = get_asset_cache()
+    if not block and cache is None:
+        yield
+        return
+    from playwright_handle.routing import install_route_policy
+
+    stats = await install_route_policy(context, block=block, asset_cache=cache)
+    try:
+        yield
+    finally:
+        logger.debug(f"请求拦截：{stats.summary()}")
+
+
+def cookie_str_to_playwright_cookies(cookie_str: str) -> list[dict]:
+    """
+    将 "k=v; k2=v2" 转成 Playwright 可 add_cookies 的结构。
+    注：只用于 music.163.com 域下的简单 Cookie 注入。
+    """
+    cookies: list[dict] = []
+    if not cookie_str:
+        return cookies
+    for item in cookie_str.split(";"):
+        item = item.strip()
+        if "=" not in item:
+            continue
+        k, v = item.split("=", 1)
+        k = k.strip()
+        if not k:
+            continue
+        cookies.append({"name": k, "value": v, "domain": ".music.163.com", "path": "/"})
+    return cookies
+
+
+def cookies_to_cookie_str(cookies: list[dict]) -> str:
+    """将 Playwright cookies 转为 requests/NeteaseClient 使用的 cookie_str。"""
+    return "; ".join(
+        f"{c.get('name')}={c.get('value')}" for c in cookies if c.get("name") and c.get("value") is not None
+    )
+
+
+async def inject_cookie_str(context: BrowserContext, cookie_str: str | None) -> None:
+    """把 cookie_str 注入浏览器上下文（如果有），避免打开页面后是未登录态。"""
+    if not cookie_str:
+        return
+    try:
+        pw_cookies = cookie_str_to_playwright_cookies(cookie_str)
+        if pw_cookies:
+            await context.add_cookies(pw_cookies)
+            logger.info(f"已注入 Cookie 到浏览器（{len(pw_cookies)} 条）")
+    except Exception as e:
+        logger.warning(f"注入 Cookie 失败：{e}")
+
+
+def run_user_browser_stages(*args, **kwargs) -> dict:
+    """run_user_browser_stages_async 的同步版本（worker 进程 / 调度线程中调用），参数与返回值相同"""
+    from playwright_handle.browser_pool import run_sync
+
+    return run_sync(run_user_browser_stages_async(*args, **kwargs))
+
+
+async def run_user_browser_stages_async(
+    profile_dir: str,
+    stages: list[str],
+    *,
+    cookie_str: str | None = None,
+    phone: str | None = None,
+    password: str | None = None,
+    share_msg: str | None = None,
+    search_keyword: str = "你好",
+    timeout_ms: int = 30000,
+    vip_further_get_time_callback=None,
+    uid=None,
+    login_verify_timeout: int = 120,
+) -> dict:
+    """
+    在同一个浏览器上下文中依次执行一个用户当天需要的浏览器步骤。
+
+    stages 可选（按 BROWSER_STAGES 顺序执行）：
+    - 'missions'：打开音乐人后台获取循环任务列表（音乐人签到用），结果为接口 JSON；同一次页面加载中顺带刷新 VIP 状态
+    - 'vip'：打开音乐人首页领取 VIP，结果为 furtherVipGetTime（ms）或 None
+    - 'share'：发布笔记（配音乐），动态交给延迟删除队列（uid 见 share_note_in_context），结果为 (成功标志, 最新Cookie字符串)
+
+    某一步未登录（任务列表非 200 / VIP 未解析到时间 / 发布失败）且提供了账号密码时，
+    关闭浏览器执行一次 Playwright 登录，再用新 Cookie 继续剩余步骤（整个流程最多登录一次）。
+    某一步抛出异常时结果中不包含该步，由调用方回退到单独执行。
+    timeout_ms 为每一步等待页面 / 接口响应的超时，login_verify_timeout 为登录二次验证的最长等待（秒）。
+
+    返回：{步骤名: 结果, "cookie_str": 最新 Cookie, "launches": 打开浏览器上下文的次数}
+    """
+    from playwright_handle.friend import share_note_in_context
+    from playwright_handle.musician import fetch_cycle_missions_in_context, open_vip_right_page_in_context
+
+    async def _run_stage(context, stage):
+        if stage == "missions":
+            res = await fetch_cycle_missions_in_context(
+                context, timeout_ms=timeout_ms, vip_further_get_time_callback=vip_further_get_time_callback,
+            )
+            return res, isinstance(res, dict) and res.get("code") == 200
+        if stage == "vip":
+            res = await open_vip_right_page_in_context(
+                context, timeout_ms=timeout_ms, vip_further_get_time_callback=vip_further_get_time_callback
+            )
+            return res, res is not None
+        res = await share_note_in_context(
+            context, share_msg or "", search_keyword,
+            vip_further_get_time_callback=vip_further_get_time_callback, uid=uid,
+        )
+        return res, bool(res and res[0])
+
+    results: dict = {"launches": 0}
+    pending = [s for s in BROWSER_STAGES if s in stages]
+    current_cookie = cookie_str
+    relogged = False
+
+    while pending:
+        need_login = False
+        async with user_context(profile_dir, session_key=phone) as context:
+            results["launches"] += 1
+            await inject_cookie_str(context, current_cookie)
+            while pending:
+                stage = pending[0]
+                try:
+                    with span("stage", stage=stage) as stage_span:
+                        res, ok = await _run_stage(context, stage)
+                        if not ok:
+                            stage_span.fail("未登录或未取得结果", outcome="not_ok")
+                except Exception as e:
+                    logger.warning(f"浏览器步骤 {stage} 执行异常：{e}")
+                    pending.pop(0)
+                    continue
+                if not ok and not relogged and phone and password:
+                    need_login = True
+                    break
+                results[stage] = res
+                pending.pop(0)
+            try:
+                with span(SPAN_COOKIE_HARVEST):
+                    results["cookie_str"] = cookies_to_cookie_str(await context.cookies("https://music.163.com"))
+            except Exception:
+                pass
+
+        if need_login:
+            relogged = True
+            logger.info(f"浏览器步骤 {pending[0]} 未成功，疑似未登录，执行 Playwright 登录刷新浏览器态后继续...")
+            from playwright_handle.login import browser_login_async
+
+            try:
+                current_cookie = await browser_login_async(
+                    phone, password, profile_dir=profile_dir, verify_timeout=login_verify_timeout
+                )
+            except Exception as e:
+                logger.error(f"Playwright 登录失败，剩余浏览器步骤 {pending} 交由调用方单独执行：{e}")
+                break
+
+    logger.info(f"浏览器步骤 {list(stages)} 执行完毕，共打开浏览器上下文 {results['launches']} 次")
+    return results
@@ -0,0 +1,335 @@
+"""
+常驻 Chromium 与按用户 / 任务创建的轻量浏览器上下文。
+
+原先每个浏览器操作都用 launch_persistent_context 从头启动 Chromium 并加载整个 profile 目录，
+启动加 profile 加载每次要数秒、占用数百 MB。启用 PLAYWRIGHT_BROWSER_POOL 后：
+
+- 每个 worker 进程保留一个常驻的 Chromium（进程数即常驻浏览器数），worker 按 PLAYWRIGHT_WORKER_MAX_TASKS 重启时随之回收；
+  每关闭一个上下文记录一次驱动与 Chromium 的 RSS / 文件句柄（见 supervisor），创建满 PLAYWRIGHT_BROWSER_MAX_CONTEXTS 个上下文
+  或 RSS 超过 PLAYWRIGHT_BROWSER_MAX_RSS_MB 时连同驱动一起重启
+- 每个用户 / 任务只调用 browser.new_context(storage_state=...) 创建上下文，用完即关，建立上下文只需几十毫秒
+- 登录态保存在 Redis（见 session_store，按手机号区分），任意 worker 都能重建；未提供 session_key 或 Redis 不可用时
+  退回 profile 目录下的 storage_state.json。上下文正常结束时写回
+
+浏览器流程都基于 playwright.async_api，Playwright 对象只能在创建它的事件循环中使用：
+
+- 同步入口（worker 进程、调度线程调用的 share_note_and_delete 等）经 run_sync 执行：worker 进程中使用常驻的事件循环，
+  常驻 Chromium 在各任务之间保留；其他线程每次新建事件循环，用完即关，因此按次启动浏览器
+- asyncio 调度（见 async_runner）在自己的事件循环上调用 enable_resident_browser 后，多个用户的上下文并发共用同一个 Chromium
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from playwright.async_api import Browser, BrowserContext, async_playwright
+
+import session_store
+from core import logger
+from config import PLAYWRIGHT_BROWSER_MAX_CONTEXTS, PLAYWRIGHT_BROWSER_MAX_RSS_MB
+
+STORAGE_STATE_FILE = "storage_state.json"
+CONTEXT_VIEWPORT = {"width": 1280, "height": 800}
+
+
+def storage_state_path(profile_dir: str) -> str:
+    return os.path.join(profile_dir, STORAGE_STATE_FILE)
+
+
+def _context_options(stealth: bool) -> dict:
+    from playwright_handle.browser import STEALTH_USER_AGENT
+
+    options: dict = {"viewport": CONTEXT_VIEWPORT}
+    if stealth:
+        options.update(user_agent=STEALTH_USER_AGENT, locale="zh-CN", timezone_id="Asia/Shanghai")
+    return options
+
+
+def _load_storage_state(profile_dir: str, session_key) -> tuple[dict | str | None, int | None]:
+    """返回 (storage_state, Redis 中的 version)；Redis 中没有时用本地文件（旧数据迁移到 Redis 也走这里）"""
+    loaded = session_store.load_state(session_key)
+    if loaded:
+        return loaded
+    state_path = storage_state_path(profile_dir)
+    return (state_path if os.path.exists(state_path) else None), 0
+
+
+def _write_storage_state(state: dict, profile_dir: str, session_key, version: int | None):
+    """写回登录态：优先 Redis；Redis 不可用或没有 session_key 时写本地文件（先写临时文件再替换）"""
+    if session_store.save_state(session_key, state, version):
+        return
+    state_path = storage_state_path(profile_dir)
+    tmp_path = f"{state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+    except Exception as e:
+        logger.warning(f"保存浏览器登录态到 {state_path} 失败：{e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+async def _save_storage_state(context: BrowserContext, profile_dir: str, session_key, version: int | None):
+    try:
+        state = await context.storage_state()
+    except Exception as e:
+        logger.warning(f"读取浏览器登录态失败：{e}")
+        return
+    # Redis / 文件写入放到线程中，不阻塞同一事件循环上的其他上下文
+    await asyncio.to_thread(_write_storage_state, state, profile_dir, session_key, version)
+
+
+@asynccontextmanager
+async def _new_context(browser: Browser, profile_dir: str, stealth: bool, session_key=None, overwrite: bool = False):
+    """
+    在 browser 上为该用户创建上下文；正常结束时写回 storage_state，异常退出时不覆盖已有的登录态。
+    overwrite=True（登录）时无论期间是否被其他任务更新都写回。
+    """
+    from playwright_handle.browser import STEALTH_INIT_SCRIPT
+
+    started = time.monotonic()
+    options = _context_options(stealth)
+    state, version = await asyncio.to_thread(_load_storage_state, profile_dir, session_key)
+    if state:
+        options["storage_state"] = state
+    context = await browser.new_context(**options)
+    try:
+        if stealth:
+            await context.add_init_script(STEALTH_INIT_SCRIPT)
+        logger.info(f"已创建浏览器上下文（{int((time.monotonic() - started) * 1000)}ms）：{session_key or profile_dir}")
+        yield context
+        await _save_storage_state(context, profile_dir, session_key, None if overwrite else version)
+    finally:
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+
+async def _launch(p, headless: bool) -> Browser:
+    from playwright_handle.browser import STEALTH_ARGS
+
+    return await p.chromium.launch(headless=headless, args=STEALTH_ARGS)
+
+
+class BrowserPool:
+    """
+    常驻的 Chromium，只能在创建它的事件循环中使用；同一循环上的多个上下文并发共用它。
+    浏览器断开（崩溃）后下次使用时重新启动；需要重启（见 _check_recycle）时等已打开的上下文都关闭后再重启。
+    """
+
+    def __init__(self, headless: bool = True):
+        self.headless = headless
+        self.launches = 0
+        self.contexts = 0
+        self.recycles = 0
+        # 当前这次启动的 Chromium 上已创建的上下文数
+        self.browser_contexts = 0
+        self._playwright = None
+        self._browser: Browser | None = None
+        self._loop = asyncio.get_running_loop()
+        self._cond = asyncio.Condition()
+        # 正在使用的上下文数与待执行的重启原因
+        self._active = 0
+        self._recycle_reason: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._playwright is not None
+
+    async def browser(self) -> Browser:
+        if asyncio.get_running_loop() is not self._loop:
+            raise RuntimeError("常驻浏览器只能在创建它的事件循环中使用")
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        await self._close_browser()
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        started = time.monotonic()
+        self._browser = await _launch(self._playwright, self.headless)
+        self.launches += 1
+        self.browser_contexts = 0
+        logger.info(f"已启动常驻 Chromium（第 {self.launches} 次，{int((time.monotonic() - started) * 1000)}ms）")
+        return self._browser
+
+    @asynccontextmanager
+    async def context(self, profile_dir: str, *, stealth: bool = True, session_key=None, overwrite: bool = False):
+        async with self._cond:
+            # 等待重启的浏览器不再接新的上下文
+            await self._cond.wait_for(lambda: not (self._recycle_reason and self._active))
+            if self._recycle_reason:
+                await self._recycle()
+            browser = await self.browser()
+            self._active += 1
+            self.contexts += 1
+            self.browser_contexts += 1
+        try:
+            async with _new_context(browser, profile_dir, stealth, session_key, overwrite) as context:
+                yield context
+        finally:
+            async with self._cond:
+                self._active -= 1
+                self._check_recycle()
+                if self._recycle_reason and not self._active:
+                    await self._recycle()
+                self._cond.notify_all()
+
+    def _check_recycle(self):
+        """上下文关闭后记录本进程下驱动与 Chromium 的资源占用，超出上限时标记重启（其余上下文都关闭后执行）"""
+        from playwright_handle.supervisor import fd_count, tree_usage
+
+        usage = tree_usage()
+        logger.info(
+            f"常驻 Chromium 已创建 {self.browser_contexts} 个上下文，{usage}；本进程文件句柄 {fd_count(os.getpid())} 个"
+        )
+        if self._recycle_reason:
+            return
+        if PLAYWRIGHT_BROWSER_MAX_CONTEXTS and self.browser_contexts >= PLAYWRIGHT_BROWSER_MAX_CONTEXTS:
+            self._recycle_reason = f"已创建 {self.browser_contexts} 个上下文"
+        elif PLAYWRIGHT_BROWSER_MAX_RSS_MB and usage.rss_mb > PLAYWRIGHT_BROWSER_MAX_RSS_MB:
+            self._recycle_reason = f"RSS {usage.rss_mb}MB 超过 {PLAYWRIGHT_BROWSER_MAX_RSS_MB}MB"
+
+    async def _recycle(self):
+        reason, self._recycle_reason = self._recycle_reason, None
+        self.recycles += 1
+        logger.info(f"重启常驻 Chromium 与 Playwright 驱动（第 {self.recycles} 次）：{reason}")
+        await self.close()
+
+    async def _close_browser(self):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        await self._close_browser()
+        playwright, self._playwright = self._playwright, None
+        if playwright is not None:
+            try:
+                await playwright.stop()
+            except Exception:
+                pass
+
+
+# 允许保留常驻浏览器的事件循环（worker 进程中 run_sync 使用的循环、asyncio 调度的循环）及其上的浏览器
+_resident_loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BrowserPool | None]" = weakref.WeakKeyDictionary()
+_resident_lock = threading.Lock()
+
+
+def enable_resident_browser():
+    """在当前事件循环上保留常驻浏览器（须在循环中调用）；循环结束前须 await close_browser_pool()"""
+    loop = asyncio.get_running_loop()
+    with _resident_lock:
+        _resident_loops.setdefault(loop, None)
+
+
+def get_browser_pool() -> BrowserPool | None:
+    """当前事件循环的常驻浏览器；当前循环不保留常驻浏览器时返回 None"""
+    loop = asyncio.get_running_loop()
+    with _resident_lock:
+        if loop not in _resident_loops:
+            return None
+        pool = _resident_loops[loop]
+        if pool is None:
+            pool = _resident_loops[loop] = BrowserPool()
+        return pool
+
+
+def has_resident_browser() -> bool:
+    """本进程是否有正在运行的常驻浏览器（巡检残留进程时据此跳过本进程的直接子进程，见 supervisor）"""
+    with _resident_lock:
+        return any(pool is not None and pool.running for pool in _resident_loops.values())
+
+
+async def close_browser_pool():
+    """关闭当前事件循环的常驻浏览器"""
+    loop = asyncio.get_running_loop()
+    with _resident_lock:
+        pool = _resident_loops.get(loop)
+        if pool is not None:
+            _resident_loops[loop] = None
+    if pool is not None:
+        await pool.close()
+
+
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _close_worker_loop():
+    loop = _worker_loop
+    if loop is None or loop.is_closed() or loop.is_running():
+        return
+    try:
+        loop.run_until_complete(close_browser_pool())
+    except Exception:
+        pass
+    loop.close()
+
+
+def run_sync(coro):
+    """
+    在同步代码中执行浏览器流程的协程，返回其结果。
+    worker 进程中所有任务共用一个常驻的事件循环（常驻浏览器随之保留，进程退出时关闭）；其他线程每次新建事件循环。
+    已有运行中的事件循环时不能调用（应直接 await 对应的 *_async 函数）。
+    """
+    global _worker_loop
+    from playwright_handle import worker_pool
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("当前线程已在运行事件循环，请直接 await 对应的 *_async 函数")
+
+    if not worker_pool._IN_WORKER or threading.current_thread() is not threading.main_thread():
+        return asyncio.run(coro)
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        # worker 进程退出时不执行 atexit，用 multiprocessing 的 Finalize 关闭常驻浏览器
+        multiprocessing.util.Finalize(None, _close_worker_loop, exitpriority=10)
+
+        async def _enable():
+            enable_resident_browser()
+
+        _worker_loop.run_until_complete(_enable())
+    return _worker_loop.run_until_complete(coro)
+
+
+@asynccontextmanager
+async def pooled_context(
+    profile_dir: str, *, stealth: bool = True, headless: bool = True, session_key=None, overwrite: bool = False,
+):
+    """
+    为该用户创建一个轻量浏览器上下文：当前事件循环保留常驻浏览器（见 enable_resident_browser）时使用常驻 Chromium，
+    其他情况（临时事件循环、非 headless）临时启动一个 Chromium，用完关闭。
+    session_key（手机号）用于在 Redis 中存取登录态，见 session_store。
+    """
+    pool = get_browser_pool() if headless else None
+    if pool is not None:
+        async with pool.context(
+            profile_dir, stealth=stealth, session_key=session_key, overwrite=overwrite,
+        ) as context:
+            yield context
+        return
+    async with async_playwright() as p:
+        browser = await _launch(p, headless)
+        try:
+            async with _new_context(browser, profile_dir, stealth, session_key, overwrite) as context:
+                yield context
+        finally:
+            await browser.close()
@@ -0,0 +1,159 @@
+"""
+浏览器流程（VIP 领取、发布笔记）的分步耗时。
+
+每次执行结束时输出一行各步骤耗时，并把本次记录追加到 Redis（每个流程保留最近 FLOW_TIMING_KEEP 次），
+用于对比改动前后的中位耗时（在项目根目录执行）：
+    python playwright_handle/flow_timing.py stats
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+# 单独执行本文件时须先把项目根目录加入 path，否则找不到 core
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import redis
+
+from core import logger
+from config import REDIS_POOL
+from tracing import span
+
+FLOW_TIMING_KEY_TPL = "netease:music:flow_timing:{flow}"
+FLOW_TIMING_KEEP = 200
+
+FLOW_VIP = "vip"
+FLOW_SHARE = "share"
+FLOW_TITLES = {FLOW_VIP: "VIP 领取", FLOW_SHARE: "发布笔记"}
+
+
+def _get_redis():
+    try:
+        return redis.Redis(connection_pool=REDIS_POOL) if REDIS_POOL else None
+    except Exception as e:
+        logger.debug(f"[流程耗时] Redis 不可用：{e}")
+        return None
+
+
+class FlowTimer:
+    """记录一个流程中各步骤的耗时（秒）；同名步骤累加"""
+
+    def __init__(self, flow: str, variant: str = ""):
+        self.flow = flow
+        self.variant = variant
+        self.steps: dict[str, float] = {}
+        self.started = time.monotonic()
+        self.ok: bool | None = None
+
+    @contextmanager
+    def step(self, name: str):
+        """同时记为一个 step span（见 tracing），步骤内的 goto / 等待元素等 span 挂在其下"""
+        started = time.monotonic()
+        try:
+            with span("step", flow=self.flow, step=name):
+                yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.monotonic() - started
+
+    @property
+    def total(self) -> float:
+        return time.monotonic() - self.started
+
+    def finish(self, ok: bool | None = None):
+        """输出本次各步骤耗时并记录到 Redis"""
+        self.ok = ok
+        total = self.total
+        detail = " / ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps.items())
+        title = FLOW_TITLES.get(self.flow, self.flow) + (f"（{self.variant}）" if self.variant else "")
+        logger.info(f"{title}耗时 {total:.2f}s：{detail or '无步骤'}")
+        record = {
+            "at": int(time.time()),
+            "variant": self.variant,
+            "ok": ok,
+            "total": round(total, 3),
+            "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()},
+        }
+        try:
+            r = _get_redis()
+            if r:
+                key = FLOW_TIMING_KEY_TPL.format(flow=self.flow)
+                with r.pipeline() as pipe:
+                    pipe.lpush(key, json.dumps(record, ensure_ascii=False))
+                    pipe.ltrim(key, 0, FLOW_TIMING_KEEP - 1)
+                    pipe.execute()
+        except Exception as e:
+            logger.debug(f"记录 {self.flow} 流程耗时失败：{e}")
+
+
+@contextmanager
+def timed_flow(flow: str, variant: str = ""):
+    """with timed_flow(FLOW_VIP) as timer: ...；退出时记录（异常退出记为失败），ok 可在流程中设置 timer.ok"""
+    timer = FlowTimer(flow, variant)
+    with span("flow", flow=flow, variant=variant) as flow_span:
+        try:
+            yield timer
+        except BaseException:
+            timer.finish(False)
+            raise
+        timer.finish(timer.ok)
+        if timer.ok is False:
+            flow_span.fail("流程未成功", outcome="not_ok")
+
+
+def load_records(flow: str) -> list[dict]:
+    r = _get_redis()
+    if not r:
+        return []
+    records = []
+    for raw in r.lrange(FLOW_TIMING_KEY_TPL.format(flow=flow), 0, -1):
+        try:
+            records.append(json.loads(raw))
+        except ValueError:
+            continue
+    return records
+
+
+def format_stats(flow: str, records: list[dict]) -> list[str]:
+    """按流程方式（variant）分组，输出次数、成功率与总耗时 / 各步骤耗时的中位数"""
+    lines = [f"{FLOW_TITLES.get(flow, flow)}：最近 {len(records)} 次"]
+    groups: dict[str, list[dict]] = {}
+    for record in records:
+        groups.setdefault(record.get("variant") or "-", []).append(record)
+    for variant, items in sorted(groups.items()):
+        totals = [item["total"] for item in items]
+        ok = sum(1 for item in items if item.get("ok"))
+        lines.append(
+            f"  {variant}：{len(items)} 次，成功 {ok} 次，中位 {statistics.median(totals):.2f}s，"
+            f"最慢 {max(totals):.2f}s"
+        )
+        step_names: list[str] = []
+        for item in items:
+            step_names.extend(name for name in item.get("steps", {}) if name not in step_names)
+        for name in step_names:
+            values = [item["steps"][name] for item in items if name in item.get("steps", {})]
+            lines.append(f"    {name}：中位 {statistics.median(values):.2f}s（{len(values)} 次）")
+    return lines
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="浏览器流程分步耗时")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="各流程最近若干次的中位耗时")
+    args = parser.parse_args()
+    if args.command == "stats":
+        for flow in FLOW_TITLES:
+            for line in format_stats(flow, load_records(flow)):
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
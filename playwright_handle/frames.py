@@ -0,0 +1,103 @@
+"""
+在 main frame 与各 iframe 中查找元素所在的 frame，并缓存查找结果。
+
+登录弹窗、动态页（g_iframe）、音乐人首页的元素可能在主文档，也可能在某个 iframe 里。原先各模块每次查找都
+遍历 page.frames、在每个 frame 上调一次 locator(selector).count()（每次都是一次 CDP 往返），登录流程还每 100ms 重扫一遍。
+FrameResolver 记住每个 selector 上次所在的 frame：命中时只在该 frame 上 count() 一次；frame 发生导航、挂载或卸载时清空缓存。
+
+    resolver = frame_resolver(page)
+    scope, loc = await resolver.locate("#pubEvent")         # 未找到时为 (None, None)
+    async for scope, loc in resolver.candidates(selector):  # 依次给出包含 selector 的 frame（上次命中的优先）
+        ...
+"""
+
+from __future__ import annotations
+
+from typing import AsyncIterator, Iterator
+
+from playwright.async_api import Frame, Locator, Page
+
+_FRAME_EVENTS = ("framenavigated", "frameattached", "framedetached")
+
+
+class FrameResolver:
+    """绑定到一个页面的 selector -> frame 缓存；只能在创建该页面的事件循环中使用。"""
+
+    def __init__(self, page: Page):
+        self.page = page
+        self._cache: dict[tuple[str, bool], Page | Frame] = {}
+        for event in _FRAME_EVENTS:
+            page.on(event, self.invalidate)
+
+    def invalidate(self, *_):
+        self._cache.clear()
+
+    def scopes(self) -> Iterator[Page | Frame]:
+        """先 main frame（page 本身），再各子 frame"""
+        yield self.page
+        for fr in self.page.frames:
+            if fr is self.page.main_frame:
+                continue
+            yield fr
+
+    @staticmethod
+    def query(scope: Page | Frame, selector: str, exact_text: bool = False) -> Locator:
+        """exact_text 时按完整文本匹配（get_by_text(exact=True)），否则按 selector"""
+        return scope.get_by_text(selector, exact=True) if exact_text else scope.locator(selector)
+
+    async def candidates(self, selector: str, *, exact_text: bool = False) -> AsyncIterator[tuple[Page | Frame, Locator]]:
+        """
+        依次给出包含 selector 的 (scope, locator)：先试上次命中的 frame，再按顺序扫描其余 frame。
+        最后给出的 scope 会被缓存，调用方在第一个可用的 scope 上 break 即可。
+        """
+        key = (selector, exact_text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if isinstance(cached, Frame) and cached.is_detached():
+                cached = None
+                self._cache.pop(key, None)
+            else:
+                loc = self.query(cached, selector, exact_text)
+                try:
+                    found = await loc.count() > 0
+                except Exception:
+                    found = False
+                if found:
+                    yield cached, loc
+                else:
+                    self._cache.pop(key, None)
+        for scope in self.scopes():
+            if scope is cached:
+                continue
+            loc = self.query(scope, selector, exact_text)
+            try:
+                if await loc.count() == 0:
+                    continue
+            except Exception:
+                continue
+            self._cache[key] = scope
+            yield scope, loc
+
+    async def locate(self, selector: str, *, exact_text: bool = False) -> tuple[Page | Frame | None, Locator | None]:
+        """第一个包含 selector 的 (scope, locator)；都没有时返回 (None, None)"""
+        async for scope, loc in self.candidates(selector, exact_text=exact_text):
+            return scope, loc
+        return None, None
+
+
+def frame_resolver(page: Page | Frame) -> FrameResolver:
+    """取页面的 FrameResolver（每个页面一个，首次调用时创建）；传入 Frame 时使用其所在页面"""
+    if isinstance(page, Frame):
+        page = page.page
+    resolver = getattr(page, "_frame_resolver", None)
+    if resolver is None:
+        # 挂在页面对象上，随页面一起释放
+        resolver = FrameResolver(page)
+        setattr(page, "_frame_resolver", resolver)
+    return resolver
+
+
+async def first_with_selector(page: Page, selector: str) -> Page | Frame:
+    """在所有 frame 中找到第一个包含指定 selector 的 scope；都没有时返回 page。"""
+    scope, _ = await frame_resolver(page).locate(selector)
+    return scope if scope is not None else page
@@ -1,80 +1,45 @@
 """
 使用 Playwright 在网页版网易云音乐的「动态/朋友」页发一条笔记，并给笔记配上音乐。
 依赖 `playwright_handle/login.py` 已经登录并写入浏览器持久化 profile。
+基于 playwright.async_api：share_note_and_delete_async 可在同一个事件循环上与其他用户的流程并发执行，
+share_note_and_delete 为其同步版本（见 browser_pool.run_sync）。
 """
 
 from __future__ import annotations
 
+import asyncio
+import math
 import os
 import time
+from contextlib import AsyncExitStack
 
-from playwright.sync_api import sync_playwright, Page, Frame
+from playwright.async_api import BrowserContext, Page
 
-from core import logger, NeteaseClient, TaskManager
+from core import logger
+from config import PLAYWRIGHT_PAGE_API
+from playwright_handle.browser import cookies_to_cookie_str, inject_cookie_str, user_context
+from playwright_handle.browser_pool import run_sync
+from playwright_handle.flow_timing import FLOW_SHARE, timed_flow
+from playwright_handle.frames import first_with_selector
+from playwright_handle.page_api import PageApi, PageApiError
+from tracing import (
+    SPAN_COOKIE_HARVEST, SPAN_EXPECT_RESPONSE, SPAN_GOTO, SPAN_SELECTOR_WAIT, frame_label, span,
+)
 
 FRIEND_URL = "https://music.163.com/#/friend"
 PROFILE_DIR = ".playwright_profile_netease"  # 作为独立脚本运行时使用；集成到 main.py 时会传参覆盖
 VIP_RIGHT_URL = "https://y.music.163.com/g/yida/7d4d0e9f89884a68b8eddea50b5aa6a6"
+CONTENT_FRAME = "iframe#g_iframe"  # music.163.com 的 #/ 页面内容都在这个 iframe 里
+PUB_EVENT_TIMEOUT_MS = 15000  # 等发笔记按钮的时间；取代原先的 networkidle
 
 
-def _scopes(page: Page | Frame):
-    yield page
-    for fr in page.frames:
-        if fr is page.main_frame:
-            continue
-        yield fr
+async def _harvest_cookie_str(context: BrowserContext) -> str:
+    """读取上下文中 music.163.com 的最新 Cookie（记为 cookie-harvest span）"""
+    with span(SPAN_COOKIE_HARVEST):
+        return cookies_to_cookie_str(await context.cookies("https://music.163.com"))
 
 
-def _first_with_selector(page: Page, selector: str) -> Frame | Page:
-    """在所有 frame 中找到第一个包含指定 selector 的 scope。"""
-    for scope in _scopes(page):
-        try:
-            if scope.locator(selector).count() > 0:
-                return scope
-        except Exception:
-            continue
-    return page
-
-
-def _cookies_to_cookie_str(cookies: list[dict]) -> str:
-    """将 Playwright cookies 转为 requests/NeteaseClient 使用的 cookie_str。"""
-    pairs = []
-    for c in cookies:
-        name = c.get("name")
-        value = c.get("value")
-        if name and value is not None:
-            pairs.append(f"{name}={value}")
-    return "; ".join(pairs)
-
-
-def _cookie_str_to_playwright_cookies(cookie_str: str) -> list[dict]:
-    """
-    将 "k=v; k2=v2" 转成 Playwright 可 add_cookies 的结构。
-    注：只用于 music.163.com 域下的简单 Cookie 注入。
-    """
-    cookies: list[dict] = []
-    if not cookie_str:
-        return cookies
-    for item in cookie_str.split(";"):
-        item = item.strip()
-        if "=" not in item:
-            continue
-        k, v = item.split("=", 1)
-        k = k.strip()
-        if not k:
-            continue
-        cookies.append(
-            {
-                "name": k,
-                "value": v,
-                "domain": ".music.163.com",
-                "path": "/",
-            }
-        )
-    return cookies
-
-
-def _log_vip_task_progress(
+async def _log_vip_task_progress(
     page: Page,
     *,
     vip_further_get_time_callback=None,
@@ -106,19 +71,20 @@ def _log_vip_task_progress(
 
     logger.info("打开音乐人权益页，监听 VIP 任务进度接口...")
     try:
-        with page.expect_response(_is_target, timeout=30000) as resp_info:
-            # 打开 y.music 的活动页，页面内部会自动请求目标接口
-            page.goto(VIP_RIGHT_URL, wait_until="domcontentloaded")
-        resp = resp_info.value
+        with span(SPAN_EXPECT_RESPONSE, api="vip/info", url=VIP_RIGHT_URL):
+            async with page.expect_response(_is_target, timeout=30000) as resp_info:
+                # 打开 y.music 的活动页，页面内部会自动请求目标接口
+                await page.goto(VIP_RIGHT_URL, wait_until="domcontentloaded")
+            resp = await resp_info.value
     except Exception as e:
         logger.warning(f"未能捕获 VIP 任务进度接口响应：{e}")
         return None
 
     try:
-        data = resp.json()
+        data = await resp.json()
     except Exception as e:
         try:
-            raw_text = resp.text()
+            raw_text = await resp.text()
         except Exception:
             raw_text = ""
         logger.warning(f"解析 VIP 任务进度接口 JSON 失败：{e}，原始内容片段：{raw_text[:300]}")
@@ -180,7 +146,12 @@ def _log_vip_task_progress(
     return further_vip_get_time
 
 
-def open_vip_right_page_and_listen(
+def open_vip_right_page_and_listen(*args, **kwargs) -> int | None:
+    """open_vip_right_page_and_listen_async 的同步版本，参数与返回值相同"""
+    return run_sync(open_vip_right_page_and_listen_async(*args, **kwargs))
+
+
+async def open_vip_right_page_and_listen_async(
     profile_dir: str,
     *,
     cookie_str: str | None = None,
@@ -195,198 +166,318 @@ def open_vip_right_page_and_listen(
     """
     os.makedirs("log", exist_ok=True)
 
-    def _run_once(_cookie_str: str | None) -> int | None:
-        with sync_playwright() as p:
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_dir,
-                headless=True,
-                viewport={"width": 1280, "height": 800},
-            )
-            page = context.new_page()
+    async def _run_once(_cookie_str: str | None) -> int | None:
+        async with user_context(profile_dir, stealth=False, session_key=phone) as context:
+            page = await context.new_page()
 
             # 先注入 cookie（如果有），避免打开后是未登录态
-            if _cookie_str:
-                try:
-                    pw_cookies = _cookie_str_to_playwright_cookies(_cookie_str)
-                    if pw_cookies:
-                        context.add_cookies(pw_cookies)
-                        logger.info(f"已注入 Cookie 到浏览器（{len(pw_cookies)} 条）")
-                except Exception as e:
-                    logger.warning(f"注入 Cookie 失败：{e}")
+            await inject_cookie_str(context, _cookie_str)
 
             # _log_vip_task_progress 内部会 goto VIP_RIGHT_URL 并 expect_response
+            # 复用 timeout：expect_response 需要显式传入
+            # 这里通过临时 monkey patch 的方式不优雅；直接在 _log_vip_task_progress 内固定 30s，
+            # 因此这里用 page.set_default_timeout 来尽量一致。
             try:
-                # 复用 timeout：expect_response 需要显式传入
-                # 这里通过临时 monkey patch 的方式不优雅；直接在 _log_vip_task_progress 内固定 30s，
-                # 因此这里用 page.set_default_timeout 来尽量一致。
-                try:
-                    page.set_default_timeout(timeout_ms)
-                except Exception:
-                    pass
-                further_time = _log_vip_task_progress(
-                    page,
-                    vip_further_get_time_callback=vip_further_get_time_callback,
-                )
-            finally:
-                context.close()
-            return further_time
+                page.set_default_timeout(timeout_ms)
+            except Exception:
+                pass
+            return await _log_vip_task_progress(
+                page,
+                vip_further_get_time_callback=vip_further_get_time_callback,
+            )
 
     # 第一次尝试：用传入 cookie 注入（如果有）
-    res = _run_once(cookie_str)
+    res = await _run_once(cookie_str)
     if res:
         return res
 
     # 若未成功且给了账号密码，则执行登录刷新 profile，再重试一次
     if phone and password:
         logger.info("首次未成功解析 furtherVipGetTime，尝试 Playwright 登录刷新浏览器态后重试一次...")
-        from playwright_handle.login import browser_login
+        from playwright_handle.login import browser_login_async
 
         try:
-            new_cookie_str = browser_login(phone, password, profile_dir=profile_dir)
+            new_cookie_str = await browser_login_async(phone, password, profile_dir=profile_dir)
         except Exception as e:
             logger.error(f"Playwright 登录失败：{e}")
             return None
-        return _run_once(new_cookie_str)
+        return await _run_once(new_cookie_str)
 
     return res
 
-def share_note_and_delete(
-    profile_dir: str,
+async def _share_note_by_page_api(
+    context: BrowserContext,
+    msg: str,
+    search_keyword: str,
+    vip_further_get_time_callback=None,
+    uid=None,
+) -> tuple[bool, str | None]:
+    """
+    在页面内直接调用搜索、分享、vip/info（以及删除）接口，不再点击发笔记 / 配乐 / 分享按钮。
+    分享请求发出前（打开页面、搜索配乐）失败，或接口明确拒绝时抛出 PageApiError，由调用方回退为点击页面；
+    分享请求本身出错（超时、页面内执行失败、返回非 JSON）或未登录（301）时请求可能已被受理，直接返回失败，
+    不再回退点击以免重复发布。
+    """
+    from playwright_handle.musician import _parse_vip_info_payload
+
+    with timed_flow(FLOW_SHARE, "页面内接口") as timer:
+        stack = AsyncExitStack()
+        try:
+            with timer.step("打开页面"):
+                api = await stack.enter_async_context(PageApi.open(context))
+            with timer.step("搜索配乐"):
+                song_id = await api.search_first_song(search_keyword)
+            if not song_id:
+                raise PageApiError(f"未搜索到“{search_keyword}”的歌曲")
+            with timer.step("分享"):
+                try:
+                    data = await api.share_song(song_id, msg)
+                except Exception as e:
+                    logger.warning(f"页面内分享请求失败（可能已发布，不再回退点击）：{e}")
+                    timer.ok = False
+                    return False, None
+            shared_at = time.monotonic()
+            logger.info(f"分享接口返回：{str(data)[:200]}")
+            event_id = (data.get("event") or {}).get("id")
+            if not event_id:
+                # 301 为未登录；200 却没有 event.id 时可能已发布，不再回退点击以免重复发布
+                if data.get("code") in (200, 301):
+                    logger.warning("分享接口返回中未获取到 event.id，发布可能失败/未登录")
+                    timer.ok = False
+                    return False, None
+                raise PageApiError(f"页面内分享未获取到 event.id（code={data.get('code')}）")
+
+            try:
+                with timer.step("vip/info"):
+                    _parse_vip_info_payload(
+                        await api.vip_info(), vip_further_get_time_callback=vip_further_get_time_callback,
+                    )
+            except PageApiError as e:
+                logger.warning(f"获取 VIP 任务进度失败：{e}")
+
+            logger.info(f"分享成功，event_id={event_id}")
+            fresh_cookie_str = await _harvest_cookie_str(context)
+        finally:
+            await stack.aclose()  # 先关闭页面，删除不再占用页面
+        with timer.step("删除动态"):
+            # 直接删除时会等待剩余的延迟，放到线程中执行，不阻塞事件循环上的其他流程
+            await asyncio.to_thread(_hand_off_delete, uid, event_id, fresh_cookie_str, shared_at)
+        timer.ok = True
+        return True, fresh_cookie_str
+
+
+def _hand_off_delete(uid, event_id, cookie_str: str | None, shared_at: float):
+    """
+    优先登记到延迟删除队列；登记失败时改为直接删除，等待时间从发布成功时算起，
+    只补足 DYNAMIC_DELETE_DELAY_SECONDS 中剩下的部分（之前在页面里固定再等满）。
+    """
+    from config import DYNAMIC_DELETE_DELAY_SECONDS
+    from deletion_queue import delete_now, schedule_delete
+
+    if schedule_delete(uid, event_id):
+        return
+    remaining = DYNAMIC_DELETE_DELAY_SECONDS - (time.monotonic() - shared_at)
+    delete_now(cookie_str, event_id, delay=max(0, math.ceil(remaining)))
+
+
+async def share_note_in_context(
+    context: BrowserContext,
     msg: str,
     search_keyword: str = "你好",
-    cookie_str: str | None = None,
-    phone: str | None = None,
-    password: str | None = None,
     vip_further_get_time_callback=None,
+    uid=None,
 ) -> tuple[bool, str | None]:
     """
-    供 main.py 调用：用浏览器发布笔记（配音乐）并监听分享接口返回，拿到 event_id 后等待删除。
+    在已打开的浏览器上下文中发布笔记（配音乐），监听分享接口返回拿到 event_id，
+    随后进入音乐人权益页打印 VIP 任务进度。
+    传入 uid 时动态交给延迟删除队列删除，立即返回；否则（或登记失败时）关闭页面后补足剩余的等待时间再直接删除。
+    PLAYWRIGHT_PAGE_API 时优先在页面内直接调用接口（见 _share_note_by_page_api），失败时回退为点击页面。
 
     返回：
     - (成功标志, 最新Cookie字符串)
     """
-    os.makedirs("log", exist_ok=True)
-
-    def _run_once(_cookie_str: str | None) -> tuple[bool, str | None]:
-        with sync_playwright() as p:
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_dir,
-                headless=True,
-                viewport={"width": 1280, "height": 800},
+    if PLAYWRIGHT_PAGE_API:
+        try:
+            return await _share_note_by_page_api(
+                context, msg, search_keyword, vip_further_get_time_callback=vip_further_get_time_callback, uid=uid,
             )
-            page = context.new_page()
+        except PageApiError as e:
+            logger.warning(f"{e}，改为在动态页点击发布")
+
+    with timed_flow(FLOW_SHARE, "点击页面") as timer:
+        success, fresh_cookie_str, event_id, shared_at = await _share_note_by_clicking(
+            context, timer, msg, search_keyword, vip_further_get_time_callback=vip_further_get_time_callback,
+        )
+        if success:
+            # 页面已关闭，删除不再占用页面
+            with timer.step("删除动态"):
+                await asyncio.to_thread(_hand_off_delete, uid, event_id, fresh_cookie_str, shared_at)
+        timer.ok = success
+        return success, fresh_cookie_str
 
-            # 先注入 cookie（如果有），避免打开后是未登录态
-            if _cookie_str:
-                try:
-                    pw_cookies = _cookie_str_to_playwright_cookies(_cookie_str)
-                    if pw_cookies:
-                        context.add_cookies(pw_cookies)
-                        logger.info(f"已注入 Cookie 到浏览器（{len(pw_cookies)} 条）")
-                except Exception as e:
-                    logger.warning(f"注入 Cookie 失败：{e}")
 
-            logger.info("打开朋友/动态页，用于发布笔记...")
-            page.goto(FRIEND_URL, wait_until="networkidle")
+def _anywhere(page: Page, selector: str):
+    """同时匹配主文档与 g_iframe 内的 selector，取第一个（等待时两处谁先出现都算）"""
+    return page.locator(selector).or_(page.frame_locator(CONTENT_FRAME).locator(selector)).first
+
+
+async def _wait_visible(locator, selector: str, timeout: int, *, frame: str = "main/g_iframe"):
+    """等待元素可见（记为 selector-wait span）"""
+    with span(SPAN_SELECTOR_WAIT, selector=selector, frame=frame):
+        await locator.wait_for(state="visible", timeout=timeout)
+
+
+async def _share_note_by_clicking(
+    context: BrowserContext,
+    timer,
+    msg: str,
+    search_keyword: str,
+    vip_further_get_time_callback=None,
+) -> tuple[bool, str | None, object, float]:
+    """
+    在动态页点击发笔记、配乐、分享，返回 (成功标志, 最新Cookie字符串, event_id, 发布成功的 monotonic 时刻)。
+    每一步都等待对应元素或接口响应出现即继续，不等 networkidle，也没有固定等待。
+    """
+    page = await context.new_page()
+    try:
+        logger.info("打开朋友/动态页，用于发布笔记...")
+        with timer.step("打开动态页"), span(SPAN_GOTO, url=FRIEND_URL):
+            await page.goto(FRIEND_URL, wait_until="domcontentloaded")
 
-            # 1. 找到包含发笔记按钮的 frame（若没找到通常表示未登录）
-            scope = _first_with_selector(page, "#pubEvent")
-            if scope.locator("#pubEvent").count() == 0:
+        # 1. 等发笔记按钮出现（在 g_iframe 中）；超时通常表示未登录
+        with timer.step("等待发笔记按钮"), span(SPAN_SELECTOR_WAIT, selector="#pubEvent") as sp:
+            try:
+                await _anywhere(page, "#pubEvent").wait_for(state="visible", timeout=PUB_EVENT_TIMEOUT_MS)
+            except Exception as e:
+                sp.fail(e, outcome="not_found")
                 logger.warning("未找到发笔记按钮，疑似未登录态")
-                context.close()
-                return False, None
+                return False, None, None, 0.0
+            scope = await first_with_selector(page, "#pubEvent")
+            sp.set(frame=frame_label(scope))
 
-            # 2. 点击「发笔记」按钮
-            scope.click("#pubEvent")
-            logger.info("已点击发笔记按钮")
+        # 2. 点击「发笔记」按钮
+        await scope.click("#pubEvent")
+        logger.info("已点击发笔记按钮")
 
-            # 3. 输入内容
+        # 3. 输入内容
+        with timer.step("填写内容"):
             textarea = scope.locator("textarea.u-txt.area.j-flag[placeholder='一起聊聊吧~']").first
-            textarea.wait_for(state="visible", timeout=15000)
-            textarea.fill(msg)
-            logger.info("已输入笔记内容")
-
-            # 4. 点击「给笔记配上音乐」
-            scope.get_by_text("给笔记配上音乐", exact=True).click()
-            logger.info("已点击给笔记配上音乐")
-
-            # 5. 搜索并选择第一首
-            search_scope = _first_with_selector(page, ".m-lysearch")
-            search_input = search_scope.locator(".m-lysearch input.u-txt.txt.j-flag").first
-            search_input.wait_for(state="visible", timeout=15000)
-            search_input.fill(search_keyword)
-            search_input.press("Enter")
+            await _wait_visible(textarea, "textarea", 15000, frame=frame_label(scope))
+            await textarea.fill(msg)
+        logger.info("已输入笔记内容")
+
+        # 4. 点击「给笔记配上音乐」
+        await scope.get_by_text("给笔记配上音乐", exact=True).click()
+        logger.info("已点击给笔记配上音乐")
+
+        # 5. 搜索并选择第一首（搜索层可能不在发笔记按钮所在的 frame，两处一起等）
+        with timer.step("搜索配乐"):
+            search_input = _anywhere(page, ".m-lysearch input.u-txt.txt.j-flag")
+            await _wait_visible(search_input, ".m-lysearch input", 15000)
+            await search_input.fill(search_keyword)
+            await search_input.press("Enter")
             logger.info(f"已在搜索框输入“{search_keyword}”并回车")
 
             # 你贴的 DOM 里结果是：.srchlist ... <li class="sitm ...">
-            first_item = search_scope.locator(".srchlist li.sitm").first
-            # 先等元素挂载出来，再等可见
-            first_item.wait_for(state="attached", timeout=30000)
-            first_item.wait_for(state="visible", timeout=30000)
-            first_item.click()
-            logger.info("已选择搜索结果中的第一条歌曲（li.sitm）")
-
-            # 6. 点击「分享」按钮
-            share_btn = scope.locator("a.u-btn2.u-btn2-2.u-btn2-w2.j-flag[data-action='share']").first
-            share_btn.wait_for(state="visible", timeout=15000)
-
-            # 7. 监听分享接口返回（必须在点击前开始监听，避免竞态错过）
-            page_obj = scope.page if isinstance(scope, Frame) else scope
-            with page_obj.expect_response(
+            first_item = _anywhere(page, ".srchlist li.sitm")
+            await _wait_visible(first_item, ".srchlist li.sitm", 30000)
+            await first_item.click()
+        logger.info("已选择搜索结果中的第一条歌曲（li.sitm）")
+
+        # 6. 点击「分享」按钮
+        share_btn = scope.locator("a.u-btn2.u-btn2-2.u-btn2-w2.j-flag[data-action='share']").first
+        await _wait_visible(share_btn, "a[data-action='share']", 15000, frame=frame_label(scope))
+
+        # 7. 监听分享接口返回（必须在点击前开始监听，避免竞态错过；page 级监听覆盖所有 frame）
+        with timer.step("分享"), span(SPAN_EXPECT_RESPONSE, api="share/friends/resource"):
+            async with page.expect_response(
                 lambda r: "weapi/share/friends/resource" in r.url and r.request.method == "POST",
                 timeout=20000,
             ) as resp_info:
-                share_btn.click()
-            logger.info("已点击分享按钮，已捕获接口返回")
+                await share_btn.click()
+            resp = await resp_info.value
+        shared_at = time.monotonic()
+        logger.info("已点击分享按钮，已捕获接口返回")
 
-            resp = resp_info.value
-            try:
-                data = resp.json()
-            except Exception:
-                data = {}
+        try:
+            data = await resp.json()
+        except Exception:
+            data = {}
 
-            logger.info(f"分享接口返回：{str(data)[:200]}")
-            event_id = data.get("event", {}).get("id")
-            if not event_id:
-                logger.warning("分享接口返回中未获取到 event.id，发布可能失败/触发验证")
-                context.close()
-                return False, None
+        logger.info(f"分享接口返回：{str(data)[:200]}")
+        event_id = data.get("event", {}).get("id")
+        if not event_id:
+            logger.warning("分享接口返回中未获取到 event.id，发布可能失败/触发验证")
+            return False, None, None, 0.0
 
-            # 8. 发布成功后，进入音乐人权益页，监听并打印 VIP 任务进度
+        # 8. 发布成功后，进入音乐人权益页，监听并打印 VIP 任务进度
+        with timer.step("vip/info"):
             try:
-                _log_vip_task_progress(page, vip_further_get_time_callback=vip_further_get_time_callback)
+                await _log_vip_task_progress(page, vip_further_get_time_callback=vip_further_get_time_callback)
             except Exception as e:
                 logger.warning(f"获取 VIP 任务进度时发生异常：{e}")
 
-            # 9. 删除动态（复用核心 TaskManager）
-            logger.info(f"分享成功，event_id={event_id}，等待 10 秒后删除动态...")
-            time.sleep(10)
-            cookies = context.cookies("https://music.163.com")
-            fresh_cookie_str = _cookies_to_cookie_str(cookies)
-            client = NeteaseClient(cookie_str=fresh_cookie_str)
-            task = TaskManager(client)
-            delete_res = task.delete_dynamic(event_id)
-            logger.info(f"删除动态结果: {delete_res}")
+        logger.info(f"分享成功，event_id={event_id}")
+        fresh_cookie_str = await _harvest_cookie_str(context)
+        return True, fresh_cookie_str, event_id, shared_at
+    finally:
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+
+def share_note_and_delete(*args, **kwargs) -> tuple[bool, str | None]:
+    """share_note_and_delete_async 的同步版本，参数与返回值相同"""
+    return run_sync(share_note_and_delete_async(*args, **kwargs))
+
+
+async def share_note_and_delete_async(
+    profile_dir: str,
+    msg: str,
+    search_keyword: str = "你好",
+    cookie_str: str | None = None,
+    phone: str | None = None,
+    password: str | None = None,
+    vip_further_get_time_callback=None,
+    uid=None,
+) -> tuple[bool, str | None]:
+    """
+    供 main.py 调用：单独启动浏览器执行 share_note_in_context。
+    注入的 Cookie 未登录且提供了账号密码时，登录刷新 profile 后重试一次。
+
+    返回：
+    - (成功标志, 最新Cookie字符串)
+    """
+    os.makedirs("log", exist_ok=True)
 
-            context.close()
-            return True, fresh_cookie_str
+    async def _run_once(_cookie_str: str | None) -> tuple[bool, str | None]:
+        async with user_context(profile_dir, stealth=False, session_key=phone) as context:
+            await inject_cookie_str(context, _cookie_str)
+            return await share_note_in_context(
+                context,
+                msg,
+                search_keyword,
+                vip_further_get_time_callback=vip_further_get_time_callback,
+                uid=uid,
+            )
 
     # 第一次尝试：用传入 cookie 注入
-    success, fresh_cookie = _run_once(cookie_str)
+    success, fresh_cookie = await _run_once(cookie_str)
     if success:
         return True, fresh_cookie
 
     # 若仍未登录且给了账号密码，则执行登录刷新 profile，再重试一次（不再依赖旧 cookie）
     if phone and password:
         logger.info("Cookie 注入后仍未登录，开始执行 Playwright 登录流程刷新浏览器态...")
-        from playwright_handle.login import browser_login
+        from playwright_handle.login import browser_login_async
 
         try:
-            new_cookie_str = browser_login(phone, password, profile_dir=profile_dir)
+            new_cookie_str = await browser_login_async(phone, password, profile_dir=profile_dir)
         except Exception as e:
             logger.error(f"Playwright 登录失败，无法继续发布：{e}")
             return False, None
-        return _run_once(new_cookie_str)
+        return await _run_once(new_cookie_str)
 
     return False, None
 
@@ -1,12 +1,14 @@
 """
 使用 Playwright 打开网易云音乐 **手机号密码登录页**，自动完成你描述的所有点击和输入，
 并把登录后的 Cookie 保存到 Redis（供 core.py/main.py 复用）。
+基于 playwright.async_api：browser_login_async 可与其他用户的流程在同一个事件循环上并发执行，browser_login 为其同步版本。
 
 使用前先在文件最上面改成你自己的手机号、密码、可选 uid。
 """
 
 from __future__ import annotations
 
+import asyncio
 import os
 import random
 import re
@@ -22,9 +24,15 @@ if _PROJECT_ROOT not in sys.path:
     sys.path.insert(0, _PROJECT_ROOT)
 
 from ddddocr import DdddOcr
-from playwright.sync_api import sync_playwright, Page, Frame
+from playwright.async_api import Page, Frame
 
 from core import NeteaseClient  # 仅用于本模块内部根据 Cookie 识别 uid
+from playwright_handle.browser import cookies_to_cookie_str, user_context
+from playwright_handle.browser_pool import run_sync
+from playwright_handle.frames import frame_resolver
+from tracing import (
+    SPAN_CAPTCHA, SPAN_COOKIE_HARVEST, SPAN_EXPECT_RESPONSE, SPAN_GOTO, SPAN_SELECTOR_WAIT, frame_label, span,
+)
 
 logger = logging.getLogger("netease_music")
 
@@ -55,7 +63,7 @@ def _phone_debug_subdir(phone: str) -> str:
     return s.strip("_") or "unknown"
 
 
-def save_login_debug_screenshot(page: Page | Frame, phone: str, tag: str) -> Optional[str]:
+async def save_login_debug_screenshot(page: Page | Frame, phone: str, tag: str) -> Optional[str]:
     """
     登录失败或异常场景截图，保存到 **项目根目录** 下 debug/{phone}/（不写入 playwright_handle）。
     tag 仅用于文件名（会净化非法字符）。
@@ -70,7 +78,7 @@ def save_login_debug_screenshot(page: Page | Frame, phone: str, tag: str) -> Opt
         safe_tag = re.sub(r"[^\w\-.]+", "_", tag).strip("_")[:80] or "shot"
         name = f"{time.strftime('%Y%m%d_%H%M%S')}_{safe_tag}.png"
         path = os.path.join(out_dir, name)
-        pw_page.screenshot(path=path, full_page=True)
+        await pw_page.screenshot(path=path, full_page=True)
         logger.info(f"[登录调试] 已保存截图：{path}")
         return path
     except Exception as e:
@@ -78,17 +86,6 @@ def save_login_debug_screenshot(page: Page | Frame, phone: str, tag: str) -> Opt
         return None
 
 
-def cookies_to_cookie_str(cookies: list[dict]) -> str:
-    # 只拼接 name/value；domain/path/expiry 不需要给 requests 用
-    pairs = []
-    for c in cookies:
-        name = c.get("name")
-        value = c.get("value")
-        if name and value is not None:
-            pairs.append(f"{name}={value}")
-    return "; ".join(pairs)
-
-
 def try_get_uid_from_cookie(cookie_str: str) -> Optional[int]:
     """
     尝试用 Cookie 换取当前登录用户的 uid。
@@ -129,85 +126,63 @@ def try_get_uid_from_cookie(cookie_str: str) -> Optional[int]:
     return None
 
 
-def _scopes(page: Page | Frame):
-    """
-    返回可操作的 scope：优先 main frame，再遍历所有子 frame。
-    这样弹窗在主文档/不同 frame 时都能继续流程。
-    """
-    yield page
-    for fr in page.frames:
-        if fr is page.main_frame:
-            continue
-        yield fr
-
-
-def _click_first(page: Page | Frame, locator_or_text: str, *, exact_text: bool = False, timeout: int = 15000):
+async def _click_first(page: Page | Frame, locator_or_text: str, *, exact_text: bool = False, timeout: int = 15000):
     """
     在 main frame + 所有 iframe 中，找到第一个可点击的目标并点击。
     - locator_or_text: 支持 "text=xxx" / css / xpath 等；若 exact_text=True 则按纯文本匹配
     """
     # 关键点：登录弹窗/内部 frame 可能是“点击后才动态创建”的
-    # 因此需要在 timeout 内不断重扫所有 frame，直到找到目标元素
+    # 因此需要在 timeout 内不断重扫所有 frame，直到找到目标元素（找到过的 frame 会被记住，下次先查它）
     deadline = time.time() + max(1, timeout / 1000)
     last_err: Optional[Exception] = None
-    while time.time() < deadline:
-        for scope in _scopes(page):
-            try:
-                if exact_text:
-                    loc = scope.get_by_text(locator_or_text, exact=True)
-                else:
-                    loc = scope.locator(locator_or_text)
-                if loc.count() == 0:
+    resolver = frame_resolver(page)
+    with span(SPAN_SELECTOR_WAIT, selector=locator_or_text, action="click") as sp:
+        while time.time() < deadline:
+            async for scope, loc in resolver.candidates(locator_or_text, exact_text=exact_text):
+                try:
+                    await loc.first.wait_for(state="visible", timeout=500)
+                    await loc.first.click()
+                    sp.set(frame=frame_label(scope))
+                    return scope
+                except Exception as e:
+                    last_err = e
                     continue
-                loc.first.wait_for(state="visible", timeout=500)
-                loc.first.click()
-                return scope
-            except Exception as e:
-                last_err = e
-                continue
-        time.sleep(0.1)
-    raise last_err or RuntimeError(f"无法点击目标：{locator_or_text}")
+            await asyncio.sleep(0.1)
+        raise last_err or RuntimeError(f"无法点击目标：{locator_or_text}")
 
 
-def _try_click_if_visible(page: Page | Frame, text: str, *, exact_text: bool = True, timeout_ms: int = 3000) -> bool:
+async def _try_click_if_visible(page: Page | Frame, text: str, *, exact_text: bool = True, timeout_ms: int = 3000) -> bool:
     """
     若在 timeout 内找到可点击的文本则点击并返回 True，否则不抛错、返回 False。
     用于「有则点一下」的场景（如滑块成功后可能再次出现「密码登录」选项卡）。
     """
     deadline = time.time() + max(0.5, timeout_ms / 1000)
+    resolver = frame_resolver(page)
     while time.time() < deadline:
-        for scope in _scopes(page):
+        async for _, loc in resolver.candidates(text if exact_text else f"text={text}", exact_text=exact_text):
             try:
-                if exact_text:
-                    loc = scope.get_by_text(text, exact=True)
-                else:
-                    loc = scope.locator(f"text={text}")
-                if loc.count() == 0:
-                    continue
-                loc.first.wait_for(state="visible", timeout=500)
-                loc.first.click()
+                await loc.first.wait_for(state="visible", timeout=500)
+                await loc.first.click()
                 return True
             except Exception:
                 continue
-        time.sleep(0.2)
+        await asyncio.sleep(0.2)
     return False
 
 
 NETWORK_SECURITY_RISK_TEXT = "您当前的网络环境存在安全风险"
+YIDUN_MODAL_SELECTOR = ".yidun_modal__body, .yidun.yidun-custom"
 
 
-def _is_network_security_risk_visible(page: Page | Frame) -> bool:
+async def _is_network_security_risk_visible(page: Page | Frame) -> bool:
     """
     登录后若出现「您当前的网络环境存在安全风险」，易与「未出现滑块」混淆。
     在所有 frame 中检测该文案是否可见。
     """
     try:
-        for scope in _scopes(page):
-            loc = scope.get_by_text(NETWORK_SECURITY_RISK_TEXT, exact=True)
-            if loc.count() == 0:
-                continue
+        async for _, loc in frame_resolver(page).candidates(NETWORK_SECURITY_RISK_TEXT, exact_text=True):
             try:
-                if loc.first.is_visible():
+                if await loc.first.is_visible():
                     return True
             except Exception:
                 return True
@@ -216,13 +191,13 @@ def _is_network_security_risk_visible(page: Page | Frame) -> bool:
     return False
 
 
-def ensure_no_network_security_risk(
+async def ensure_no_network_security_risk(
     page: Page | Frame, *, where: str = "", debug_phone: Optional[str] = None
 ) -> None:
     """
     若检测到网络环境安全风险提示，记录日志并终止自动登录（换 IP/代理通常才能恢复）。
     """
-    if not _is_network_security_risk_visible(page):
+    if not await _is_network_security_risk_visible(page):
         return
     suffix = f"（{where}）" if where else ""
     logger.error(
@@ -231,65 +206,63 @@ def ensure_no_network_security_risk(
     )
     if debug_phone:
         wt = re.sub(r"[^\w\-.]+", "_", where)[:40] if where else ""
-        save_login_debug_screenshot(page, debug_phone, f"network_risk_{wt}" if wt else "network_risk")
+        await save_login_debug_screenshot(page, debug_phone, f"network_risk_{wt}" if wt else "network_risk")
     raise NeteaseLoginNetworkRiskError(NETWORK_SECURITY_RISK_TEXT)
 
 
-def _has_yidun_slider_modal(page: Page | Frame) -> bool:
+async def _has_yidun_slider_modal(page: Page | Frame) -> bool:
     """
     快速判断是否出现 yidun 滑块弹窗/容器（不等待，只做存在性检测）。
     用于避免重复调用 solve_slider_captcha() 造成多次“未触发验证码”的噪音与耗时。
     """
     try:
-        for scope in _scopes(page):
-            if scope.locator(".yidun_modal__body, .yidun.yidun-custom").count() > 0:
-                return True
+        scope, _ = await frame_resolver(page).locate(YIDUN_MODAL_SELECTOR)
+        return scope is not None
     except Exception:
         return False
-    return False
 
 
-def _fill_first(page: Page | Frame, selector: str, value: str, *, timeout: int = 15000):
+async def _fill_first(page: Page | Frame, selector: str, value: str, *, timeout: int = 15000):
     deadline = time.time() + max(1, timeout / 1000)
     last_err: Optional[Exception] = None
-    while time.time() < deadline:
-        for scope in _scopes(page):
-            try:
-                loc_all = scope.locator(selector)
-                if loc_all.count() == 0:
+    resolver = frame_resolver(page)
+    with span(SPAN_SELECTOR_WAIT, selector=selector, action="fill") as sp:
+        while time.time() < deadline:
+            async for scope, loc_all in resolver.candidates(selector):
+                try:
+                    loc = loc_all.first
+                    await loc.wait_for(state="visible", timeout=500)
+                    await loc.fill(value)
+                    sp.set(frame=frame_label(scope))
+                    return scope
+                except Exception as e:
+                    last_err = e
                     continue
-                loc = loc_all.first
-                loc.wait_for(state="visible", timeout=500)
-                loc.fill(value)
-                return scope
-            except Exception as e:
-                last_err = e
-                continue
-        time.sleep(0.1)
-    raise last_err or RuntimeError(f"无法输入：{selector}")
+            await asyncio.sleep(0.1)
+        raise last_err or RuntimeError(f"无法输入：{selector}")
 
 
-def _check_first(page: Page | Frame, selector: str, *, timeout: int = 15000):
+async def _check_first(page: Page | Frame, selector: str, *, timeout: int = 15000):
     deadline = time.time() + max(1, timeout / 1000)
     last_err: Optional[Exception] = None
-    while time.time() < deadline:
-        for scope in _scopes(page):
-            try:
-                loc_all = scope.locator(selector)
-                if loc_all.count() == 0:
+    resolver = frame_resolver(page)
+    with span(SPAN_SELECTOR_WAIT, selector=selector, action="check") as sp:
+        while time.time() < deadline:
+            async for scope, loc_all in resolver.candidates(selector):
+                try:
+                    loc = loc_all.first
+                    await loc.wait_for(state="attached", timeout=500)
+                    await loc.check(force=True)
+                    sp.set(frame=frame_label(scope))
+                    return scope
+                except Exception as e:
+                    last_err = e
                     continue
-                loc = loc_all.first
-                loc.wait_for(state="attached", timeout=500)
-                loc.check(force=True)
-                return scope
-            except Exception as e:
-                last_err = e
-                continue
-        time.sleep(0.1)
-    raise last_err or RuntimeError(f"无法勾选：{selector}")
+            await asyncio.sleep(0.1)
+        raise last_err or RuntimeError(f"无法勾选：{selector}")
 
 
-def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone: Optional[str] = None):
+async def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone: Optional[str] = None):
     """
     网易云 yidun 滑块高成功率版本（修复 OpenCV 尺寸断言错误）
     - 真滑块判断（naturalWidth）
@@ -299,8 +272,8 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
     - 新增尺寸校验：确保滑块图 ≤ 背景图（解决 OpenCV 断言错误）
     """
 
-    def wait_real_image(scope, selector, min_width=120, timeout=10000):
-        scope.wait_for_function(
+    async def wait_real_image(scope, selector, min_width=120, timeout=10000):
+        await scope.wait_for_function(
             f"""
             () => {{
                 const img = document.querySelector("{selector}");
@@ -310,10 +283,8 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
             timeout=timeout
         )
 
-    def download_img(scope, selector) -> bytes:
-        src = scope.locator(selector).first.get_attribute("src")
-        if not src:
-            raise RuntimeError("图片 src 为空")
+    def fetch_img(src, selector) -> tuple[bytes, Exception | None]:
+        """下载图片并校验尺寸（阻塞，放到线程中执行）；返回 (图片内容, 尺寸校验错误)"""
         import requests
         # 1. 下载图片并解析尺寸
         resp = requests.get(src, timeout=10)
@@ -330,53 +301,61 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
             if "jigsaw" in selector and (img_width < 30 or img_height < 30):
                 raise RuntimeError(f"滑块图尺寸异常：{img_width}x{img_height}")
         except Exception as e:
+            return resp.content, e
+        return resp.content, None
+
+    async def download_img(scope, selector) -> bytes:
+        src = await scope.locator(selector).first.get_attribute("src")
+        if not src:
+            raise RuntimeError("图片 src 为空")
+        content, size_error = await asyncio.to_thread(fetch_img, src, selector)
+        if size_error is not None:
             # 4. 尺寸异常：自动点击刷新按钮，并重抛异常触发重试
-            logger.warning(f"图片尺寸校验失败，自动刷新验证码：{e}")
-            scope.locator(".yidun_refresh").first.click()
-            time.sleep(1)
-            raise RuntimeError(f"图片无效，已刷新：{e}")
-        return resp.content
+            logger.warning(f"图片尺寸校验失败，自动刷新验证码：{size_error}")
+            await scope.locator(".yidun_refresh").first.click()
+            await asyncio.sleep(1)
+            raise RuntimeError(f"图片无效，已刷新：{size_error}")
+        return content
 
-    def is_sms_mode(scope):
-        return scope.locator(".yidun_smsbox, .yidun_voice").count() > 0
+    async def is_sms_mode(scope):
+        return await scope.locator(".yidun_smsbox, .yidun_voice").count() > 0
 
     # 等验证码弹窗（同时排除：仅有风控文案、无滑块）
     modal_found = False
     for _ in range(30):
-        ensure_no_network_security_risk(page, where="等待滑块验证码期间", debug_phone=debug_phone)
-        for scope in _scopes(page):
-            if scope.locator(".yidun_modal__body, .yidun.yidun-custom").count() > 0:
-                modal_found = True
-                break
-        if modal_found:
+        await ensure_no_network_security_risk(page, where="等待滑块验证码期间", debug_phone=debug_phone)
+        if await _has_yidun_slider_modal(page):
+            modal_found = True
             break
-        time.sleep(0.3)
+        await asyncio.sleep(0.3)
 
     if not modal_found:
-        ensure_no_network_security_risk(page, where="确认无滑块弹窗前", debug_phone=debug_phone)
+        await ensure_no_network_security_risk(page, where="确认无滑块弹窗前", debug_phone=debug_phone)
         logger.info("未触发验证码，跳过滑块验证")
         if debug_phone:
-            save_login_debug_screenshot(page, debug_phone, "no_captcha")
+            await save_login_debug_screenshot(page, debug_phone, "no_captcha")
         return
 
     # 优先使用 ddddocr 的 slide_match（修正参数顺序 + 尺寸校验，避免其内部 OpenCV 断言）
     # 同时保留 OpenCV 匹配作为兜底方案
-    ocr = DdddOcr(det=False, ocr=False, show_ad=False)
+    # 模型加载与识别都是 CPU 密集的阻塞调用，放到线程中执行，不阻塞事件循环上的其他流程
+    ocr = await asyncio.to_thread(DdddOcr, det=False, ocr=False, show_ad=False)
     import cv2
     import numpy as np
 
     for attempt in range(1, max_retry + 1):
         logger.info(f"[滑块] 第 {attempt} 次尝试")
 
-        for scope in _scopes(page):
+        # 只在包含滑块弹窗的 frame 中尝试（不再在每个 frame 上各等一次图片超时）
+        async for scope, _ in frame_resolver(page).candidates(YIDUN_MODAL_SELECTOR):
             try:
                 # 等待真实图片加载（避免加载占位图）
-                wait_real_image(scope, "img.yidun_bg-img")
-                wait_real_image(scope, "img.yidun_jigsaw", min_width=40)
+                await wait_real_image(scope, "img.yidun_bg-img")
+                await wait_real_image(scope, "img.yidun_jigsaw", min_width=40)
 
                 # 下载背景图和滑块图
-                bg_bytes = download_img(scope, "img.yidun_bg-img")
-                slider_bytes = download_img(scope, "img.yidun_jigsaw")
+                bg_bytes = await download_img(scope, "img.yidun_bg-img")
+                slider_bytes = await download_img(scope, "img.yidun_jigsaw")
 
                 # 校验图片有效性
                 if len(bg_bytes) < 5000 or len(slider_bytes) < 1000:
@@ -404,7 +383,7 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
                 # 优先使用 ddddocr 的 slide_match：
                 # 关键点：按照“小图在前、背景在后”的顺序传参，避免其内部 OpenCV 尺寸断言
                 try:
-                    res = ocr.slide_match(slider_bytes, bg_bytes)
+                    res = await asyncio.to_thread(ocr.slide_match, slider_bytes, bg_bytes)
                     target_x = float(res["target"][0])
                     logger.info(f"[滑块] ddddocr 识别位移：{target_x:.2f} 像素")
                 except Exception as e:
@@ -422,7 +401,7 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
 
                 # 获取滑块位置，准备拖动
                 slider = scope.locator(".yidun_slider__icon").first
-                box = slider.bounding_box()
+                box = await slider.bounding_box()
                 if not box:
                     raise RuntimeError("无法获取滑块位置，跳过本次拖动")
 
@@ -430,8 +409,8 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
                 start_y = box["y"] + box["height"] / 2
 
                 # 人类模拟拖动轨迹（避免被风控）
-                page.mouse.move(start_x, start_y)
-                page.mouse.down()
+                await page.mouse.move(start_x, start_y)
+                await page.mouse.down()
 
                 total = target_x
                 cur = 0
@@ -439,33 +418,33 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
                     step = min(total - cur, max(2, cur * 0.08))  # 先慢后快
                     cur += step
                     # 轻微上下抖动，模拟人类操作
-                    page.mouse.move(start_x + cur, start_y + (0.5 - time.time() % 1))
-                    time.sleep(0.015)
+                    await page.mouse.move(start_x + cur, start_y + (0.5 - time.time() % 1))
+                    await asyncio.sleep(0.015)
 
                 # 轻微回拉（反机器人风控）
-                page.mouse.move(start_x + total - 2, start_y, steps=2)
-                time.sleep(0.05)
-                page.mouse.move(start_x + total, start_y, steps=2)
+                await page.mouse.move(start_x + total - 2, start_y, steps=2)
+                await asyncio.sleep(0.05)
+                await page.mouse.move(start_x + total, start_y, steps=2)
 
-                page.mouse.up()
-                time.sleep(2)  # 等待验证结果
+                await page.mouse.up()
+                await asyncio.sleep(2)  # 等待验证结果
 
                 # 验证成功判断：滑块元素消失
-                if scope.locator(".yidun_slider__icon").count() == 0:
+                if await scope.locator(".yidun_slider__icon").count() == 0:
                     logger.info("[滑块] 验证码验证成功！")
                     return
 
                 # 验证失败，刷新验证码后重试：必须 break 出内层 scope 循环，下一轮 attempt 再重新扫 scope 等新图
                 if attempt < max_retry:
                     logger.info(f"[滑块] 第 {attempt} 次失败，刷新验证码重试")
-                    scope.locator(".yidun_refresh").first.click()
-                    time.sleep(2)  # 等新验证码 DOM 与图片加载
+                    await scope.locator(".yidun_refresh").first.click()
+                    await asyncio.sleep(2)  # 等新验证码 DOM 与图片加载
                     break  # 跳出 for scope，进入下一 attempt，重新从第一个 scope 开始等新图
             except cv2.error as e:
                 # 捕获 OpenCV 相关错误，单独兜底
                 logger.warning(f"[滑块] OpenCV 处理失败：{str(e)}，跳过本次尝试")
                 if attempt < max_retry:
-                    time.sleep(1)
+                    await asyncio.sleep(1)
                 continue
             except Exception as e:
                 # 捕获其他所有异常，避免流程中断
@@ -474,10 +453,10 @@ def solve_slider_captcha(page: Page | Frame, max_retry: int = 3, *, debug_phone:
 
     logger.error(f"[滑块] 累计 {max_retry} 次尝试均失败，放弃滑块验证（请手动完成或检查网络/验证码样式）")
     if debug_phone:
-        save_login_debug_screenshot(page, debug_phone, "slider_failed")
+        await save_login_debug_screenshot(page, debug_phone, "slider_failed")
 
 
-def check_secondary_verification(page: Page | Frame, timeout: int = 10, *, auto_action: bool = True) -> bool:
+async def check_secondary_verification(page: Page | Frame, timeout: int = 10, *, auto_action: bool = True) -> bool:
     """
     检查是否需要二次验证（登录安全验证弹窗）。
     如果出现二次验证弹窗，记录日志并返回 True。
@@ -488,108 +467,104 @@ def check_secondary_verification(page: Page | Frame, timeout: int = 10, *, auto_
     """
     deadline = time.time() + timeout
     while time.time() < deadline:
-        for scope in _scopes(page):
+        async for scope, _ in frame_resolver(page).candidates(".mrc-modal-container"):
             try:
-                modal = scope.locator(".mrc-modal-container")
-                title = scope.get_by_text("登录安全验证", exact=False)
-                
                 # 有时弹窗标题文案会变化，不能强依赖 title；只要容器存在就认为进入二次验证流程
-                if modal.count() > 0:
-                    logger.warning("[二次验证] 检测到登录安全验证弹窗，需要额外验证")
-                    pw_page: Page = page if isinstance(page, Page) else page.page
+                logger.warning("[二次验证] 检测到登录安全验证弹窗，需要额外验证")
+                pw_page: Page = page if isinstance(page, Page) else page.page
 
-                    if not auto_action:
-                        return True
+                if not auto_action:
+                    return True
                     
-                    # 检查可用的验证方式
-                    verification_options = scope.locator(".mjZhxAab")
-                    option_count = verification_options.count()
+                # 检查可用的验证方式
+                verification_options = scope.locator(".mjZhxAab")
+                option_count = await verification_options.count()
                     
-                    if option_count > 0:
-                        logger.info(f"[二次验证] 发现 {option_count} 种验证方式")
-
-                        # 优先：原设备扫码验证（可生成二维码供手机扫码确认）
-                        for i in range(option_count):
-                            try:
-                                option = verification_options.nth(i)
-                                option_text = option.locator("span.DwyRKeOe").first.inner_text(timeout=1000)
-                                if "原设备扫码验证" in option_text:
-                                    logger.info("[二次验证] 尝试点击「原设备扫码验证」并抓取 pollingToken")
-                                    try:
-                                        with pw_page.expect_response(
+                if option_count > 0:
+                    logger.info(f"[二次验证] 发现 {option_count} 种验证方式")
+
+                    # 优先：原设备扫码验证（可生成二维码供手机扫码确认）
+                    for i in range(option_count):
+                        try:
+                            option = verification_options.nth(i)
+                            option_text = await option.locator("span.DwyRKeOe").first.inner_text(timeout=1000)
+                            if "原设备扫码验证" in option_text:
+                                logger.info("[二次验证] 尝试点击「原设备扫码验证」并抓取 pollingToken")
+                                try:
+                                    with span(SPAN_EXPECT_RESPONSE, api="scan-apply/start"):
+                                        async with pw_page.expect_response(
                                             lambda r: "/weapi/login/origin-device/scan-apply/start" in r.url,
                                             timeout=15000,
                                         ) as resp_info:
-                                            option.click()
-                                        resp = resp_info.value
-                                        payload = resp.json()
-                                        polling_token = (
-                                            (payload or {})
-                                            .get("data", {})
-                                            .get("pollingToken")
+                                            await option.click()
+                                        resp = await resp_info.value
+                                    payload = await resp.json()
+                                    polling_token = (
+                                        (payload or {})
+                                        .get("data", {})
+                                        .get("pollingToken")
+                                    )
+                                    if polling_token:
+                                        qr_uri = (
+                                            "orpheus://rnpage?"
+                                            "component=rn-account-verify&isTheme=true&immersiveMode=true&route=confirmOldDevice"
+                                            f"&pollingToken={polling_token}"
+                                        )
+                                        qr_url = (
+                                            "https://api.pwmqr.com/qrcode/create/?url="
+                                            + urllib.parse.quote(qr_uri, safe="")
                                         )
-                                        if polling_token:
-                                            qr_uri = (
-                                                "orpheus://rnpage?"
-                                                "component=rn-account-verify&isTheme=true&immersiveMode=true&route=confirmOldDevice"
-                                                f"&pollingToken={polling_token}"
-                                            )
-                                            qr_url = (
-                                                "https://api.pwmqr.com/qrcode/create/?url="
-                                                + urllib.parse.quote(qr_uri, safe="")
-                                            )
-                                            logger.warning(f"[二次验证] 扫码二维码链接：{qr_url}")
-                                            # 标记：已进入扫码验证流程，后续应至少等待一段时间给用户扫码
-                                            try:
-                                                setattr(pw_page, "_secondary_scan_started_at", time.time())
-                                            except Exception:
-                                                pass
-                                        else:
-                                            logger.warning(f"[二次验证] 未从接口返回中提取到 pollingToken：{payload}")
-                                    except Exception as e:
-                                        logger.warning(f"[二次验证] 监听 scan-apply/start 接口失败：{e}")
-                                        option.click()
-                                    return True
-                            except Exception:
-                                continue
-
-                        # 其次：原设备确认（有些情况还需要再输入验证码，成功率不如扫码）
-                        for i in range(option_count):
-                            try:
-                                option = verification_options.nth(i)
-                                option_text = option.locator("span.DwyRKeOe").first.inner_text(timeout=1000)
-                                if "原设备确认" in option_text:
-                                    logger.info("[二次验证] 尝试点击「原设备确认」")
-                                    option.click()
-                                    time.sleep(2)
-                                    # 检查弹窗是否消失
-                                    if scope.locator(".mrc-modal-container").count() == 0:
-                                        logger.info("[二次验证] 原设备确认成功，弹窗已关闭")
-                                        return False
-                                    break
-                            except Exception:
-                                continue
+                                        logger.warning(f"[二次验证] 扫码二维码链接：{qr_url}")
+                                        # 标记：已进入扫码验证流程，后续应至少等待一段时间给用户扫码
+                                        try:
+                                            setattr(pw_page, "_secondary_scan_started_at", time.time())
+                                        except Exception:
+                                            pass
+                                    else:
+                                        logger.warning(f"[二次验证] 未从接口返回中提取到 pollingToken：{payload}")
+                                except Exception as e:
+                                    logger.warning(f"[二次验证] 监听 scan-apply/start 接口失败：{e}")
+                                    await option.click()
+                                return True
+                        except Exception:
+                            continue
+
+                    # 其次：原设备确认（有些情况还需要再输入验证码，成功率不如扫码）
+                    for i in range(option_count):
+                        try:
+                            option = verification_options.nth(i)
+                            option_text = await option.locator("span.DwyRKeOe").first.inner_text(timeout=1000)
+                            if "原设备确认" in option_text:
+                                logger.info("[二次验证] 尝试点击「原设备确认」")
+                                await option.click()
+                                await asyncio.sleep(2)
+                                # 检查弹窗是否消失
+                                if await scope.locator(".mrc-modal-container").count() == 0:
+                                    logger.info("[二次验证] 原设备确认成功，弹窗已关闭")
+                                    return False
+                                break
+                        except Exception:
+                            continue
                         
-                        # 如果自动处理失败，记录需要手动处理
-                        logger.warning(
-                            "[二次验证] 无法自动完成二次验证，请手动选择验证方式：\n"
-                            "  - 短信验证\n"
-                            "  - 原设备确认\n"
-                            "  - 原设备扫码验证\n"
-                            "  - 微信授权验证"
-                        )
-                        return True
-                    
+                    # 如果自动处理失败，记录需要手动处理
+                    logger.warning(
+                        "[二次验证] 无法自动完成二次验证，请手动选择验证方式：\n"
+                        "  - 短信验证\n"
+                        "  - 原设备确认\n"
+                        "  - 原设备扫码验证\n"
+                        "  - 微信授权验证"
+                    )
+                    return True
             except Exception:
                 continue
         
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
     
     logger.debug("[二次验证] 未检测到二次验证弹窗")
     return False
 
 
-def do_login_with_phone(page: Page | Frame, phone: str, password: str):
+async def do_login_with_phone(page: Page | Frame, phone: str, password: str):
     """
     按你给的 DOM/文字说明，依次点击：
     1. 选择其他登录模式
@@ -600,48 +575,60 @@ def do_login_with_phone(page: Page | Frame, phone: str, password: str):
     6. 点击登录
     """
     # 1. 点击「选择其他登录模式」
-    _click_first(page, "选择其他登录模式", exact_text=True)
+    await _click_first(page, "选择其他登录模式", exact_text=True)
     logger.info("已点击「选择其他登录模式」")
 
     # 2. 勾选协议复选框
-    _check_first(page, "#j-official-terms")
+    await _check_first(page, "#j-official-terms")
     logger.info("已勾选协议复选框")
 
     # 3. 点击「手机号登录/注册」
-    _click_first(page, "a:has(div:has-text('手机号登录/注册'))")
+    await _click_first(page, "a:has(div:has-text('手机号登录/注册'))")
     logger.info("已点击「手机号登录/注册」")
 
     # 4. 等弹窗出来，点击「密码登录」
     # 注意：这一步经常出现在主文档的弹窗里，所以要重新在所有 scope 中找
     # 有时文案/空格会有细微变化，先尝试精确文本，再退回到模糊 text 选择器
     try:
-        _click_first(page, "密码登录", exact_text=True, timeout=20000)
+        await _click_first(page, "密码登录", exact_text=True, timeout=20000)
         logger.info("已点击「密码登录」（精确匹配）")
     except Exception as e:
         logger.warning(f"精确文本『密码登录』点击失败，改用模糊匹配：{e}")
-        _click_first(page, "text=密码登录", exact_text=False, timeout=20000)
+        await _click_first(page, "text=密码登录", exact_text=False, timeout=20000)
         logger.info("已点击「密码登录」（模糊匹配）")
-    time.sleep(random.uniform(0.2, 0.5))
+    await asyncio.sleep(random.uniform(0.2, 0.5))
 
     # 5. 输入手机号
-    _fill_first(page, "input[placeholder='请输入手机号']", phone)
+    await _fill_first(page, "input[placeholder='请输入手机号']", phone)
     logger.info("已输入手机号")
-    time.sleep(random.uniform(0.2, 0.5))
+    await asyncio.sleep(random.uniform(0.2, 0.5))
 
     # 6. 输入密码
-    _fill_first(page, "input[placeholder='请输入密码']", password)
+    await _fill_first(page, "input[placeholder='请输入密码']", password)
     logger.info("已输入密码")
-    time.sleep(random.uniform(0.2, 0.5))
+    await asyncio.sleep(random.uniform(0.2, 0.5))
 
     # 7. 点击「登录」
-    _click_first(page, "a:has(div:has-text('登录'))")
+    await _click_first(page, "a:has(div:has-text('登录'))")
     logger.info("已点击「登录」")
 
 
-def browser_login(phone: str, password: str, profile_dir: str = PROFILE_DIR, headless: bool = True) -> str:
+def browser_login(*args, **kwargs) -> str:
+    """browser_login_async 的同步版本，参数与返回值相同"""
+    return run_sync(browser_login_async(*args, **kwargs))
+
+
+async def browser_login_async(
+    phone: str,
+    password: str,
+    profile_dir: str = PROFILE_DIR,
+    headless: bool = True,
+    verify_timeout: int = 120,
+) -> str:
     """
     供核心逻辑调用的通用浏览器登录函数：
     - 使用 Playwright 完成手机号+密码登录（含滑块）
+    - 需要二次验证时最多等待 verify_timeout 秒（调度运行中按剩余时间传入）
     - 返回 cookie_str，后续由 core.AuthManager 负责写入 Redis 等
     """
     if not phone or not password:
@@ -649,89 +636,64 @@ def browser_login(phone: str, password: str, profile_dir: str = PROFILE_DIR, hea
 
     os.makedirs(os.path.join(_PROJECT_ROOT, "log"), exist_ok=True)
     profile_dir = os.path.join(profile_dir, phone)
-    with sync_playwright() as p:
-        # 反检测配置（保守版本，避免破坏页面功能）
-        context = p.chromium.launch_persistent_context(
-            user_data_dir=profile_dir,
-            headless=headless,
-            viewport={"width": 1280, "height": 800},
-            # 模拟真实浏览器环境
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            locale="zh-CN",
-            timezone_id="Asia/Shanghai",
-            # 容器环境必需参数
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-dev-shm-usage",
-                "--no-sandbox",
-            ],
-        )
-        # 基础反检测脚本
-        context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => false });
-            delete window.cdc_asyncScript;
-            delete window.cdc_file;
-            Object.defineProperty(navigator, 'languages', { get: () => ['zh-CN', 'zh', 'en'] });
-            window.chrome = { runtime: {} };
-        """)
-        page = context.new_page()
+    # 反检测配置（保守版本，避免破坏页面功能）见 browser.STEALTH_*；登录失败退出时不会覆盖已保存的登录态
+    async with user_context(
+        profile_dir, headless=headless, session_key=phone, overwrite_session=True, block_resources=False,
+    ) as context:
+        page = await context.new_page()
 
         logger.info(f"使用 Playwright 打开登录页，账号：{phone}")
-        page.goto(LOGIN_URL, wait_until="domcontentloaded")
+        with span(SPAN_GOTO, url=LOGIN_URL):
+            await page.goto(LOGIN_URL, wait_until="domcontentloaded")
 
         logger.info("开始执行自动登录流程（main frame + 所有 iframe 自动探测）...")
         try:
-            do_login_with_phone(page, phone, password)
+            await do_login_with_phone(page, phone, password)
         except Exception:
-            save_login_debug_screenshot(page, phone, "login_flow_error")
-            context.close()
+            await save_login_debug_screenshot(page, phone, "login_flow_error")
             raise
 
         try:
-            solve_slider_captcha(page, debug_phone=phone)
+            with span(SPAN_CAPTCHA):
+                await solve_slider_captcha(page, debug_phone=phone)
         except NeteaseLoginNetworkRiskError:
-            context.close()
             raise
         except Exception as e:
             logger.warning(f"滑块验证码处理过程出错：{e}")
-            save_login_debug_screenshot(page, phone, "slider_exception")
+            await save_login_debug_screenshot(page, phone, "slider_exception")
 
         # 少数情况下：滑块成功后会回到「密码登录」选项卡，需要重新点并再次触发滑块
         # 这里避免无条件重复 solve_slider_captcha()，否则会出现多次“未触发验证码”的日志与耗时
         for _ in range(3):
-            time.sleep(1)
-            if not _try_click_if_visible(page, "密码登录", exact_text=True, timeout_ms=2500):
+            await asyncio.sleep(1)
+            if not await _try_click_if_visible(page, "密码登录", exact_text=True, timeout_ms=2500):
                 break
             logger.info("[登录] 检测到密码登录选项卡再次出现，已重新点击「密码登录」，继续执行输入与登录")
-            time.sleep(random.uniform(0.2, 0.5))
-            _fill_first(page, "input[placeholder='请输入手机号']", phone)
-            time.sleep(random.uniform(0.2, 0.5))
-            _fill_first(page, "input[placeholder='请输入密码']", password)
-            time.sleep(random.uniform(0.2, 0.5))
-            _click_first(page, "a:has(div:has-text('登录'))", timeout=10000)
-            time.sleep(random.uniform(0.2, 0.5))
+            await asyncio.sleep(random.uniform(0.2, 0.5))
+            await _fill_first(page, "input[placeholder='请输入手机号']", phone)
+            await asyncio.sleep(random.uniform(0.2, 0.5))
+            await _fill_first(page, "input[placeholder='请输入密码']", password)
+            await asyncio.sleep(random.uniform(0.2, 0.5))
+            await _click_first(page, "a:has(div:has-text('登录'))", timeout=10000)
+            await asyncio.sleep(random.uniform(0.2, 0.5))
             logger.info("[登录] 已重新输入账号密码并点击登录")
 
             # 只有检测到滑块容器时才处理滑块
-            if _has_yidun_slider_modal(page):
+            if await _has_yidun_slider_modal(page):
                 try:
-                    solve_slider_captcha(page, debug_phone=phone)
+                    with span(SPAN_CAPTCHA, retry=True):
+                        await solve_slider_captcha(page, debug_phone=phone)
                 except NeteaseLoginNetworkRiskError:
-                    context.close()
                     raise
                 except Exception as e:
                     logger.warning(f"滑块验证码处理过程出错：{e}")
-                    save_login_debug_screenshot(page, phone, "slider_exception")
+                    await save_login_debug_screenshot(page, phone, "slider_exception")
 
-        try:
-            ensure_no_network_security_risk(page, where="登录重试结束后", debug_phone=phone)
-        except NeteaseLoginNetworkRiskError:
-            context.close()
-            raise
+        await ensure_no_network_security_risk(page, where="登录重试结束后", debug_phone=phone)
 
         # 滑块验证完成后，检查是否需要二次验证
         try:
-            needs_secondary = check_secondary_verification(page, timeout=10)
+            needs_secondary = await check_secondary_verification(page, timeout=10)
             if needs_secondary:
                 logger.warning("[登录] 检测到需要二次验证，等待用户手动完成...")
                 # 扫码验证：最多等 60 秒，每 5 秒检查一次；用户提前完成就立刻继续
@@ -740,49 +702,51 @@ def browser_login(phone: str, password: str, profile_dir: str = PROFILE_DIR, hea
                 except Exception:
                     started_at = None
                 if started_at:
-                    logger.warning("[登录] 已生成扫码二维码链接，开始轮询等待（每 5 秒检查一次，最多 60 秒）...")
-                    scan_deadline = time.time() + 60
+                    scan_wait = min(60, verify_timeout)
+                    logger.warning(f"[登录] 已生成扫码二维码链接，开始轮询等待（每 5 秒检查一次，最多 {scan_wait} 秒）...")
+                    scan_deadline = time.time() + scan_wait
                     while time.time() < scan_deadline:
                         # 被动检测：不重复点击/不重复生成二维码
-                        still_needs_scan = check_secondary_verification(page, timeout=2, auto_action=False)
+                        still_needs_scan = await check_secondary_verification(page, timeout=2, auto_action=False)
                         if not still_needs_scan:
                             logger.info("[登录] 二次验证已完成（扫码），继续登录流程")
                             break
-                        time.sleep(5)
+                        await asyncio.sleep(5)
 
-                # 循环检查，最多等待 120 秒，直到二次验证弹窗消失（被动检测）
-                secondary_deadline = time.time() + 120
+                # 循环检查，最多等待 verify_timeout 秒，直到二次验证弹窗消失（被动检测）
+                secondary_deadline = time.time() + verify_timeout
                 while time.time() < secondary_deadline:
-                    still_needs = check_secondary_verification(page, timeout=2, auto_action=False)
+                    still_needs = await check_secondary_verification(page, timeout=2, auto_action=False)
                     if not still_needs:
                         logger.info("[登录] 二次验证已完成，继续登录流程")
                         break
-                    time.sleep(2)
+                    await asyncio.sleep(2)
                 else:
                     logger.warning("[登录] 二次验证等待超时，继续尝试获取 Cookie")
-                    save_login_debug_screenshot(page, phone, "secondary_verify_timeout")
+                    await save_login_debug_screenshot(page, phone, "secondary_verify_timeout")
         except Exception as e:
             logger.warning(f"检查二次验证时出错：{e}")
-            save_login_debug_screenshot(page, phone, "secondary_verify_error")
+            await save_login_debug_screenshot(page, phone, "secondary_verify_error")
 
         deadline = time.time() + 60
         cookie_str = ""
         login_cookie_ok = False
-        while time.time() < deadline:
-            cookies = context.cookies("https://music.163.com")
-            cookie_str = cookies_to_cookie_str(cookies)
-
-            has_music_u = any(c.get("name") == "MUSIC_U" and c.get("value") for c in cookies)
-            has_csrf = any(c.get("name") == "__csrf" and c.get("value") for c in cookies)
-            if has_music_u or has_csrf:
-                login_cookie_ok = True
-                break
-            time.sleep(1)
+        with span(SPAN_COOKIE_HARVEST) as harvest_span:
+            while time.time() < deadline:
+                cookies = await context.cookies("https://music.163.com")
+                cookie_str = cookies_to_cookie_str(cookies)
+
+                has_music_u = any(c.get("name") == "MUSIC_U" and c.get("value") for c in cookies)
+                has_csrf = any(c.get("name") == "__csrf" and c.get("value") for c in cookies)
+                if has_music_u or has_csrf:
+                    login_cookie_ok = True
+                    break
+                await asyncio.sleep(1)
+            if not login_cookie_ok:
+                harvest_span.fail("未获取到登录 Cookie")
 
         if not login_cookie_ok:
-            save_login_debug_screenshot(page, phone, "no_login_cookie")
-
-        context.close()
+            await save_login_debug_screenshot(page, phone, "no_login_cookie")
 
         if not cookie_str or not login_cookie_ok:
             raise RuntimeError("浏览器登录未获取到任何 Cookie，请检查是否登录成功。")
@@ -5,45 +5,39 @@
 用途：
 - 规避部分场景下直接请求 weapi 接口需要 checkToken 导致的 301/风控问题
 - 通过网页端同源请求拿到接口返回 JSON
+
+各流程基于 playwright.async_api（*_async），同名的同步函数为其包装（见 browser_pool.run_sync）。
 """
 
 from __future__ import annotations
 
 import os
-import time
 from typing import Any
 
-from playwright.sync_api import Frame, Page, sync_playwright
+from playwright.async_api import BrowserContext, Page
 
 from core import logger
+from config import PLAYWRIGHT_PAGE_API
+from playwright_handle.browser import inject_cookie_str, user_context
+from playwright_handle.browser_pool import run_sync
+from playwright_handle.friend import VIP_RIGHT_URL  # 音乐人首页 VIP 区域的续期/领取按钮打开的权益页，打开即自动领取
+from playwright_handle.flow_timing import FLOW_VIP, timed_flow
+from playwright_handle.frames import first_with_selector
+from playwright_handle.page_api import PageApi, PageApiError
+from playwright_handle.sniffer import ResponseSniffer, response_matcher, sniff_navigation
+from tracing import SPAN_EXPECT_RESPONSE, SPAN_GOTO, SPAN_SELECTOR_WAIT, current_span, frame_label, span
 
 MUSICIAN_HOME_URL = "https://music.163.com/musician/artist/home"
 
 VIP_INFO_URL_SUBSTR = "nmusician/workbench/special/right/vip/info"
 VIP_TASK_NAME = "即日起30天内发布图文笔记天数≥4"
 
-
-def _scopes(page: Page | Frame):
-    """
-    兼容可能存在 iframe 的场景：遍历 page.frames，找到第一个包含 selector 的 scope。
-    """
-    yield page
-    if isinstance(page, Page):
-        for fr in page.frames:
-            if fr is page.main_frame:
-                continue
-            yield fr
-
-
-def _first_with_selector(page: Page, selector: str) -> Page | Frame:
-    """在所有 frame 中找到第一个包含指定 selector 的 scope。"""
-    for scope in _scopes(page):
-        try:
-            if scope.locator(selector).count() > 0:
-                return scope
-        except Exception:
-            continue
-    return page
+CYCLE_LIST_RESPONSE = response_matcher("/weapi/nmusician/workbench/mission/cycle/list")
+VIP_INFO_RESPONSE = response_matcher(VIP_INFO_URL_SUBSTR, host="interface.music.163.com")
+# 任务列表返回后，再最多等这么久捕获音乐人首页同时请求的 vip/info
+VIP_INFO_GRACE_MS = 3000
+# vip-container 渲染出来后再等续期/领取按钮的时间（按钮与区域同时渲染，没有按钮时不必等满 timeout）
+VIP_BUTTON_GRACE_MS = 2000
 
 
 def _parse_vip_info_payload(
@@ -110,200 +104,261 @@ def _parse_vip_info_payload(
     return further_vip_get_time
 
 
-def open_vip_right_page_and_listen(
-    profile_dir: str,
+async def _claim_vip_by_page_api(context: BrowserContext, *, timeout_ms: int, vip_further_get_time_callback=None) -> int | None:
+    """
+    直接打开权益页（页面加载即自动领取），不再在音乐人首页轮询并点击续期/领取按钮。
+    优先使用页面自己请求的 vip/info，未捕获到时在页面内调用 vip/info。
+    """
+    page = await context.new_page()
+    try:
+        page.set_default_timeout(timeout_ms)
+        with timed_flow(FLOW_VIP, "权益页") as timer:
+            try:
+                with timer.step("打开权益页并等待 vip/info"), span(SPAN_EXPECT_RESPONSE, api="vip/info", url=VIP_RIGHT_URL):
+                    async with context.expect_event("response", predicate=VIP_INFO_RESPONSE, timeout=timeout_ms) as resp_info:
+                        await page.goto(VIP_RIGHT_URL, wait_until="domcontentloaded")
+                    data = await (await resp_info.value).json()
+            except Exception as e:
+                logger.info(f"未捕获到权益页的 vip/info 响应，改为页面内请求：{e}")
+                with timer.step("页面内请求 vip/info"):
+                    data = await PageApi(page, timeout_ms=timeout_ms).vip_info()
+            further_vip_get_time = _parse_vip_info_payload(data, vip_further_get_time_callback=vip_further_get_time_callback)
+            timer.ok = further_vip_get_time is not None
+            return further_vip_get_time
+    finally:
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+
+async def open_vip_right_page_in_context(
+    context: BrowserContext,
     *,
-    cookie_str: str | None = None,
-    phone: str | None = None,
-    password: str | None = None,
     timeout_ms: int = 30000,
     vip_further_get_time_callback=None,
 ) -> int | None:
     """
-    按你的要求：打开音乐人首页（music.163.com/musician/artist/home），
-    若页面中存在 `vip-container` 区域的续期/领取按钮则点击，并监听 VIP info 接口，
-    从返回里提取 furtherVipGetTime（ms）。
-    """
-
-    os.makedirs("log", exist_ok=True)
+    在已打开的浏览器上下文中领取 VIP，并从 VIP info 接口返回里提取 furtherVipGetTime（ms）。
 
-    def _run_once(_cookie_str: str | None) -> int | None:
-        with sync_playwright() as p:
-            # 反检测配置（保守版本）
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_dir,
-                headless=True,
-                viewport={"width": 1280, "height": 800},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-dev-shm-usage",
-                    "--no-sandbox",
-                ],
+    PLAYWRIGHT_PAGE_API 时直接打开权益页（见 _claim_vip_by_page_api）；否则（或其失败时）打开音乐人首页
+    （music.163.com/musician/artist/home），若页面中存在 `vip-container` 区域的续期/领取按钮则点击，并监听 VIP info 接口。
+    """
+    if PLAYWRIGHT_PAGE_API:
+        try:
+            return await _claim_vip_by_page_api(
+                context, timeout_ms=timeout_ms, vip_further_get_time_callback=vip_further_get_time_callback,
             )
-            context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', { get: () => false });
-                delete window.cdc_asyncScript;
-                delete window.cdc_file;
-                Object.defineProperty(navigator, 'languages', { get: () => ['zh-CN', 'zh', 'en'] });
-                window.chrome = { runtime: {} };
-            """)
-            page = context.new_page()
-
-            if _cookie_str:
-                try:
-                    pw_cookies = _cookie_str_to_playwright_cookies(_cookie_str)
-                    if pw_cookies:
-                        context.add_cookies(pw_cookies)
-                        logger.info(f"已注入 Cookie 到浏览器（{len(pw_cookies)} 条）")
-                except Exception as e:
-                    logger.warning(f"注入 Cookie 失败：{e}")
+        except PageApiError as e:
+            logger.warning(f"{e}，改为在音乐人首页点击领取")
 
-            # 放在 goto 前：如果页面初始化也会请求 vip/info，后续仍能捕获点击后的那次
-            page.set_default_timeout(timeout_ms)
-            page.goto(MUSICIAN_HOME_URL, wait_until="domcontentloaded")
+    with timed_flow(FLOW_VIP, "点击领取") as timer:
+        further_vip_get_time = await _claim_vip_by_clicking(
+            context, timer, timeout_ms=timeout_ms, vip_further_get_time_callback=vip_further_get_time_callback,
+        )
+        timer.ok = further_vip_get_time is not None
+        return further_vip_get_time
 
-            def _is_target(resp) -> bool:
-                try:
-                    return (
-                        VIP_INFO_URL_SUBSTR in resp.url
-                        and "interface.music.163.com" in resp.url
-                        and resp.request.method == "POST"
-                    )
-                except Exception:
-                    return False
-
-            # 页面可能需要更久渲染（SPA 异步加载），不要立刻 count。
-            # 在 timeout_ms 内轮询找到 vip 区域内的续期/领取按钮后再点击。
-            deadline = time.time() + timeout_ms / 1000
-            renew_btn = None
-            while time.time() < deadline and renew_btn is None:
-                for scope in _scopes(page):
+
+async def _find_vip_button(page: Page, timeout_ms: int):
+    """
+    等待音乐人首页 vip-container 区域渲染出来，再等其中的续期/领取按钮（同一次渲染产生，只给 VIP_BUTTON_GRACE_MS）。
+    按钮不在主文档时，再在各 iframe 中找一次。没有按钮时返回 None。
+    """
+    container = page.locator("div.vip-container")
+    button = container.locator("div.link-wrapper span.check").or_(container.locator("span.check")).first
+    sp = current_span()
+    try:
+        await container.first.wait_for(state="attached", timeout=timeout_ms)
+        await button.wait_for(state="visible", timeout=VIP_BUTTON_GRACE_MS)
+        if sp:
+            sp.set(frame="main")
+        return button
+    except Exception:
+        pass
+    scope = await first_with_selector(page, "div.vip-container span.check")
+    if scope is not page:
+        if sp:
+            sp.set(frame=frame_label(scope))
+        return scope.locator("div.vip-container span.check").first
+    return None
+
+
+async def _claim_vip_by_clicking(context: BrowserContext, timer, *, timeout_ms: int, vip_further_get_time_callback=None) -> int | None:
+    """
+    打开音乐人首页，点击 vip-container 区域的续期/领取按钮，从随后的 vip/info 响应中解析 furtherVipGetTime。
+    按钮可能在新标签页打开权益页，也可能在当前页请求；两种情况都只等 vip/info 响应，不再固定等待新页面。
+    """
+    page = await context.new_page()
+    try:
+        page.set_default_timeout(timeout_ms)
+        # 页面初始化时也会请求 vip/info：没有按钮时直接用这次的结果，不必再 reload
+        with ResponseSniffer(context, {"vip": VIP_INFO_RESPONSE}) as sniffer:
+            with timer.step("打开首页"), span(SPAN_GOTO, url=MUSICIAN_HOME_URL):
+                await page.goto(MUSICIAN_HOME_URL, wait_until="domcontentloaded")
+            with timer.step("等待按钮"), span(SPAN_SELECTOR_WAIT, selector="div.vip-container span.check") as sp:
+                renew_btn = await _find_vip_button(page, timeout_ms)
+                if renew_btn is None:
+                    sp.fail("未找到 VIP 按钮", outcome="not_found")
+            initial = (await sniffer.results()).get("vip")
+
+        if renew_btn is not None:
+            logger.info("找到 VIP 续期/领取按钮，点击并等待 vip/info 接口...")
+            new_pages: list[Page] = []
+            on_page = new_pages.append
+            context.on("page", on_page)
+            try:
+                with timer.step("点击并等待 vip/info"), span(SPAN_EXPECT_RESPONSE, api="vip/info", action="click"):
+                    async with context.expect_event("response", predicate=VIP_INFO_RESPONSE, timeout=timeout_ms) as resp_info:
+                        # force=True 绕过覆盖层检查，也不需要先滚动
+                        await renew_btn.click(force=True)
+                    data = await (await resp_info.value).json()
+                if new_pages:
+                    logger.info("点击后打开了 VIP 权益页，已收到 vip/info，关闭该页")
+                return _parse_vip_info_payload(data, vip_further_get_time_callback=vip_further_get_time_callback)
+            except Exception as e:
+                logger.warning(f"点击 VIP 按钮后捕获/解析 vip/info 接口失败：{e}")
+                return None
+            finally:
+                context.remove_listener("page", on_page)
+                for extra in new_pages:
                     try:
-                        vip_container = scope.locator("div.vip-container")
-                        if vip_container.count() == 0:
-                            continue
+                        await extra.close()
+                    except Exception:
+                        pass
 
-                        btn = vip_container.locator("div.link-wrapper span.check")
-                        if btn.count() == 0:
-                            btn = vip_container.locator("span.check")
+        if initial is not None:
+            logger.warning("未找到 VIP 按钮：使用页面加载时的 vip/info 获取 furtherVipGetTime")
+            return _parse_vip_info_payload(initial.data, vip_further_get_time_callback=vip_further_get_time_callback)
 
-                        if btn.count() > 0:
-                            renew_btn = btn.first
-                            break
-                    except Exception:
-                        continue
+        logger.warning("未找到 VIP 按钮且页面未请求 vip/info：reload 后再监听一次...")
+        try:
+            with timer.step("reload 等待 vip/info"), span(SPAN_EXPECT_RESPONSE, api="vip/info", action="reload"):
+                # 先启动监听，再 reload（避免竞态）
+                async with context.expect_event("response", predicate=VIP_INFO_RESPONSE, timeout=timeout_ms) as resp_info:
+                    await page.reload(wait_until="domcontentloaded")
+                data = await (await resp_info.value).json()
+            return _parse_vip_info_payload(data, vip_further_get_time_callback=vip_further_get_time_callback)
+        except Exception as e:
+            logger.warning(f"监听 vip/info 接口失败：{e}")
+            return None
+    finally:
+        try:
+            await page.close()
+        except Exception:
+            pass
 
-                if renew_btn is None:
-                    page.wait_for_timeout(500)
 
-            if renew_btn is not None:
-                try:
-                    renew_btn.wait_for(state="visible", timeout=timeout_ms // 2)
-                except Exception:
-                    pass
+def open_vip_right_page_and_listen(*args, **kwargs) -> int | None:
+    """open_vip_right_page_and_listen_async 的同步版本，参数与返回值相同"""
+    return run_sync(open_vip_right_page_and_listen_async(*args, **kwargs))
 
-                logger.info("找到 VIP 续期/领取按钮，准备点击并监听 vip/info 接口...")
-                try:
-                    # 先滚动到元素位置，确保可见
-                    renew_btn.scroll_into_view_if_needed()
-                    page.wait_for_timeout(500)
-
-                    # 同时监听新页面打开和接口响应
-                    with context.expect_event("response", predicate=_is_target, timeout=timeout_ms) as resp_info:
-                        # 监听新页面（点击可能会打开新标签页）
-                        with context.expect_page(timeout=5000) as new_page_info:
-                            # 使用 force=True 强制点击，绕过覆盖层检查
-                            renew_btn.click(force=True)
-
-                        # 如果打开了新页面，等待其加载并等待接口响应
-                        try:
-                            new_page = new_page_info.value
-                            logger.info("检测到新页面打开，等待 VIP 权益页加载...")
-                            new_page.wait_for_load_state("domcontentloaded", timeout=10000)
-                            # 等待一段时间让页面完成自动领取操作
-                            new_page.wait_for_timeout(3000)
-                            logger.info("VIP 权益页已加载，等待自动领取完成...")
-                        except Exception as e:
-                            logger.info(f"未检测到新页面或新页面加载超时（可能在当前页操作）：{e}")
-
-                    resp = resp_info.value
-                    data = resp.json()
-                    return _parse_vip_info_payload(
-                        data,
-                        vip_further_get_time_callback=vip_further_get_time_callback,
-                    )
-                except Exception as e:
-                    logger.warning(f"点击 VIP 按钮后捕获/解析 vip/info 接口失败：{e}")
-                    return None
 
-            logger.warning("未找到 VIP 按钮：仍尝试监听 vip/info 获取 furtherVipGetTime...")
-            try:
-                # 先启动监听，再 reload（避免竞态）
-                with context.expect_event("response", predicate=_is_target, timeout=timeout_ms) as resp_info:
-                    page.reload(wait_until="domcontentloaded")
-                resp = resp_info.value
-                data = resp.json()
-                return _parse_vip_info_payload(
-                    data,
-                    vip_further_get_time_callback=vip_further_get_time_callback,
-                )
-            except Exception as e:
-                logger.warning(f"监听 vip/info 接口失败：{e}")
-                return None
+async def open_vip_right_page_and_listen_async(
+    profile_dir: str,
+    *,
+    cookie_str: str | None = None,
+    phone: str | None = None,
+    password: str | None = None,
+    timeout_ms: int = 30000,
+    vip_further_get_time_callback=None,
+) -> int | None:
+    """
+    单独启动浏览器执行 open_vip_right_page_in_context，返回 furtherVipGetTime（ms）。
+    注入的 Cookie 未登录且提供了账号密码时，登录刷新 profile 后重试一次。
+    """
+
+    os.makedirs("log", exist_ok=True)
 
-            # context.close() 不需要手动写在 finally：sync_playwright 会在 with 退出时清理
+    async def _run_once(_cookie_str: str | None) -> int | None:
+        async with user_context(profile_dir, session_key=phone) as context:
+            await inject_cookie_str(context, _cookie_str)
+            return await open_vip_right_page_in_context(
+                context,
+                timeout_ms=timeout_ms,
+                vip_further_get_time_callback=vip_further_get_time_callback,
+            )
 
     # 第一次尝试：用传入 cookie 注入（如果有）
-    res = _run_once(cookie_str)
+    res = await _run_once(cookie_str)
     if res is not None:
         return res
 
     # 若未成功且给了账号密码，则执行登录刷新 profile，再重试一次（不再依赖旧 cookie）
     if phone and password:
         logger.info("首次未成功解析 furtherVipGetTime，尝试 Playwright 登录刷新浏览器态后重试一次...")
-        from playwright_handle.login import browser_login
+        from playwright_handle.login import browser_login_async
 
         try:
-            new_cookie_str = browser_login(phone, password, profile_dir=profile_dir)
+            new_cookie_str = await browser_login_async(phone, password, profile_dir=profile_dir)
         except Exception as e:
             logger.error(f"Playwright 登录失败：{e}")
             return None
-        return _run_once(new_cookie_str)
+        return await _run_once(new_cookie_str)
 
     return res
 
 
-def _cookie_str_to_playwright_cookies(cookie_str: str) -> list[dict]:
-    """
-    将 "k=v; k2=v2" 转成 Playwright 可 add_cookies 的结构。
-    注：只用于 music.163.com 域下的简单 Cookie 注入。
+async def fetch_cycle_missions_in_context(
+    context: BrowserContext,
+    *,
+    timeout_ms: int = 30000,
+    vip_further_get_time_callback=None,
+) -> dict[str, Any]:
     """
-    cookies: list[dict] = []
-    if not cookie_str:
-        return cookies
-    for item in cookie_str.split(";"):
-        item = item.strip()
-        if "=" not in item:
-            continue
-        k, v = item.split("=", 1)
-        k = k.strip()
-        if not k:
-            continue
-        cookies.append(
-            {
-                "name": k,
-                "value": v,
-                "domain": ".music.163.com",
-                "path": "/",
-            }
-        )
-    return cookies
+    在已打开的浏览器上下文中打开 https://music.163.com/musician/artist/home 并捕获
+    /weapi/nmusician/workbench/mission/cycle/list 接口返回。
+    同一次页面加载中顺带取得 vip/info，解析出的 furtherVipGetTime 交给 vip_further_get_time_callback，
+    VIP 状态不再需要单独打开一次浏览器。
 
+    PLAYWRIGHT_PAGE_API 时改为在页面内直接请求这两个接口（见 page_api），请求失败或返回意外的错误码时回退为监听。
 
-def get_musician_cycle_mission_by_playwright(
+    返回：
+    - 成功：接口响应 JSON（dict）
+    - 失败：{"code": 250, "msg": "..."}
+    """
+    if PLAYWRIGHT_PAGE_API:
+        try:
+            async with PageApi.open(context, timeout_ms=timeout_ms) as api:
+                res = await api.cycle_missions()
+                if res.get("code") == 200 and vip_further_get_time_callback:
+                    try:
+                        _parse_vip_info_payload(await api.vip_info(), vip_further_get_time_callback=vip_further_get_time_callback)
+                    except PageApiError as e:
+                        logger.warning(f"获取 VIP 状态失败：{e}")
+            # 301 为未登录，交给调用方登录后重试；其他错误码可能是页面内请求被风控，回退为监听页面自己的请求
+            if res.get("code") in (200, 301):
+                return res
+            logger.warning(f"页面内请求 cycle/list 返回 code={res.get('code')}，改为打开音乐人后台监听接口")
+        except PageApiError as e:
+            logger.warning(f"{e}，改为打开音乐人后台监听接口")
+
+    logger.info("打开音乐人后台首页，并等待 cycle mission 接口返回...")
+    targets = {"missions": CYCLE_LIST_RESPONSE}
+    if vip_further_get_time_callback:
+        targets["vip"] = VIP_INFO_RESPONSE
+    # domcontentloaded 更快，接口通常在页面初始化阶段就会请求
+    results = await sniff_navigation(
+        context, MUSICIAN_HOME_URL, targets, timeout_ms=timeout_ms, wait_for=["missions"], grace_ms=VIP_INFO_GRACE_MS,
+    )
+
+    if "vip" in results:
+        _parse_vip_info_payload(results["vip"].data, vip_further_get_time_callback=vip_further_get_time_callback)
+
+    missions = results.get("missions")
+    if missions is None:
+        return {"code": 250, "msg": f"未捕获到 cycle/list 接口响应（timeout={timeout_ms}ms）"}
+    logger.info(f"捕获请求：POST {missions.url}（{missions.elapsed_ms}ms）")
+    data = missions.data
+    return data if isinstance(data, dict) else {"code": 250, "msg": "接口返回不是 JSON 对象", "data": data}
+
+
+def get_musician_cycle_mission_by_playwright(*args, **kwargs) -> dict[str, Any]:
+    """get_musician_cycle_mission_by_playwright_async 的同步版本，参数与返回值相同"""
+    return run_sync(get_musician_cycle_mission_by_playwright_async(*args, **kwargs))
+
+
+async def get_musician_cycle_mission_by_playwright_async(
     profile_dir: str,
     *,
     cookie_str: str | None = None,
@@ -312,10 +367,10 @@ def get_musician_cycle_mission_by_playwright(
     actionType: str = "102",
     platform: str = "200",
     timeout_ms: int = 30000,
+    vip_further_get_time_callback=None,
 ) -> dict[str, Any]:
     """
-    打开 https://music.163.com/musician/artist/home 并监听
-    /weapi/nmusician/workbench/mission/cycle/list 接口返回。
+    单独启动浏览器执行 fetch_cycle_missions_in_context（同时通过 vip_further_get_time_callback 刷新 VIP 状态）。
 
     返回：
     - 成功：接口响应 JSON（dict）
@@ -323,97 +378,29 @@ def get_musician_cycle_mission_by_playwright(
     """
     os.makedirs("log", exist_ok=True)
 
-    def _run_once(_cookie_str: str | None) -> dict[str, Any]:
-        with sync_playwright() as p:
-            # 反检测配置（保守版本）
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_dir,
-                headless=True,
-                viewport={"width": 1280, "height": 800},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-dev-shm-usage",
-                    "--no-sandbox",
-                ],
+    async def _run_once(_cookie_str: str | None) -> dict[str, Any]:
+        async with user_context(profile_dir, session_key=phone) as context:
+            await inject_cookie_str(context, _cookie_str)
+            return await fetch_cycle_missions_in_context(
+                context, timeout_ms=timeout_ms, vip_further_get_time_callback=vip_further_get_time_callback,
             )
-            context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', { get: () => false });
-                delete window.cdc_asyncScript;
-                delete window.cdc_file;
-                Object.defineProperty(navigator, 'languages', { get: () => ['zh-CN', 'zh', 'en'] });
-                window.chrome = { runtime: {} };
-            """)
-            page = context.new_page()
-
-            # 先注入 cookie（如果有），避免打开后是未登录态
-            if _cookie_str:
-                try:
-                    pw_cookies = _cookie_str_to_playwright_cookies(_cookie_str)
-                    if pw_cookies:
-                        context.add_cookies(pw_cookies)
-                        logger.info(f"已注入 Cookie 到浏览器（{len(pw_cookies)} 条）")
-                except Exception as e:
-                    logger.warning(f"注入 Cookie 失败：{e}")
-
-            # 监听循环任务列表接口（需要在触发请求之前开始监听，避免竞态）
-            def _is_target(resp) -> bool:
-                try:
-                    return (
-                        "/weapi/nmusician/workbench/mission/cycle/list" in resp.url
-                        and resp.request.method == "POST"
-                    )
-                except Exception:
-                    return False
-
-            logger.info("打开音乐人后台首页，并等待 cycle mission 接口返回...")
-            try:
-                with page.expect_response(_is_target, timeout=timeout_ms) as resp_info:
-                    # domcontentloaded 更快，接口通常在页面初始化阶段就会请求
-                    page.goto(MUSICIAN_HOME_URL, wait_until="domcontentloaded")
-                resp = resp_info.value
-            except Exception as e:
-                context.close()
-                return {"code": 250, "msg": f"未捕获到 cycle/list 接口响应（timeout={timeout_ms}ms）：{e}"}
-
-            # 打印请求体（便于确认 actionType/platform）
-            try:
-                req = resp.request
-                logger.info(f"捕获请求：{req.method} {req.url}")
-            except Exception:
-                pass
-
-            try:
-                data = resp.json()
-            except Exception as e:
-                try:
-                    txt = resp.text()
-                except Exception:
-                    txt = ""
-                context.close()
-                return {"code": 250, "msg": f"解析接口 JSON 失败：{e}", "raw": txt[:500]}
-
-            context.close()
-            return data if isinstance(data, dict) else {"code": 250, "msg": "接口返回不是 JSON 对象", "data": data}
 
     # 第一次尝试：用传入 cookie 注入（如果有）
-    res = _run_once(cookie_str)
+    res = await _run_once(cookie_str)
     if isinstance(res, dict) and res.get("code") == 200:
         return res
 
     # 若仍未登录且给了账号密码，则执行登录刷新 profile，再重试一次（不再依赖旧 cookie）
     if phone and password:
         logger.info("首次未成功获取任务列表，尝试 Playwright 登录刷新浏览器态后重试一次...")
-        from playwright_handle.login import browser_login
+        from playwright_handle.login import browser_login_async
 
         try:
-            new_cookie_str = browser_login(phone, password, profile_dir=profile_dir)
+            new_cookie_str = await browser_login_async(phone, password, profile_dir=profile_dir)
         except Exception as e:
             logger.error(f"Playwright 登录失败：{e}")
             return {"code": 301, "msg": f"playwright login failed: {e}"}
-        return _run_once(new_cookie_str)
+        return await _run_once(new_cookie_str)
 
     return res
 
@@ -0,0 +1,193 @@
+"""
+在已登录的 music.163.com 页面内直接调用 weapi。
+
+浏览器步骤原先靠点击页面（#pubEvent、搜索配乐、分享按钮、轮询 span.check）来触发同源请求，
+只是为了让请求带上页面的登录态与 checkToken。这里改为在页面里用 page.evaluate 发起同一批请求：
+
+- 请求由页面的 fetch 发出（同源、带 Cookie，与点击触发的请求一致）
+- 参数用页面自带的 window.asrsea 加密；页面尚未加载出该函数时改用 NeteaseSecurity.encrypt_weapi 加密后交给页面发送
+- checkToken 用项目中的 checkToken.js 在页面的 JS 引擎里生成（不再需要 Node.js / execjs）
+
+请求失败（网络异常、返回非 JSON）时抛出 PageApiError，由调用方回退到点击页面的流程；
+接口本身的错误码（如未登录 301）原样返回。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any
+
+from playwright.async_api import BrowserContext, Page
+
+from core import CryptoUtil, NeteaseSecurity, logger
+from tracing import SPAN_GOTO, span
+
+PAGE_API_HOME_URL = "https://music.163.com/"
+MUSIC_ORIGIN = "https://music.163.com"
+INTERFACE_ORIGIN = "https://interface.music.163.com"
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CHECK_TOKEN_JS = os.path.join(_PROJECT_ROOT, "checkToken.js")
+
+# 参数：{url, data, form, pubKey, modulus, nonce, tokenSource, timeoutMs}
+# form 为空且页面没有 asrsea 时返回 {needForm: true, data}，由 Python 加密后再调用一次
+_CALL_JS = """
+async (args) => {
+    const data = Object.assign({}, args.data);
+    if (args.tokenSource && !data.checkToken) {
+        try {
+            data.checkToken = new Function("var data;\\n" + args.tokenSource + "\\nreturn get_token();")();
+        } catch (e) {}
+    }
+    let form = args.form;
+    if (!form) {
+        if (typeof window.asrsea !== "function") {
+            return {needForm: true, data};
+        }
+        const enc = window.asrsea(JSON.stringify(data), args.pubKey, args.modulus, args.nonce);
+        form = {params: enc.encText, encSecKey: enc.encSecKey};
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), args.timeoutMs);
+    try {
+        const resp = await fetch(args.url, {
+            method: "POST",
+            credentials: "include",
+            headers: {"Content-Type": "application/x-www-form-urlencoded"},
+            body: new URLSearchParams(form).toString(),
+            signal: controller.signal,
+        });
+        return {status: resp.status, text: await resp.text()};
+    } finally {
+        clearTimeout(timer);
+    }
+}
+"""
+
+_check_token_source: str | None = None
+
+
+class PageApiError(Exception):
+    """页面内请求未能得到接口 JSON（网络异常、页面已关闭、返回非 JSON）"""
+
+
+def _load_check_token_source() -> str:
+    global _check_token_source
+    if _check_token_source is None:
+        try:
+            with open(CHECK_TOKEN_JS, "r", encoding="utf-8") as f:
+                _check_token_source = f.read()
+        except OSError as e:
+            logger.warning(f"读取 checkToken.js 失败，页面内请求将不携带 checkToken：{e}")
+            _check_token_source = ""
+    return _check_token_source
+
+
+class PageApi:
+    """绑定到一个已打开 music.163.com 的页面；只能在创建该页面的事件循环中使用。"""
+
+    def __init__(self, page: Page, *, timeout_ms: int = 30000):
+        self.page = page
+        self.timeout_ms = timeout_ms
+
+    @classmethod
+    @asynccontextmanager
+    async def open(cls, context: BrowserContext, *, url: str = PAGE_API_HOME_URL, timeout_ms: int = 30000):
+        """新开一个页面并打开 url（只等 domcontentloaded），退出时关闭"""
+        page = await context.new_page()
+        try:
+            page.set_default_timeout(timeout_ms)
+            try:
+                with span(SPAN_GOTO, url=url):
+                    await page.goto(url, wait_until="domcontentloaded")
+            except Exception as e:
+                raise PageApiError(f"打开 {url} 失败：{e}") from e
+            yield cls(page, timeout_ms=timeout_ms)
+        finally:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    async def csrf_token(self) -> str:
+        for cookie in await self.page.context.cookies(MUSIC_ORIGIN):
+            if cookie.get("name") == "__csrf":
+                return cookie.get("value") or ""
+        return ""
+
+    async def call(
+        self, path: str, data: dict | None = None, *, origin: str = MUSIC_ORIGIN, check_token: bool = False,
+    ) -> dict:
+        """在页面内 POST origin + path，返回接口 JSON"""
+        started = time.monotonic()
+        csrf = await self.csrf_token()
+        args = {
+            "url": f"{origin}{path}{'&' if '?' in path else '?'}csrf_token={csrf}",
+            "data": {**(data or {}), "csrf_token": csrf},
+            "form": None,
+            "pubKey": NeteaseSecurity.PUBKEY,
+            "modulus": NeteaseSecurity.MODULUS,
+            "nonce": NeteaseSecurity.NONCE,
+            "tokenSource": _load_check_token_source() if check_token else "",
+            "timeoutMs": self.timeout_ms,
+        }
+        with span("page-api", path=path.split("?")[0]) as sp:
+            try:
+                res = await self.page.evaluate(_CALL_JS, args)
+                if res.get("needForm"):
+                    args["form"] = NeteaseSecurity.encrypt_weapi(res["data"])
+                    res = await self.page.evaluate(_CALL_JS, args)
+            except Exception as e:
+                raise PageApiError(f"页面内请求 {path} 失败：{e}") from e
+            try:
+                payload = json.loads(res.get("text") or "")
+            except ValueError as e:
+                raise PageApiError(
+                    f"页面内请求 {path} 返回非 JSON（HTTP {res.get('status')}）：{(res.get('text') or '')[:100]}"
+                ) from e
+            if not isinstance(payload, dict):
+                raise PageApiError(f"页面内请求 {path} 返回的不是 JSON 对象")
+            sp.set(status=res.get("status"), code=payload.get("code"))
+        logger.info(f"页面内请求 {path}（{int((time.monotonic() - started) * 1000)}ms）：code={payload.get('code')}")
+        return payload
+
+    # ---------- 各业务接口 ----------
+
+    async def cycle_missions(self, actionType: str = "102", platform: str = "200") -> dict[str, Any]:
+        """音乐人循环任务列表（同 TaskManager.get_musician_cycle_mission）"""
+        return await self.call(
+            "/weapi/nmusician/workbench/mission/cycle/list",
+            {"actionType": actionType, "platform": platform},
+            check_token=True,
+        )
+
+    async def reward_obtain(self, userMissionId, period) -> dict[str, Any]:
+        """领取任务奖励（同 TaskManager.reward_obtain）"""
+        return await self.call(
+            "/weapi/nmusician/workbench/mission/reward/obtain/new",
+            {"userMissionId": userMissionId, "period": period},
+        )
+
+    async def search_first_song(self, keyword: str) -> str | None:
+        """搜索歌曲，返回第一条结果的 id（与发笔记时在配乐搜索框中选第一条一致）"""
+        res = await self.call("/weapi/cloudsearch/get/web", {"s": keyword, "type": "1", "offset": "0", "limit": "1"})
+        songs = (res.get("result") or {}).get("songs") or []
+        return str(songs[0]["id"]) if songs and songs[0].get("id") else None
+
+    async def share_song(self, song_id: str, msg: str) -> dict[str, Any]:
+        """发布配乐笔记（同 TaskManager.share_song），成功时返回中带 event.id"""
+        return await self.call(
+            "/weapi/share/friends/resource",
+            {"id": song_id, "type": "song", "msg": msg, "uuid": CryptoUtil.generate_publish_uuid()},
+            check_token=True,
+        )
+
+    async def delete_event(self, event_id) -> dict[str, Any]:
+        return await self.call("/weapi/event/delete", {"id": str(event_id)})
+
+    async def vip_info(self) -> dict[str, Any]:
+        """音乐人 VIP 权益信息（含 furtherVipGetTime 与任务进度）"""
+        return await self.call("/weapi/nmusician/workbench/special/right/vip/info", {}, origin=INTERFACE_ORIGIN)
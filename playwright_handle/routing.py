@@ -0,0 +1,222 @@
+"""
+自动化页面的请求拦截。
+
+发布动态、VIP 领取、音乐人任务列表只需要页面脚本、接口与 DOM（#pubEvent、div.vip-container、cycle/list、vip/info），
+图片、字体、媒体以及统计 / 广告等第三方请求都用不到。通过 context.route 拦截：
+
+- resource_type 属于 PLAYWRIGHT_BLOCKED_RESOURCE_TYPES 的请求
+- 域名不在 PLAYWRIGHT_ALLOWED_HOSTS（后缀匹配）中的第三方请求；页面需要的第三方脚本把域名加进该列表即可
+- 允许的域名下、地址包含 PLAYWRIGHT_BLOCKED_URL_KEYWORDS 的统计上报
+
+登录页不拦截（滑块验证码需要加载图片）。
+
+各页面拦截前后的加载耗时与传输字节数可用基准命令对比（在项目根目录执行）：
+    python playwright_handle/routing.py bench [--phone 13800138000] [--rounds 3]
+基准同时对比放行的 JS/CSS 经由共享静态资源缓存（见 asset_cache）返回时的冷、热加载。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import time
+from urllib.parse import urlsplit
+
+# 单独执行本文件时须先把项目根目录加入 path，否则找不到 core
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from playwright.async_api import BrowserContext, Route
+
+from core import logger
+from run_timing import pad_display
+from config import PLAYWRIGHT_ALLOWED_HOSTS, PLAYWRIGHT_BLOCKED_RESOURCE_TYPES, PLAYWRIGHT_BLOCKED_URL_KEYWORDS
+
+
+def host_allowed(host: str | None, allowed_hosts=PLAYWRIGHT_ALLOWED_HOSTS) -> bool:
+    host = (host or "").lower()
+    return any(host == suffix or host.endswith(f".{suffix}") for suffix in allowed_hosts)
+
+
+def block_reason(url: str, resource_type: str) -> str | None:
+    """需要拦截时返回原因（用于统计），放行返回 None"""
+    if resource_type in PLAYWRIGHT_BLOCKED_RESOURCE_TYPES:
+        return resource_type
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return None
+    if not host_allowed(parts.hostname):
+        return "third_party"
+    lowered = url.lower()
+    if any(keyword in lowered for keyword in PLAYWRIGHT_BLOCKED_URL_KEYWORDS):
+        return "beacon"
+    return None
+
+
+class RouteStats:
+    """一个浏览器上下文中被拦截的请求数（按原因）与共享静态资源缓存的命中情况"""
+
+    def __init__(self):
+        self.blocked: dict[str, int] = {}
+        self.allowed = 0
+        self.cache: dict[str, int] = {}
+        # 由缓存直接返回（未经网络下载）的字节数
+        self.cache_bytes = 0
+
+    @property
+    def blocked_total(self) -> int:
+        return sum(self.blocked.values())
+
+    def summary(self) -> str:
+        detail = "，".join(f"{reason} {count}" for reason, count in sorted(self.blocked.items()))
+        text = f"拦截 {self.blocked_total} 个请求（{detail or '无'}），放行 {self.allowed} 个"
+        if self.cache:
+            text += "；静态资源缓存 " + "，".join(f"{result} {count}" for result, count in sorted(self.cache.items()))
+        return text
+
+
+async def install_route_policy(context: BrowserContext, *, block: bool = True, asset_cache=None) -> RouteStats:
+    """
+    在上下文上安装拦截规则，返回统计。
+    block：是否拦截不需要的请求；asset_cache：放行的 JS/CSS 经由共享静态资源缓存返回（见 asset_cache）。
+    """
+    stats = RouteStats()
+
+    async def _handle(route: Route):
+        request = route.request
+        reason = block_reason(request.url, request.resource_type) if block else None
+        try:
+            if reason:
+                stats.blocked[reason] = stats.blocked.get(reason, 0) + 1
+                await route.abort("blockedbyclient")
+                return
+            stats.allowed += 1
+            if asset_cache is not None and asset_cache.handles(request):
+                result, cached_bytes = await asset_cache.serve(route)
+                stats.cache[result] = stats.cache.get(result, 0) + 1
+                stats.cache_bytes += cached_bytes
+                return
+            await route.continue_()
+        except Exception as e:
+            # 页面已关闭等情况下 route 可能已失效，不影响主流程
+            logger.debug(f"处理请求拦截失败：{e}")
+
+    await context.route("**/*", _handle)
+    return stats
+
+
+# ========== 基准测试 ==========
+
+def _bench_pages() -> list[tuple[str, str, str]]:
+    """(名称, 地址, 等待的选择器)"""
+    from playwright_handle.friend import FRIEND_URL, VIP_RIGHT_URL
+    from playwright_handle.musician import MUSICIAN_HOME_URL
+
+    return [
+        ("friend", FRIEND_URL, "iframe#g_iframe"),
+        ("musician_home", MUSICIAN_HOME_URL, "body"),
+        ("vip_right", VIP_RIGHT_URL, "body"),
+    ]
+
+
+async def _measure_page(context: BrowserContext, url: str, selector: str, timeout_ms: int) -> tuple[float, int, int]:
+    """打开页面直到 load 事件且 selector 出现，返回 (耗时秒, 响应字节数, 请求数)；响应字节数含缓存返回的内容"""
+    transferred = [0, 0]
+
+    async def _on_finished(request):
+        try:
+            sizes = await request.sizes()
+            transferred[0] += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+            transferred[1] += 1
+        except Exception:
+            pass
+
+    page = await context.new_page()
+    page.on("requestfinished", _on_finished)
+    started = time.monotonic()
+    try:
+        await page.goto(url, wait_until="load", timeout=timeout_ms)
+        await page.wait_for_selector(selector, state="attached", timeout=timeout_ms)
+        elapsed = time.monotonic() - started
+    finally:
+        await page.close()
+    return elapsed, transferred[0], transferred[1]
+
+
+async def run_bench(phone: str | None, rounds: int, timeout_ms: int):
+    """
+    对每个页面分别在 不拦截 / 拦截 / 拦截+共享缓存（冷、热）时打开 rounds 次，输出平均加载耗时、网络传输字节数与拦截数。
+    共享缓存使用临时目录：冷缓存每轮前清空，热缓存沿用冷缓存各轮写入的内容。
+    """
+    import tempfile
+
+    from playwright_handle.asset_cache import AssetCache
+    from playwright_handle.browser import inject_cookie_str, user_context
+
+    cookie_str = None
+    if phone:
+        from core import AuthManager
+
+        auth = AuthManager()
+        for user in auth.get_all_users_credentials():
+            if str(user.get("phone")) == str(phone):
+                cookie_str = (auth.redis.get(f"netease:music:user:{user.get('uid')}:cookie") if auth.redis else None)
+                break
+
+    profile_dir = os.path.join(_PROJECT_ROOT, ".playwright_profiles", "_bench")
+    cache_dir = tempfile.mkdtemp(prefix="asset_cache_bench_")
+    cache = AssetCache(cache_dir, 200 * 1024 * 1024)
+    modes = (("不拦截", False, None), ("拦截", True, None), ("拦截+冷缓存", True, cache), ("拦截+热缓存", True, cache))
+    print(
+        pad_display("页面", 14, left=True) + " " + pad_display("模式", 12, left=True)
+        + "".join(" " + pad_display(title, width) for title, width in (
+            ("耗时(s)", 9), ("传输(KB)", 10), ("请求数", 7), ("拦截数", 7), ("缓存命中", 9),
+        ))
+    )
+    try:
+        for name, url, selector in _bench_pages():
+            cache.clear()
+            for mode, blocked, asset_cache in modes:
+                total_elapsed, total_bytes, total_requests, total_blocked, total_hits = 0.0, 0, 0, 0, 0
+                for _ in range(rounds):
+                    if mode == "拦截+冷缓存":
+                        cache.clear()
+                    # 由这里安装拦截规则与缓存，与 PLAYWRIGHT_BLOCK_RESOURCES / PLAYWRIGHT_ASSET_CACHE_MB 的设置无关
+                    async with user_context(
+                        profile_dir, session_key=phone, block_resources=False, asset_cache=False,
+                    ) as context:
+                        stats = await install_route_policy(context, block=blocked, asset_cache=asset_cache)
+                        await inject_cookie_str(context, cookie_str)
+                        elapsed, size, requests = await _measure_page(context, url, selector, timeout_ms)
+                    total_elapsed += elapsed
+                    total_bytes += max(0, size - stats.cache_bytes)
+                    total_requests += requests
+                    total_blocked += stats.blocked_total
+                    total_hits += stats.cache.get("hit", 0) + stats.cache.get("revalidated", 0)
+                print(
+                    f"{name:<14} {pad_display(mode, 12, left=True)} {total_elapsed / rounds:>9.2f} {total_bytes / rounds / 1024:>10.1f} "
+                    f"{total_requests / rounds:>7.0f} {total_blocked / rounds:>7.0f} {total_hits / rounds:>9.0f}"
+                )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动化页面请求拦截")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="对比拦截前后各页面的加载耗时与传输字节数")
+    p_bench.add_argument("--phone", help="使用该用户在 Redis 中的登录态（默认未登录）")
+    p_bench.add_argument("--rounds", type=int, default=3)
+    p_bench.add_argument("--timeout-ms", type=int, default=30000)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        asyncio.run(run_bench(args.phone, max(1, args.rounds), args.timeout_ms))
+
+
+if __name__ == "__main__":
+    main()
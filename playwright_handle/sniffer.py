@@ -0,0 +1,169 @@
+"""
+在一次页面导航中同时捕获多个接口的响应。
+
+原先每个浏览器步骤各自打开页面、用 expect_response 等待一个接口（任务列表的 cycle/list、VIP 的 vip/info），
+同一个页面初始化时发出的其他接口响应都被丢掉。ResponseSniffer 在浏览器上下文上按名称注册多个 URL 条件，
+导航期间收集所有匹配的响应（JSON 与距开始监听的耗时），等到需要的接口都返回（或超时）后一起取出：
+
+    with ResponseSniffer(context, {"missions": response_matcher("/mission/cycle/list")}) as sniffer:
+        await page.goto(url)
+        await sniffer.wait(timeout_ms=30000)
+        results = await sniffer.results()
+
+也可以直接用 sniff_navigation 打开页面并返回结果。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable
+
+from playwright.async_api import BrowserContext, Response
+
+from core import logger
+from tracing import SPAN_EXPECT_RESPONSE, SPAN_GOTO, span
+
+
+def response_matcher(url_substr: str, *, host: str | None = None, method: str = "POST") -> Callable[[Response], bool]:
+    """按 URL 片段、域名与请求方法匹配响应"""
+
+    def _match(resp: Response) -> bool:
+        try:
+            return (
+                url_substr in resp.url
+                and (host is None or host in resp.url)
+                and resp.request.method == method
+            )
+        except Exception:
+            return False
+
+    return _match
+
+
+class SniffedResponse:
+    """捕获到的一个接口响应；data 为解析后的 JSON，解析失败时为 {"code": 250, "msg": ...}"""
+
+    def __init__(self, name: str, url: str, status: int, data: Any, elapsed_ms: int):
+        self.name = name
+        self.url = url
+        self.status = status
+        self.data = data
+        self.elapsed_ms = elapsed_ms
+
+    def __repr__(self):
+        return f"SniffedResponse({self.name}, status={self.status}, {self.elapsed_ms}ms)"
+
+
+class ResponseSniffer:
+    """
+    在上下文的所有页面上收集匹配 targets（名称 -> 条件）的响应。
+    同一名称匹配到多次时都会保留，results() 取最后一次。响应内容须在页面关闭前取出。
+    """
+
+    def __init__(self, context: BrowserContext, targets: dict[str, Callable[[Response], bool]]):
+        self.context = context
+        self.targets = dict(targets)
+        self._hits: dict[str, list[tuple[Response, int]]] = {}
+        self._started = time.monotonic()
+        # 每捕获到一个匹配的响应置位一次，wait 据此重新检查
+        self._changed = asyncio.Event()
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        self.context.on("response", self._on_response)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.context.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+        return False
+
+    def _on_response(self, resp: Response):
+        for name, matches in self.targets.items():
+            if matches(resp):
+                self._hits.setdefault(name, []).append((resp, int((time.monotonic() - self._started) * 1000)))
+                self._changed.set()
+
+    def missing(self, names=None) -> list[str]:
+        return [name for name in (names or self.targets) if name not in self._hits]
+
+    async def wait(self, names=None, *, timeout_ms: int = 30000) -> bool:
+        """等待 names（默认全部）都至少捕获到一次；超时返回 False，已捕获的结果仍可取出"""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while self.missing(names):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return not self.missing(names)
+        return True
+
+    async def _parse(self, name: str, resp: Response, elapsed_ms: int) -> SniffedResponse:
+        try:
+            data = await resp.json()
+        except Exception as e:
+            try:
+                raw = (await resp.text())[:500]
+            except Exception:
+                raw = ""
+            data = {"code": 250, "msg": f"解析接口 JSON 失败：{e}", "raw": raw}
+        return SniffedResponse(name, resp.url, resp.status, data, elapsed_ms)
+
+    async def results(self) -> dict[str, SniffedResponse]:
+        """每个名称最后一次捕获到的响应；未捕获到的名称不在结果中"""
+        return {name: await self._parse(name, *hits[-1]) for name, hits in self._hits.items()}
+
+    async def all_results(self) -> dict[str, list[SniffedResponse]]:
+        return {name: [await self._parse(name, *hit) for hit in hits] for name, hits in self._hits.items()}
+
+
+async def sniff_navigation(
+    context: BrowserContext,
+    url: str,
+    targets: dict[str, Callable[[Response], bool]],
+    *,
+    timeout_ms: int = 30000,
+    wait_for=None,
+    grace_ms: int = 0,
+    wait_until: str = "domcontentloaded",
+) -> dict[str, SniffedResponse]:
+    """
+    新开页面打开 url，收集 targets 的响应，等到 wait_for（默认全部）都返回或超时后，
+    再最多等 grace_ms 让其余 targets 返回（页面不一定会请求的接口），然后关闭页面并返回结果。
+    导航失败时返回已捕获到的部分。
+    """
+    page = await context.new_page()
+    started = time.monotonic()
+    try:
+        page.set_default_timeout(timeout_ms)
+        with ResponseSniffer(context, targets) as sniffer:
+            try:
+                with span(SPAN_GOTO, url=url):
+                    await page.goto(url, wait_until=wait_until)
+                with span(SPAN_EXPECT_RESPONSE, api=",".join(wait_for or targets)) as sp:
+                    remaining_ms = max(0, timeout_ms - int((time.monotonic() - started) * 1000))
+                    if await sniffer.wait(wait_for, timeout_ms=remaining_ms):
+                        if grace_ms > 0:
+                            await sniffer.wait(timeout_ms=grace_ms)
+                    else:
+                        sp.fail(f"未捕获 {sniffer.missing(wait_for)}", outcome="timeout")
+            except Exception as e:
+                logger.warning(f"打开 {url} 失败：{e}")
+            results = await sniffer.results()
+        missing = [name for name in targets if name not in results]
+        logger.info(
+            f"打开 {url} 捕获接口 {sorted(results)}（{int((time.monotonic() - started) * 1000)}ms）"
+            + (f"，未捕获 {missing}" if missing else "")
+        )
+        return results
+    finally:
+        try:
+            await page.close()
+        except Exception:
+            pass
@@ -0,0 +1,294 @@
+"""
+Playwright 驱动与 Chromium 子进程的巡检：内存、文件句柄与残留进程。
+
+调度进程常驻数月，每次运行都会启动新的 Playwright 驱动（node run-driver）与 Chromium。正常情况下它们随
+async_playwright() / browser.close() 退出，但 worker 被强制结束、驱动崩溃或异常路径上漏关时，Chromium 会被
+过继给 1 号进程（容器中调度进程本身就是 1 号进程时则过继给调度进程）继续占用内存。这里只读 /proc（非 Linux 环境下
+各函数返回空结果）：
+
+- tree_usage：某个进程下的驱动 / Chromium 进程数、RSS 与打开的文件句柄数；常驻浏览器每关闭一个上下文记录一次，
+  超过 PLAYWRIGHT_BROWSER_MAX_CONTEXTS 个上下文或 PLAYWRIGHT_BROWSER_MAX_RSS_MB 时重启（见 browser_pool）
+- find_orphans / reap_orphans：父进程已是 1 号进程、或是没有浏览器任务在执行的调度进程本身的驱动 / Chromium，
+  连同其子进程一起结束；只处理当前用户、命令行可识别为 Playwright 的进程，worker 进程与 asyncio 调度进程中的常驻浏览器不受影响。
+  1 号进程就是调度进程（容器内 CMD python main.py，再 docker exec 执行下面的命令）时，它名下的进程留给它自己巡检
+- supervise：调度器每 PLAYWRIGHT_SUPERVISOR_SECONDS 秒执行一次（启动时立即执行一次），输出汇总并清理残留进程
+
+手动查看与清理（在项目根目录执行）：
+    python playwright_handle/supervisor.py ps
+    python playwright_handle/supervisor.py reap --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import sys
+import time
+
+# 单独执行本文件时须先把项目根目录加入 path，否则找不到 core
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from core import logger
+
+KIND_DRIVER = "driver"
+KIND_CHROMIUM = "chromium"
+KIND_TITLES = {KIND_DRIVER: "驱动", KIND_CHROMIUM: "Chromium"}
+
+# Playwright 自带 Chromium 的可执行文件名（cmdline[0] 的 basename）
+CHROMIUM_EXECUTABLES = ("chrome", "chromium", "headless_shell", "chrome-headless-shell", "chrome_crashpad_handler")
+# 僵尸进程没有 cmdline，只能按 comm（最多 15 个字符）判断
+ZOMBIE_COMMS = ("chrome", "chromium", "headless_shell", "chrome-headless-", "chrome_crashpad", "node")
+# 调度进程的入口脚本（判断 1 号进程是不是调度进程）
+SCHEDULER_SCRIPT = "main.py"
+# SIGTERM 后等待多久（秒）仍未退出则 SIGKILL
+REAP_GRACE_SECONDS = 3.0
+
+
+class ProcInfo:
+    """/proc/<pid> 中的一个进程"""
+
+    __slots__ = ("pid", "ppid", "uid", "state", "comm", "cmdline", "rss_kb")
+
+    def __init__(self, pid: int, ppid: int, uid: int, state: str, comm: str, cmdline: list[str], rss_kb: int):
+        self.pid = pid
+        self.ppid = ppid
+        self.uid = uid
+        self.state = state
+        self.comm = comm
+        self.cmdline = cmdline
+        self.rss_kb = rss_kb
+
+    @property
+    def kind(self) -> str | None:
+        """Playwright 驱动 / Chromium（含 renderer、gpu 等子进程）；其他进程为 None"""
+        if not self.cmdline:
+            return None
+        if "run-driver" in self.cmdline and any("playwright" in arg for arg in self.cmdline):
+            return KIND_DRIVER
+        exe = self.cmdline[0]
+        if os.path.basename(exe) in CHROMIUM_EXECUTABLES or "ms-playwright" in exe:
+            return KIND_CHROMIUM
+        return None
+
+
+def _read_proc(pid: int) -> ProcInfo | None:
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8", errors="replace") as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = [arg.decode("utf-8", "replace") for arg in f.read().split(b"\0") if arg]
+        uid, rss_kb = -1, 0
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("Uid:"):
+                    uid = int(line.split()[1])
+                elif line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    # comm 可能包含空格和括号，按最后一个 ')' 切分
+    head, _, rest = stat.rpartition(")")
+    fields = rest.split()
+    if len(fields) < 2:
+        return None
+    return ProcInfo(pid, int(fields[1]), uid, fields[0], head.partition("(")[2], cmdline, rss_kb)
+
+
+def list_processes() -> dict[int, ProcInfo]:
+    """当前可见的全部进程；非 Linux 环境返回空字典"""
+    procs: dict[int, ProcInfo] = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return procs
+    for name in names:
+        if not name.isdigit():
+            continue
+        info = _read_proc(int(name))
+        if info is not None:
+            procs[info.pid] = info
+    return procs
+
+
+def is_scheduler(info: ProcInfo | None) -> bool:
+    """是否为本项目的调度进程（python main.py）"""
+    if info is None or not info.cmdline or "python" not in os.path.basename(info.cmdline[0]):
+        return False
+    return any(os.path.basename(arg) == SCHEDULER_SCRIPT for arg in info.cmdline[1:])
+
+
+def fd_count(pid: int) -> int:
+    """进程打开的文件句柄数；无权限或进程已退出时为 0"""
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return 0
+
+
+def descendants(root: int, procs: dict[int, ProcInfo]) -> list[ProcInfo]:
+    children: dict[int, list[ProcInfo]] = {}
+    for info in procs.values():
+        children.setdefault(info.ppid, []).append(info)
+    found: list[ProcInfo] = []
+    stack = [root]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child.pid)
+    return found
+
+
+class ProcessUsage:
+    """一组驱动 / Chromium 进程的汇总"""
+
+    def __init__(self, procs: list[ProcInfo]):
+        self.pids = [info.pid for info in procs]
+        self.drivers = sum(1 for info in procs if info.kind == KIND_DRIVER)
+        self.chromium = sum(1 for info in procs if info.kind == KIND_CHROMIUM)
+        self.rss_mb = sum(info.rss_kb for info in procs) // 1024
+        self.fds = sum(fd_count(info.pid) for info in procs)
+
+    def __str__(self) -> str:
+        return f"驱动 {self.drivers} 个、Chromium {self.chromium} 个进程，RSS {self.rss_mb}MB，文件句柄 {self.fds} 个"
+
+
+def tree_usage(root: int | None = None, procs: dict[int, ProcInfo] | None = None) -> ProcessUsage:
+    """root（默认当前进程）之下的驱动与 Chromium 进程"""
+    procs = list_processes() if procs is None else procs
+    return ProcessUsage([info for info in descendants(os.getpid() if root is None else root, procs) if info.kind])
+
+
+def find_orphans(procs: dict[int, ProcInfo] | None = None, *, include_own_children: bool = False) -> list[ProcInfo]:
+    """
+    残留的驱动 / Chromium 进程（连同其子进程，父进程在前）：属于当前用户，且父进程是 1 号进程或已不存在。
+    当前进程自己就是 1 号进程（容器内直接运行调度程序）时，它的直接子进程不按"父进程是 1 号进程"判断为残留；
+    1 号进程是调度进程、当前进程是另外执行的命令（docker exec）时，1 号进程名下的进程可能正在执行任务，同样跳过。
+    include_own_children：当前进程没有浏览器任务在执行时传 True，当前进程的直接子进程中的驱动 / Chromium 也算残留。
+    """
+    procs = list_processes() if procs is None else procs
+    me, uid = os.getpid(), os.getuid()
+    init_is_scheduler = me != 1 and is_scheduler(procs.get(1))
+    orphans: list[ProcInfo] = []
+    seen: set[int] = set()
+    for info in procs.values():
+        if info.pid == me or info.uid != uid or not info.kind or info.pid in seen:
+            continue
+        if info.ppid == me:
+            if not include_own_children:
+                continue
+        elif info.ppid == 1 and init_is_scheduler:
+            continue
+        elif info.ppid > 1 and info.ppid in procs:
+            continue
+        for item in [info] + descendants(info.pid, procs):
+            if item.pid not in seen:
+                seen.add(item.pid)
+                orphans.append(item)
+    return orphans
+
+
+def _reap_zombies() -> int:
+    """回收当前进程名下已退出的驱动 / Chromium 子进程（调度进程是容器 1 号进程时残留进程会过继给它）"""
+    reaped = 0
+    me = os.getpid()
+    for info in list_processes().values():
+        if info.ppid != me or info.state != "Z" or info.comm not in ZOMBIE_COMMS:
+            continue
+        try:
+            if os.waitpid(info.pid, os.WNOHANG)[0]:
+                reaped += 1
+        except ChildProcessError:
+            pass
+    return reaped
+
+
+def _running(pid: int) -> bool:
+    info = _read_proc(pid)
+    return info is not None and info.state != "Z"
+
+
+def reap_orphans(*, include_own_children: bool = False, dry_run: bool = False) -> list[ProcInfo]:
+    """结束残留的驱动 / Chromium 进程：先 SIGTERM，REAP_GRACE_SECONDS 内未退出再 SIGKILL；返回找到的进程"""
+    orphans = find_orphans(include_own_children=include_own_children)
+    if not orphans or dry_run:
+        return orphans
+    pids = [info.pid for info in orphans]
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+    deadline = time.monotonic() + REAP_GRACE_SECONDS
+    alive = pids
+    while alive and time.monotonic() < deadline:
+        time.sleep(0.2)
+        _reap_zombies()
+        alive = [pid for pid in alive if _running(pid)]
+    for pid in alive:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    _reap_zombies()
+    return orphans
+
+
+def _self_rss_mb() -> int:
+    info = _read_proc(os.getpid())
+    return info.rss_kb // 1024 if info else 0
+
+
+def supervise():
+    """
+    调度器定时任务：输出浏览器进程的内存 / 句柄汇总，并结束残留进程
+    （没有进程内浏览器任务在执行、且本进程没有常驻浏览器时才包括本进程的直接子进程）
+    """
+    from playwright_handle.browser_pool import has_resident_browser
+    from playwright_handle.worker_pool import local_jobs_idle
+
+    with local_jobs_idle() as idle:
+        orphans = reap_orphans(include_own_children=idle and not has_resident_browser())
+    if orphans:
+        usage = ProcessUsage(orphans)
+        logger.warning(
+            f"[浏览器巡检] 已结束 {len(orphans)} 个残留进程（{usage.drivers} 个驱动、{usage.chromium} 个 Chromium，"
+            f"约 {usage.rss_mb}MB）：{', '.join(str(pid) for pid in usage.pids[:20])}"
+        )
+    usage = tree_usage()
+    logger.info(
+        f"[浏览器巡检] 调度进程 RSS {_self_rss_mb()}MB、文件句柄 {fd_count(os.getpid())} 个；"
+        f"浏览器进程：{usage}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Playwright 驱动与 Chromium 进程巡检")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ps", help="列出当前用户的驱动 / Chromium 进程")
+    reap = sub.add_parser("reap", help="结束父进程已退出的残留进程")
+    reap.add_argument("--dry-run", action="store_true", help="只列出，不结束")
+
+    args = parser.parse_args()
+    if args.command == "ps":
+        procs = list_processes()
+        orphan_pids = {info.pid for info in find_orphans(procs)}
+        uid = os.getuid()
+        rows = [info for info in procs.values() if info.kind and info.uid == uid]
+        for info in sorted(rows, key=lambda item: item.pid):
+            mark = "  残留" if info.pid in orphan_pids else ""
+            print(
+                f"{info.pid:>7} {info.ppid:>7} {KIND_TITLES[info.kind]:<8} {info.rss_kb // 1024:>5}MB "
+                f"{fd_count(info.pid):>5} 句柄{mark}"
+            )
+        print(f"共 {len(rows)} 个进程，{ProcessUsage(rows)}；残留 {len(orphan_pids)} 个")
+        return
+    orphans = reap_orphans(dry_run=args.dry_run)
+    action = "找到" if args.dry_run else "已结束"
+    print(f"{action} {len(orphans)} 个残留进程：{' '.join(str(info.pid) for info in orphans) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
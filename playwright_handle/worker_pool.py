@@ -0,0 +1,238 @@
+"""
+Playwright 浏览器子进程池：把浏览器任务放到独立的 worker 进程中执行。
+
+- Playwright 对象不能在多线程间安全共享，调度进程里的多个用户线程改为把任务序列化后投递到进程池
+- 每个 worker 进程各自启动 Chromium，互不影响；Chromium / worker 崩溃不会拖垮 APScheduler 主进程
+- 进程数按 CPU 核数与可用内存自动计算，也可通过 PLAYWRIGHT_WORKER_PROCESSES 固定
+
+任务以「名称 + 参数」的形式投递，回调函数（如 vip_further_get_time_callback）无法跨进程传递，
+由 worker 收集回调值后随结果返回，再在主进程中依次回放。
+
+异步调度器（async_runner）使用 run_browser_job_async：未启用进程池时直接在事件循环上执行对应的 *_async 流程，
+多个用户的浏览器上下文共享同一个常驻浏览器并发执行（见 browser_pool）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from core import logger
+from tracing import current_trace_context, span, use_trace_context
+from config import (
+    PLAYWRIGHT_WORKER_POOL,
+    PLAYWRIGHT_WORKER_PROCESSES,
+    PLAYWRIGHT_WORKER_MEMORY_MB,
+    PLAYWRIGHT_WORKER_MAX_TASKS,
+)
+
+# 可投递的任务：名称 -> (模块, 函数名)
+BROWSER_JOBS = {
+    "share_note_and_delete": ("playwright_handle.friend", "share_note_and_delete"),
+    "open_vip_right_page_and_listen": ("playwright_handle.musician", "open_vip_right_page_and_listen"),
+    "get_musician_cycle_mission_by_playwright": ("playwright_handle.musician", "get_musician_cycle_mission_by_playwright"),
+    "browser_login": ("playwright_handle.login", "browser_login"),
+    "run_user_browser_stages": ("playwright_handle.browser", "run_user_browser_stages"),
+}
+
+# worker 进程内置为 True：worker 内部的嵌套调用（如流程内的 browser_login）直接在本进程执行
+_IN_WORKER = False
+
+# 正在当前进程内执行的浏览器任务数（进程内模式），巡检残留进程时据此判断本进程的驱动 / Chromium 是否仍在使用
+_local_jobs = 0
+_local_jobs_lock = threading.Lock()
+
+
+def _read_mem_available_mb() -> int | None:
+    """读取 /proc/meminfo 中的 MemAvailable（MB），非 Linux 环境返回 None。"""
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except Exception:
+        pass
+    return None
+
+
+def default_worker_count() -> int:
+    """按 CPU 核数与可用内存估算 worker 进程数（每个 worker 预留 PLAYWRIGHT_WORKER_MEMORY_MB）。"""
+    if PLAYWRIGHT_WORKER_PROCESSES > 0:
+        return PLAYWRIGHT_WORKER_PROCESSES
+    by_cpu = os.cpu_count() or 1
+    mem_mb = _read_mem_available_mb()
+    by_mem = max(1, mem_mb // PLAYWRIGHT_WORKER_MEMORY_MB) if mem_mb else by_cpu
+    return max(1, min(by_cpu, by_mem))
+
+
+def _init_worker():
+    global _IN_WORKER
+    _IN_WORKER = True
+
+
+def _execute_job(name: str, args: tuple, kwargs: dict, collect_vip_time: bool, trace_ctx: dict | None = None) -> dict:
+    """在 worker 进程中执行任务；返回值与异常都需要可 pickle。trace_ctx 为投递方的 span（见 tracing）。"""
+    module_name, func_name = BROWSER_JOBS[name]
+    func = getattr(importlib.import_module(module_name), func_name)
+
+    vip_times: list[int] = []
+    if collect_vip_time:
+        kwargs["vip_further_get_time_callback"] = vip_times.append
+
+    try:
+        with use_trace_context(trace_ctx), span("job", job=name):
+            result = func(*args, **kwargs)
+    except Exception as e:
+        # Playwright 的部分异常对象无法跨进程传递，转成普通 RuntimeError 保留类型名与信息
+        try:
+            pickle.dumps(e)
+        except Exception:
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        raise
+    return {"result": result, "vip_times": vip_times}
+
+
+class PlaywrightWorkerPool:
+    """浏览器任务进程池，进程异常退出后会在下一次投递时自动重建。"""
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or default_worker_count()
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn：调度进程是多线程的，fork 可能复制到持有中的锁
+                ctx = multiprocessing.get_context("spawn")
+                kwargs = {}
+                if PLAYWRIGHT_WORKER_MAX_TASKS > 0:
+                    kwargs["max_tasks_per_child"] = PLAYWRIGHT_WORKER_MAX_TASKS
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    **kwargs,
+                )
+                logger.info(f"已启动 Playwright 浏览器进程池：{self.max_workers} 个 worker 进程")
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        try:
+            executor.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+
+    def run(self, name: str, *args, vip_further_get_time_callback=None, **kwargs):
+        """投递任务并阻塞等待结果；worker 进程崩溃时抛出 RuntimeError。"""
+        if name not in BROWSER_JOBS:
+            raise ValueError(f"未知的浏览器任务：{name}")
+
+        executor = self._get_executor()
+        future = executor.submit(
+            _execute_job, name, args, kwargs, vip_further_get_time_callback is not None, current_trace_context()
+        )
+        try:
+            payload = future.result()
+        except BrokenProcessPool as e:
+            logger.error(f"浏览器任务 {name} 所在的 worker 进程异常退出，进程池将重建：{e}")
+            self._reset(executor)
+            raise RuntimeError(f"浏览器 worker 进程异常退出：{e}") from e
+
+        # 在主进程中回放 worker 收集到的回调值
+        if vip_further_get_time_callback:
+            for ms in payload.get("vip_times") or []:
+                try:
+                    vip_further_get_time_callback(ms)
+                except Exception as e:
+                    logger.warning(f"执行 vip_further_get_time_callback 失败：{e}")
+        return payload.get("result")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Playwright 浏览器进程池已关闭")
+
+
+_pool: PlaywrightWorkerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> PlaywrightWorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PlaywrightWorkerPool()
+        return _pool
+
+
+def run_browser_job(name: str, *args, **kwargs):
+    """
+    执行一个浏览器任务：启用进程池时投递到 worker 进程，否则（或已在 worker 内）直接在当前进程执行。
+    参数与对应的 playwright_handle 函数保持一致。
+    """
+    if not PLAYWRIGHT_WORKER_POOL or _IN_WORKER:
+        global _local_jobs
+        module_name, func_name = BROWSER_JOBS[name]
+        func = getattr(importlib.import_module(module_name), func_name)
+        with _local_jobs_lock:
+            _local_jobs += 1
+        try:
+            with span("job", job=name):
+                return func(*args, **kwargs)
+        finally:
+            with _local_jobs_lock:
+                _local_jobs -= 1
+    return get_worker_pool().run(name, *args, **kwargs)
+
+
+async def run_browser_job_async(name: str, *args, **kwargs):
+    """
+    run_browser_job 的异步版本：未启用进程池时在当前事件循环上执行对应的 <函数名>_async；
+    否则在线程中投递到进程池并等待结果，不阻塞事件循环。
+    """
+    if PLAYWRIGHT_WORKER_POOL and not _IN_WORKER:
+        return await asyncio.to_thread(run_browser_job, name, *args, **kwargs)
+
+    global _local_jobs
+    module_name, func_name = BROWSER_JOBS[name]
+    func = getattr(importlib.import_module(module_name), func_name + "_async")
+    with _local_jobs_lock:
+        _local_jobs += 1
+    try:
+        with span("job", job=name):
+            return await func(*args, **kwargs)
+    finally:
+        with _local_jobs_lock:
+            _local_jobs -= 1
+
+
+@contextmanager
+def local_jobs_idle():
+    """
+    with local_jobs_idle() as idle: ...；idle 表示当前进程内没有浏览器任务在执行。
+    期间持有锁，新的进程内任务要等退出后才开始，避免刚启动的驱动被当作残留进程结束（见 supervisor）。
+    """
+    with _local_jobs_lock:
+        yield _local_jobs == 0
+
+
+def shutdown_worker_pool():
+    """关闭进程池（调度器退出时调用）。"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.shutdown()
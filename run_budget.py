@@ -0,0 +1,108 @@
+"""
+单次运行的时间预算。
+
+每次每日 / 间隔任务运行都有一个截止时间（RUN_TIME_BUDGET_SECONDS），避免少数账号卡在二次验证、
+页面超时里把整次运行拖进下一个定时任务：
+
+- 用户按紧急程度排序后依次开始（见 main.user_urgency），截止时间到了还没开始的用户推迟到补跑
+- 各阶段的超时（浏览器步骤的 timeout_ms、登录二次验证的等待时间）按剩余时间计算，不超过各自的默认值
+- 剩余时间放不下某个用户预计的耗时时抛出 RunDeferred，该用户记为 deferred，由补跑运行继续处理
+
+预算通过 ContextVar 传递：线程池中由 run_users_concurrently 设置，协程与 asyncio.to_thread 会自动继承。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from config import RUN_TIME_BUDGET_SECONDS
+
+# 预估耗时（秒），用于判断剩余时间是否还放得下一个用户
+USER_BASE_ESTIMATE_SECONDS = 10
+BROWSER_STAGE_ESTIMATE_SECONDS = 45
+# 浏览器步骤的默认超时（与 playwright_handle 中 timeout_ms 的默认值一致）
+DEFAULT_STAGE_TIMEOUT_MS = 30000
+# 阶段超时的下限，剩余时间再少也不会把超时压到这以下
+MIN_STAGE_TIMEOUT_MS = 5000
+MIN_LOGIN_VERIFY_TIMEOUT_SECONDS = 10
+# 登录二次验证的默认最长等待（与 browser_login 的默认值一致）
+LOGIN_VERIFY_TIMEOUT_SECONDS = 120
+# 计算阶段超时时预留的收尾时间
+SAFETY_MARGIN_SECONDS = 5
+
+
+class RunDeferred(Exception):
+    """剩余时间不足，当前用户推迟到补跑运行"""
+
+
+class RunBudget:
+    """一次运行的截止时间；total_seconds <= 0 表示不限时。"""
+
+    def __init__(self, total_seconds: int = RUN_TIME_BUDGET_SECONDS):
+        self.total_seconds = total_seconds
+        self.started_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.total_seconds <= 0
+
+    def remaining(self) -> float:
+        if self.unlimited:
+            return float('inf')
+        return self.total_seconds - (time.monotonic() - self.started_at)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def require(self, seconds: float, what: str):
+        """剩余时间不足 seconds 时抛出 RunDeferred"""
+        remaining = self.remaining()
+        if remaining < seconds:
+            raise RunDeferred(f"{what}预计需要 {int(seconds)} 秒，本次运行仅剩 {max(0, int(remaining))} 秒")
+
+    def stage_timeout_ms(self, default_ms: int, stages: int = 1) -> int:
+        """把剩余时间平分给 stages 个阶段，每个阶段的超时不超过 default_ms"""
+        share_ms = (self.remaining() - SAFETY_MARGIN_SECONDS) / max(1, stages) * 1000
+        return int(max(MIN_STAGE_TIMEOUT_MS, min(default_ms, share_ms)))
+
+    def login_verify_timeout(self) -> int:
+        """登录时等待二次验证的最长秒数"""
+        usable = self.remaining() - SAFETY_MARGIN_SECONDS
+        return int(max(MIN_LOGIN_VERIFY_TIMEOUT_SECONDS, min(LOGIN_VERIFY_TIMEOUT_SECONDS, usable)))
+
+
+_current_budget: contextvars.ContextVar[RunBudget | None] = contextvars.ContextVar('run_budget', default=None)
+
+
+def current_budget() -> RunBudget | None:
+    return _current_budget.get()
+
+
+@contextmanager
+def use_budget(budget: RunBudget | None):
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def stage_timeout_kwargs(stages: int = 1) -> dict:
+    """当前运行有时间预算时，按剩余时间给浏览器步骤传入收紧后的 timeout_ms；否则使用各函数的默认值"""
+    budget = current_budget()
+    return {"timeout_ms": budget.stage_timeout_ms(DEFAULT_STAGE_TIMEOUT_MS, stages)} if budget else {}
+
+
+def login_timeout_kwargs() -> dict:
+    """当前运行有时间预算时，按剩余时间收紧登录二次验证的等待"""
+    budget = current_budget()
+    return {"verify_timeout": budget.login_verify_timeout()} if budget else {}
+
+
+def require_user_time(what: str, browser_stages: int = 0):
+    """剩余时间放不下一个用户（基础耗时 + 浏览器步骤）时抛出 RunDeferred；不限时时不做检查"""
+    budget = current_budget()
+    if budget:
+        budget.require(USER_BASE_ESTIMATE_SECONDS + BROWSER_STAGE_ESTIMATE_SECONDS * browser_stages, what)
@@ -0,0 +1,224 @@
+"""
+调度运行的断点记录与恢复。
+
+每次运行（按任务类型 + 日期区分，例如 daily:2026-03-08）在 Redis 中记录每个用户的执行状态：
+pending / running / done / failed / deferred，以及该用户的结果摘要（企业微信汇总行）。
+
+- 同一天再次触发同一类型的运行（手动重跑、容器重启后恢复）时，已完成的用户直接复用记录的结果，不再重复执行
+- 调度器启动时通过 get_unfinished_runs() 找出当天中断的运行，只补跑剩余用户
+- Redis 不可用时退化为不记录（与原先行为一致）
+
+另外按「用户 + 日期」记录当天已完成的任务（音乐人签到 / 日常签到 / 发布动态 / VIP 领取），当天结束时过期。
+重试、手动重跑或重启后先查这些标记，已完成的步骤不再打开浏览器、不再请求接口。
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from datetime import date, datetime, timedelta
+
+import redis
+
+from core import logger
+from config import REDIS_POOL
+
+RUN_META_KEY_TPL = "netease:music:run:{run_id}"
+RUN_USERS_KEY_TPL = "netease:music:run:{run_id}:users"
+ACTIVE_RUNS_KEY = "netease:music:runs:active"
+RUN_TTL_SECONDS = 3 * 86400
+
+USER_DONE_KEY_TPL = "netease:music:user:{uid}:done:{day}"
+
+# 每日完成标记的任务类型
+TASK_MISSIONS = "missions"  # 音乐人签到（任务奖励）
+TASK_DAILY = "daily"        # 日常签到 dailyTask
+TASK_SHARE = "share"        # 发布动态
+TASK_VIP = "vip"            # VIP 领取
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_DEFERRED = "deferred"  # 运行时间预算不足，推迟到补跑
+
+
+def _get_redis():
+    try:
+        r = redis.Redis(connection_pool=REDIS_POOL) if REDIS_POOL else None
+        if r:
+            r.ping()
+        return r
+    except Exception as e:
+        logger.warning(f"[断点记录] Redis 不可用，本次运行不记录断点：{e}")
+        return None
+
+
+def make_run_id(kind: str, day: date | None = None) -> str:
+    return f"{kind}:{(day or date.today()).strftime('%Y-%m-%d')}"
+
+
+class RunCheckpoint:
+    """一次运行的断点记录。Redis 不可用时所有操作均为空操作。"""
+
+    def __init__(self, kind: str, run_id: str, r=None):
+        self.kind = kind
+        self.run_id = run_id
+        self.redis = r
+        self.meta_key = RUN_META_KEY_TPL.format(run_id=run_id)
+        self.users_key = RUN_USERS_KEY_TPL.format(run_id=run_id)
+        self._records: dict[str, dict] = {}
+
+    # ---------- 读取 ----------
+    def load(self) -> "RunCheckpoint":
+        """从 Redis 读取所有用户的记录到本地缓存。"""
+        if not self.redis:
+            return self
+        try:
+            raw = self.redis.hgetall(self.users_key)
+            self._records = {k: json.loads(v) for k, v in raw.items()}
+        except Exception as e:
+            logger.warning(f"[断点记录] 读取运行 {self.run_id} 的用户状态失败：{e}")
+        return self
+
+    def is_finished(self) -> bool:
+        if not self.redis:
+            return False
+        try:
+            return self.redis.hget(self.meta_key, "status") == "finished"
+        except Exception:
+            return False
+
+    def status(self, task_key) -> str:
+        return (self._records.get(str(task_key)) or {}).get("status", STATUS_PENDING)
+
+    def result(self, task_key):
+        """用户的结果摘要（写入时的原样 JSON 结构），没有记录时返回 None。"""
+        return (self._records.get(str(task_key)) or {}).get("result")
+
+    def count(self, status: str) -> int:
+        return sum(1 for rec in self._records.values() if rec.get("status") == status)
+
+    # ---------- 写入 ----------
+    def _set_user(self, task_key, status: str, result=None, error: str | None = None):
+        record = {
+            "status": status,
+            "result": result,
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if error:
+            record["error"] = error[:300]
+        self._records[str(task_key)] = record
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self.users_key, str(task_key), json.dumps(record, ensure_ascii=False))
+            pipe.expire(self.users_key, RUN_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[断点记录] 写入用户 {task_key} 状态失败：{e}")
+
+    def mark_running(self, task_key):
+        self._set_user(task_key, STATUS_RUNNING)
+
+    def mark_done(self, task_key, result):
+        self._set_user(task_key, STATUS_DONE, result)
+
+    def mark_failed(self, task_key, result, error: str):
+        self._set_user(task_key, STATUS_FAILED, result, error)
+
+    def mark_deferred(self, task_key, reason: str):
+        self._set_user(task_key, STATUS_DEFERRED, None, reason)
+
+    def start(self, user_list: list[dict]):
+        """标记运行开始：登记用户并加入活跃运行集合（已有记录的用户保持原状态）。"""
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hsetnx(self.meta_key, "started_at", time.time())
+            pipe.hset(self.meta_key, mapping={"kind": self.kind, "status": "running", "total": len(user_list)})
+            pipe.expire(self.meta_key, RUN_TTL_SECONDS)
+            pipe.sadd(ACTIVE_RUNS_KEY, self.run_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[断点记录] 标记运行 {self.run_id} 开始失败：{e}")
+
+    def finish(self):
+        """标记运行完成并移出活跃运行集合。"""
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self.meta_key, mapping={"status": "finished", "finished_at": time.time()})
+            pipe.srem(ACTIVE_RUNS_KEY, self.run_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[断点记录] 标记运行 {self.run_id} 完成失败：{e}")
+
+
+def open_run(kind: str, day: date | None = None) -> RunCheckpoint:
+    """打开（或续上）当天某类型的运行记录。"""
+    run_id = make_run_id(kind, day)
+    return RunCheckpoint(kind, run_id, _get_redis()).load()
+
+
+def get_unfinished_runs() -> list[str]:
+    """
+    返回当天未完成的运行类型列表（如 ['daily', 'interval']）。
+    非当天的残留运行不再补跑，直接移出活跃集合（第二天的定时任务会正常执行）。
+    """
+    r = _get_redis()
+    if not r:
+        return []
+    today_suffix = date.today().strftime('%Y-%m-%d')
+    kinds: list[str] = []
+    try:
+        for run_id in sorted(r.smembers(ACTIVE_RUNS_KEY)):
+            kind, _, day = run_id.partition(":")
+            if day != today_suffix:
+                logger.info(f"[断点记录] 运行 {run_id} 非当天，放弃补跑")
+                r.srem(ACTIVE_RUNS_KEY, run_id)
+                continue
+            if r.hget(RUN_META_KEY_TPL.format(run_id=run_id), "status") == "finished":
+                r.srem(ACTIVE_RUNS_KEY, run_id)
+                continue
+            kinds.append(kind)
+    except Exception as e:
+        logger.warning(f"[断点记录] 读取未完成运行失败：{e}")
+    return kinds
+
+
+# ---------- 每日完成标记 ----------
+def _done_key(uid, day: date | None = None) -> str:
+    return USER_DONE_KEY_TPL.format(uid=uid, day=(day or date.today()).strftime('%Y-%m-%d'))
+
+
+def get_done_tasks(uid, day: date | None = None) -> set[str]:
+    """用户当天已完成的任务类型集合；Redis 不可用时返回空集合（全部照常执行）。"""
+    r = _get_redis()
+    if not r or not uid:
+        return set()
+    try:
+        return set(r.hkeys(_done_key(uid, day)))
+    except Exception as e:
+        logger.warning(f"[完成标记] 读取用户 {uid} 的完成标记失败：{e}")
+        return set()
+
+
+def mark_task_done(uid, task: str, day: date | None = None):
+    """记录用户当天已完成某类任务，标记在当天结束时过期。"""
+    r = _get_redis()
+    if not r or not uid:
+        return
+    day = day or date.today()
+    end_of_day = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    try:
+        key = _done_key(uid, day)
+        pipe = r.pipeline()
+        pipe.hset(key, task, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        pipe.expireat(key, int(end_of_day.timestamp()))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[完成标记] 记录用户 {uid} 的 {task} 完成标记失败：{e}")
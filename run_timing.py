@@ -0,0 +1,108 @@
+"""
+按用户、按阶段统计耗时。
+
+手动运行（cli.py run ...）时开启：各阶段用 timed(uid, stage) 包裹，结束后输出每个用户各阶段的耗时表与合计。
+未开启时 timed 不做任何事，定时任务不受影响。
+
+统计对象通过 ContextVar 传递：run_users_concurrently 把调用方的上下文带进线程池，协程与 asyncio.to_thread 会自动继承。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+STAGE_LOGIN = 'login'
+STAGE_BROWSER = 'browser'
+STAGE_DAILY = 'daily'
+STAGE_VIP = 'vip'
+STAGE_SHARE = 'share'
+STAGE_TOTAL = 'total'
+
+# 表格列顺序与表头
+STAGE_COLUMNS = (
+    (STAGE_LOGIN, '登录'),
+    (STAGE_BROWSER, '浏览器'),
+    (STAGE_DAILY, '每日'),
+    (STAGE_VIP, 'VIP'),
+    (STAGE_SHARE, '发布'),
+    (STAGE_TOTAL, '合计'),
+)
+
+
+def pad_display(text: str, width: int, left: bool = False) -> str:
+    """按显示宽度（中文占两格）补齐空格"""
+    shown = sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text)
+    fill = ' ' * max(0, width - shown)
+    return text + fill if left else fill + text
+
+
+class RunTimings:
+    """一次运行中每个用户各阶段的累计耗时（秒），线程安全。"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._users: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, uid, stage: str, seconds: float):
+        with self._lock:
+            stages = self._users.setdefault(str(uid), {})
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def users(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {uid: dict(stages) for uid, stages in self._users.items()}
+
+    def format_table(self) -> list[str]:
+        """每个用户一行，最后是各阶段合计与整次运行的墙钟耗时；登录耗时同时计入触发登录的阶段"""
+        users = self.users()
+        width = max([4, *map(len, users)])
+        header = "".join(" " + pad_display(title, 8) for _, title in STAGE_COLUMNS)
+        lines = [pad_display('用户', width, left=True) + header]
+        totals: dict[str, float] = {}
+        for uid, stages in users.items():
+            for stage, seconds in stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+            lines.append(pad_display(uid, width, left=True) + _format_cells(stages))
+        lines.append(pad_display('合计', width, left=True) + _format_cells(totals))
+        elapsed = time.monotonic() - self.started_at
+        lines.append(f"共 {len(users)} 个用户，墙钟耗时 {elapsed:.2f}s")
+        return lines
+
+
+def _format_cells(stages: dict[str, float]) -> str:
+    return "".join(f" {stages[stage]:>8.2f}" if stage in stages else f" {'-':>8}" for stage, _ in STAGE_COLUMNS)
+
+
+_current_timings: contextvars.ContextVar[RunTimings | None] = contextvars.ContextVar('run_timings', default=None)
+
+
+def current_timings() -> RunTimings | None:
+    return _current_timings.get()
+
+
+@contextmanager
+def use_timings(timings: RunTimings | None):
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed(uid, stage: str):
+    """开启了统计时记录该阶段的耗时（异常退出也记录）；未开启时不做任何事"""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timings.record(uid, stage, time.monotonic() - started)
@@ -0,0 +1,122 @@
+"""
+浏览器登录态（Playwright storage_state）的 Redis 存储。
+
+登录态原先保存在各节点本地的 profile 目录里，用户只能由持有其 profile 的节点处理，profile 还会随 Chromium 缓存不断变大。
+改为把 storage_state 序列化后存进 Redis，任意 worker 都能用它重建浏览器上下文（见 playwright_handle.browser_pool）：
+
+- 只保留网易云相关的部分：163.com 域下的 Cookie，music.163.com 与 y.music.163.com 的 localStorage
+- 压缩后以文本保存（zlib + base64，带格式版本号），30 天未更新自动过期
+- 每次保存递增 version；写回时若 version 已被其他 worker 更新（例如期间在别的节点重新登录），放弃本次写回，不覆盖更新的登录态
+- Redis 不可用时 load_state 返回 None、save_state 返回 False，由调用方退回本地文件
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import time
+import zlib
+
+import redis
+
+from core import logger
+from config import REDIS_POOL
+
+STORAGE_STATE_KEY_TPL = "netease:music:session:{key}:storage_state"
+STORAGE_STATE_TTL_SECONDS = 30 * 86400
+# 序列化格式版本，格式变化时递增，读取到不认识的格式按没有登录态处理
+STORAGE_STATE_FORMAT = 1
+
+COOKIE_DOMAIN_SUFFIX = "163.com"
+LOCAL_STORAGE_ORIGINS = ("https://music.163.com", "https://y.music.163.com")
+
+
+def _get_redis():
+    try:
+        r = redis.Redis(connection_pool=REDIS_POOL) if REDIS_POOL else None
+        if r:
+            r.ping()
+        return r
+    except Exception as e:
+        logger.warning(f"[登录态] Redis 不可用，使用本地 storage_state 文件：{e}")
+        return None
+
+
+def _key(session_key) -> str:
+    return STORAGE_STATE_KEY_TPL.format(key=session_key)
+
+
+def filter_state(state: dict) -> dict:
+    """只保留网易云的 Cookie 与 localStorage"""
+    cookies = [
+        c for c in state.get("cookies") or []
+        if (c.get("domain") or "").lstrip(".").endswith(COOKIE_DOMAIN_SUFFIX)
+    ]
+    origins = [o for o in state.get("origins") or [] if o.get("origin") in LOCAL_STORAGE_ORIGINS]
+    return {"cookies": cookies, "origins": origins}
+
+
+def encode_state(state: dict) -> str:
+    raw = json.dumps(filter_state(state), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+
+def decode_state(data: str) -> dict:
+    return json.loads(zlib.decompress(base64.b64decode(data)).decode("utf-8"))
+
+
+def load_state(session_key) -> tuple[dict, int] | None:
+    """读取登录态，返回 (storage_state, version)；没有记录、格式不认识或 Redis 不可用时返回 None"""
+    if not session_key:
+        return None
+    r = _get_redis()
+    if not r:
+        return None
+    try:
+        record = r.hgetall(_key(session_key))
+        if not record:
+            return None
+        if int(record.get("format") or 0) != STORAGE_STATE_FORMAT:
+            logger.warning(f"[登录态] {session_key} 的 storage_state 格式 {record.get('format')} 不受支持，忽略")
+            return None
+        return decode_state(record["data"]), int(record.get("version") or 0)
+    except Exception as e:
+        logger.warning(f"[登录态] 读取 {session_key} 的 storage_state 失败：{e}")
+        return None
+
+
+def save_state(session_key, state: dict, expected_version: int | None = None) -> bool:
+    """
+    写回登录态。expected_version 为读取时的 version（没有读到时传 0）：
+    期间已被其他 worker 更新时放弃写回并返回 True（更新的登录态已在 Redis 中）；Redis 不可用时返回 False。
+    """
+    if not session_key:
+        return False
+    r = _get_redis()
+    if not r:
+        return False
+    key = _key(session_key)
+    data = encode_state(state)
+    try:
+        with r.pipeline() as pipe:
+            pipe.watch(key)
+            current = int(pipe.hget(key, "version") or 0)
+            if expected_version is not None and current != expected_version:
+                logger.info(f"[登录态] {session_key} 的 storage_state 已被其他任务更新（version {current}），不覆盖")
+                return True
+            pipe.multi()
+            pipe.hset(key, mapping={
+                "format": STORAGE_STATE_FORMAT,
+                "version": current + 1,
+                "data": data,
+                "updated_at": int(time.time()),
+            })
+            pipe.expire(key, STORAGE_STATE_TTL_SECONDS)
+            pipe.execute()
+        return True
+    except redis.WatchError:
+        logger.info(f"[登录态] {session_key} 的 storage_state 写回时被并发更新，不覆盖")
+        return True
+    except Exception as e:
+        logger.warning(f"[登录态] 保存 {session_key} 的 storage_state 失败：{e}")
+        return False
@@ -0,0 +1,324 @@
+"""
+基于 Redis Streams 的分布式任务队列。
+
+- 调度进程（TASK_QUEUE_MODE=producer）在定时触发时把每个用户的任务（daily / vip / share）投递到 Stream
+- worker 进程通过消费组（consumer group）领取任务，执行完成后 XACK 确认
+- worker 失联（超过 TASK_QUEUE_VISIBILITY_TIMEOUT 未确认）的任务会被其他 worker 通过 XAUTOCLAIM 重新认领
+- 执行异常的任务重新入队，累计投递超过 TASK_QUEUE_MAX_DELIVERIES 次后转入死信 Stream
+- 同一批次（run）的所有任务完成后，由最后完成的 worker 按投递顺序汇总结果并推送企业微信
+
+用法（在项目根目录执行）：
+    python task_queue.py worker [--name worker-1]
+    python task_queue.py bench --workers 4 --jobs 200 --latency 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from datetime import datetime
+
+import redis
+
+from core import AuthManager, logger
+from config import (
+    REDIS_POOL,
+    TASK_QUEUE_STREAM, TASK_QUEUE_DEAD_STREAM, TASK_QUEUE_GROUP,
+    TASK_QUEUE_VISIBILITY_TIMEOUT, TASK_QUEUE_MAX_DELIVERIES,
+    WECOM_WEBHOOK_KEY,
+)
+
+JOB_KINDS = ('daily', 'vip', 'share', 'noop')
+
+RUN_KEY_TPL = 'netease:music:queue:run:{run_id}'
+RUN_LINES_KEY_TPL = 'netease:music:queue:run:{run_id}:lines'
+RUN_TTL_SECONDS = 7 * 86400
+
+# 批次类型 -> 企业微信汇总标题与空结果文案
+RUN_TITLES = {
+    'daily': ("网易音乐人日常任务", "本次每日任务已执行，无用户结果可汇总。"),
+    'interval': ("网易音乐人发送任务", "本次发送任务已执行，无用户结果可汇总。"),
+}
+
+# 多久尝试一次认领失联 worker 的任务（秒）
+CLAIM_INTERVAL_SECONDS = 30
+
+
+def get_redis():
+    return redis.Redis(connection_pool=REDIS_POOL)
+
+
+def ensure_group(r, stream: str = TASK_QUEUE_STREAM):
+    """创建消费组（已存在时忽略）。"""
+    try:
+        r.xgroup_create(stream, TASK_QUEUE_GROUP, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def enqueue_run(run_type: str, jobs: list[tuple[str, str, dict]], *, r=None, stream: str = TASK_QUEUE_STREAM) -> str:
+    """
+    投递一批任务，返回批次 ID。
+
+    Args:
+        run_type: 批次类型（daily / interval / bench），决定汇总通知的标题
+        jobs: [(kind, task_key, 额外字段)]，列表顺序即汇总顺序
+    """
+    r = r or get_redis()
+    ensure_group(r, stream)
+    run_id = f"{run_type}:{datetime.now().strftime('%Y%m%d%H%M%S')}:{uuid.uuid4().hex[:6]}"
+    run_key = RUN_KEY_TPL.format(run_id=run_id)
+
+    pipe = r.pipeline()
+    pipe.hset(run_key, mapping={
+        'type': run_type,
+        'total': len(jobs),
+        'remaining': len(jobs),
+        'created_at': time.time(),
+    })
+    pipe.expire(run_key, RUN_TTL_SECONDS)
+    for idx, (kind, task_key, extra) in enumerate(jobs):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知的任务类型：{kind}")
+        fields = {
+            'kind': kind,
+            'task_key': task_key,
+            'run_id': run_id,
+            'idx': idx,
+            'attempts': 0,
+            'enqueued_at': time.time(),
+        }
+        fields.update(extra or {})
+        pipe.xadd(stream, fields)
+    pipe.execute()
+    logger.info(f"[任务队列] 已投递批次 {run_id}：{len(jobs)} 个任务")
+    return run_id
+
+
+def _send_run_summary(r, run_id: str):
+    run_type = r.hget(RUN_KEY_TPL.format(run_id=run_id), 'type')
+    logger.info(f"[任务队列] 批次 {run_id} 全部完成")
+    if run_type not in RUN_TITLES or not WECOM_WEBHOOK_KEY:
+        return
+    title, empty_text = RUN_TITLES[run_type]
+    try:
+        raw = r.hgetall(RUN_LINES_KEY_TPL.format(run_id=run_id))
+        lines: list[str] = []
+        for idx in sorted(raw, key=int):
+            lines.extend(json.loads(raw[idx]))
+        from wecom_notify import send_wecom_webhook
+        send_wecom_webhook(WECOM_WEBHOOK_KEY, "\n".join(lines) if lines else empty_text, title=title)
+    except Exception as e:
+        logger.warning(f"[任务队列] 发送批次 {run_id} 汇总通知失败：{e}")
+
+
+def _finish_job(r, fields: dict, lines: list[str]):
+    """记录任务结果，批次最后一个任务完成时推送汇总。"""
+    run_id = fields.get('run_id')
+    if not run_id:
+        return
+    lines_key = RUN_LINES_KEY_TPL.format(run_id=run_id)
+    pipe = r.pipeline()
+    pipe.hset(lines_key, str(fields.get('idx', 0)), json.dumps(lines or [], ensure_ascii=False))
+    pipe.expire(lines_key, RUN_TTL_SECONDS)
+    pipe.hincrby(RUN_KEY_TPL.format(run_id=run_id), 'remaining', -1)
+    remaining = pipe.execute()[-1]
+    if remaining == 0:
+        _send_run_summary(r, run_id)
+
+
+def _handle_job(auth, fields: dict) -> list[str]:
+    """执行单个任务，返回汇总给企业微信的精简结果行。"""
+    kind = fields.get('kind')
+    if kind == 'noop':
+        # 基准测试用：模拟任务耗时
+        time.sleep(float(fields.get('latency') or 0))
+        return []
+
+    import main as runner  # 延迟导入：worker 进程才需要加载调度模块
+
+    task_key = fields.get('task_key')
+    user = auth.get_user_credentials(task_key)
+    if not user:
+        logger.error(f"[任务队列] 未找到用户 {task_key} 的凭证，跳过任务 {kind}")
+        return [f"用户{task_key}：", f"{kind} 任务：未找到用户凭证，未能执行任务", ""]
+
+    if kind == 'daily':
+        return runner.process_daily_user(auth, user)
+    if kind == 'vip':
+        runner.process_vip_user(auth, user, fields.get('vip_state') or 'overdue')
+        return []
+    if kind == 'share':
+        return runner.process_share_user(auth, user)
+    raise ValueError(f"未知的任务类型：{kind}")
+
+
+def _delivery_count(r, stream: str, msg_id: str) -> int:
+    try:
+        pending = r.xpending_range(stream, TASK_QUEUE_GROUP, min=msg_id, max=msg_id, count=1)
+        if pending:
+            return int(pending[0].get('times_delivered') or 1)
+    except Exception:
+        pass
+    return 1
+
+
+def _dead_letter(r, stream: str, dead_stream: str, msg_id: str, fields: dict, reason: str):
+    logger.error(f"[任务队列] 任务 {msg_id}（{fields.get('kind')} / {fields.get('task_key')}）转入死信队列：{reason}")
+    dead_fields = dict(fields)
+    dead_fields.update({'source_id': msg_id, 'reason': reason, 'dead_at': time.time()})
+    pipe = r.pipeline()
+    pipe.xadd(dead_stream, dead_fields)
+    pipe.xack(stream, TASK_QUEUE_GROUP, msg_id)
+    pipe.execute()
+    label = f"用户{fields.get('task_key')}"
+    _finish_job(r, fields, [f"{label}：", f"{fields.get('kind')} 任务：多次执行失败，已转入死信队列（{reason}）", ""])
+
+
+def _process_message(r, auth, stream: str, dead_stream: str, msg_id: str, fields: dict):
+    attempts = int(fields.get('attempts') or 0) + _delivery_count(r, stream, msg_id)
+    if attempts > TASK_QUEUE_MAX_DELIVERIES:
+        _dead_letter(r, stream, dead_stream, msg_id, fields, f"超过最大投递次数 {TASK_QUEUE_MAX_DELIVERIES}")
+        return
+
+    try:
+        lines = _handle_job(auth, fields)
+    except Exception as e:
+        logger.error(f"[任务队列] 执行任务 {msg_id}（{fields.get('kind')} / {fields.get('task_key')}）异常：{e}")
+        if attempts >= TASK_QUEUE_MAX_DELIVERIES:
+            _dead_letter(r, stream, dead_stream, msg_id, fields, str(e)[:200])
+            return
+        # 重新入队（累计次数记在 attempts 中），原消息确认掉
+        retry_fields = dict(fields)
+        retry_fields['attempts'] = attempts
+        pipe = r.pipeline()
+        pipe.xadd(stream, retry_fields)
+        pipe.xack(stream, TASK_QUEUE_GROUP, msg_id)
+        pipe.execute()
+        return
+
+    r.xack(stream, TASK_QUEUE_GROUP, msg_id)
+    _finish_job(r, fields, lines)
+
+
+def run_worker(
+    name: str | None = None,
+    *,
+    stream: str = TASK_QUEUE_STREAM,
+    dead_stream: str = TASK_QUEUE_DEAD_STREAM,
+    block_ms: int = 5000,
+    visibility_timeout: int = TASK_QUEUE_VISIBILITY_TIMEOUT,
+):
+    """启动一个 worker，循环领取并执行任务，收到 SIGTERM / SIGINT 后处理完当前任务再退出。"""
+    r = get_redis()
+    ensure_group(r, stream)
+    consumer = name or f"{socket.gethostname()}-{os.getpid()}"
+    auth = AuthManager()
+
+    stopping = False
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        logger.info(f"[任务队列] worker {consumer} 收到信号 {signum}，处理完当前任务后退出")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(f"[任务队列] worker {consumer} 已启动，监听 {stream}（消费组 {TASK_QUEUE_GROUP}）")
+    last_claim = 0.0
+    while not stopping:
+        messages = []
+        try:
+            if time.time() - last_claim >= CLAIM_INTERVAL_SECONDS:
+                last_claim = time.time()
+                claimed = r.xautoclaim(
+                    stream, TASK_QUEUE_GROUP, consumer,
+                    min_idle_time=visibility_timeout * 1000, start_id='0-0', count=10,
+                )
+                for msg_id, fields in claimed[1]:
+                    if fields:
+                        logger.warning(f"[任务队列] 认领失联 worker 的任务 {msg_id}（{fields.get('kind')} / {fields.get('task_key')}）")
+                        messages.append((msg_id, fields))
+            if not messages:
+                resp = r.xreadgroup(TASK_QUEUE_GROUP, consumer, {stream: '>'}, count=1, block=block_ms)
+                for _stream, entries in resp or []:
+                    messages.extend(entries)
+        except redis.RedisError as e:
+            logger.error(f"[任务队列] 读取任务失败：{e}，5 秒后重试")
+            time.sleep(5)
+            continue
+
+        for msg_id, fields in messages:
+            _process_message(r, auth, stream, dead_stream, msg_id, fields)
+
+    logger.info(f"[任务队列] worker {consumer} 已退出")
+
+
+def run_bench(workers: int, jobs: int, latency: float):
+    """
+    本机吞吐基准：对 1..workers 个 worker 进程分别投递 jobs 个 noop 任务（每个耗时 latency 秒），
+    输出耗时、吞吐与相对单 worker 的加速比。
+    """
+    r = get_redis()
+    baseline = None
+    counts = sorted({1, *[n for n in (2, 4, 8, 16) if n < workers], workers})
+    print(f"{'workers':>8} {'耗时(s)':>10} {'任务/s':>10} {'加速比':>8}")
+    for n in counts:
+        stream = f"{TASK_QUEUE_STREAM}:bench:{uuid.uuid4().hex[:8]}"
+        dead_stream = f"{stream}:dead"
+        ensure_group(r, stream)
+        procs = [
+            multiprocessing.Process(
+                target=run_worker,
+                kwargs={'name': f"bench-{i}", 'stream': stream, 'dead_stream': dead_stream, 'block_ms': 200},
+                daemon=True,
+            )
+            for i in range(n)
+        ]
+        for p in procs:
+            p.start()
+        started = time.time()
+        run_id = enqueue_run('bench', [('noop', f"bench-{i}", {'latency': latency}) for i in range(jobs)], r=r, stream=stream)
+        run_key = RUN_KEY_TPL.format(run_id=run_id)
+        while int(r.hget(run_key, 'remaining') or 0) > 0:
+            time.sleep(0.02)
+        elapsed = time.time() - started
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+        r.delete(stream, dead_stream, run_key, RUN_LINES_KEY_TPL.format(run_id=run_id))
+        throughput = jobs / elapsed if elapsed else 0.0
+        baseline = baseline or throughput
+        print(f"{n:>8} {elapsed:>10.2f} {throughput:>10.1f} {throughput / baseline:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网易音乐人任务队列（Redis Streams）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_worker = sub.add_parser('worker', help="启动 worker 进程消费任务")
+    p_worker.add_argument('--name', help="消费者名称（默认 主机名-进程号）")
+
+    p_bench = sub.add_parser('bench', help="本机吞吐基准测试（noop 任务）")
+    p_bench.add_argument('--workers', type=int, default=4)
+    p_bench.add_argument('--jobs', type=int, default=200)
+    p_bench.add_argument('--latency', type=float, default=0.05, help="每个 noop 任务的模拟耗时（秒）")
+
+    args = parser.parse_args()
+    if args.command == 'worker':
+        run_worker(args.name)
+    elif args.command == 'bench':
+        run_bench(max(1, args.workers), max(1, args.jobs), max(0.0, args.latency))
+
+
+if __name__ == '__main__':
+    main()
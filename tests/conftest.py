@@ -0,0 +1,65 @@
+"""
+测试公共配置：在导入业务模块之前把 config.REDIS_POOL 换成 fakeredis（各模块在导入时读取连接池），
+把业务日志、cron 日志与 span 文件指到临时目录（不写入仓库的 log/），每个用例前清空数据。
+依赖见 requirements-dev.txt。
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from logging.handlers import RotatingFileHandler
+
+import pytest
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis  # noqa: E402
+
+import config  # noqa: E402
+
+config.REDIS_POOL = redis.ConnectionPool(
+    connection_class=getattr(fakeredis, 'FakeRedisConnection', None) or fakeredis.FakeConnection,
+    server=fakeredis.FakeServer(),
+    decode_responses=True,
+)
+
+# core.py 只在 logger 没有处理器时才挂 log/netease_music.log，main.py 按文件名判断是否已挂 cron 日志；
+# 先挂好指向临时目录的同名文件，两处就都不会再打开 log/ 下的文件
+_LOG_DIR = tempfile.mkdtemp(prefix='netease_music_test_log_')
+_logger = logging.getLogger('netease_music')
+for _name in ('netease_music.log', 'netease_music_cron.log'):
+    _logger.addHandler(RotatingFileHandler(os.path.join(_LOG_DIR, _name), encoding='utf-8'))
+
+import tracing  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _log_dir():
+    yield _LOG_DIR
+    for h in list(_logger.handlers):
+        if isinstance(h, RotatingFileHandler) and h.baseFilename.startswith(_LOG_DIR):
+            _logger.removeHandler(h)
+            h.close()
+    shutil.rmtree(_LOG_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _spans_file(tmp_path, monkeypatch):
+    """span 写到本用例的 tmp_path；写入器按文件缓存，用例前后都要重置"""
+    monkeypatch.setattr(tracing, 'TRACE_SPANS_FILE', str(tmp_path / 'spans.jsonl'))
+    monkeypatch.setattr(tracing, '_span_writer', None)
+    yield
+    writer = logging.getLogger('netease_music.spans')
+    for h in list(writer.handlers):
+        writer.removeHandler(h)
+        h.close()
+
+
+@pytest.fixture(autouse=True)
+def r():
+    client = redis.Redis(connection_pool=config.REDIS_POOL)
+    client.flushall()
+    return client
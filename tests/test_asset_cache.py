@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+from playwright_handle import asset_cache
+from playwright_handle.asset_cache import HIT, MISS, AssetCache
+
+HEADERS = {"content-type": "text/javascript", "cache-control": "max-age=600", "etag": '"v1"'}
+
+
+def test_store_refuses_per_user_responses(tmp_path):
+    cache = AssetCache(str(tmp_path), 1024 * 1024)
+    assert cache.store("https://s/a.js", dict(HEADERS, **{"cache-control": "private, max-age=600"}), b"a") is None
+    assert cache.store("https://s/b.js", dict(HEADERS, vary="Accept-Encoding, Cookie"), b"b") is None
+    assert cache.store("https://s/c.js", dict(HEADERS, **{"cache-control": "no-store"}), b"c") is None
+    assert cache.store("https://s/d.js", dict(HEADERS, vary="Accept-Encoding"), b"d") is not None
+    assert len(os.listdir(cache.blob_dir)) == 1
+
+
+def test_store_keeps_running_total(tmp_path, monkeypatch):
+    cache = AssetCache(str(tmp_path), 1000)
+    walks = []
+    real_dir_size = asset_cache._dir_size
+    monkeypatch.setattr(asset_cache, "_dir_size", lambda path: walks.append(path) or real_dir_size(path))
+
+    cache.store("https://s/0.js", HEADERS, b"0" * 50)
+    for i in range(1, 10):
+        cache.store(f"https://s/{i}.js", HEADERS, bytes([i]) * 50)
+    # 相同内容只存一份，不重复计入
+    cache.store("https://s/dup.js", HEADERS, b"0" * 50)
+    assert cache._bytes == 500 == cache.size()
+    assert len(walks) == 2  # 首次写入统计一次，上面的 size() 一次
+
+    # 超过上限才遍历目录并淘汰
+    for i in range(10, 16):
+        cache.store(f"https://s/{i}.js", HEADERS, bytes([i]) * 100)
+    assert cache._bytes == cache.size() <= 1000
+
+
+class _Response:
+    status = 200
+    headers = HEADERS
+
+    async def body(self):
+        return b"console.log(1)"
+
+
+class _Route:
+    def __init__(self, url):
+        self.request = type("Request", (), {"url": url, "headers": {}})()
+        self.fulfilled = []
+
+    async def fetch(self, headers=None):
+        return _Response()
+
+    async def fulfill(self, **kwargs):
+        self.fulfilled.append(kwargs)
+
+
+def test_serve_stores_then_hits(tmp_path):
+    cache = AssetCache(str(tmp_path), 1024 * 1024)
+    url = "https://s.music.126.net/a.js"
+    assert asyncio.run(cache.serve(_Route(url))) == (MISS, 0)
+    route = _Route(url)
+    assert asyncio.run(cache.serve(route)) == (HIT, len(b"console.log(1)"))
+    assert route.fulfilled[0]["body"] == b"console.log(1)"
@@ -0,0 +1,52 @@
+import asyncio
+
+import async_runner
+import main
+from run_state import STATUS_DONE, STATUS_FAILED, TASK_MISSIONS, TASK_SHARE, TASK_VIP, open_run
+
+
+def test_unexpected_error_keeps_user_summary():
+    users = [{'task_key': 'a', 'uid': 1}, {'task_key': 'b', 'uid': 2}]
+
+    async def handler(user):
+        if user['uid'] == 2:
+            raise RuntimeError('boom')
+        return ['用户1：', 'ok', '']
+
+    run = open_run('daily')
+    lines = asyncio.run(async_runner.run_users_async(users, handler, task_name='每日任务', checkpoint=run))
+    assert lines == ['用户1：', 'ok', '', '用户2：', '每日任务：执行任务时发生异常：boom', '']
+    assert run.status('a') == STATUS_DONE
+    assert run.status('b') == STATUS_FAILED
+
+
+def test_plan_browser_stages(monkeypatch):
+    monkeypatch.setattr(main, 'should_execute_task', lambda uid: True)
+    assert main.plan_browser_stages(1, set(), None) == ['missions', 'share']
+    assert main.plan_browser_stages(1, set(), 'overdue') == ['missions', 'vip', 'share']
+    # VIP 领取日当天不发布动态
+    assert main.plan_browser_stages(1, set(), 'today', daily=False) == ['vip']
+    assert main.plan_browser_stages(1, {TASK_MISSIONS, TASK_VIP, TASK_SHARE}, 'overdue') == []
+    monkeypatch.setattr(main, 'should_execute_task', lambda uid: False)
+    assert main.plan_browser_stages(1, set(), None, daily=False) == []
+
+
+def test_interval_steps():
+    assert main.interval_steps(1, None, False) == (False, True)
+    assert main.interval_steps(1, 'overdue', False) == (True, True)
+    assert main.interval_steps(1, 'today', False) == (True, False)
+    assert main.interval_steps(1, 'today', True) == (False, False)
+
+
+def test_browser_job_saves_vip_time_off_the_event_loop(monkeypatch):
+    import playwright_handle.worker_pool as worker_pool
+
+    async def fake_job(name, *args, vip_further_get_time_callback=None, **kwargs):
+        vip_further_get_time_callback(1700000000000)
+        vip_further_get_time_callback(1800000000000)
+        return 'ok'
+
+    monkeypatch.setattr(worker_pool, 'run_browser_job_async', fake_job)
+    session = async_runner.AsyncUserSession(None, {'task_key': 'a', 'uid': 1, 'phone': '13800000000'})
+    assert asyncio.run(session.run_browser_job('open_vip_right_page_and_listen')) == 'ok'
+    assert main.get_vip_further_get_time_ms(1) == 1800000000000
@@ -0,0 +1,66 @@
+import json
+import time
+
+import deletion_queue
+from deletion_queue import PENDING_DELETE_KEY, RETRY_BACKOFF_SECONDS, _claim_due, _member, _requeue, schedule_delete
+
+
+def test_claim_due_takes_only_due_items_up_to_limit(r):
+    now = time.time()
+    r.zadd(PENDING_DELETE_KEY, {
+        _member(1, 'e1'): now - 30,
+        _member(1, 'e2'): now - 20,
+        _member(2, 'e3'): now - 10,
+        _member(3, 'later'): now + 600,
+    })
+    first = _claim_due(r, now, limit=2)
+    assert [item['event_id'] for item in first] == ['e1', 'e2']
+    assert [item['event_id'] for item in _claim_due(r, now, limit=10)] == ['e3']
+    assert _claim_due(r, now, limit=10) == []
+    assert r.zcard(PENDING_DELETE_KEY) == 1
+
+
+def test_claim_due_skips_members_claimed_elsewhere(r, monkeypatch):
+    now = time.time()
+    r.zadd(PENDING_DELETE_KEY, {_member(1, 'e1'): now - 1, _member(1, 'e2'): now - 1})
+    real_zrange = r.zrangebyscore
+
+    def racing_zrange(*args, **kwargs):
+        members = real_zrange(*args, **kwargs)
+        # 另一个进程在本进程 ZREM 之前领走了 e1
+        r.zrem(PENDING_DELETE_KEY, _member(1, 'e1'))
+        return members
+
+    monkeypatch.setattr(r, 'zrangebyscore', racing_zrange)
+    assert [item['event_id'] for item in _claim_due(r, now, limit=10)] == ['e2']
+
+
+def test_claim_due_drops_unparseable_members(r):
+    r.zadd(PENDING_DELETE_KEY, {'not-json': time.time() - 1})
+    assert _claim_due(r, time.time(), limit=10) == []
+    assert r.zcard(PENDING_DELETE_KEY) == 0
+
+
+def test_requeue_backs_off_then_gives_up(r, monkeypatch):
+    monkeypatch.setattr(deletion_queue, 'DYNAMIC_DELETE_MAX_ATTEMPTS', 3)
+    before = time.time()
+    _requeue(r, {'uid': '1', 'event_id': 'e1', 'attempts': 0}, 'boom')
+    [(member, score)] = r.zrange(PENDING_DELETE_KEY, 0, -1, withscores=True)
+    assert json.loads(member)['attempts'] == 1
+    assert score >= before + RETRY_BACKOFF_SECONDS
+
+    r.delete(PENDING_DELETE_KEY)
+    _requeue(r, {'uid': '1', 'event_id': 'e1', 'attempts': 1}, 'boom')
+    [(member, score)] = r.zrange(PENDING_DELETE_KEY, 0, -1, withscores=True)
+    assert json.loads(member)['attempts'] == 2
+    assert score >= before + 2 * RETRY_BACKOFF_SECONDS
+
+    r.delete(PENDING_DELETE_KEY)
+    _requeue(r, {'uid': '1', 'event_id': 'e1', 'attempts': 2}, 'boom')
+    assert r.zcard(PENDING_DELETE_KEY) == 0
+
+
+def test_schedule_delete_registers_member(r):
+    assert schedule_delete(1, 'e1', delay=60)
+    assert r.zrange(PENDING_DELETE_KEY, 0, -1) == [_member(1, 'e1')]
+    assert not schedule_delete(None, 'e1')
@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from playwright_handle import friend
+from playwright_handle.page_api import PageApiError
+
+
+class _FakeApi:
+    def __init__(self, *, search=None, share=None):
+        self.search, self.share = search, share
+        self.shared = 0
+
+    @asynccontextmanager
+    async def open(self, context):
+        yield self
+
+    async def search_first_song(self, keyword):
+        if isinstance(self.search, Exception):
+            raise self.search
+        return self.search
+
+    async def share_song(self, song_id, msg):
+        self.shared += 1
+        raise self.share
+
+
+def _share(monkeypatch, api):
+    clicked = []
+
+    async def click(context, timer, msg, search_keyword, vip_further_get_time_callback=None):
+        clicked.append(msg)
+        return False, None, None, 0.0
+
+    monkeypatch.setattr(friend, 'PLAYWRIGHT_PAGE_API', True)
+    monkeypatch.setattr(friend, 'PageApi', api)
+    monkeypatch.setattr(friend, '_share_note_by_clicking', click)
+    result = asyncio.run(friend.share_note_in_context(object(), 'hi', uid=1))
+    return result, clicked
+
+
+def test_share_request_error_does_not_fall_back(monkeypatch):
+    # 超时 / 返回非 JSON 时分享可能已被受理，回退点击会重复发布
+    for error in (PageApiError('页面内请求超时'), PageApiError('返回非 JSON'), RuntimeError('evaluate 失败')):
+        api = _FakeApi(search='123', share=error)
+        result, clicked = _share(monkeypatch, api)
+        assert result == (False, None)
+        assert api.shared == 1
+        assert clicked == []
+
+
+def test_search_error_falls_back_to_clicking(monkeypatch):
+    api = _FakeApi(search=PageApiError('搜索失败'))
+    _, clicked = _share(monkeypatch, api)
+    assert api.shared == 0
+    assert clicked == ['hi']
@@ -0,0 +1,106 @@
+"""
+tests/fixtures/cycle_list.json 按代码读取的字段（description / userMissionId / period / status）构造，
+不是抓取的真实响应；其中的 status 取值只用于配合 MISSION_CLAIMABLE_STATUSES。
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import mission_engine
+from mission_engine import NO_CHECKIN_RESULT, RateLimiter, claim_mission_rewards, find_claimable_missions
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'cycle_list.json')
+
+
+@pytest.fixture
+def cycle_list():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FakeTask:
+    def __init__(self, codes=None):
+        self.codes = codes or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def reward_obtain(self, user_mission_id, period):
+        with self._lock:
+            self.calls.append(user_mission_id)
+        return {"code": self.codes.get(user_mission_id, 200)}
+
+
+def _ids(missions):
+    return [m['userMissionId'] for m in missions]
+
+
+def test_only_checkin_is_claimed_by_default(cycle_list):
+    claimable, missing = find_claimable_missions(cycle_list)
+    assert _ids(claimable) == [10001]
+    assert missing == []
+
+
+def test_configured_statuses_are_claimed(cycle_list, monkeypatch):
+    monkeypatch.setattr(mission_engine, 'MISSION_CLAIMABLE_STATUSES', (10,))
+    claimable, missing = find_claimable_missions(cycle_list)
+    assert _ids(claimable) == [10001, 10002]
+    # 可领取但缺少 userMissionId 的任务单独返回，由调用方重试
+    assert [m['description'] for m in missing] == ['分享1首歌曲']
+
+
+def test_report_tracks_checkin_and_failures(cycle_list, monkeypatch):
+    monkeypatch.setattr(mission_engine, 'MISSION_CLAIMABLE_STATUSES', (10,))
+    task = FakeTask(codes={10002: 500})
+    report = claim_mission_rewards(task, cycle_list)
+    assert sorted(task.calls) == [10001, 10002]
+    assert report.checkin_result == {"code": 200}
+    assert report.success_count == 1
+    assert not report.completed
+    assert report.summary_lines()[0].startswith("音乐人任务奖励：领取 2 个，成功 1 个")
+
+
+def test_checkin_claimed_completes(cycle_list):
+    report = claim_mission_rewards(FakeTask(), cycle_list)
+    assert report.checkin_result == {"code": 200}
+    assert report.completed
+
+
+def test_list_without_checkin_counts_as_checked_in(cycle_list):
+    cycle_list['data']['list'] = [m for m in cycle_list['data']['list'] if '签到' not in m['description']]
+    task = FakeTask()
+    report = claim_mission_rewards(task, cycle_list)
+    assert task.calls == []
+    assert report.checkin_result == NO_CHECKIN_RESULT
+    assert report.completed
+    assert report.summary_lines() == []
+
+
+def test_failed_checkin_is_not_completed(cycle_list):
+    report = claim_mission_rewards(FakeTask(codes={10001: -1}), cycle_list)
+    assert report.checkin_result == {"code": -1}
+    assert not report.completed
+
+
+def test_rate_limiter_allows_burst_then_spaces_requests(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(mission_engine.time, 'monotonic', lambda: now[0])
+    limiter = RateLimiter(rate=10, burst=2)
+    waits = [limiter._reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    # 令牌用完后按 1/rate 依次顺延
+    assert waits[2] == pytest.approx(0.1)
+    assert waits[3] == pytest.approx(0.2)
+
+    # 时间推进后补充令牌，但不超过 burst
+    now[0] += 10
+    assert [limiter._reserve() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.1])
+
+
+def test_rate_limiter_burst_is_at_least_one(monkeypatch):
+    monkeypatch.setattr(mission_engine.time, 'monotonic', lambda: 0.0)
+    limiter = RateLimiter(rate=1, burst=0)
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == pytest.approx(1.0)
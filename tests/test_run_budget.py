@@ -0,0 +1,76 @@
+import pytest
+
+import run_budget
+from run_budget import (
+    DEFAULT_STAGE_TIMEOUT_MS, LOGIN_VERIFY_TIMEOUT_SECONDS, MIN_LOGIN_VERIFY_TIMEOUT_SECONDS, MIN_STAGE_TIMEOUT_MS,
+    RunBudget, RunDeferred, current_budget, login_timeout_kwargs, require_user_time, stage_timeout_kwargs,
+    use_budget,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(run_budget.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_remaining_and_expiry(clock):
+    budget = RunBudget(60)
+    assert budget.remaining() == 60
+    clock[0] += 59
+    assert not budget.expired()
+    clock[0] += 1
+    assert budget.expired()
+
+
+def test_unlimited_budget_never_expires(clock):
+    budget = RunBudget(0)
+    assert budget.unlimited
+    clock[0] += 10 ** 6
+    assert not budget.expired()
+    budget.require(10 ** 6, "用户 1 ")
+    assert budget.stage_timeout_ms(DEFAULT_STAGE_TIMEOUT_MS) == DEFAULT_STAGE_TIMEOUT_MS
+    assert budget.login_verify_timeout() == LOGIN_VERIFY_TIMEOUT_SECONDS
+
+
+def test_stage_timeout_is_shared_and_clamped(clock):
+    budget = RunBudget(1000)
+    assert budget.stage_timeout_ms(DEFAULT_STAGE_TIMEOUT_MS, stages=3) == DEFAULT_STAGE_TIMEOUT_MS
+    clock[0] += 1000 - 65  # 剩 65 秒，扣除 5 秒余量后 3 个阶段各 20 秒
+    assert budget.stage_timeout_ms(DEFAULT_STAGE_TIMEOUT_MS, stages=3) == 20000
+    clock[0] += 60
+    assert budget.stage_timeout_ms(DEFAULT_STAGE_TIMEOUT_MS, stages=3) == MIN_STAGE_TIMEOUT_MS
+
+
+def test_login_verify_timeout_is_clamped(clock):
+    budget = RunBudget(1000)
+    assert budget.login_verify_timeout() == LOGIN_VERIFY_TIMEOUT_SECONDS
+    clock[0] += 1000 - 35
+    assert budget.login_verify_timeout() == 30
+    clock[0] += 30
+    assert budget.login_verify_timeout() == MIN_LOGIN_VERIFY_TIMEOUT_SECONDS
+
+
+def test_require_user_time_uses_current_budget(clock):
+    # 不在运行中（没有预算）时不做检查
+    require_user_time("用户 1 ", browser_stages=3)
+    assert stage_timeout_kwargs() == {}
+    assert login_timeout_kwargs() == {}
+
+    budget = RunBudget(100)
+    with use_budget(budget):
+        assert current_budget() is budget
+        require_user_time("用户 1 ", browser_stages=2)  # 10 + 45 * 2 = 100
+        with pytest.raises(RunDeferred, match="预计需要 145 秒，本次运行仅剩 100 秒"):
+            require_user_time("用户 1 ", browser_stages=3)
+        assert stage_timeout_kwargs(2) == {"timeout_ms": DEFAULT_STAGE_TIMEOUT_MS}
+        assert login_timeout_kwargs() == {"verify_timeout": 95}
+    assert current_budget() is None
+
+
+def test_require_reports_zero_when_overdue(clock):
+    budget = RunBudget(10)
+    clock[0] += 30
+    with pytest.raises(RunDeferred, match="仅剩 0 秒"):
+        budget.require(1, "用户 1 ")
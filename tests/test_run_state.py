@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+
+import run_state
+from run_state import (
+    ACTIVE_RUNS_KEY, STATUS_DEFERRED, STATUS_DONE, STATUS_FAILED, STATUS_PENDING, STATUS_RUNNING, TASK_DAILY,
+    RunCheckpoint, get_done_tasks, get_unfinished_runs, mark_task_done, open_run,
+)
+
+USERS = [{'task_key': 'a'}, {'task_key': 'b'}, {'task_key': 'c'}]
+
+
+def test_user_status_transitions_are_persisted():
+    run = open_run('daily')
+    run.start(USERS)
+    assert run.status('a') == STATUS_PENDING
+
+    run.mark_running('a')
+    assert run.status('a') == STATUS_RUNNING
+    run.mark_done('a', ['用户a：', 'ok', ''])
+    run.mark_running('b')
+    run.mark_failed('b', [], 'x' * 500)
+    run.mark_deferred('c', '本次运行时间预算已用完')
+
+    reloaded = open_run('daily')
+    assert reloaded.status('a') == STATUS_DONE
+    assert reloaded.result('a') == ['用户a：', 'ok', '']
+    assert reloaded.status('b') == STATUS_FAILED
+    assert len(reloaded._records['b']['error']) == 300
+    assert reloaded.status('c') == STATUS_DEFERRED
+    assert reloaded.result('c') is None
+    assert reloaded.count(STATUS_DEFERRED) == 1
+    # 重跑时失败、推迟的用户可以重新开始
+    reloaded.mark_running('c')
+    assert open_run('daily').status('c') == STATUS_RUNNING
+
+
+def test_start_keeps_existing_records_and_finish_closes_run(r):
+    run = open_run('interval')
+    run.start(USERS)
+    run.mark_done('a', [])
+    assert get_unfinished_runs() == ['interval']
+
+    again = open_run('interval')
+    again.start(USERS)
+    assert again.status('a') == STATUS_DONE
+    assert not again.is_finished()
+
+    again.finish()
+    assert open_run('interval').is_finished()
+    assert get_unfinished_runs() == []
+    assert not r.sismember(ACTIVE_RUNS_KEY, again.run_id)
+
+
+def test_stale_runs_are_not_resumed(r):
+    yesterday = date.today() - timedelta(days=1)
+    open_run('daily', yesterday).start(USERS)
+    open_run('interval').start(USERS)
+    assert get_unfinished_runs() == ['interval']
+    assert r.smembers(ACTIVE_RUNS_KEY) == {run_state.make_run_id('interval')}
+
+
+def test_without_redis_checkpoint_is_a_noop():
+    run = RunCheckpoint('daily', run_state.make_run_id('daily'))
+    run.start(USERS)
+    run.mark_done('a', ['x'])
+    assert run.status('a') == STATUS_DONE
+    assert not run.is_finished()
+    run.finish()
+
+
+def test_done_markers_are_per_day():
+    mark_task_done('u1', TASK_DAILY)
+    assert get_done_tasks('u1') == {TASK_DAILY}
+    assert get_done_tasks('u1', date.today() - timedelta(days=1)) == set()
+    assert get_done_tasks('u2') == set()
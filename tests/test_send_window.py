@@ -0,0 +1,30 @@
+from main import get_user_window_offset_seconds
+
+
+def test_offset_is_stable_and_within_window():
+    user = {'task_key': 'user-1', 'uid': 1, 'phone': '13800000000'}
+    offset = get_user_window_offset_seconds(user, 3600)
+    assert 0 <= offset < 3600
+    assert get_user_window_offset_seconds(dict(user), 3600) == offset
+
+
+def test_offset_is_keyed_by_task_key_first():
+    a = get_user_window_offset_seconds({'task_key': 'k', 'uid': 1}, 86400)
+    b = get_user_window_offset_seconds({'task_key': 'k', 'uid': 2}, 86400)
+    c = get_user_window_offset_seconds({'uid': 'k'}, 86400)
+    assert a == b == c
+
+
+def test_offsets_spread_across_window():
+    window = 3600
+    offsets = [get_user_window_offset_seconds({'task_key': f'user-{i}'}, window) for i in range(400)]
+    # 400 个用户分到 4 个 15 分钟的区间，每个区间都应有相当数量的用户
+    buckets = [0] * 4
+    for offset in offsets:
+        buckets[offset * 4 // window] += 1
+    assert min(buckets) > 50
+
+
+def test_no_window_means_no_offset():
+    assert get_user_window_offset_seconds({'task_key': 'k'}, 0) == 0
+    assert get_user_window_offset_seconds({'task_key': 'k'}, -5) == 0
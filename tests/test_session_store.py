@@ -0,0 +1,85 @@
+import session_store
+from session_store import STORAGE_STATE_KEY_TPL, load_state, save_state
+
+STATE = {
+    "cookies": [
+        {"name": "MUSIC_U", "value": "a", "domain": ".music.163.com"},
+        {"name": "other", "value": "b", "domain": ".example.com"},
+    ],
+    "origins": [
+        {"origin": "https://music.163.com", "localStorage": [{"name": "k", "value": "v"}]},
+        {"origin": "https://example.com", "localStorage": []},
+    ],
+}
+
+
+def _state(value):
+    return {"cookies": [{"name": "MUSIC_U", "value": value, "domain": ".music.163.com"}], "origins": []}
+
+
+def test_round_trip_keeps_only_netease_data():
+    assert save_state('138', STATE, expected_version=0)
+    state, version = load_state('138')
+    assert version == 1
+    assert [c["name"] for c in state["cookies"]] == ["MUSIC_U"]
+    assert [o["origin"] for o in state["origins"]] == ["https://music.163.com"]
+
+
+def test_matching_version_is_overwritten():
+    save_state('138', _state('v1'), expected_version=0)
+    _, version = load_state('138')
+    assert save_state('138', _state('v2'), expected_version=version)
+    state, version = load_state('138')
+    assert (state["cookies"][0]["value"], version) == ('v2', 2)
+
+
+def test_stale_version_does_not_overwrite_newer_login():
+    save_state('138', _state('first'), expected_version=0)
+    _, read_version = load_state('138')
+    # 期间另一个 worker 重新登录并写回
+    save_state('138', _state('relogin'), expected_version=read_version)
+
+    assert save_state('138', _state('stale'), expected_version=read_version)
+    state, version = load_state('138')
+    assert (state["cookies"][0]["value"], version) == ('relogin', 2)
+
+
+def test_login_overwrites_without_version_check():
+    save_state('138', _state('first'), expected_version=0)
+    save_state('138', _state('second'))
+    assert save_state('138', _state('login'), expected_version=None)
+    state, version = load_state('138')
+    assert (state["cookies"][0]["value"], version) == ('login', 3)
+
+
+def test_concurrent_update_during_write_is_not_overwritten(r, monkeypatch):
+    key = STORAGE_STATE_KEY_TPL.format(key='138')
+    save_state('138', _state('first'), expected_version=0)
+
+    class RacingRedis:
+        """在 WATCH 之后、事务提交之前模拟另一个 worker 的写入"""
+
+        def pipeline(self):
+            pipe = r.pipeline()
+            hget = pipe.hget
+
+            def racing_hget(*args):
+                value = hget(*args)
+                r.hset(key, mapping={"version": 7, "data": session_store.encode_state(_state('other'))})
+                return value
+
+            pipe.hget = racing_hget
+            return pipe
+
+    monkeypatch.setattr(session_store, '_get_redis', lambda: RacingRedis())
+    assert save_state('138', _state('mine'), expected_version=1)
+    monkeypatch.undo()
+    state, version = load_state('138')
+    assert (state["cookies"][0]["value"], version) == ('other', 7)
+
+
+def test_without_redis_save_reports_failure(monkeypatch):
+    monkeypatch.setattr(session_store, '_get_redis', lambda: None)
+    assert not save_state('138', STATE, expected_version=0)
+    assert load_state('138') is None
+    assert not save_state('', STATE)
@@ -0,0 +1,84 @@
+from playwright_handle import supervisor
+from playwright_handle.supervisor import ProcInfo, find_orphans
+
+UID = 1000
+CHROME = "/root/.cache/ms-playwright/chromium-1140/chrome-linux/chrome"
+DRIVER = ["/usr/lib/node", "/site-packages/playwright/driver/package/cli.js", "run-driver"]
+
+
+def _proc(pid, ppid, cmdline, uid=UID):
+    return ProcInfo(pid, ppid, uid, "S", cmdline[0].rsplit("/", 1)[-1][:15], cmdline, 1024)
+
+
+def _fake_os(monkeypatch, me):
+    monkeypatch.setattr(supervisor.os, "getpid", lambda: me)
+    monkeypatch.setattr(supervisor.os, "getuid", lambda: UID)
+
+
+def _tree(scheduler):
+    # 调度进程 -> 驱动 -> Chromium -> renderer
+    return {p.pid: p for p in [
+        _proc(scheduler, 0 if scheduler == 1 else 1, ["python", "main.py"]),
+        _proc(20, scheduler, DRIVER),
+        _proc(21, 20, [CHROME, "--headless"]),
+        _proc(22, 21, [CHROME, "--type=renderer"]),
+    ]}
+
+
+def _pids(orphans):
+    return [p.pid for p in orphans]
+
+
+def test_pid1_scheduler_children_are_not_orphans(monkeypatch):
+    # 容器内 main.py 就是 1 号进程，自己的驱动 / Chromium 父进程也是 1
+    _fake_os(monkeypatch, 1)
+    assert find_orphans(_tree(1)) == []
+
+
+def test_pid1_scheduler_children_reaped_when_idle(monkeypatch):
+    _fake_os(monkeypatch, 1)
+    assert _pids(find_orphans(_tree(1), include_own_children=True)) == [20, 21, 22]
+
+
+def test_reparented_to_init_is_orphan(monkeypatch):
+    _fake_os(monkeypatch, 10)
+    procs = _tree(10)
+    procs[30] = _proc(30, 1, DRIVER)
+    procs[31] = _proc(31, 30, [CHROME, "--headless"])
+    assert _pids(find_orphans(procs)) == [30, 31]
+    assert _pids(find_orphans(procs, include_own_children=True)) == [20, 21, 22, 30, 31]
+
+
+def test_missing_parent_is_orphan_under_pid1(monkeypatch):
+    _fake_os(monkeypatch, 1)
+    procs = _tree(1)
+    procs[40] = _proc(40, 999, [CHROME, "--headless"])
+    assert _pids(find_orphans(procs)) == [40]
+
+
+def test_other_user_and_non_browser_ignored(monkeypatch):
+    _fake_os(monkeypatch, 10)
+    procs = {
+        50: _proc(50, 1, DRIVER, uid=0),
+        51: _proc(51, 1, ["/usr/bin/bash"]),
+    }
+    assert find_orphans(procs) == []
+
+
+def test_exec_under_pid1_scheduler_skips_its_children(monkeypatch):
+    # docker exec 执行 supervisor.py reap：1 号进程是调度进程，它名下的驱动 / Chromium 正在执行任务
+    _fake_os(monkeypatch, 77)
+    procs = _tree(1)
+    procs[77] = _proc(77, 0, ["python", "playwright_handle/supervisor.py", "reap"])
+    assert find_orphans(procs) == []
+    assert find_orphans(procs, include_own_children=True) == []
+    # 父进程已不存在的仍是残留
+    procs[40] = _proc(40, 999, [CHROME, "--headless"])
+    assert _pids(find_orphans(procs)) == [40]
+
+
+def test_exec_under_other_init_reaps_reparented(monkeypatch):
+    _fake_os(monkeypatch, 77)
+    procs = _tree(1)
+    procs[1] = _proc(1, 0, ["/sbin/init"])
+    assert _pids(find_orphans(procs)) == [20, 21, 22]
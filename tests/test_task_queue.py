@@ -0,0 +1,74 @@
+import pytest
+
+import task_queue
+
+STREAM = 'test:queue:jobs'
+DEAD_STREAM = 'test:queue:dead'
+GROUP = task_queue.TASK_QUEUE_GROUP
+
+
+@pytest.fixture(autouse=True)
+def max_deliveries(monkeypatch):
+    monkeypatch.setattr(task_queue, 'TASK_QUEUE_MAX_DELIVERIES', 3)
+    return 3
+
+
+def _read(r, consumer='c1'):
+    resp = r.xreadgroup(GROUP, consumer, {STREAM: '>'}, count=1)
+    return resp[0][1][0] if resp else None
+
+
+def _drain(r, auth=None):
+    """逐条领取并处理，直到队列中没有新消息"""
+    while (msg := _read(r)) is not None:
+        task_queue._process_message(r, auth, STREAM, DEAD_STREAM, *msg)
+
+
+def _run(r, run_id):
+    return r.hgetall(task_queue.RUN_KEY_TPL.format(run_id=run_id))
+
+
+def test_success_acks_and_finishes_run(r):
+    run_id = task_queue.enqueue_run('bench', [('noop', 'u1', {}), ('noop', 'u2', {})], r=r, stream=STREAM)
+    _drain(r)
+    assert _run(r, run_id)['remaining'] == '0'
+    assert r.xpending(STREAM, GROUP)['pending'] == 0
+    assert r.xlen(DEAD_STREAM) == 0
+
+
+def test_failure_is_requeued_with_attempts_then_dead_lettered(r, monkeypatch, max_deliveries):
+    calls = []
+
+    def failing(auth, fields):
+        calls.append(int(fields.get('attempts') or 0))
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(task_queue, '_handle_job', failing)
+    run_id = task_queue.enqueue_run('bench', [('noop', 'u1', {})], r=r, stream=STREAM)
+    _drain(r)
+
+    # 每次失败重新入队，attempts 累计已执行次数；达到上限后转入死信，不再重试
+    assert calls == [0, 1, 2]
+    assert r.xpending(STREAM, GROUP)['pending'] == 0
+    dead = r.xrange(DEAD_STREAM)
+    assert len(dead) == 1
+    assert dead[0][1]['reason'] == 'boom'
+    assert dead[0][1]['attempts'] == str(max_deliveries - 1)
+    assert _run(r, run_id)['remaining'] == '0'
+
+
+def test_redelivered_message_over_limit_is_dead_lettered_without_running(r, monkeypatch, max_deliveries):
+    monkeypatch.setattr(task_queue, '_handle_job', lambda auth, fields: pytest.fail('不应再执行'))
+    run_id = task_queue.enqueue_run('bench', [('noop', 'u1', {'attempts': max_deliveries - 1})], r=r, stream=STREAM)
+    msg_id, _fields = _read(r, 'lost-worker')
+    # 失联 worker 的消息被其他 worker 认领，投递次数 +1
+    msg_id, fields = r.xclaim(STREAM, GROUP, 'c2', min_idle_time=0, message_ids=[msg_id])[0]
+    assert task_queue._delivery_count(r, STREAM, msg_id) == 2
+
+    task_queue._process_message(r, None, STREAM, DEAD_STREAM, msg_id, fields)
+
+    dead = r.xrange(DEAD_STREAM)
+    assert len(dead) == 1
+    assert dead[0][1]['source_id'] == msg_id
+    assert r.xpending(STREAM, GROUP)['pending'] == 0
+    assert _run(r, run_id)['remaining'] == '0'
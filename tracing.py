@@ -0,0 +1,437 @@
+"""
+浏览器流程的分步 span。
+
+每个 span 记录名称、起止时间、耗时、结果（ok / error）、是否超出预算以及附加属性（url、selector、所用 frame 等），
+按「运行 → 用户 → 浏览器任务 → 流程 → 步骤」嵌套（ContextVar 传递；投递到 worker 进程的任务由 worker_pool 带上父 span），
+结束时逐行写入 TRACE_SPANS_FILE，TRACE_OTEL 时同时导出到 OpenTelemetry。
+
+    with span("goto", url=url) as sp:
+        await page.goto(url)
+        sp.set(status=200)
+
+PLAYWRIGHT_TRACE_ON_SLOW 时，浏览器上下文全程录制 Playwright trace，只有其中有 span 失败或超出预算时才把
+trace.zip 保存到 PLAYWRIGHT_TRACE_DIR（见 capture_playwright_trace）。
+
+在大量运行中找最慢的步骤（在项目根目录执行）：
+    python tracing.py summary                 # 各类 span 的次数、失败、超预算、P50 / P95
+    python tracing.py slowest --name goto     # 最慢的若干个 span 及其所属用户与运行
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+from core import logger
+from run_timing import pad_display
+from config import (
+    PLAYWRIGHT_TRACE_DIR,
+    PLAYWRIGHT_TRACE_ON_SLOW,
+    TRACE_OTEL,
+    TRACE_SPAN_BUDGETS,
+    TRACE_SPANS_BACKUPS,
+    TRACE_SPANS_FILE,
+    TRACE_SPANS_MAX_MB,
+)
+
+SPAN_LAUNCH = "launch"
+SPAN_GOTO = "goto"
+SPAN_SELECTOR_WAIT = "selector-wait"
+SPAN_CAPTCHA = "captcha"
+SPAN_EXPECT_RESPONSE = "expect_response"
+SPAN_COOKIE_HARVEST = "cookie-harvest"
+
+# 默认耗时预算（毫秒）；TRACE_SPAN_BUDGETS 中的同名项覆盖
+DEFAULT_SPAN_BUDGETS_MS = {
+    SPAN_LAUNCH: 15000,
+    SPAN_GOTO: 10000,
+    SPAN_SELECTOR_WAIT: 10000,
+    SPAN_CAPTCHA: 30000,
+    SPAN_EXPECT_RESPONSE: 10000,
+    SPAN_COOKIE_HARVEST: 2000,
+}
+
+
+def _parse_budgets(value: str) -> dict[str, int]:
+    budgets = dict(DEFAULT_SPAN_BUDGETS_MS)
+    for item in value.split(","):
+        name, sep, ms = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            budgets[name.strip()] = int(ms)
+        except ValueError:
+            logger.warning(f"TRACE_SPAN_BUDGETS 中的 {item!r} 不是 name=毫秒，已忽略")
+    return budgets
+
+
+SPAN_BUDGETS_MS = _parse_budgets(TRACE_SPAN_BUDGETS)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """一个计时步骤；uid / run_id 未指定时沿用父 span 的"""
+
+    def __init__(self, name: str, parent: "Span | None" = None, *, uid=None, run_id=None, attrs=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = _new_id()
+        self.parent_id = parent.span_id if parent else None
+        self.uid = uid if uid is not None else (parent.uid if parent else None)
+        self.run_id = run_id if run_id is not None else (parent.run_id if parent else None)
+        self.attrs: dict[str, Any] = dict(attrs or {})
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.duration_ms: int | None = None
+        self.outcome = "ok"
+        self.error: str | None = None
+        self.budget_ms = SPAN_BUDGETS_MS.get(name)
+        self._otel = None
+
+    def set(self, **attrs):
+        """追加属性（如所用 frame、接口状态码）"""
+        self.attrs.update(attrs)
+        return self
+
+    def fail(self, error: str | Exception, outcome: str = "error"):
+        """未抛异常但结果失败（如未找到元素后走了回退）时标记"""
+        self.outcome = outcome
+        self.error = str(error)[:300]
+        return self
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget_ms is not None and self.duration_ms is not None and self.duration_ms > self.budget_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "uid": self.uid,
+            "run_id": self.run_id,
+            "start": datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            "duration_ms": self.duration_ms,
+            "outcome": self.outcome,
+            "error": self.error,
+            "budget_ms": self.budget_ms,
+            "over_budget": self.over_budget,
+            "attrs": self.attrs,
+            "pid": os.getpid(),
+        }
+
+
+class _RemoteParent(Span):
+    """其他进程中的父 span（只用于让子 span 挂到同一条链路上，本身不导出）"""
+
+    def __init__(self, ctx: dict):
+        super().__init__("remote")
+        self.trace_id = ctx.get("trace_id") or self.trace_id
+        self.span_id = ctx.get("span_id") or self.span_id
+        self.uid = ctx.get("uid")
+        self.run_id = ctx.get("run_id")
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("trace_span", default=None)
+_current_capture: contextvars.ContextVar["_TraceCapture | None"] = contextvars.ContextVar("trace_capture", default=None)
+_span_writer: logging.Logger | None = None
+_span_writer_lock = threading.Lock()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def _get_span_writer() -> logging.Logger:
+    """span 文件的写入器：文件保持打开、按大小轮转（与业务日志一样用 RotatingFileHandler），每行一个 span"""
+    global _span_writer
+    with _span_writer_lock:
+        if _span_writer is None:
+            parent_dir = os.path.dirname(TRACE_SPANS_FILE)
+            if parent_dir:
+                os.makedirs(parent_dir, exist_ok=True)
+            # 各进程（调度进程、worker 进程）各自追加写整行并各自轮转，轮转前后少量 span 可能落在相邻的文件中
+            handler = RotatingFileHandler(
+                TRACE_SPANS_FILE,
+                maxBytes=TRACE_SPANS_MAX_MB * 1024 * 1024,
+                backupCount=TRACE_SPANS_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            writer = logging.getLogger("netease_music.spans")
+            writer.setLevel(logging.INFO)
+            writer.propagate = False
+            writer.addHandler(handler)
+            _span_writer = writer
+        return _span_writer
+
+
+def _export(sp: Span):
+    if TRACE_SPANS_FILE:
+        try:
+            _get_span_writer().info(json.dumps(sp.to_dict(), ensure_ascii=False, default=str))
+        except OSError as e:
+            logger.debug(f"写入 span 失败：{e}")
+
+
+_otel_tracer = None
+
+
+def _get_otel_tracer():
+    global _otel_tracer
+    if _otel_tracer is None:
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError:
+            logger.warning("TRACE_OTEL 已开启但未安装 opentelemetry，span 只写入文件")
+            _otel_tracer = False
+        else:
+            _otel_tracer = otel_trace.get_tracer("netease_music")
+    return _otel_tracer or None
+
+
+def _otel_start(sp: Span, parent: Span | None):
+    tracer = _get_otel_tracer() if TRACE_OTEL else None
+    if tracer is None:
+        return
+    from opentelemetry import trace as otel_trace
+
+    # 跨进程的父 span 没有 OpenTelemetry 对象，worker 中的 span 另起一条链路，以 trace_id 属性关联
+    context = otel_trace.set_span_in_context(parent._otel) if parent is not None and parent._otel else None
+    sp._otel = tracer.start_span(sp.name, context=context, start_time=int(sp.started_at * 1e9))
+
+
+def _otel_end(sp: Span):
+    if sp._otel is None:
+        return
+    try:
+        from opentelemetry.trace import Status, StatusCode
+
+        attrs = {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in sp.attrs.items()}
+        attrs.update(
+            {"trace.id": sp.trace_id, "span.id": sp.span_id, "outcome": sp.outcome, "over_budget": sp.over_budget}
+        )
+        if sp.uid is not None:
+            attrs["uid"] = str(sp.uid)
+        if sp.run_id is not None:
+            attrs["run_id"] = str(sp.run_id)
+        sp._otel.set_attributes(attrs)
+        if sp.outcome != "ok":
+            sp._otel.set_status(Status(StatusCode.ERROR, sp.error or sp.outcome))
+        sp._otel.end()
+    except Exception as e:
+        logger.debug(f"导出 OpenTelemetry span 失败：{e}")
+
+
+@contextmanager
+def span(name: str, *, uid=None, run_id=None, **attrs):
+    """
+    记录一个 span（异常退出记为 error 并继续抛出）。未配置 TRACE_SPANS_FILE 且未开启 TRACE_OTEL 时只计时、不导出。
+    """
+    parent = _current_span.get()
+    sp = Span(name, parent, uid=uid, run_id=run_id, attrs=attrs)
+    _otel_start(sp, parent)
+    token = _current_span.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        sp.duration_ms = int((time.monotonic() - sp._started) * 1000)
+        capture = _current_capture.get()
+        if capture is not None and (sp.outcome != "ok" or sp.over_budget):
+            capture.flag(sp)
+        _export(sp)
+        _otel_end(sp)
+
+
+def frame_label(scope) -> str:
+    """span 中记录的 frame：主文档为 main，iframe 为其 name（没有时为 url）"""
+    try:
+        if not hasattr(scope, "parent_frame"):
+            return "main"
+        if scope.parent_frame is None:
+            return "main"
+        return scope.name or scope.url
+    except Exception:
+        return "?"
+
+
+# ---------- 跨进程 ----------
+
+
+def current_trace_context() -> dict | None:
+    """当前 span 的链路信息（可 pickle），随浏览器任务投递到 worker 进程"""
+    sp = _current_span.get()
+    if sp is None:
+        return None
+    return {"trace_id": sp.trace_id, "span_id": sp.span_id, "uid": sp.uid, "run_id": sp.run_id}
+
+
+@contextmanager
+def use_trace_context(ctx: dict | None):
+    """在 worker 进程中把投递方的 span 作为父 span"""
+    if not ctx:
+        yield
+        return
+    token = _current_span.set(_RemoteParent(ctx))
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+# ---------- Playwright trace ----------
+
+
+class _TraceCapture:
+    def __init__(self):
+        self.reasons: list[str] = []
+
+    def flag(self, sp: Span):
+        reason = f"{sp.name}:{sp.outcome if sp.outcome != 'ok' else 'slow'}"
+        if reason not in self.reasons:
+            self.reasons.append(reason)
+
+
+@asynccontextmanager
+async def capture_playwright_trace(context):
+    """
+    PLAYWRIGHT_TRACE_ON_SLOW 时在浏览器上下文上录制 trace；退出时若期间有 span 失败或超出预算（或流程抛出异常），
+    把 trace.zip 保存到 PLAYWRIGHT_TRACE_DIR，否则丢弃。
+    """
+    if not PLAYWRIGHT_TRACE_ON_SLOW:
+        yield
+        return
+    try:
+        await context.tracing.start(screenshots=True, snapshots=True)
+    except Exception as e:
+        logger.debug(f"启动 Playwright trace 失败：{e}")
+        yield
+        return
+    capture = _TraceCapture()
+    token = _current_capture.set(capture)
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _current_capture.reset(token)
+        if failed and not capture.reasons:
+            capture.reasons.append("exception")
+        try:
+            if capture.reasons:
+                os.makedirs(PLAYWRIGHT_TRACE_DIR, exist_ok=True)
+                sp = _current_span.get()
+                tag = "_".join(str(x) for x in (sp.uid if sp else None, sp.span_id if sp else _new_id()) if x)
+                path = os.path.join(PLAYWRIGHT_TRACE_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{tag}.zip")
+                await context.tracing.stop(path=path)
+                logger.info(f"保存 Playwright trace（{', '.join(capture.reasons)}）：{path}")
+            else:
+                await context.tracing.stop()
+        except Exception as e:
+            logger.debug(f"停止 Playwright trace 失败：{e}")
+
+
+# ---------- 统计 ----------
+
+
+def load_spans(path: str = TRACE_SPANS_FILE, *, name: str | None = None) -> list[dict]:
+    """读取 span 文件及其轮转出的旧文件（path.1 … path.N，从旧到新）"""
+    spans = []
+    if not path:
+        return spans
+    backups = [f"{path}.{i}" for i in range(TRACE_SPANS_BACKUPS, 0, -1)]
+    for file_path in backups + [path]:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if name is None or item.get("name") == name:
+                        spans.append(item)
+        except FileNotFoundError:
+            continue
+    return spans
+
+
+def _percentile(values: list[int], q: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def format_summary(spans: list[dict]) -> list[str]:
+    """按 span 名称汇总：次数、失败数、超预算数、P50 / P95 / 最大耗时，按 P95 从慢到快"""
+    groups: dict[str, list[dict]] = {}
+    for item in spans:
+        if item.get("duration_ms") is not None:
+            groups.setdefault(item["name"], []).append(item)
+    rows = []
+    for name, items in groups.items():
+        durations = [item["duration_ms"] for item in items]
+        rows.append((
+            _percentile(durations, 0.95), name, len(items),
+            sum(1 for item in items if item.get("outcome") != "ok"),
+            sum(1 for item in items if item.get("over_budget")),
+            _percentile(durations, 0.5), max(durations),
+        ))
+    titles = ("次数", "失败", "超预算", "P50(ms)", "P95(ms)", "最大(ms)")
+    lines = [pad_display("span", 24, left=True) + "".join(pad_display(title, 10) for title in titles)]
+    for p95, name, count, failed, slow, p50, worst in sorted(rows, reverse=True):
+        lines.append(pad_display(name, 24, left=True) + "".join(f"{v:>10}" for v in (count, failed, slow, p50, p95, worst)))
+    return lines
+
+
+def format_slowest(spans: list[dict], top: int) -> list[str]:
+    lines = []
+    for item in sorted(spans, key=lambda x: x.get("duration_ms") or 0, reverse=True)[:top]:
+        attrs = " ".join(f"{k}={v}" for k, v in (item.get("attrs") or {}).items())
+        lines.append(
+            f"{item.get('duration_ms'):>8}ms {item.get('name'):<18} {item.get('outcome'):<6} "
+            f"uid={item.get('uid')} run={item.get('run_id')} {item.get('start')} {attrs}"
+        )
+    return lines
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="浏览器流程 span 统计")
+    parser.add_argument("--file", default=TRACE_SPANS_FILE, help="span 文件（默认 TRACE_SPANS_FILE）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("summary", help="各类 span 的次数、失败、超预算与耗时分位数")
+    slowest = sub.add_parser("slowest", help="最慢的 span")
+    slowest.add_argument("--name", help="只看该名称的 span")
+    slowest.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    if not args.file:
+        parser.error("未配置 TRACE_SPANS_FILE，请用 --file 指定 span 文件")
+    if args.command == "summary":
+        lines = format_summary(load_spans(args.file))
+    else:
+        lines = format_slowest(load_spans(args.file, name=args.name), args.top)
+    for line in lines:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()